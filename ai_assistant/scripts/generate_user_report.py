@@ -16,6 +16,7 @@ try:
     PROJECT_ROOT = SCRIPT_DIR.parent.parent
     sys.path.append(str(PROJECT_ROOT))
     from settings import BASE_DIR
+    from modules.wg_config_parser import load_server_config
 except ImportError as e:
     print(f"Ошибка импорта settings: {e}")
     sys.exit(1)
@@ -26,29 +27,17 @@ PARAMS_FILE = Path("/etc/wireguard/params")
 
 def parse_wg_config(config_path):
     """Читает конфигурацию WireGuard и извлекает информацию о клиентах."""
-    clients = []
-    current_client = None
-
     try:
-        with open(config_path, "r") as file:
-            for line in file:
-                line = line.strip()
-                if line.startswith("### Client"):
-                    if current_client:
-                        clients.append(current_client)
-                    current_client = {"login": line.split("### Client")[-1].strip(), "peer": {}}
-                elif line.startswith("[Peer]"):
-                    continue
-                elif "=" in line and current_client:
-                    key, value = map(str.strip, line.split("=", 1))
-                    current_client["peer"][key] = value
-            if current_client:
-                clients.append(current_client)
+        config = load_server_config(config_path)
     except FileNotFoundError:
         print(f"Файл конфигурации {config_path} не найден.")
         sys.exit(1)
 
-    return clients
+    return [
+        {"login": peer.name, "peer": peer.as_dict()}
+        for peer in config.peers
+        if peer.name is not None
+    ]
 
 def get_wg_status():
     """Получает состояние WireGuard через команду `wg show`."""
@@ -5,6 +5,7 @@
 # Обновлено: 2024-12-02
 
 import json
+import sqlite3
 import subprocess
 from pathlib import Path
 import sys
@@ -16,7 +17,8 @@ PROJECT_ROOT = Path(__file__).resolve().parent.parent
 sys.path.append(str(PROJECT_ROOT))  # Добавляем корень проекта в sys.path
 
 # Импортируем настройки
-from settings import PROJECT_DIR, SUMMARY_REPORT_PATH, USER_DB_PATH, LOG_LEVEL
+from settings import PROJECT_DIR, SUMMARY_REPORT_PATH, LOG_LEVEL
+from modules import user_store
 
 # Настройка логирования
 logging.basicConfig(
@@ -86,19 +88,14 @@ def check_wireguard_status():
 
 
 def count_users():
-    """Считает количество пользователей из user_records.json."""
-    if USER_DB_PATH.exists():
-        try:
-            with open(USER_DB_PATH, "r", encoding="utf-8") as file:
-                user_data = json.load(file)
-                user_count = len(user_data)
-                logger.debug(f"Обнаружено пользователей: {user_count}")
-                return user_count, "user_records.json"
-        except json.JSONDecodeError:
-            logger.error(f"Ошибка чтения файла user_records.json.")
-            return 0, "Ошибка чтения user_records.json"
-    logger.warning(f"Файл user_records.json отсутствует.")
-    return 0, "Отсутствует файл user_records.json"
+    """Считает количество пользователей в базе данных пользователей."""
+    try:
+        user_count = user_store.count_users()
+    except sqlite3.Error as e:
+        logger.error(f"Ошибка чтения базы пользователей: {e}")
+        return 0, "Ошибка чтения user_records.db"
+    logger.debug(f"Обнаружено пользователей: {user_count}")
+    return user_count, "user_records.db"
 
 
 def count_peers(wg_info):
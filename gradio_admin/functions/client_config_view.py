@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+# gradio_admin/functions/client_config_view.py
+# Конфигурация и QR-код клиента по запросу (из кэша modules.client_render)
+
+import io
+
+from modules.client_render import render_config, render_qr
+
+
+def qr_image(username):
+    """QR-код клиента как изображение PIL или None, если отрисовать его нельзя."""
+    from PIL import Image
+
+    try:
+        return Image.open(io.BytesIO(render_qr(username)))
+    except (KeyError, FileNotFoundError, ValueError) as e:
+        print(f"[DEBUG] QR-код {username} недоступен: {e}")
+        return None
+
+
+def show_client_config(username):
+    """
+    Конфигурация и QR-код клиента для вкладки статистики.
+    :return: Кортеж (текст конфигурации или сообщение об ошибке, изображение или None).
+    """
+    username = (username or "").strip()
+    if not username:
+        return "Введите имя пользователя.", None
+    try:
+        config = render_config(username)
+    except KeyError:
+        return f"❌ Пользователь {username} не найден.", None
+    except FileNotFoundError:
+        return f"❌ Конфигурация пользователя {username} не найдена.", None
+    except ValueError as e:
+        return f"❌ {e}", None
+    return config, qr_image(username)
@@ -1,31 +1,33 @@
 #!/usr/bin/env python3
 # gradio_admin/functions/create_user.py
-# Логика создания пользователей через main.py
+# Логика создания пользователей (в процессе админки, modules.provisioning)
 
-import os
-import subprocess
+from gradio_admin.functions.client_config_view import qr_image
+from modules.provisioning import format_timings, get_service
+from modules.user_repository import UserExistsError
 
 def create_user(username, email="N/A", telegram_id="N/A"):
     """
-    Создание пользователя через main.py.
+    Создание пользователя через общий ProvisioningService процесса.
     """
     if not username:
         return "Ошибка: имя пользователя не может быть пустым.", None
 
     try:
-        subprocess.run(
-            ["python3", "main.py", username, email, telegram_id],
-            check=True,
-            cwd=os.path.abspath(os.path.dirname(__file__) + "/../../")
-        )
-        qr_code_path = os.path.join("user", "data", "qrcodes", f"{username}.png")
-        absolute_path = os.path.abspath(qr_code_path)
-        
-        if os.path.exists(absolute_path):
-            return f"✅ Пользователь {username} успешно создан.", absolute_path
-        return f"✅ Пользователь {username} успешно создан, но QR-код не найден.", None
+        result = get_service().create_user(username, email or "N/A", telegram_id or "N/A")
+        timing = f"⏱️ {format_timings(result)}"
 
-    except subprocess.CalledProcessError as e:
+        if result["qr_path"]:
+            return f"✅ Пользователь {username} успешно создан.\n{timing}", result["qr_path"]
+        # Ленивый режим: QR-код отрисовывается из записи пользователя в памяти
+        image = qr_image(username)
+        if image is not None:
+            return f"✅ Пользователь {username} успешно создан.\n{timing}", image
+        return f"✅ Пользователь {username} успешно создан, но QR-код не найден.\n{timing}", None
+
+    except UserExistsError:
+        return f"❌ Пользователь с именем '{username}' уже существует.", None
+    except (ValueError, KeyError, OSError) as e:
         return f"❌ Ошибка при создании пользователя: {str(e)}", None
     except Exception as e:
         return f"❌ Непредвиденная ошибка: {str(e)}", None
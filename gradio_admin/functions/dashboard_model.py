@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# gradio_admin/functions/dashboard_model.py
+# Модель вкладки Dashboard: активные пиры по снимкам телеметрии.
+#
+# Модель подписана на снимок телеметрии (modules.telemetry.get_snapshot) и
+# пересчитывается, только когда появился новый снимок (по taken_at): таймер
+# вкладки опрашивает её чаще, чем сборщик снимает данные, и холостые опросы
+# ничего не считают. Скорости rx/tx — разность счётчиков двух соседних снимков.
+#
+# Стоимость обновления ограничена:
+# - для всех пиров считаются только скорости (проход по колонкам снимка);
+# - строки форматируются только для settings.DASHBOARD_MAX_ROWS самых активных пиров;
+# - графики трафика строятся по свёртке 1m из истории (modules.timeseries) только
+#   для показанных пиров и пересчитываются раз в минуту, когда закрывается минута.
+#
+# Каждое обновление возвращает дельту: изменившиеся строки, ушедшие пиры и
+# порядок, если он поменялся. Номер версии позволяет клиенту понять, что
+# изменений не было.
+
+import heapq
+import threading
+import time
+
+import settings
+from modules import user_store
+from modules.telemetry import get_snapshot
+from modules.timeseries import get_reader
+from modules.wg_dump import format_bytes, format_handshake
+
+COLUMNS = ["👤 User", "🌎 Endpoint", "🤝 Handshake", "⬆️ rx/s", "⬇️ tx/s", "📈 Traffic", "⚡ St."]
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+
+def sparkline(values):
+    """Строка-график значений ("▁▃█▂"), масштаб — по максимуму ряда."""
+    top = max(values, default=0)
+    if top <= 0:
+        return SPARK_CHARS[0] * len(values)
+    last = len(SPARK_CHARS) - 1
+    return "".join(SPARK_CHARS[min(last, int(value * last / top + 0.5))] for value in values)
+
+
+def _delta(previous, current):
+    # Счётчик сбрасывается при перезапуске интерфейса: приращение — новое значение
+    return current - previous if current >= previous else current
+
+
+class Dashboard:
+    """
+    Строки вкладки Dashboard с дельтами между обновлениями.
+    :param max_rows: Максимум строк (по умолчанию settings.DASHBOARD_MAX_ROWS).
+    :param minutes: Минут истории в графике (по умолчанию settings.DASHBOARD_SPARKLINE_MINUTES).
+    """
+
+    def __init__(self, max_rows=None, minutes=None):
+        self.max_rows = max_rows or settings.DASHBOARD_MAX_ROWS
+        self.minutes = minutes or settings.DASHBOARD_SPARKLINE_MINUTES
+        self.version = 0
+        self.last_duration = 0.0
+        self._lock = threading.Lock()
+        self._taken_at = None
+        self._counters = {}     # public_key -> (rx, tx) предыдущего снимка
+        self._rates = {}        # public_key -> (rx/s, tx/s)
+        self._rows = {}         # public_key -> строка таблицы
+        self._order = []        # ключи показанных пиров по убыванию активности
+        self._sparks = (None, {})  # (конец окна, {public_key: график})
+        self._names = (None, {})   # (generation базы, {public_key: username})
+        self._summary = {"peers": 0, "active": 0, "rx_rate": 0.0, "tx_rate": 0.0, "taken_at": None}
+
+    def _usernames(self):
+        generation = (str(settings.USER_STORE_PATH), user_store.generation())
+        if self._names[0] != generation:
+            users = user_store.query_users(["public_key"], where=[("public_key", "!=", None)])
+            self._names = (generation, {fields["public_key"]: username for username, fields in users.items()})
+        return self._names[1]
+
+    def _sparklines(self, keys, now):
+        """Графики трафика (rx + tx за минуту) показанных пиров по закрытым минутам."""
+        end = int(now) - int(now) % 60
+        cached_end, sparks = self._sparks
+        if cached_end != end:
+            sparks = {}
+        missing = [key for key in keys if key not in sparks]
+        if missing:
+            start = end - self.minutes * 60
+            series = {key: [0] * self.minutes for key in missing}
+            rows = get_reader().query(start, end, "1m", public_keys=missing)
+            for ts, key, rx, tx in zip(rows.timestamps, rows.public_keys, rows.rx, rows.tx):
+                series[key][(ts - start) // 60] += rx + tx
+            sparks = {**sparks, **{key: sparkline(values) for key, values in series.items()}}
+        self._sparks = (end, sparks)
+        return sparks
+
+    def update(self, snapshot=None):
+        """
+        Пересчитывает строки по новому снимку телеметрии.
+        :param snapshot: Снимок (по умолчанию — текущий из modules.telemetry).
+        :return: Дельта {"version", "changed": {public_key: строка}, "removed": [public_key],
+            "order": [public_key] или None, если порядок не изменился}; None — снимок тот же.
+        """
+        snapshot = get_snapshot() if snapshot is None else snapshot
+        if snapshot is None:
+            return None
+        with self._lock:
+            if snapshot.taken_at == self._taken_at:
+                return None
+            start = time.perf_counter()
+            table, taken_at = snapshot.table, snapshot.taken_at
+            elapsed = taken_at - self._taken_at if self._taken_at is not None else None
+
+            # Скорости всех пиров — один проход по колонкам снимка
+            previous, counters, rates = self._counters, {}, {}
+            for key, rx, tx in zip(table.public_keys, table.rx_bytes, table.tx_bytes):
+                counters[key] = (rx, tx)
+                before = previous.get(key)
+                if elapsed and before is not None:
+                    rates[key] = (_delta(before[0], rx) / elapsed, _delta(before[1], tx) / elapsed)
+                else:
+                    rates[key] = (0.0, 0.0)
+
+            threshold = taken_at - settings.TELEMETRY_ACTIVE_WINDOW
+            handshakes = dict(zip(table.public_keys, table.latest_handshakes))
+
+            def activity(key):
+                rx_rate, tx_rate = rates[key]
+                return handshakes[key] >= threshold, rx_rate + tx_rate, handshakes[key]
+
+            order = heapq.nlargest(self.max_rows, counters, key=activity)
+            names, sparks = self._usernames(), self._sparklines(order, taken_at)
+            rows = {}
+            for key in order:
+                peer = table.get(key)
+                rx_rate, tx_rate = rates[key]
+                rows[key] = [
+                    names.get(key, f"{key[:8]}…"),
+                    peer["endpoint"] or "N/A",
+                    format_handshake(peer["latest_handshake"], taken_at),
+                    f"{format_bytes(int(rx_rate))}/s",
+                    f"{format_bytes(int(tx_rate))}/s",
+                    sparks.get(key, ""),
+                    "🟢" if peer["latest_handshake"] >= threshold else "🔴",
+                ]
+
+            delta = {
+                "changed": {key: row for key, row in rows.items() if self._rows.get(key) != row},
+                "removed": [key for key in self._rows if key not in rows],
+                "order": order if order != self._order else None,
+            }
+            self._taken_at, self._counters, self._rates = taken_at, counters, rates
+            self._rows, self._order = rows, order
+            self._summary = {
+                "peers": len(counters),
+                "active": sum(1 for handshake in table.latest_handshakes if handshake >= threshold),
+                "rx_rate": sum(rate[0] for rate in rates.values()),
+                "tx_rate": sum(rate[1] for rate in rates.values()),
+                "taken_at": taken_at,
+            }
+            if delta["changed"] or delta["removed"] or delta["order"] is not None:
+                self.version += 1
+            delta["version"] = self.version
+            self.last_duration = time.perf_counter() - start
+            return delta
+
+    def rows(self):
+        """Строки таблицы в порядке активности."""
+        with self._lock:
+            return [list(self._rows[key]) for key in self._order]
+
+    def summary(self):
+        """Сводка последнего снимка: пиры, активные, суммарные скорости, время снимка и обновления."""
+        with self._lock:
+            return {**self._summary, "duration": self.last_duration, "version": self.version}
+
+
+_dashboard = None
+_dashboard_lock = threading.Lock()
+
+
+def get_dashboard():
+    """Общая модель процесса, обновлённая по текущему снимку (все вкладки браузера видят одну)."""
+    global _dashboard
+    with _dashboard_lock:
+        if _dashboard is None:
+            _dashboard = Dashboard()
+    _dashboard.update()
+    return _dashboard
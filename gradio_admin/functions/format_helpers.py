@@ -5,6 +5,8 @@
 
 from datetime import datetime
 
+from modules.expiry_time import time_left_text
+
 def format_time(iso_time):
     """Форматирует время из ISO 8601 в читаемый формат."""
     try:
@@ -15,15 +17,8 @@ def format_time(iso_time):
 
 
 def calculate_time_remaining(expiry_time):
-    """Вычисляет оставшееся время до истечения."""
-    try:
-        dt_expiry = datetime.fromisoformat(expiry_time)
-        delta = dt_expiry - datetime.now()
-        if delta.days >= 0:
-            return f"{delta.days} days"
-        return "Expired"
-    except Exception:
-        return "N/A"
+    """Вычисляет оставшееся время до истечения (ISO 8601 или Unix epoch)."""
+    return time_left_text(expiry_time, min_days=0)
 
 
 def format_user_info(username, user_data, table_row):
@@ -2,8 +2,10 @@
 # gradio_admin/functions/show_user_info.py
 # Функции для отображения информации о пользователе в проекте wg_qr_generator
 
-from gradio_admin.functions.user_records import load_user_records
+from gradio_admin.functions.user_records import load_user_record
 from gradio_admin.functions.format_helpers import format_time
+from modules.telemetry import get_snapshot
+from modules.wg_dump import format_bytes, format_handshake
 
 def show_user_info(selected_data, query):
     """Показывает подробную информацию о выбранном пользователе."""
@@ -19,8 +21,7 @@ def show_user_info(selected_data, query):
     try:
         row = selected_data if isinstance(selected_data, list) else selected_data.iloc[0].values
         username = row[0].replace("👤 User account : ", "") if len(row) > 0 else "N/A"
-        records = load_user_records()
-        user_data = records.get(username, {})
+        user_data = load_user_record(username) or {}
 
         created = user_data.get("created_at", "N/A")
         expires = user_data.get("expires_at", "N/A")
@@ -32,6 +33,15 @@ def show_user_info(selected_data, query):
 🌱 Created: {format_time(created)}
 🔥 Expires: {format_time(expires)}
 🌐 Internal IP: {int_ip}
+"""
+        # Текущее состояние пира из снимка телеметрии (без запуска `wg`)
+        snapshot = get_snapshot()
+        peer = snapshot.table.get(user_data.get("public_key")) if snapshot is not None else None
+        if peer is not None:
+            user_info += f"""🌎 External IP: {peer['endpoint'] or 'N/A'}
+⬆️ Uploaded: {format_bytes(peer['rx_bytes'])}
+⬇️ Downloaded: {format_bytes(peer['tx_bytes'])}
+🤝 Last handshake: {format_handshake(peer['latest_handshake'], snapshot.taken_at)}
 """
         print(f"[DEBUG] User info:\n{user_info}")  # Отладка
         return user_info.strip()
@@ -1,28 +1,91 @@
 # statistics.py
-import json
-import os
+import time
+from datetime import datetime
+from modules.key_pool import get_pool_stats
+from modules.telemetry import get_telemetry_stats
+from modules.timeseries import get_reader
+from modules.wg_dump import format_bytes
+from modules import user_store
 
 def get_user_statistics():
     """
     Получение статистики пользователей.
     Возвращает количество пользователей, их список и другие метрики.
     """
-    base_dir = os.getcwd()
-    user_records_path = os.path.join(base_dir, "user", "data", "user_records.json")
-
-    if not os.path.exists(user_records_path):
-        return {
-            "status": "error",
-            "message": "Файл user_records.json не найден."
-        }
-
-    with open(user_records_path, "r") as f:
-        users_data = json.load(f)
-
-    total_users = len(users_data)
-    user_names = list(users_data.keys())
+    user_names = user_store.get_usernames()
+    total_users = len(user_names)
     return {
         "status": "success",
         "total_users": total_users,
         "user_names": user_names,
     }
+
+
+def format_key_pool_stats():
+    """
+    Форматирует состояние пула ключей для вкладки статистики.
+    """
+    try:
+        stats = get_pool_stats()
+    except OSError as e:
+        return f"🔑 Key pool: unavailable ({e})"
+
+    rate = f"{stats['refill_rate']:,.0f} keys/s" if stats["refill_rate"] else "N/A"
+    last_refill = (
+        datetime.fromtimestamp(stats["last_refill_at"]).strftime("%Y-%m-%d %H:%M:%S")
+        if stats["last_refill_at"] else "N/A"
+    )
+    worker = "🟢 running" if stats["worker_running"] else "🔴 stopped"
+    return (
+        f"🔑 Key pool: **{stats['depth']}/{stats['watermark']}** | "
+        f"Refill rate: {rate} | Last refill: {last_refill} | Worker: {worker}"
+    )
+
+
+def format_telemetry_stats():
+    """
+    Форматирует последний снимок телеметрии пиров для вкладки статистики.
+    """
+    try:
+        stats = get_telemetry_stats()
+    except (OSError, ValueError) as e:
+        return f"📡 Telemetry: unavailable ({e})"
+
+    worker = "🟢 running" if stats["worker_running"] else "🔴 stopped"
+    snapshot = stats["snapshot"]
+    if snapshot is None:
+        error = f" ({stats['last_error']})" if stats["last_error"] else ""
+        return f"📡 Telemetry: no data yet{error} | Worker: {worker}"
+
+    taken_at = datetime.fromtimestamp(snapshot["taken_at"]).strftime("%Y-%m-%d %H:%M:%S")
+    quota = stats["quota"]
+    quota_info = (
+        f" | Quota check: {quota['checked']} peers in {quota['duration'] * 1000:.1f} ms, "
+        f"suspended {quota['suspended']}"
+        if quota else ""
+    )
+    return (
+        f"📡 Peers: **{snapshot['active']}/{snapshot['peers']}** active | "
+        f"⬆️ {format_bytes(snapshot['rx_bytes'])} ⬇️ {format_bytes(snapshot['tx_bytes'])} | "
+        f"Sampled: {taken_at} every {stats['interval']} s | Worker: {worker}{quota_info}"
+    )
+
+
+def format_traffic_stats():
+    """
+    Форматирует трафик за последние сутки по истории (modules.timeseries) для вкладки статистики.
+    """
+    try:
+        usage = get_reader().usage(time.time() - 86400, None, "1m")
+    except (OSError, ValueError) as e:
+        return f"📈 Traffic history: unavailable ({e})"
+
+    if not usage:
+        return "📈 Traffic 24 h: no history yet"
+    rx = sum(total[0] for total in usage.values())
+    tx = sum(total[1] for total in usage.values())
+    top_key, top = max(usage.items(), key=lambda item: sum(item[1]))
+    return (
+        f"📈 Traffic 24 h: ⬆️ {format_bytes(rx)} ⬇️ {format_bytes(tx)} | "
+        f"Peers with traffic: {len(usage)} | Top: {top_key[:8]}… {format_bytes(sum(top))}"
+    )
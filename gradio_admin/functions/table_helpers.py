@@ -1,51 +1,29 @@
 #!/usr/bin/env python3
 # gradio_admin/functions/table_helpers.py
 
-import os
-import json
 import pandas as pd
-from settings import USER_DB_PATH  # Путь к JSON с данными пользователей
-
-
-def load_data(show_inactive=True):
-    """Загружает данные пользователей из JSON."""
-    if not os.path.exists(USER_DB_PATH):
-        return []
-
-    with open(USER_DB_PATH, "r") as f:
-        users = json.load(f)
-
-    table = []
-    for username, user_info in users.items():
-        if not show_inactive and user_info.get("status", "") != "active":
-            continue
-        table.append({
-            "username": user_info.get("username", "N/A"),
-            "data_used": user_info.get("data_used", "0.0 KiB"),
-            "data_limit": user_info.get("data_limit", "100.0 GB"),
-            "status": user_info.get("status", "inactive"),
-            "subscription_price": user_info.get("subscription_price", "0.00 USD"),
-            "user_id": user_info.get("user_id", "N/A")  # Сохраняем UID
-        })
-    return table
-
-
-def update_table(show_inactive):
-    """Создает таблицу для отображения в Gradio."""
-    users = load_data(show_inactive)
-    formatted_rows = []
-
-    for user in users:
-        formatted_rows.append([
-            user["username"],
-            user["data_used"],
-            user["data_limit"],
-            user["status"],
-            user["subscription_price"],
-            user["user_id"],  # UID добавляем в таблицу
-        ])
-
-    return pd.DataFrame(
-        formatted_rows,
-        columns=["👤 User", "📊 Used", "📦 Limit", "⚡ St.", "💳 $", "UID"]
-    )
+from gradio_admin.functions.table_model import COLUMNS, get_user_table
+
+
+def load_data(show_inactive=True, offset=0, limit=None):
+    """
+    Загружает данные пользователей из кэшируемой модели таблицы.
+    Трафик — итог из учёта (modules.timeseries) с начала периода (data_used_base).
+    :param offset: Сколько отобранных пользователей пропустить.
+    :param limit: Максимум пользователей (None — все).
+    """
+    table = get_user_table()
+    keys = ["username", "data_used", "data_limit", "status", "subscription_price", "user_id"]
+    indexes = table.search("", show_inactive)
+    stop = None if limit is None else offset + limit
+    return [dict(zip(keys, table.rows[index])) for index in indexes[offset:stop]]
+
+
+def update_table(show_inactive, query="", page=1, sort="added", descending=False):
+    """
+    Создает страницу таблицы для отображения в Gradio.
+    :param sort: Ключ сортировки (table_model.SORT_KEYS).
+    :return: Кортеж (DataFrame страницы, подпись "Page 1 / 3 · 250 users", номер страницы).
+    """
+    rows, total, page, pages = get_user_table().page(query, show_inactive, page, sort=sort, descending=descending)
+    return pd.DataFrame(rows, columns=COLUMNS), f"Page {page} / {pages} · {total} users", page
@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+# gradio_admin/functions/table_model.py
+# Кэшируемая модель таблицы статистики пользователей.
+#
+# Строки таблицы строятся один раз и перестраиваются, только когда меняется
+# база пользователей (user_store.generation()); колонка трафика — когда меняется
+# файл итогов учёта (accounting.bin в settings.TIMESERIES_DIR, по mtime и размеру).
+# Для поиска хранится заранее собранный текст строк в нижнем регистре, склеенный
+# в одну строку: совпадения ищутся str.find по всей таблице сразу, номер строки —
+# бисекцией по смещениям. Уточняющий запрос (продолжение предыдущего) проверяется
+# только по строкам, найденным предыдущим запросом. Отдаётся одна страница строк.
+#
+# Из базы читаются только поля таблицы (user_store.iter_users — страницами, без
+# разбора записей целиком).
+
+import os
+import threading
+from bisect import bisect_right
+
+import settings
+from modules import user_store
+from modules.accounting import LEDGER_FILE
+from modules.timeseries import get_reader
+from modules.wg_dump import format_bytes, parse_bytes
+
+COLUMNS = ["👤 User", "📊 Used", "📦 Limit", "⚡ St.", "💳 $", "UID"]
+USED_COLUMN = 1
+# Поля записи, которые читает таблица
+FIELDS = ("username", "data_used", "data_limit", "status", "subscription_price", "user_id",
+          "public_key", "data_used_base")
+# Ключи сортировки страницы ("added" — порядок добавления)
+SORT_KEYS = ("added", "user", "used", "limit", "status")
+
+
+def format_data_used(used_bytes, data_limit):
+    """Трафик пользователя и доля от лимита (например, "1.20 GiB (1.3%)")."""
+    limit_bytes = parse_bytes(data_limit)
+    if not limit_bytes:
+        return format_bytes(used_bytes)
+    return f"{format_bytes(used_bytes)} ({used_bytes / limit_bytes:.1%})"
+
+
+def _ledger_key():
+    try:
+        stat = os.stat(os.path.join(str(settings.TIMESERIES_DIR), LEDGER_FILE))
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class UserTable:
+    """Строки таблицы статистики с индексом поиска."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._generation = None
+        self._ledger = False
+        self.rows = []          # [username, used, limit, status, price, uid]
+        self.active = frozenset()  # индексы строк со статусом active
+        self._records = []      # (public_key, data_limit, data_used_base, data_used)
+        self._used = []         # трафик строки в байтах (для сортировки)
+        self._texts = []        # текст строки для поиска (нижний регистр)
+        self._blob = ""
+        self._starts = []       # смещение каждой строки в _blob
+        self._last = (None, None, None)  # (generation, query, индексы)
+
+    def refresh(self):
+        """Перестраивает строки, если изменилась база или итоги трафика."""
+        generation = (str(settings.USER_STORE_PATH), user_store.generation())
+        ledger = _ledger_key()
+        with self._lock:
+            if generation != self._generation:
+                self._build(user_store.iter_users(FIELDS))
+                self._generation = generation
+                self._ledger = False
+            if ledger != self._ledger:
+                self._fill_traffic()
+                self._ledger = ledger
+        return self
+
+    def _build(self, users):
+        """:param users: Пары (username, {поле: значение}) с полями FIELDS."""
+        rows, records, texts, active = [], [], [], []
+        for username, info in users:
+            data_limit = info.get("data_limit") or "100.0 GB"
+            status = info.get("status") or "inactive"
+            row = [
+                username,
+                info.get("data_used") or "0.0 KiB",
+                data_limit,
+                status,
+                info.get("subscription_price") or "0.00 USD",
+                info.get("user_id") or "N/A",
+            ]
+            if status == "active":
+                active.append(len(rows))
+            rows.append(row)
+            records.append((info.get("public_key"), data_limit, int(info.get("data_used_base") or 0), row[USED_COLUMN]))
+            # Трафик меняется при каждой выборке телеметрии, поэтому в поиск не входит
+            texts.append(" ".join(str(row[column]) for column in range(len(row)) if column != USED_COLUMN)
+                         .lower().replace("\n", " "))
+
+        starts, offset = [], 0
+        for text in texts:
+            starts.append(offset)
+            offset += len(text) + 1
+        self.rows, self._records, self._texts, self.active = rows, records, texts, frozenset(active)
+        self._blob = "\n".join(texts)
+        self._starts = starts
+        self._last = (None, None, None)
+
+    def _fill_traffic(self):
+        totals = get_reader().totals()
+        used_bytes = []
+        for row, (public_key, data_limit, base, stored) in zip(self.rows, self._records):
+            used = totals.get(public_key)
+            if used:
+                used_bytes.append(sum(used) - base)
+                row[USED_COLUMN] = format_data_used(used_bytes[-1], data_limit)
+            else:
+                used_bytes.append(parse_bytes(stored) or 0)
+                row[USED_COLUMN] = stored
+        self._used = used_bytes
+
+    def _sort_key(self, sort):
+        rows = self.rows
+        if sort == "user":
+            return lambda index: rows[index][0].lower()
+        if sort == "used":
+            used = self._used
+            return lambda index: used[index]
+        if sort == "limit":
+            return lambda index: parse_bytes(rows[index][2]) or 0
+        if sort == "status":
+            return lambda index: rows[index][3]
+        return None
+
+    def _match(self, query):
+        if query == "":
+            return range(len(self.rows))
+        generation, previous, found = self._last
+        if generation == self._generation and previous and query.startswith(previous):
+            # Уточнение предыдущего запроса: проверяются только найденные строки
+            texts = self._texts
+            matches = [index for index in found if query in texts[index]]
+        else:
+            matches = []
+            blob, starts, find = self._blob, self._starts, self._blob.find
+            position = find(query)
+            while position != -1:
+                index = bisect_right(starts, position) - 1
+                matches.append(index)
+                next_start = starts[index + 1] if index + 1 < len(starts) else len(blob)
+                position = find(query, next_start)
+        self._last = (self._generation, query, matches)
+        return matches
+
+    def search(self, query="", show_inactive=True):
+        """
+        Индексы строк, содержащих query (без учёта регистра).
+        :param show_inactive: Учитывать неактивных пользователей.
+        """
+        query = " ".join((query or "").lower().split("\n")).strip()
+        with self._lock:
+            matches = self._match(query)
+            if show_inactive:
+                return list(matches)
+            active = self.active
+            return [index for index in matches if index in active]
+
+    def page(self, query="", show_inactive=True, page=1, page_size=None, sort="added", descending=False):
+        """
+        Страница отфильтрованной таблицы.
+        :param sort: Ключ сортировки из SORT_KEYS ("added" — порядок добавления).
+        :return: Кортеж (строки страницы, всего найдено, номер страницы, всего страниц).
+        """
+        page_size = page_size or settings.STATS_TABLE_PAGE_SIZE
+        matches = self.search(query, show_inactive)
+        key = self._sort_key(sort)
+        if key is not None or descending:
+            with self._lock:
+                matches.sort(key=key, reverse=descending)
+        pages = max(1, -(-len(matches) // page_size))
+        page = min(max(1, int(page or 1)), pages)
+        start = (page - 1) * page_size
+        with self._lock:
+            rows = [list(self.rows[index]) for index in matches[start:start + page_size]]
+        return rows, len(matches), page, pages
+
+
+_table = None
+_table_lock = threading.Lock()
+
+
+def get_user_table():
+    """Общая модель таблицы процесса, актуальная на момент вызова."""
+    global _table
+    with _table_lock:
+        if _table is None:
+            _table = UserTable()
+    return _table.refresh()
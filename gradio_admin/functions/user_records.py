@@ -2,19 +2,22 @@
 # gradio_admin/functions/user_records.py
 # Утилиты для работы с пользовательскими данными в проекте wg_qr_generator
 
-import json
-import os
+import sqlite3
 
-USER_RECORDS_PATH = os.path.join(os.path.dirname(__file__), "../../user/data/user_records.json")
+from modules import user_store
 
 def load_user_records():
-    """Загружает данные о пользователях из файла user_records.json."""
+    """Загружает данные о пользователях из базы данных."""
     try:
-        with open(USER_RECORDS_PATH, "r") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        print("[DEBUG] user_records.json not found!")
-        return {}
-    except json.JSONDecodeError as e:
-        print(f"[DEBUG] JSON decode error in user_records.json: {e}")
+        return user_store.get_users()
+    except sqlite3.Error as e:
+        print(f"[DEBUG] User store error: {e}")
         return {}
+
+def load_user_record(username):
+    """Загружает запись одного пользователя (None, если не найден)."""
+    try:
+        return user_store.get_user(username)
+    except sqlite3.Error as e:
+        print(f"[DEBUG] User store error: {e}")
+        return None
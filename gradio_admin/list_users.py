@@ -2,53 +2,60 @@
 # list_users.py
 ## Скрипт для отображения списка пользователей с информацией о сроке действия и IP-адресе.
 
-import os
-import json
-from datetime import datetime
-from modules.utils import read_json
+import sqlite3
 
-USER_RECORDS_PATH = os.path.join("user", "data", "user_records.json")
+from modules import user_store
+from modules.expiry_time import days_left_text, epochs_array, seconds_left
 
-def list_users():
+# Оставшееся время в списках и поиске: "N дней", "Истек" или ошибка в сроке
+REMAINING_TEXT = {
+    "template": "{} дней",
+    "expired": "Истек",
+    "missing": "Ошибка в данных срока действия",
+}
+
+# Поля записи, которые показывают список и поиск
+LIST_FIELDS = ("created_at", "expires_at", "address", "expires_epoch")
+
+def format_user_list(user_data):
+    """
+    Форматирует пользователей из user_store.query_users(LIST_FIELDS).
+    :return: Блоки с информацией о пользователях через пустую строку.
+    """
+    # Оставшееся время всех пользователей — одним проходом по срокам из базы
+    epochs = epochs_array(details["expires_epoch"] for details in user_data.values())
+    remaining = days_left_text(seconds_left(epochs), **REMAINING_TEXT)
+
+    users_list = []
+    for (username, details), remaining_str in zip(user_data.items(), remaining):
+        created_at = details["created_at"] or "N/A"
+        expires_at = details["expires_at"] or "N/A"
+        address = details["address"] or "N/A"
+
+        users_list.append(
+            f"👤 Пользователь: {username}\n"
+            f"   📅 Создан: {created_at}\n"
+            f"   ⏳ Истекает: {expires_at}\n"
+            f"   ⏳ Осталось: {remaining_str}\n"
+            f"   🌐 Адрес: {address}"
+        )
+    return "\n\n".join(users_list)
+
+def list_users(offset=0, limit=None):
     """
     Чтение списка пользователей и отображение информации о них.
+    Из базы читаются только показываемые поля и только запрошенная страница.
+    :param offset: Сколько пользователей пропустить (в порядке добавления).
+    :param limit: Максимум пользователей (None — все).
     :return: Список пользователей или сообщение об ошибке.
     """
-    if not os.path.exists(USER_RECORDS_PATH):
-        return "❌ Файл user_records.json не найден."
-
     try:
-        user_data = read_json(USER_RECORDS_PATH)
+        user_data = user_store.query_users(LIST_FIELDS, offset=offset, limit=limit)
         if not user_data:
             return "❌ Нет зарегистрированных пользователей."
+        return format_user_list(user_data)
 
-        users_list = []
-        for username, details in user_data.items():
-            created_at = details.get("created_at", "N/A")
-            expires_at = details.get("expires_at", "N/A")
-            address = details.get("address", "N/A")
-
-            # Рассчитаем оставшееся время
-            try:
-                expires_datetime = datetime.fromisoformat(expires_at)
-                remaining_time = expires_datetime - datetime.now()
-                remaining_days = remaining_time.days
-                remaining_str = f"{remaining_days} дней" if remaining_days > 0 else "Истек"
-            except Exception:
-                remaining_str = "Ошибка в данных срока действия"
-
-            user_info = (
-                f"👤 Пользователь: {username}\n"
-                f"   📅 Создан: {created_at}\n"
-                f"   ⏳ Истекает: {expires_at}\n"
-                f"   ⏳ Осталось: {remaining_str}\n"
-                f"   🌐 Адрес: {address}"
-            )
-            users_list.append(user_info)
-
-        return "\n\n".join(users_list)
-
-    except json.JSONDecodeError:
-        return "❌ Ошибка чтения файла user_records.json. Проверьте его формат."
+    except sqlite3.Error as e:
+        return f"❌ Ошибка чтения базы пользователей: {e}"
     except Exception as e:
         return f"❌ Ошибка: {str(e)}"
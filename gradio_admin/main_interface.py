@@ -5,7 +5,32 @@ import gradio as gr
 from gradio_admin.tabs.create_user_tab import create_user_tab
 from gradio_admin.tabs.delete_user_tab import delete_user_tab
 from gradio_admin.tabs.statistics_tab import statistics_tab
+from gradio_admin.tabs.dashboard_tab import dashboard_tab
 from gradio_admin.tabs.ollama_chat_tab import ollama_chat_tab  # Новый импорт
+from modules.key_pool import start_refill_worker
+from modules.config_rerender import start_params_watcher
+from modules.expiry_scheduler import start_expiry_scheduler
+from modules.provisioning import get_service
+from modules.telemetry import start_telemetry_worker
+from modules.user_index import warm_index
+
+# Фоновое пополнение пула ключей, чтобы создание пользователя не ждало keygen
+start_refill_worker()
+
+# Фоновый сбор состояния пиров: вкладки читают снимок из памяти, без запуска `wg`
+start_telemetry_worker()
+
+# Истечение аккаунтов: поток спит до ближайшего срока из индекса базы
+start_expiry_scheduler()
+
+# Пересборка конфигураций и QR-кодов клиентов при изменении /etc/wireguard/params
+start_params_watcher()
+
+# Создание пользователей в процессе админки: кэши параметров, wg0.conf и базы заполняются заранее
+get_service().warm()
+
+# Поисковый индекс пользователей строится в фоне, дальше обновляется по месту
+warm_index()
 
 # Создание интерфейса
 with gr.Blocks() as admin_interface:
@@ -17,6 +42,9 @@ with gr.Blocks() as admin_interface:
     
     with gr.Tab(label="🔍 Статистика"):
         statistics_tab()
+
+    with gr.Tab(label="📡 Dashboard"):
+        dashboard_tab()
     
     with gr.Tab(label="🤖 Чат с Ai"):
         ollama_chat_tab()
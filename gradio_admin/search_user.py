@@ -2,16 +2,16 @@
 # search_user.py
 ## Скрипт для поиска пользователей по имени или IP-адресу с частичным совпадением.
 
-import os
-import json
-from datetime import datetime
+import sqlite3
 
-# Путь к файлу записей пользователей
-USER_RECORDS_PATH = os.path.join("user", "data", "user_records.json")
+from gradio_admin.list_users import LIST_FIELDS, format_user_list
+from modules import user_store
+from modules.user_index import get_index
 
 def search_user(search_term):
     """
-    Поиск пользователей по частичному совпадению имени или IP.
+    Поиск пользователей по частичному совпадению имени, email, Telegram ID или IP,
+    по подсети (CIDR) или публичному ключу (modules.user_index).
     
     Аргументы:
         search_term (str): Строка для поиска.
@@ -19,46 +19,17 @@ def search_user(search_term):
     Возвращает:
         str: Информация о найденных пользователях или сообщение об отсутствии результатов.
     """
-    if not os.path.exists(USER_RECORDS_PATH):
-        return "❌ Файл user_records.json не найден."
-
     try:
-        with open(USER_RECORDS_PATH, "r") as f:
-            user_data = json.load(f)
-
-        result = []
-        for username, details in user_data.items():
-            # Проверка на совпадение имени пользователя или IP
-            if search_term.lower() in username.lower() or search_term in details.get("address", ""):
-                created_at = details.get("created_at", "N/A")
-                expires_at = details.get("expires_at", "N/A")
-                address = details.get("address", "N/A")
-
-                # Рассчёт оставшегося времени
-                try:
-                    expires_datetime = datetime.fromisoformat(expires_at)
-                    remaining_time = expires_datetime - datetime.now()
-                    remaining_days = remaining_time.days
-                    remaining_str = f"{remaining_days} дней" if remaining_days > 0 else "Истек"
-                except ValueError:
-                    remaining_str = "Ошибка в данных срока действия"
-
-                # Формируем строку с информацией о пользователе
-                user_info = (
-                    f"👤 Пользователь: {username}\n"
-                    f"   📅 Создан: {created_at}\n"
-                    f"   ⏳ Истекает: {expires_at}\n"
-                    f"   ⏳ Осталось: {remaining_str}\n"
-                    f"   🌐 Адрес: {address}"
-                )
-                result.append(user_info)
-
-        if not result:
+        # Имена по индексу (имя, email, Telegram ID, IP или подсеть, ключ), из базы — только поля списка
+        names = get_index().search(search_term)
+        if not names:
             return "ℹ️ Пользователь не найден."
+        user_data = user_store.query_users(LIST_FIELDS, where={"username": names})
+        if not user_data:
+            return "ℹ️ Пользователь не найден."
+        return format_user_list(user_data)
 
-        return "\n\n".join(result)
-
-    except json.JSONDecodeError:
-        return "❌ Ошибка чтения файла user_records.json. Проверьте его формат."
+    except sqlite3.Error as e:
+        return f"❌ Ошибка чтения базы пользователей: {e}"
     except Exception as e:
         return f"❌ Произошла ошибка: {str(e)}"
@@ -0,0 +1,65 @@
+# gradio_admin/tabs/dashboard_tab.py
+# Вкладка "Dashboard": активные пиры, обновляемые по таймеру из снимков телеметрии
+
+from datetime import datetime
+
+import gradio as gr
+import pandas as pd
+
+import settings
+from gradio_admin.functions.dashboard_model import COLUMNS, get_dashboard
+from modules.wg_dump import format_bytes
+
+# Ответ без изменений: gr.skip() не отправляет в браузер ничего (старые версии — пустой update)
+unchanged = getattr(gr, "skip", gr.update)
+
+
+def format_summary(summary):
+    """Строка сводки над таблицей."""
+    if summary["taken_at"] is None:
+        return "📡 Telemetry: no data yet"
+    taken_at = datetime.fromtimestamp(summary["taken_at"]).strftime("%Y-%m-%d %H:%M:%S")
+    return (
+        f"📡 Peers: **{summary['active']}/{summary['peers']}** active | "
+        f"⬆️ {format_bytes(int(summary['rx_rate']))}/s ⬇️ {format_bytes(int(summary['tx_rate']))}/s | "
+        f"Sampled: {taken_at} | Update: {summary['duration'] * 1000:.1f} ms"
+    )
+
+
+def load_rows():
+    """Таблица по текущему снимку."""
+    return pd.DataFrame(get_dashboard().rows(), columns=COLUMNS)
+
+
+def dashboard_tab():
+    """Возвращает вкладку с живой таблицей активных пиров."""
+    with gr.Row():
+        gr.Markdown("## Dashboard")
+
+    dashboard = get_dashboard()
+    with gr.Row():
+        summary_info = gr.Markdown(format_summary(dashboard.summary()))
+    # Gradio без gr.Timer: таблица перечитывается через every (целиком при каждом опросе)
+    timer = gr.Timer(settings.DASHBOARD_INTERVAL) if hasattr(gr, "Timer") else None
+    with gr.Row():
+        peers_table = gr.Dataframe(
+            headers=COLUMNS,
+            value=pd.DataFrame(dashboard.rows(), columns=COLUMNS) if timer else load_rows,
+            interactive=False,
+            wrap=True,
+            **({} if timer else {"every": settings.DASHBOARD_INTERVAL})
+        )
+    if timer is None:
+        return
+    # Версия модели, которую уже видит эта вкладка браузера
+    version = gr.State(dashboard.version)
+
+    def tick(seen):
+        """Отправляет таблицу, только если модель изменилась с прошлого обновления вкладки."""
+        dashboard = get_dashboard()
+        summary = dashboard.summary()
+        if summary["version"] == seen:
+            return unchanged(), format_summary(summary), seen
+        return pd.DataFrame(dashboard.rows(), columns=COLUMNS), format_summary(summary), summary["version"]
+
+    timer.tick(fn=tick, inputs=[version], outputs=[peers_table, summary_info, version])
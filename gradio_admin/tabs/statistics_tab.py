@@ -1,20 +1,40 @@
 # gradio_admin/tabs/statistics_tab.py
 # Вкладка "Statistics" для Gradio-интерфейса проекта wg_qr_generator
 
+import inspect
+
 import gradio as gr
-import pandas as pd
 from gradio_admin.functions.table_helpers import update_table
-from gradio_admin.functions.format_helpers import format_user_info
-from gradio_admin.functions.user_records import load_user_records
+from gradio_admin.functions.table_model import SORT_KEYS
+from gradio_admin.functions.client_config_view import show_client_config
+from gradio_admin.functions.statistics import format_key_pool_stats, format_telemetry_stats, format_traffic_stats
 
 def statistics_tab():
     """Возвращает вкладку статистики пользователей WireGuard."""
     with gr.Row():
         gr.Markdown("## Statistics")
 
+    # Состояние пула ключей
+    with gr.Row():
+        key_pool_info = gr.Markdown(format_key_pool_stats())
+
+    # Последний снимок телеметрии пиров (из памяти сборщика)
+    with gr.Row():
+        telemetry_info = gr.Markdown(format_telemetry_stats())
+
+    # Трафик за сутки по истории
+    with gr.Row():
+        traffic_info = gr.Markdown(format_traffic_stats())
+
     # Чекбокс Show inactive и кнопка Refresh
     with gr.Row():
         show_inactive = gr.Checkbox(label="Show inactive", value=True)
+        sort_by = gr.Dropdown(
+            label="Sort by",
+            choices=list(SORT_KEYS),
+            value="added"
+        )
+        descending = gr.Checkbox(label="Descending", value=False)
         refresh_button = gr.Button("Refresh")
 
     # Область для отображения информации о выбранном пользователе
@@ -28,8 +48,22 @@ def statistics_tab():
 
     # Кнопки действий на одной строке
     with gr.Row():
-        block_button = gr.Button("Block", elem_id="block-button")
-        delete_button = gr.Button("Delete", elem_id="delete-button")
+        gr.Button("Block", elem_id="block-button")
+        gr.Button("Delete", elem_id="delete-button")
+
+    # Конфигурация и QR-код клиента по запросу (без файлов на диске в ленивом режиме)
+    with gr.Row():
+        config_username = gr.Textbox(label="Username", placeholder="Enter username to show config and QR...")
+        config_button = gr.Button("Config / QR")
+    with gr.Row():
+        client_config = gr.Code(label="Client config", interactive=False)
+        client_qr = gr.Image(label="QR code", interactive=False)
+
+    config_button.click(
+        fn=show_client_config,
+        inputs=[config_username],
+        outputs=[client_config, client_qr]
+    )
 
     # Поле поиска
     with gr.Row():
@@ -39,15 +73,23 @@ def statistics_tab():
     with gr.Row():
         gr.Markdown("Click a cell to view user details after the search.", elem_id="table-help-text", elem_classes=["small-text"])
 
-    # Таблица с данными
+    # Таблица с данными: одна страница из кэшируемой модели (gradio_admin/functions/table_model.py)
+    initial_table, initial_label, _ = update_table(True)
     with gr.Row():
         stats_table = gr.Dataframe(
             headers=["👥 User's info", "🆔 Other info"],
-            value=update_table(True),
+            value=initial_table,
             interactive=False,  # Таблица только для чтения
             wrap=True
         )
 
+    # Страницы таблицы
+    with gr.Row():
+        prev_button = gr.Button("◀ Prev")
+        page_input = gr.Number(label="Page", value=1, precision=0)
+        next_button = gr.Button("Next ▶")
+        page_label = gr.Markdown(initial_label)
+
     # Функция для показа информации о пользователе
     def show_user_info(selected_data, query):
         """Показывает подробную информацию о выбранном пользователе."""
@@ -60,28 +102,36 @@ def statistics_tab():
     )
 
     # Обновление данных при нажатии кнопки "Refresh"
-    def refresh_table(show_inactive):
+    def refresh_table(show_inactive, sort, descending):
         """Очищает строку поиска, сбрасывает информацию о пользователе и обновляет таблицу."""
-        return "", "Please enter a query to filter user data and then Click a cell to view user details after the search. and perform actions.", update_table(show_inactive)
+        table, label, page = update_table(show_inactive, "", 1, sort, descending)
+        return "", "Please enter a query to filter user data and then Click a cell to view user details after the search. and perform actions.", table, label, page, format_key_pool_stats(), format_telemetry_stats(), format_traffic_stats()
 
     refresh_button.click(
         fn=refresh_table,
-        inputs=[show_inactive],
-        outputs=[search_input, selected_user_info, stats_table]
+        inputs=[show_inactive, sort_by, descending],
+        outputs=[search_input, selected_user_info, stats_table, page_label, page_input, key_pool_info, telemetry_info, traffic_info]
     )
 
-    # Поиск
-    def search_and_update_table(query, show_inactive):
-        """Фильтрует данные таблицы по запросу."""
-        table = update_table(show_inactive)
-        if query:
-            table = [
-                row for row in table if query.lower() in " ".join(map(str, row)).lower()
-            ]
-        return table
-
-    search_input.change(
-        fn=search_and_update_table,
-        inputs=[search_input, show_inactive],
-        outputs=[stats_table]
-    )
+    # Поиск: модель перестраивается только при изменении базы, фильтр — по готовой колонке поиска;
+    # в Gradio передаётся только видимая страница
+    table_inputs = [search_input, show_inactive, sort_by, descending]
+    table_outputs = [stats_table, page_label, page_input]
+
+    def search_and_update_table(query, show_inactive, sort, descending):
+        """Фильтрует и сортирует данные таблицы по запросу (с первой страницы)."""
+        return update_table(show_inactive, query, 1, sort, descending)
+
+    def change_page(step):
+        """Обработчик перехода на страницу: step — смещение от текущей."""
+        def handler(query, show_inactive, sort, descending, page):
+            return update_table(show_inactive, query, int(page or 1) + step, sort, descending)
+        return handler
+
+    # Промежуточные нажатия клавиш не обрабатываются: выполняется только последнее событие
+    debounce = {"trigger_mode": "always_last"} if "trigger_mode" in inspect.signature(search_input.change).parameters else {}
+    for event in (search_input.change, show_inactive.change, sort_by.change, descending.change):
+        event(fn=search_and_update_table, inputs=table_inputs, outputs=table_outputs, **debounce)
+    page_input.submit(fn=change_page(0), inputs=table_inputs + [page_input], outputs=table_outputs)
+    prev_button.click(fn=change_page(-1), inputs=table_inputs + [page_input], outputs=table_outputs)
+    next_button.click(fn=change_page(1), inputs=table_inputs + [page_input], outputs=table_outputs)
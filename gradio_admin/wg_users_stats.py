@@ -4,20 +4,36 @@
 
 import os
 import json
+from itertools import islice
 
 # Путь к файлу JSON
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 JSON_LOG_PATH = os.path.join(PROJECT_ROOT, "logs/wg_users.json")
 
 
-def load_data(show_inactive):
+_cache = (None, None)  # (stat_key, data)
+
+
+def _load_json():
+    """Разобранный wg_users.json (перечитывается, только если файл изменился)."""
+    global _cache
+    stat = os.stat(JSON_LOG_PATH)
+    stat_key = (stat.st_mtime_ns, stat.st_size)
+    if _cache[0] != stat_key:
+        with open(JSON_LOG_PATH, "r") as f:
+            _cache = (stat_key, json.load(f))
+    return _cache[1]
+
+
+def load_data(show_inactive, offset=0, limit=None):
     """
     Загружает данные пользователей WireGuard из JSON-файла и фильтрует их.
+    Строки форматируются только для запрошенной страницы.
+    :param offset: Сколько отобранных пользователей пропустить.
+    :param limit: Максимум строк (None — все).
     """
     try:
-        print(f"Путь к JSON: {JSON_LOG_PATH}")  # Отладка
-        with open(JSON_LOG_PATH, "r") as f:
-            data = json.load(f)
+        data = _load_json()
     except FileNotFoundError:
         print("JSON-файл не найден!")
         return [["Нет данных о пользователях"]]
@@ -25,16 +41,13 @@ def load_data(show_inactive):
         print(f"Ошибка декодирования JSON: {e}")
         return [["Ошибка чтения JSON-файла"]]
 
-    # Логика работы с верхним уровнем JSON
-    print(f"Загруженные пользователи: {data}")  # Отладка
+    # Пропускаем пользователей со статусом "inactive", если show_inactive == False
+    users = ((username, user_data) for username, user_data in data.items()
+             if show_inactive or user_data.get("status") != "inactive")
+    stop = None if limit is None else offset + limit
 
     table = []
-
-    for username, user_data in data.items():
-        # Пропускаем пользователей со статусом "inactive", если show_inactive == False
-        if not show_inactive and user_data.get("status") == "inactive":
-            continue
-
+    for username, user_data in islice(users, offset, stop):
         # Форматируем статус
         status_color = "green" if user_data.get("status") == "active" else "red"
         status_html = f"<span style='color: {status_color}'>{user_data.get('status', 'unknown')}</span>"
@@ -50,7 +63,6 @@ def load_data(show_inactive):
             status_html
         ])
 
-    print(f"Форматированная таблица перед возвратом: {table}")  # Отладка
     return table
 
 
@@ -8,20 +8,19 @@
 ## на основе IP-адреса сервера (SERVER_WG_IPV4) и перезапускает интерфейс WireGuard.
 
 import sys
-import os
-import json
 import ipaddress
-from datetime import datetime
+import sqlite3
 import settings
+from modules import user_store
 from modules.config import load_params
-from modules.keygen import generate_private_key, generate_public_key, generate_preshared_key
-from modules.config_writer import add_user_to_server_config
+from modules.ip_allocator import get_address_allocator
+from modules.provisioning import ProvisioningService, allocate_address, format_timings, get_service
+from modules.user_repository import UserExistsError
+from modules.wg_config_parser import load_server_config
 from modules.directory_setup import setup_directories
-from modules.client_config import create_client_config
-from modules.main_registration_fields import create_user_record  # Импорт новой функции
 import subprocess
 import logging
-import qrcode  # Для генерации QR-кодов
+from modules.qr_service import render as render_qr_code  # QR-коды с кэшем по содержимому
 
 # Настройка логгера
 logging.basicConfig(
@@ -67,30 +66,39 @@ def calculate_subnet(server_wg_ipv4, default_subnet="10.66.66.0/24"):
         logger.warning(f"Ошибка при расчете подсети: {e}. Используется значение по умолчанию: {default_subnet}")
         return default_subnet
 
-def generate_next_ip(config_file, subnet="10.66.66.0/24"):
+def generate_next_ip(config_file, subnet="10.66.66.0/24", server_ip=None):
     """
     Генерирует следующий доступный IP-адрес в подсети.
+    Адреса выдаются из битовой карты (modules.ip_allocator), которая строится
+    из конфигурации сервера один раз, поэтому файл не перечитывается при каждом вызове.
     :param config_file: Путь к файлу конфигурации WireGuard.
     :param subnet: Подсеть для поиска доступного IP.
+    :param server_ip: IP-адрес сервера, исключаемый из выдачи.
     :return: Следующий доступный IP-адрес.
     """
     logger.debug(f"Ищем свободный IP-адрес в подсети {subnet}.")
-    existing_ips = []
-    if os.path.exists(config_file):
-        logger.debug(f"Чтение существующих IP-адресов из файла {config_file}.")
-        with open(config_file, "r") as f:
-            for line in f:
-                if line.strip().startswith("AllowedIPs"):
-                    ip = line.split("=")[1].strip().split("/")[0]
-                    existing_ips.append(ip)
-    network = ipaddress.ip_network(subnet)
-    for ip in network.hosts():
-        ip_str = str(ip)
-        if ip_str not in existing_ips and not ip_str.endswith(".0") and not ip_str.endswith(".1") and not ip_str.endswith(".255"):
-            logger.debug(f"Свободный IP-адрес найден: {ip_str}")
-            return ip_str
-    logger.error("Нет доступных IP-адресов в указанной подсети.")
-    raise ValueError("Нет доступных IP-адресов в указанной подсети.")
+    try:
+        ip_str, _ = get_address_allocator(config_file, [subnet], server_ip=server_ip).allocate()
+    except ValueError:
+        logger.error("Нет доступных IP-адресов в указанной подсети.")
+        raise
+    logger.debug(f"Свободный IP-адрес найден: {ip_str}")
+    return ip_str
+
+def generate_next_address(config_file, params):
+    """
+    Выделяет адрес клиента из упорядоченных пулов (settings.ADDRESS_POOLS).
+    Если пул заполнен, выдача переходит к следующему; при наличии IPv6-префикса
+    возвращается и IPv6-адрес для dual-stack конфигурации.
+    :param config_file: Путь к файлу конфигурации WireGuard.
+    :param params: Параметры сервера из /etc/wireguard/params.
+    :return: Кортеж (ipv4, ipv6 или None).
+    """
+    try:
+        return allocate_address(config_file, params)
+    except ValueError:
+        logger.error("Нет доступных IP-адресов ни в одном из пулов.")
+        raise
 
 def generate_qr_code(data, output_path):
     """
@@ -100,17 +108,10 @@ def generate_qr_code(data, output_path):
     """
     logger.debug(f"Генерация QR-кода для данных длиной {len(data)} символов.")
     try:
-        qr = qrcode.QRCode(
-            version=1,
-            error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=10,
-            border=4,
-        )
-        qr.add_data(data)
-        qr.make(fit=True)
-        img = qr.make_image(fill_color="black", back_color="white")
-        img.save(output_path)
-        logger.info(f"QR-код успешно сохранён в {output_path}")
+        if render_qr_code(data, output_path):
+            logger.info(f"QR-код успешно сохранён в {output_path}")
+        else:
+            logger.info(f"QR-код взят из кэша: {output_path}")
     except Exception as e:
         logger.error(f"Ошибка при генерации QR-кода: {e}")
         raise
@@ -119,32 +120,24 @@ def load_existing_users():
     """
     Загружает список существующих пользователей из базы данных.
     """
-    user_records_path = os.path.join("user", "data", "user_records.json")
-    logger.debug(f"Загрузка базы пользователей из {user_records_path}")
-    if os.path.exists(user_records_path):
-        with open(user_records_path, "r", encoding="utf-8") as file:
-            try:
-                user_data = json.load(file)
-                logger.info(f"Успешно загружено {len(user_data)} пользователей.")
-                return {user.lower(): user_data[user] for user in user_data}  # Нормализуем имена
-            except json.JSONDecodeError as e:
-                logger.warning(f"Ошибка чтения базы данных: {e}. Возвращаем пустую базу.")
-                return {}
-    logger.warning(f"Файл базы данных {user_records_path} не найден.")
+    logger.debug(f"Загрузка базы пользователей из {settings.USER_STORE_PATH}")
+    try:
+        user_data = user_store.get_users()
+        logger.info(f"Успешно загружено {len(user_data)} пользователей.")
+        return {user.lower(): user_data[user] for user in user_data}  # Нормализуем имена
+    except sqlite3.Error as e:
+        logger.warning(f"Ошибка чтения базы данных: {e}. Возвращаем пустую базу.")
     return {}
 
 def is_user_in_server_config(nickname, config_file):
     """
     Проверяет наличие пользователя в конфигурации сервера.
     """
-    nickname_lower = nickname.lower()
     logger.debug(f"Проверка наличия пользователя {nickname} в конфигурации {config_file}.")
     try:
-        with open(config_file, "r") as file:
-            for line in file:
-                if nickname_lower in line.lower():
-                    logger.info(f"Пользователь {nickname} найден в конфигурации сервера.")
-                    return True
+        if load_server_config(config_file).get_by_name(nickname, case_sensitive=False) is not None:
+            logger.info(f"Пользователь {nickname} найден в конфигурации сервера.")
+            return True
     except FileNotFoundError:
         logger.warning(f"Файл конфигурации {config_file} не найден.")
     return False
@@ -152,6 +145,8 @@ def is_user_in_server_config(nickname, config_file):
 def restart_wireguard(interface="wg0"):
     """
     Перезапускает WireGuard и показывает его статус.
+    Перезапуск разрывает все туннели; для добавления и удаления пиров
+    используйте modules.wg_apply.apply_peer_changes.
     """
     try:
         logger.info(f"Перезапуск интерфейса WireGuard: {interface}")
@@ -174,73 +169,38 @@ def restart_wireguard(interface="wg0"):
 
 def generate_config(nickname, params, config_file, email="N/A", telegram_id="N/A"):
     """
-    Генерация конфигурации пользователя и QR-кода.
+    Генерация конфигурации пользователя и QR-кода (modules.provisioning).
+    :return: Кортеж (config_path, qr_path); в ленивом режиме — (None, None).
     """
     logger.info("+--------- Процесс 🌱 создания пользователя активирован ---------+")
+    logger.info(f"Начало генерации конфигурации для пользователя: {nickname}")
     try:
-        logger.info(f"Начало генерации конфигурации для пользователя: {nickname}")
-        
-        # Проверка наличия SERVER_PUB_IP
-        server_public_key = params['SERVER_PUB_KEY']
-        if not params.get('SERVER_PUB_IP'):
-            raise ValueError("Параметр SERVER_PUB_IP отсутствует. Проверьте файл конфигурации.")
-        
-        endpoint = f"{params['SERVER_PUB_IP']}:{params['SERVER_PORT']}"
-        dns_servers = f"{params['CLIENT_DNS_1']},{params['CLIENT_DNS_2']}"
-
-        private_key = generate_private_key()
-        logger.debug("Приватный ключ успешно сгенерирован.")
-        public_key = generate_public_key(private_key)
-        logger.debug("Публичный ключ успешно сгенерирован.")
-        preshared_key = generate_preshared_key()
-        logger.debug("Пресекретный ключ успешно сгенерирован.")
-
-        # Вычисление подсети
-        subnet = calculate_subnet(params.get('SERVER_WG_IPV4', '10.66.66.1'))
-        logger.debug(f"Используемая подсеть: {subnet}")
-
-        # Генерация IP-адреса
-        new_ipv4 = generate_next_ip(config_file, subnet)
-        logger.info(f"Новый IP-адрес пользователя: {new_ipv4}")
-
-        # Генерация конфигурации клиента
-        client_config = create_client_config(
-            private_key=private_key,
-            address=new_ipv4,
-            dns_servers=dns_servers,
-            server_public_key=server_public_key,
-            preshared_key=preshared_key,
-            endpoint=endpoint
-        )
-        logger.debug("Конфигурация клиента успешно создана.")
-
-        config_path = os.path.join(settings.WG_CONFIG_DIR, f"{nickname}.conf")
-        qr_path = os.path.join(settings.QR_CODE_DIR, f"{nickname}.png")
-
-        # Сохраняем конфигурацию
-        os.makedirs(settings.WG_CONFIG_DIR, exist_ok=True)
-        with open(config_path, "w") as file:
-            file.write(client_config)
-        logger.info(f"Конфигурация пользователя сохранена в {config_path}")
-
-        # Генерация QR-кода
-        generate_qr_code(client_config, qr_path)
-        logger.info(f"QR-код пользователя сохранён в {qr_path}")
-
-        # Добавление пользователя в конфигурацию сервера
-        add_user_to_server_config(config_file, nickname, public_key.decode('utf-8'), preshared_key.decode('utf-8'), new_ipv4)
-        logger.info("Пользователь успешно добавлен в конфигурацию сервера.")
-
-        return config_path, qr_path
+        service = get_service()
+        if str(config_file) != service.config_file:
+            service = ProvisioningService(config_file=config_file)
+        result = service.create_user(nickname, email, telegram_id, params=params)
     except Exception as e:
         logger.error(f"Ошибка выполнения: {e}")
         raise
+    logger.info(f"Новый IP-адрес пользователя: {result['address']}")
+    if result["config_path"] is None:
+        logger.info("Ленивый режим: конфигурация и QR-код будут отрисованы по запросу.")
+    logger.info(f"{WG_EMOJI} Изменения пиров применены: {result['apply']}")
+    logger.debug(f"Время этапов: {format_timings(result)}")
+    return result["config_path"], result["qr_path"]
 
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        logger.error("Недостаточно аргументов. Использование: python3 main.py <nickname> [email] [telegram_id]")
+        logger.error("Недостаточно аргументов. Использование: python3 main.py <nickname> [email] [telegram_id] "
+                     "или python3 main.py --batch <users.csv|users.jsonl>")
         sys.exit(1)
 
+    if sys.argv[1] == "--batch":
+        # Пакетный режим: python3 main.py --batch users.csv [--workers N]
+        from modules.batch_provision import main as batch_main
+        setup_directories()
+        sys.exit(batch_main(sys.argv[2:]))
+
     nickname = sys.argv[1]
     email = sys.argv[2] if len(sys.argv) > 2 else "N/A"
     telegram_id = sys.argv[3] if len(sys.argv) > 3 else "N/A"
@@ -255,21 +215,21 @@ if __name__ == "__main__":
         params = load_params(params_file)
 
         logger.info("Проверка существующего пользователя.")
-        existing_users = load_existing_users()
-        if nickname.lower() in existing_users:
-            logger.error(f"Пользователь с именем '{nickname}' уже существует в базе данных.")
-            sys.exit(1)
-
-        if is_user_in_server_config(nickname, settings.SERVER_CONFIG_FILE):
-            logger.error(f"Пользователь с именем '{nickname}' уже существует в конфигурации сервера.")
+        try:
+            get_service().check_available(nickname)
+        except UserExistsError:
+            logger.error(f"Пользователь с именем '{nickname}' уже существует.")
             sys.exit(1)
 
         logger.info("Генерация конфигурации пользователя.")
         config_file = settings.SERVER_CONFIG_FILE
         config_path, qr_path = generate_config(nickname, params, config_file, email, telegram_id)
 
-        logger.info(f"✅ Конфигурация пользователя сохранена в {config_path}")
-        logger.info(f"✅ QR-код пользователя сохранён в {qr_path}")
+        if config_path is None:
+            logger.info("✅ Конфигурация и QR-код пользователя доступны в админке (ленивый режим).")
+        else:
+            logger.info(f"✅ Конфигурация пользователя сохранена в {config_path}")
+            logger.info(f"✅ QR-код пользователя сохранён в {qr_path}")
     except FileNotFoundError as e:
         logger.error(f"Файл не найден: {e}")
     except KeyError as e:
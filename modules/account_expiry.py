@@ -1,18 +1,16 @@
-import os
-import json
 from datetime import datetime, timedelta
 from dateutil import parser # type: ignore
 import settings
+from modules import expiry_scheduler, expiry_time, user_repository, user_store
+
+# Даты этапов истечения, которые сдвигаются вместе с expires_at
+EXPIRY_FIELDS = ('expires_at', 'auto_suspend_date', 'auto_delete_date')
 
 def load_user_records():
-    if os.path.exists(settings.USER_DB_PATH):
-        with open(settings.USER_DB_PATH, 'r') as file:
-            return json.load(file)
-    return {}
+    return user_store.get_users()
 
 def save_user_records(user_data):
-    with open(settings.USER_DB_PATH, 'w') as file:
-        json.dump(user_data, file, indent=4)
+    user_store.save_users(user_data)
 
 def check_expiry(nickname):
     """
@@ -24,20 +22,21 @@ def check_expiry(nickname):
     Returns:
         dict: Содержит статус аккаунта и оставшееся время, если аккаунт еще действителен.
     """
-    user_data = load_user_records()
-    if nickname not in user_data:
+    record = user_store.get_user(nickname)
+    if record is None:
         raise ValueError(f"Пользователь {nickname} не найден.")
 
-    expires_at = parser.parse(user_data[nickname]['expires_at'])
-    now = datetime.now()
+    expires_at = expiry_time.epoch_of(record.get('expires_at'))
+    if expires_at is None:
+        raise ValueError(f"Неверный срок действия пользователя {nickname}: {record.get('expires_at')}")
 
-    if now >= expires_at:
+    seconds = expiry_time.seconds_left(expiry_time.epochs_array([expires_at]))[0]
+    if seconds <= 0:
         return {"status": "expired", "remaining_time": "Срок действия истек"}
 
     # Вычисляем оставшееся время
-    time_left = expires_at - now
-    days_left = time_left.days
-    hours_left = time_left.seconds // 3600
+    days_left, seconds = divmod(seconds, expiry_time.DAY)
+    hours_left = seconds // 3600
     return {
         "status": "active",
         "remaining_time": f"{days_left} дней, {hours_left} часов до окончания"
@@ -45,23 +44,27 @@ def check_expiry(nickname):
 
 def extend_expiry(nickname, additional_days):
     """Продлевает срок действия аккаунта пользователя на указанное количество дней."""
-    user_data = load_user_records()
-    if nickname in user_data:
-        expires_at = parser.parse(user_data[nickname]['expires_at'])
-        new_expiration_time = expires_at + timedelta(days=additional_days)
-        user_data[nickname]['expires_at'] = new_expiration_time.isoformat()
-        save_user_records(user_data)
-        print(f"Срок действия аккаунта пользователя {nickname} продлен до {new_expiration_time}.")
+    def extend(record):
+        return {
+            field: (parser.parse(record[field]) + timedelta(days=additional_days)).isoformat()
+            for field in EXPIRY_FIELDS
+            if record.get(field)
+        }
+
+    # Чтение и запись с проверкой версии: параллельные продления не теряются
+    record = user_repository.update_user(nickname, extend)
+    if record is not None:
+        print(f"Срок действия аккаунта пользователя {nickname} продлен до {record['expires_at']}.")
+        expiry_scheduler.reactivate(nickname)
     else:
         raise ValueError(f"Пользователь {nickname} не найден.")
 
 def reset_expiry(nickname, trial_days=settings.DEFAULT_TRIAL_DAYS):
     """Сбрасывает срок действия аккаунта, начиная отсчет с текущего момента."""
-    user_data = load_user_records()
-    if nickname in user_data:
-        new_expiration_time = datetime.now() + timedelta(days=trial_days)
-        user_data[nickname]['expires_at'] = new_expiration_time.isoformat()
-        save_user_records(user_data)
+    new_expiration_time = datetime.now() + timedelta(days=trial_days)
+    changes = {field: new_expiration_time.isoformat() for field in EXPIRY_FIELDS}
+    if user_store.update_user(nickname, changes) is not None:
         print(f"Срок действия аккаунта пользователя {nickname} сброшен до {new_expiration_time}.")
+        expiry_scheduler.reactivate(nickname)
     else:
         raise ValueError(f"Пользователь {nickname} не найден.")
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+# modules/accounting.py
+## Учёт трафика пиров: сырые счётчики и монотонные итоги.
+##
+## Счётчики rx/tx в `wg show dump` считаются с момента добавления пира в
+## интерфейс и обнуляются при перезапуске интерфейса, `wg syncconf` с
+## пересозданием пира или `wg set ... remove`. Поэтому итог пира — сумма
+## приращений между выборками, а не текущее значение счётчика.
+##
+## Сброс счётчиков определяется по регрессии:
+## - rx или tx меньше предыдущего значения;
+## - время последнего handshake меньше предыдущего (в том числе 0 после
+##   ненулевого) — пир пересоздан, даже если новые счётчики уже обогнали старые.
+## При сбросе приращением считается новое значение счётчика целиком.
+##
+## Состояние хранится в accounting.bin рядом с историей трафика
+## (settings.TIMESERIES_DIR): запись фиксированной ширины на пира, номер
+## записи — индекс пира в peers.json. Файл отображён в память и растёт
+## удвоением; итоги — целые байты без округления.
+
+import mmap
+import os
+import struct
+
+LEDGER_FILE = "accounting.bin"
+ENTRY = struct.Struct("<QQQQqq")   # total_rx, total_tx, last_rx, last_tx, last_handshake, seen_at
+HEADER = struct.Struct("<4sHHQQ")  # magic, version, entry size, resets, reserved
+HEADER_SIZE = 64
+MAGIC = b"WGAC"
+VERSION = 1
+INITIAL_ENTRIES = 1024
+
+
+class Ledger:
+    """
+    Счётчики и итоги трафика пиров по индексу пира.
+    :param path: Путь к accounting.bin.
+    :param writable: Открыть на запись (создаёт файл при отсутствии).
+    """
+
+    def __init__(self, path, writable=False):
+        self.path = str(path)
+        self.writable = writable
+        self._file = None
+        self._mm = None
+        if writable and not os.path.exists(self.path):
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o644)
+            try:
+                os.ftruncate(fd, HEADER_SIZE + INITIAL_ENTRIES * ENTRY.size)
+                os.pwrite(fd, HEADER.pack(MAGIC, VERSION, ENTRY.size, 0, 0), 0)
+            finally:
+                os.close(fd)
+        self._map()
+
+    def _map(self):
+        """Отображает файл в память (повторно — если писатель его увеличил)."""
+        if self._mm is not None:
+            self._mm.close()
+            self._file.close()
+            self._mm = self._file = None
+        try:
+            self._file = open(self.path, "r+b" if self.writable else "rb")
+        except FileNotFoundError:
+            return
+        self._mm = mmap.mmap(
+            self._file.fileno(), 0,
+            access=mmap.ACCESS_WRITE if self.writable else mmap.ACCESS_READ,
+        )
+        magic, version, entry_size, _, _ = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION or entry_size != ENTRY.size:
+            self.close()
+            raise ValueError(f"Неверный формат файла учёта {self.path}")
+
+    @property
+    def capacity(self):
+        return 0 if self._mm is None else (len(self._mm) - HEADER_SIZE) // ENTRY.size
+
+    @property
+    def resets(self):
+        """Количество обнаруженных сбросов счётчиков за всё время."""
+        return 0 if self._mm is None else HEADER.unpack_from(self._mm, 0)[3]
+
+    def _refresh(self):
+        """Для читателя: перечитать отображение, если файл создан или вырос."""
+        try:
+            size = os.stat(self.path).st_size
+        except FileNotFoundError:
+            return
+        if self._mm is None or size != len(self._mm):
+            self._map()
+
+    def _grow(self, index):
+        capacity = self.capacity
+        while capacity <= index:
+            capacity *= 2
+        self._mm.flush()
+        os.truncate(self.path, HEADER_SIZE + capacity * ENTRY.size)
+        self._map()
+
+    def entry(self, index):
+        """Запись пира: (total_rx, total_tx, last_rx, last_tx, last_handshake, seen_at)."""
+        if index >= self.capacity:
+            return None
+        entry = ENTRY.unpack_from(self._mm, HEADER_SIZE + index * ENTRY.size)
+        return entry if entry[5] else None
+
+    def last(self, index):
+        """Последние сырые счётчики пира (rx, tx) или None, если пир не наблюдался."""
+        entry = self.entry(index)
+        return None if entry is None else (entry[2], entry[3])
+
+    def observe(self, index, rx, tx, handshake, ts):
+        """
+        Учитывает выборку счётчиков пира.
+        :return: Кортеж (delta_rx, delta_tx, reset).
+        """
+        if index >= self.capacity:
+            self._grow(index)
+        offset = HEADER_SIZE + index * ENTRY.size
+        total_rx, total_tx, last_rx, last_tx, last_handshake, seen_at = ENTRY.unpack_from(self._mm, offset)
+        if not seen_at:
+            # Первая выборка пира: всё, что насчитано с его добавления, — его трафик
+            reset, delta_rx, delta_tx = False, rx, tx
+        else:
+            reset = rx < last_rx or tx < last_tx or handshake < last_handshake
+            delta_rx, delta_tx = (rx, tx) if reset else (rx - last_rx, tx - last_tx)
+        ENTRY.pack_into(self._mm, offset, total_rx + delta_rx, total_tx + delta_tx, rx, tx, handshake, int(ts))
+        if reset:
+            struct.pack_into("<Q", self._mm, 8, self.resets + 1)
+        return delta_rx, delta_tx, reset
+
+    def observed(self):
+        """Индексы и последние счётчики всех наблюдавшихся пиров: [(index, rx, tx)]."""
+        self._refresh()
+        result = []
+        for index, entry in enumerate(self._entries()):
+            if entry[5]:
+                result.append((index, entry[2], entry[3]))
+        return result
+
+    def totals(self):
+        """Монотонные итоги: словарь {index: [total_rx, total_tx]}."""
+        self._refresh()
+        return {index: [entry[0], entry[1]] for index, entry in enumerate(self._entries()) if entry[5]}
+
+    def total(self, index):
+        """Итог пира [total_rx, total_tx] (нули, если пир не наблюдался)."""
+        self._refresh()
+        entry = self.entry(index)
+        return [0, 0] if entry is None else [entry[0], entry[1]]
+
+    def _entries(self):
+        if self._mm is None:
+            return iter(())
+        return ENTRY.iter_unpack(self._mm[HEADER_SIZE:HEADER_SIZE + self.capacity * ENTRY.size])
+
+    def flush(self):
+        if self._mm is not None and self.writable:
+            self._mm.flush()
+
+    def close(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._file.close()
+            self._mm = self._file = None
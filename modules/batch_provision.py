@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+# modules/batch_provision.py
+## Пакетное создание пользователей WireGuard.
+##
+## Вместо N запусков main.py все пользователи создаются за один проход:
+## - ключи берутся из пула одной операцией, недостающие генерируются параллельно;
+## - IP-адреса выделяются одним вызовом битовой карты;
+## - QR-коды кодируются пулом потоков через modules.qr_service (с кэшем по
+##   содержимому конфигурации);
+## - в ленивом режиме (settings.CLIENT_FILES_MODE = "lazy") файлы не пишутся,
+##   приватные ключи шифруются в записи (modules.client_render);
+## - wg0.conf дописывается одной записью, база пользователей — одной транзакцией
+##   (вместе, под блокировкой wg0.conf — см. modules.user_repository);
+## - изменения применяются к интерфейсу один раз.
+##
+## Использование:
+##   python3 -m modules.batch_provision users.csv [--workers N]
+##   python3 main.py --batch users.jsonl
+##
+## CSV: колонки username,email,telegram_id (заголовок необязателен).
+## JSONL: по одному объекту {"username": ..., "email": ..., "telegram_id": ...} на строку.
+
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import settings
+from modules.client_config import create_client_config, format_addresses
+from modules.client_render import lazy_mode, protect_record
+from modules.ip_allocator import get_address_allocator, resolve_pools
+from modules.key_pool import take_keypairs
+from modules.keygen import generate_keypair
+from modules.main_registration_fields import create_user_record
+from modules.qr_service import render_many
+from modules.quota import suspended_keys
+from modules.user_repository import create_users
+from modules.wg_apply import apply_peer_changes
+from modules.wg_config_parser import load_server_config
+from modules import user_store
+
+
+def read_users_file(path):
+    """
+    Читает список пользователей из CSV или JSONL.
+    :param path: Путь к файлу (.csv или .jsonl/.json).
+    :return: Список словарей {"username", "email", "telegram_id"}.
+    """
+    users = []
+    with open(path, "r", encoding="utf-8") as file:
+        if str(path).endswith((".jsonl", ".json")):
+            rows = (json.loads(line) for line in file if line.strip())
+        else:
+            reader = csv.reader(file)
+            rows = []
+            header = None
+            for row in reader:
+                if not row or not row[0].strip():
+                    continue
+                if header is None and row[0].strip().lower() in ("username", "nickname"):
+                    header = [column.strip().lower() for column in row]
+                    continue
+                columns = header or ["username", "email", "telegram_id"]
+                rows.append(dict(zip(columns, (value.strip() for value in row))))
+        for row in rows:
+            username = row.get("username") or row.get("nickname")
+            if not username:
+                continue
+            users.append({
+                "username": username.strip(),
+                "email": row.get("email") or "N/A",
+                "telegram_id": row.get("telegram_id") or "N/A",
+            })
+    return users
+
+
+def _write_user_files(tasks, workers):
+    """Записывает конфигурации клиентов и QR-коды (QR-коды — пулом потоков)."""
+    for client_config, config_path, _ in tasks:
+        with open(config_path, "w") as file:
+            file.write(client_config)
+    render_many(((client_config, qr_path) for client_config, _, qr_path in tasks), workers)
+
+
+def _collect_keys(count, workers):
+    keys = take_keypairs(count)
+    missing = count - len(keys)
+    if missing > 0:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            keys.extend(executor.map(lambda _: generate_keypair(), range(missing)))
+    return keys
+
+
+def _existing_usernames(config_file):
+    names = {name.lower() for name in user_store.get_usernames()}
+    try:
+        names.update(load_server_config(config_file).by_name_lower)
+    except FileNotFoundError:
+        pass
+    return names
+
+
+def provision_users(users, params, config_file=None, workers=None, apply=True):
+    """
+    Создаёт пользователей пакетом.
+    :param users: Список словарей {"username", "email", "telegram_id"}.
+    :param params: Параметры сервера из /etc/wireguard/params.
+    :param config_file: Путь к wg0.conf.
+    :param workers: Размер пула для генерации ключей и записи файлов.
+    :param apply: Применить изменения к интерфейсу после записи.
+    :return: Отчёт {"created", "skipped", "elapsed", "users_per_sec", "apply"}.
+    """
+    start = time.perf_counter()
+    config_file = str(config_file or settings.SERVER_CONFIG_FILE)
+    workers = workers or os.cpu_count() or 1
+    report = {"created": [], "skipped": {}, "elapsed": 0.0, "users_per_sec": 0.0, "apply": None}
+
+    # Проверка имён: один проход по базе и по wg0.conf
+    taken = _existing_usernames(config_file)
+    batch = []
+    for user in users:
+        name = user["username"]
+        if name.lower() in taken:
+            report["skipped"][name] = "уже существует"
+            continue
+        taken.add(name.lower())
+        batch.append(user)
+    if not batch:
+        report["elapsed"] = time.perf_counter() - start
+        return report
+
+    endpoint = f"{params['SERVER_PUB_IP']}:{params['SERVER_PORT']}"
+    dns_servers = f"{params['CLIENT_DNS_1']},{params['CLIENT_DNS_2']}"
+    server_public_key = params['SERVER_PUB_KEY']
+    server_ipv4 = params.get('SERVER_WG_IPV4', '10.66.66.1')
+    pools, ipv6_prefix = resolve_pools(server_ipv4, params.get('SERVER_WG_IPV6'))
+
+    keys = _collect_keys(len(batch), workers)
+    allocator = get_address_allocator(config_file, pools, ipv6_prefix, server_ipv4)
+    addresses = allocator.allocate_many(len(batch))
+
+    lazy = lazy_mode()
+    committed = False
+    try:
+        if not lazy:
+            os.makedirs(settings.WG_CONFIG_DIR, exist_ok=True)
+            os.makedirs(settings.QR_CODE_DIR, exist_ok=True)
+        tasks, peers, records = [], [], {}
+        for user, (private_key, public_key, preshared_key), (ipv4, ipv6) in zip(batch, keys, addresses):
+            name = user["username"]
+            client_config = create_client_config(
+                private_key=private_key,
+                address=ipv4,
+                address_v6=ipv6,
+                dns_servers=dns_servers,
+                server_public_key=server_public_key,
+                preshared_key=preshared_key,
+                endpoint=endpoint,
+            )
+            config_path = os.path.join(settings.WG_CONFIG_DIR, f"{name}.conf")
+            qr_path = os.path.join(settings.QR_CODE_DIR, f"{name}.png")
+            if not lazy:
+                tasks.append((client_config, config_path, qr_path))
+            peers.append((name, public_key.decode("utf-8"), preshared_key.decode("utf-8"), ipv4, ipv6))
+            records[name] = create_user_record(
+                username=name,
+                address=format_addresses(ipv4, ipv6),
+                public_key=public_key.decode("utf-8"),
+                preshared_key=preshared_key.decode("utf-8"),
+                qr_code_path=qr_path,
+                email=user["email"],
+                telegram_id=user["telegram_id"],
+            )
+            if lazy:
+                protect_record(records[name], private_key)
+
+        _write_user_files(tasks, workers)
+
+        # wg0.conf и база пользователей обновляются вместе под блокировкой wg0.conf
+        create_users(peers, records, config_file)
+        committed = True
+    finally:
+        if not committed:
+            for ipv4, _ in addresses:
+                allocator.release(ipv4)
+
+    if apply:
+        report["apply"] = apply_peer_changes(config_file, params.get('SERVER_WG_NIC'), exclude_keys=suspended_keys())
+
+    report["created"] = [user["username"] for user in batch]
+    report["elapsed"] = time.perf_counter() - start
+    if report["elapsed"] > 0:
+        report["users_per_sec"] = len(batch) / report["elapsed"]
+    return report
+
+
+def main(argv=None):
+    from argparse import ArgumentParser
+    from modules.config import load_params
+
+    parser = ArgumentParser(description="Пакетное создание пользователей WireGuard")
+    parser.add_argument("users_file", help="CSV или JSONL со списком пользователей")
+    parser.add_argument("--workers", type=int, default=None, help="Размер пула потоков")
+    parser.add_argument("--no-apply", action="store_true", help="Не применять изменения к интерфейсу")
+    args = parser.parse_args(argv)
+
+    users = read_users_file(args.users_file)
+    params = load_params(settings.PARAMS_FILE)
+    report = provision_users(users, params, workers=args.workers, apply=not args.no_apply)
+
+    for name, reason in report["skipped"].items():
+        print(f"⚠️ Пропущен {name}: {reason}")
+    print(f"✅ Создано пользователей: {len(report['created'])} за {report['elapsed']:.2f} с "
+          f"({report['users_per_sec']:.1f} пользователей/сек)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
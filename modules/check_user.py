@@ -1,12 +1,5 @@
-import os
-import json
-
-USER_DB_PATH = "user/data/user_records.json"  # Путь к файлу с записями пользователей
+from modules import user_store
 
 def user_exists(nickname):
     """Проверяет, существует ли пользователь с указанным именем."""
-    if os.path.exists(USER_DB_PATH):
-        with open(USER_DB_PATH, 'r') as file:
-            user_data = json.load(file)
-            return nickname in user_data
-    return False
+    return user_store.user_exists(nickname)
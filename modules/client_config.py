@@ -1,6 +1,152 @@
+
 # modules/client_config.py
+## Конфигурации клиентов WireGuard по шаблону.
+##
+## Шаблон — текст конфигурации с полями {name}. Он разбирается один раз
+## (compile_template) в список строк с заранее разобранными литералами и
+## полями; отрисовка — только подстановка значений. Строка, в которой хотя бы
+## одно поле пустое (None или ""), пропускается целиком — так необязательные
+## параметры (MTU, PersistentKeepalive) не попадают в конфигурацию, если не заданы.
+##
+## Поля шаблона: private_key, address, dns, mtu, server_public_key,
+## preshared_key, endpoint, allowed_ips, persistent_keepalive.
+## Свой шаблон задаётся файлом settings.CLIENT_CONFIG_TEMPLATE.
+
+import os
+import string
+
+import settings
+
+DEFAULT_TEMPLATE = """[Interface]
+PrivateKey = {private_key}
+Address = {address}
+DNS = {dns}
+MTU = {mtu}
+
+[Peer]
+PublicKey = {server_public_key}
+PresharedKey = {preshared_key}
+Endpoint = {endpoint}
+AllowedIPs = {allowed_ips}
+PersistentKeepalive = {persistent_keepalive}"""
+
+# Значения полей записи пользователя, означающие «как на сервере» (в том числе
+# заполнители, которые main_registration_fields записывал по умолчанию)
+UNSET_VALUES = ("", "N/A", None)
+LEGACY_DNS_PLACEHOLDER = "1.1.1.1,8.8.8.8"
+
+
+class ConfigTemplate:
+    """
+    Разобранный шаблон конфигурации клиента.
+    :param text: Текст шаблона с полями {name}.
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.lines = []
+        self.fields = set()
+        for line in text.split("\n"):
+            parts = []
+            for literal, field, spec, conversion in string.Formatter().parse(line):
+                if spec or conversion:
+                    raise ValueError(f"Формат полей в шаблоне конфигурации не поддерживается: {line}")
+                parts.append((literal, field))
+                if field is not None:
+                    self.fields.add(field)
+            self.lines.append(tuple(parts))
+
+    def render(self, values):
+        """
+        Подставляет значения полей.
+        :param values: Словарь {поле: значение}; строки с пустыми полями пропускаются.
+        :raises KeyError: Если значения для поля нет в values.
+        """
+        out = []
+        for parts in self.lines:
+            chunks = []
+            for literal, field in parts:
+                chunks.append(literal)
+                if field is not None:
+                    value = values[field]
+                    if value is None or value == "":
+                        break
+                    chunks.append(str(value))
+            else:
+                out.append("".join(chunks))
+        return "\n".join(out)
+
+
+_templates = {}
+_template_file = (None, None)  # (stat_key, ConfigTemplate) для settings.CLIENT_CONFIG_TEMPLATE
+
+
+def compile_template(text):
+    """Разобранный шаблон (кэшируется по тексту)."""
+    template = _templates.get(text)
+    if template is None:
+        template = _templates[text] = ConfigTemplate(text)
+    return template
+
+
+def get_template():
+    """Шаблон из settings.CLIENT_CONFIG_TEMPLATE или встроенный DEFAULT_TEMPLATE."""
+    global _template_file
+    path = settings.CLIENT_CONFIG_TEMPLATE
+    if not path:
+        return compile_template(DEFAULT_TEMPLATE)
+    stat = os.stat(path)
+    stat_key = (str(path), stat.st_mtime_ns, stat.st_size)
+    if _template_file[0] != stat_key:
+        with open(path, "r") as file:
+            _template_file = (stat_key, compile_template(file.read().rstrip("\n")))
+    return _template_file[1]
 
-def create_client_config(private_key, address, dns_servers, server_public_key, preshared_key, endpoint):
+
+def format_addresses(address, address_v6=None):
+    """
+    Формирует список адресов клиента для строк Address/AllowedIPs.
+
+    Args:
+        address (str): IPv4-адрес клиента (маска /32 добавляется, если не указана).
+        address_v6 (str): IPv6-адрес клиента (маска /128 добавляется, если не указана).
+
+    Returns:
+        str: Адреса через запятую, например "10.66.66.2/32,fd42:42:42::2/128".
+    """
+    addresses = [address if "/" in address else f"{address}/32"]
+    if address_v6:
+        addresses.append(address_v6 if "/" in address_v6 else f"{address_v6}/128")
+    return ",".join(addresses)
+
+
+def user_options(record):
+    """
+    Параметры конфигурации, заданные в записи пользователя.
+
+    Args:
+        record (dict): Запись пользователя.
+
+    Returns:
+        dict: dns_servers, allowed_ips, mtu, persistent_keepalive — только заданные поля.
+        dns_custom и allowed_ips_custom, совпадающие с прежними значениями по
+        умолчанию (общий DNS и собственный адрес клиента), не считаются заданными.
+    """
+    options = {}
+    dns = record.get("dns_custom")
+    if dns not in UNSET_VALUES and dns.replace(" ", "") != LEGACY_DNS_PLACEHOLDER:
+        options["dns_servers"] = dns
+    allowed_ips = record.get("allowed_ips_custom")
+    if allowed_ips not in UNSET_VALUES and allowed_ips != record.get("allowed_ips"):
+        options["allowed_ips"] = allowed_ips
+    for field in ("mtu", "persistent_keepalive"):
+        if record.get(field) not in UNSET_VALUES:
+            options[field] = record[field]
+    return options
+
+
+def create_client_config(private_key, address, dns_servers, server_public_key, preshared_key, endpoint,
+                         address_v6=None, allowed_ips=None, mtu=None, persistent_keepalive=None, template=None):
     """
     Создает конфигурацию клиента WireGuard.
 
@@ -11,18 +157,27 @@ def create_client_config(private_key, address, dns_servers, server_public_key, p
         server_public_key (str): Публичный ключ сервера WireGuard.
         preshared_key (bytes): Pre-shared ключ для соединения.
         endpoint (str): Адрес сервера (IP и порт).
+        address_v6 (str): IPv6-адрес клиента для dual-stack (необязательно).
+        allowed_ips (str): Сети, направляемые в туннель (по умолчанию settings.CLIENT_ALLOWED_IPS);
+            например "10.66.66.0/24" для раздельного туннеля.
+        mtu (int): MTU интерфейса клиента (по умолчанию settings.CLIENT_MTU; None — не указывать).
+        persistent_keepalive (int): Интервал keepalive в секундах
+            (по умолчанию settings.CLIENT_PERSISTENT_KEEPALIVE; None — не указывать).
+        template (ConfigTemplate): Шаблон (по умолчанию get_template()).
 
     Returns:
         str: Конфигурация клиента в формате WireGuard.
     """
-    client_config = f"""[Interface]
-PrivateKey = {private_key.decode('utf-8')}
-Address = {address}
-DNS = {dns_servers}
-
-[Peer]
-PublicKey = {server_public_key}
-PresharedKey = {preshared_key.decode('utf-8')}
-Endpoint = {endpoint}
-AllowedIPs = 0.0.0.0/0,::/0"""
-    return client_config
+    return (template or get_template()).render({
+        "private_key": private_key.decode('utf-8'),
+        "address": format_addresses(address, address_v6),
+        "dns": dns_servers,
+        "mtu": settings.CLIENT_MTU if mtu is None else mtu,
+        "server_public_key": server_public_key,
+        "preshared_key": preshared_key.decode('utf-8'),
+        "endpoint": endpoint,
+        "allowed_ips": allowed_ips or settings.CLIENT_ALLOWED_IPS,
+        "persistent_keepalive": (
+            settings.CLIENT_PERSISTENT_KEEPALIVE if persistent_keepalive is None else persistent_keepalive
+        ),
+    })
@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# modules/client_render.py
+## Конфигурации и QR-коды клиентов по запросу (ленивый режим).
+##
+## В режиме settings.CLIENT_FILES_MODE = "lazy" при создании пользователя
+## не пишутся user/data/wg_configs/<name>.conf и user/data/qrcodes/<name>.png:
+## в записи пользователя хранится только приватный ключ, зашифрованный
+## Fernet (поле private_key_enc; ключ шифрования — settings.CLIENT_SECRET_KEY_PATH,
+## права 0600). Конфигурация и QR-код собираются при запросе из админки из
+## записи пользователя и текущих параметров сервера (/etc/wireguard/params),
+## поэтому смена endpoint или DNS сервера действует сразу для всех клиентов.
+##
+## Результаты хранятся в ограниченном LRU-кэше (settings.CLIENT_RENDER_CACHE_SIZE)
+## с ключом (пользователь, версия записи, render_signature()): изменение записи,
+## параметров сервера или шаблона делает старые элементы недоступными.
+##
+## В режиме "files" (по умолчанию) render_config() читает готовый файл
+## конфигурации, если у пользователя нет зашифрованного ключа.
+##
+##   python3 -m modules.client_render show <username> [--qr out.png]
+##   python3 -m modules.client_render migrate
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import settings
+from modules import user_store
+from modules.client_config import create_client_config, get_template, user_options
+from modules.file_lock import atomic_write, locked
+
+try:
+    from cryptography.fernet import Fernet, InvalidToken
+    FERNET_AVAILABLE = True
+except ImportError:  # pragma: no cover - зависит от окружения
+    FERNET_AVAILABLE = False
+
+SECRET_FIELD = "private_key_enc"
+KEY_FILE_MODE = 0o600
+
+_fernet = None
+_fernet_lock = threading.Lock()
+_profile = (None, None)  # (stat_key, profile)
+
+
+def lazy_mode():
+    """Включён ли ленивый режим (и доступно ли шифрование)."""
+    if settings.CLIENT_FILES_MODE != "lazy":
+        return False
+    if not FERNET_AVAILABLE:
+        raise RuntimeError("Для CLIENT_FILES_MODE = \"lazy\" нужен пакет cryptography.")
+    return True
+
+
+# --- Шифрование ключей ---
+
+def _load_fernet():
+    """Ключ шифрования (создаётся с правами 0600 при первом обращении)."""
+    global _fernet
+    with _fernet_lock:
+        if _fernet is None:
+            path = str(settings.CLIENT_SECRET_KEY_PATH)
+            with locked(path):
+                if not os.path.exists(path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    atomic_write(path, Fernet.generate_key(), KEY_FILE_MODE)
+                with open(path, "rb") as file:
+                    _fernet = Fernet(file.read().strip())
+        return _fernet
+
+
+def encrypt_key(private_key):
+    """Шифрует приватный ключ клиента (bytes или str) для хранения в записи."""
+    if isinstance(private_key, str):
+        private_key = private_key.encode("utf-8")
+    return _load_fernet().encrypt(private_key).decode("ascii")
+
+
+def decrypt_key(token):
+    """
+    Расшифровывает приватный ключ клиента.
+    :return: Ключ (bytes).
+    :raises ValueError: Если токен повреждён или зашифрован другим ключом.
+    """
+    try:
+        return _load_fernet().decrypt(token.encode("ascii"))
+    except InvalidToken:
+        raise ValueError("Не удалось расшифровать ключ клиента: неверный ключ шифрования или повреждённые данные.")
+
+
+# --- Параметры сервера ---
+
+def server_profile():
+    """
+    Параметры сервера для конфигураций клиентов из settings.PARAMS_FILE
+    (перечитываются, только если файл изменился).
+    :return: Кортеж (stat_key, {"endpoint", "dns_servers", "server_public_key"}).
+    """
+    global _profile
+    path = str(settings.PARAMS_FILE)
+    stat = os.stat(path)
+    stat_key = (path, stat.st_mtime_ns, stat.st_size)
+    if _profile[0] != stat_key:
+        from modules.config import load_params
+
+        params = load_params(path)
+        _profile = (stat_key, {
+            "endpoint": f"{params['SERVER_PUB_IP']}:{params['SERVER_PORT']}",
+            "dns_servers": f"{params['CLIENT_DNS_1']},{params['CLIENT_DNS_2']}",
+            "server_public_key": params['SERVER_PUB_KEY'],
+        })
+    return _profile
+
+
+def render_signature():
+    """
+    Хэш всего, от чего зависят конфигурации клиентов помимо записи пользователя:
+    параметры сервера, шаблон и параметры конфигурации по умолчанию.
+    """
+    payload = json.dumps([
+        server_profile()[1],
+        get_template().text,
+        settings.CLIENT_ALLOWED_IPS,
+        settings.CLIENT_MTU,
+        settings.CLIENT_PERSISTENT_KEEPALIVE,
+    ], sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+# --- LRU-кэш ---
+
+class RenderCache:
+    """
+    Ограниченный LRU-кэш отрисованных конфигураций и QR-кодов.
+    :param maxsize: Максимум элементов (по умолчанию settings.CLIENT_RENDER_CACHE_SIZE).
+    """
+
+    def __init__(self, maxsize=None):
+        self.maxsize = settings.CLIENT_RENDER_CACHE_SIZE if maxsize is None else maxsize
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        """Значение по ключу; при отсутствии — build() с сохранением в кэш."""
+        with self._lock:
+            if key in self._items:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return self._items[key]
+            self.misses += 1
+        value = build()
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"size": len(self._items), "maxsize": self.maxsize, "hits": self.hits, "misses": self.misses}
+
+
+_cache = RenderCache()
+
+
+def get_cache():
+    """Общий LRU-кэш процесса."""
+    return _cache
+
+
+# --- Отрисовка ---
+
+def _user(username):
+    found = user_store.get_user_versioned(username)
+    if found is None:
+        raise KeyError(f"Пользователь {username} не найден.")
+    return found
+
+
+def build_config(record, profile, private_key=None):
+    """
+    Текст конфигурации клиента из записи пользователя и параметров сервера.
+    :param private_key: Приватный ключ (bytes); по умолчанию расшифровывается из записи.
+    """
+    addresses = (record.get("allowed_ips") or record.get("address") or "").split(",")
+    options = user_options(record)
+    return create_client_config(
+        private_key=private_key or decrypt_key(record[SECRET_FIELD]),
+        address=addresses[0].strip(),
+        address_v6=addresses[1].strip() if len(addresses) > 1 else None,
+        dns_servers=options.pop("dns_servers", profile["dns_servers"]),
+        server_public_key=profile["server_public_key"],
+        preshared_key=record["preshared_key"].encode("utf-8"),
+        endpoint=profile["endpoint"],
+        **options,
+    )
+
+
+def _config_source(username):
+    """
+    Источник конфигурации пользователя.
+    :return: Кортеж (stamp, build): stamp меняется вместе с результатом build().
+    :raises KeyError: Если пользователь не найден.
+    :raises FileNotFoundError: Если у пользователя нет ни ключа, ни файла конфигурации.
+    """
+    record, version = _user(username)
+    if record.get(SECRET_FIELD):
+        profile = server_profile()[1]
+        return (version, render_signature()), lambda: build_config(record, profile)
+
+    path = os.path.join(settings.WG_CONFIG_DIR, f"{username}.conf")
+    stat = os.stat(path)
+
+    def read():
+        with open(path, "r") as file:
+            return file.read()
+    return (version, stat.st_mtime_ns, stat.st_size), read
+
+
+def render_config(username):
+    """
+    Конфигурация клиента: из зашифрованного ключа (ленивый режим) или из файла.
+    :raises KeyError: Если пользователь не найден.
+    :raises FileNotFoundError: Если у пользователя нет ни ключа, ни файла конфигурации.
+    """
+    stamp, build = _config_source(username)
+    return _cache.get(("config", username, stamp), build)
+
+
+def render_qr(username):
+    """
+    QR-код конфигурации клиента в PNG (bytes), без записи на диск.
+    :raises KeyError: Если пользователь не найден.
+    """
+    from modules.qr_service import matrix, png_bytes
+
+    stamp, build = _config_source(username)
+    return _cache.get(
+        ("qr", username, stamp),
+        lambda: png_bytes(matrix(_cache.get(("config", username, stamp), build))),
+    )
+
+
+def protect_record(record, private_key):
+    """Сохраняет в записи пользователя зашифрованный приватный ключ (ленивый режим)."""
+    record[SECRET_FIELD] = encrypt_key(private_key)
+    record["qr_code_path"] = "N/A"
+    return record
+
+
+def private_key_of(config_text):
+    """Значение PrivateKey из секции [Interface] конфигурации клиента."""
+    for line in config_text.splitlines():
+        name, _, value = line.partition("=")
+        if name.strip() == "PrivateKey":
+            return value.strip()
+    return None
+
+
+def migrate_to_lazy():
+    """
+    Переводит существующих пользователей в ленивый режим: приватный ключ из
+    <name>.conf шифруется в запись, файлы конфигурации и QR-кода удаляются.
+    :return: Количество переведённых пользователей.
+    """
+    from modules.qr_service import prune_cache
+
+    if not FERNET_AVAILABLE:
+        raise RuntimeError("Для ленивого режима нужен пакет cryptography.")
+    changes = {}
+    for username, record in user_store.get_users().items():
+        if record.get(SECRET_FIELD):
+            continue
+        config_path = os.path.join(settings.WG_CONFIG_DIR, f"{username}.conf")
+        try:
+            with open(config_path, "r") as file:
+                private_key = private_key_of(file.read())
+        except FileNotFoundError:
+            continue
+        if private_key:
+            changes[username] = protect_record({}, private_key)
+    user_store.update_users(changes)
+    for username in changes:
+        for path in (
+            os.path.join(settings.WG_CONFIG_DIR, f"{username}.conf"),
+            os.path.join(settings.QR_CODE_DIR, f"{username}.png"),
+        ):
+            if os.path.exists(path):
+                os.remove(path)
+    prune_cache()
+    return len(changes)
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Конфигурации и QR-коды клиентов по запросу")
+    commands = parser.add_subparsers(dest="command", required=True)
+    show_parser = commands.add_parser("show", help="Показать конфигурацию клиента")
+    show_parser.add_argument("username")
+    show_parser.add_argument("--qr", default=None, help="Сохранить QR-код в PNG-файл")
+    commands.add_parser("migrate", help="Зашифровать ключи из файлов конфигураций и удалить файлы")
+    args = parser.parse_args()
+
+    if args.command == "show":
+        print(render_config(args.username))
+        if args.qr:
+            with open(args.qr, "wb") as file:
+                file.write(render_qr(args.username))
+    else:
+        print(f"🔐 Переведено в ленивый режим пользователей: {migrate_to_lazy()}")
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# modules/config_rerender.py
+## Пересборка конфигураций и QR-кодов всех клиентов после изменения
+## параметров сервера (/etc/wireguard/params), шаблона или параметров
+## конфигурации по умолчанию (settings.CLIENT_*).
+##
+## Каждая конфигурация собирается заново из записи пользователя и приватного
+## ключа из текущего файла; файл перезаписывается, только если хэш
+## содержимого изменился, а QR-код — через modules.qr_service (кэш по
+## содержимому). Пользователи в ленивом режиме файлов не имеют — их
+## конфигурации и так собираются по запросу с актуальными параметрами.
+##
+## Последняя применённая подпись (client_render.render_signature) хранится в
+## таблице meta базы пользователей; rerender_if_changed() запускает пересборку,
+## только если подпись изменилась. При первом запуске (подписи ещё нет) текущая
+## подпись только сохраняется: файлы, созданные до пересборки, остаются как есть
+## до первого реального изменения параметров (или --force). Фоновый поток
+## ParamsWatcher проверяет подпись раз в settings.CLIENT_RERENDER_INTERVAL.
+##
+##   python3 -m modules.config_rerender [--force] [--workers N]
+
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import settings
+from modules import user_store
+from modules.client_render import SECRET_FIELD, build_config, private_key_of, render_signature, server_profile
+from modules.file_lock import atomic_write
+from modules.qr_service import render as render_qr_code
+
+SIGNATURE_KEY = "client_render_signature"
+
+_watcher = None
+_watcher_lock = threading.Lock()
+
+
+def _digest(text):
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+def rerender_user(username, record, profile):
+    """
+    Пересобирает конфигурацию и QR-код одного пользователя.
+    :return: "changed", "unchanged", "lazy" или "missing" (нет файла или ключа в нём).
+    """
+    if record.get(SECRET_FIELD):
+        return "lazy"
+    config_path = os.path.join(settings.WG_CONFIG_DIR, f"{username}.conf")
+    qr_path = os.path.join(settings.QR_CODE_DIR, f"{username}.png")
+    try:
+        with open(config_path, "r") as file:
+            current = file.read()
+    except FileNotFoundError:
+        return "missing"
+    private_key = private_key_of(current)
+    if not private_key:
+        return "missing"
+
+    config = build_config(record, profile, private_key.encode("utf-8"))
+    changed = _digest(config) != _digest(current)
+    if changed:
+        atomic_write(config_path, config)
+    if changed or not os.path.exists(qr_path):
+        render_qr_code(config, qr_path)
+    return "changed" if changed else "unchanged"
+
+
+def rerender_all(workers=None):
+    """
+    Пересобирает конфигурации и QR-коды всех пользователей пулом потоков.
+    :return: Отчёт {"changed", "unchanged", "lazy", "missing", "errors", "elapsed"}.
+    """
+    start = time.perf_counter()
+    profile = server_profile()[1]
+    workers = workers or os.cpu_count() or 1
+    report = {"changed": [], "unchanged": 0, "lazy": 0, "missing": [], "errors": {}, "elapsed": 0.0}
+
+    def run(item):
+        username, record = item
+        try:
+            return username, rerender_user(username, record, profile)
+        except (OSError, ValueError, KeyError) as e:
+            return username, e
+
+    items = list(user_store.get_users().items())
+    if workers > 1 and len(items) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(run, items))
+    else:
+        results = [run(item) for item in items]
+
+    for username, result in results:
+        if isinstance(result, Exception):
+            report["errors"][username] = str(result)
+        elif result in ("changed", "missing"):
+            report[result].append(username)
+        else:
+            report[result] += 1
+    report["elapsed"] = time.perf_counter() - start
+    return report
+
+
+def rerender_if_changed(workers=None, force=False):
+    """
+    Пересобирает конфигурации, если подпись параметров изменилась с последней пересборки.
+    :return: Отчёт rerender_all() или None, если пересборка не нужна.
+    """
+    signature = render_signature()
+    stored = user_store.get_meta(SIGNATURE_KEY)
+    if not force and stored == signature:
+        return None
+    if not force and stored is None:
+        # Первый запуск: существующие файлы соответствуют текущим параметрам
+        user_store.set_meta(SIGNATURE_KEY, signature)
+        return None
+    report = rerender_all(workers)
+    # Подпись сохраняется, только если все файлы пересобраны
+    if not report["errors"]:
+        user_store.set_meta(SIGNATURE_KEY, signature)
+    return report
+
+
+class ParamsWatcher(threading.Thread):
+    """Фоновый поток: пересборка конфигураций клиентов при изменении параметров."""
+
+    def __init__(self, interval=None):
+        super().__init__(name="config-rerender", daemon=True)
+        self.interval = settings.CLIENT_RERENDER_INTERVAL if interval is None else interval
+        self.last_report = None
+        self.last_error = None
+        self._stopped = threading.Event()
+
+    def stop(self):
+        self._stopped.set()
+
+    def run(self):
+        while not self._stopped.is_set():
+            try:
+                report = rerender_if_changed()
+                if report is not None:
+                    self.last_report = report
+                    print(f"🔄 Конфигурации клиентов пересобраны: изменено {len(report['changed'])}, "
+                          f"без изменений {report['unchanged']} ({report['elapsed']:.2f} с)")
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"⚠️ Ошибка пересборки конфигураций клиентов: {e}")
+            self._stopped.wait(self.interval)
+        user_store.close_connections()
+
+
+def start_params_watcher(interval=None):
+    """Запускает наблюдение за параметрами сервера (один поток на процесс)."""
+    global _watcher
+    with _watcher_lock:
+        if _watcher is None or not _watcher.is_alive():
+            _watcher = ParamsWatcher(interval)
+            _watcher.start()
+    return _watcher
+
+
+def stop_params_watcher():
+    """Останавливает наблюдение за параметрами сервера."""
+    global _watcher
+    with _watcher_lock:
+        if _watcher is not None:
+            _watcher.stop()
+            _watcher.join(timeout=5)
+            _watcher = None
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Пересборка конфигураций и QR-кодов клиентов")
+    parser.add_argument("--force", action="store_true", help="Пересобрать, даже если параметры не менялись")
+    parser.add_argument("--workers", type=int, default=None, help="Размер пула потоков")
+    args = parser.parse_args()
+
+    report = rerender_if_changed(args.workers, args.force)
+    if report is None:
+        print("✅ Параметры не менялись, пересборка не нужна.")
+    else:
+        for username, error in report["errors"].items():
+            print(f"❌ {username}: {error}")
+        for username in report["missing"]:
+            print(f"⚠️ {username}: нет файла конфигурации или ключа в нём")
+        print(f"✅ Изменено: {len(report['changed'])}, без изменений: {report['unchanged']}, "
+              f"ленивый режим: {report['lazy']} ({report['elapsed']:.2f} с)")
@@ -1,27 +1,117 @@
 import os
+from bisect import bisect_right
+from itertools import accumulate
+from modules.client_config import format_addresses
+from modules.file_lock import atomic_write, locked
+from modules.wg_config_parser import (
+    CLIENT_MARKER,
+    invalidate_cache,
+    load_peer_index,
+    parse_server_config_text,
+    peer_ranges,
+    record_appended_peers,
+    save_peer_index,
+    stat_key,
+)
 
-def add_user_to_server_config(config_file, nickname, public_key, preshared_key, allowed_ips):
-    with open(config_file, 'a') as file:
-        file.write(f"\n### Client {nickname}\n")
-        file.write(f"[Peer]\n")
-        file.write(f"PublicKey = {public_key}\n")
-        file.write(f"PresharedKey = {preshared_key}\n")
-        file.write(f"AllowedIPs = {allowed_ips}\n")
+def _peer_block(nickname, public_key, preshared_key, allowed_ips, allowed_ips_v6=None):
+    return [
+        f"\n### Client {nickname}\n",
+        f"[Peer]\n",
+        f"PublicKey = {public_key}\n",
+        f"PresharedKey = {preshared_key}\n",
+        f"AllowedIPs = {format_addresses(allowed_ips, allowed_ips_v6)}\n",
+    ]
+
+def add_users_to_server_config(config_file, peers):
+    """
+    Дописывает несколько пиров в конфигурацию сервера одной операцией записи.
+    :param config_file: Путь к wg0.conf.
+    :param peers: Список кортежей (nickname, public_key, preshared_key, allowed_ips, allowed_ips_v6).
+    """
+    blocks = [(peer[0], peer[1], _peer_block(*peer)) for peer in peers]
+    with locked(config_file):
+        previous_stat = stat_key(os.stat(config_file)) if os.path.exists(config_file) else None
+        with open(config_file, 'a') as file:
+            for _, _, lines in blocks:
+                for line in lines:
+                    file.write(line)
+        if previous_stat is not None:
+            record_appended_peers(str(config_file), previous_stat, [
+                (nickname, public_key, sum(len(line.encode("utf-8")) for line in lines))
+                for nickname, public_key, lines in blocks
+            ])
+
+def add_user_to_server_config(config_file, nickname, public_key, preshared_key, allowed_ips, allowed_ips_v6=None):
+    add_users_to_server_config(config_file, [(nickname, public_key, preshared_key, allowed_ips, allowed_ips_v6)])
+
+def _ranges_match(content, ranges, nicknames):
+    """Проверяет, что по сохранённым смещениям действительно начинаются блоки нужных клиентов."""
+    for nickname in nicknames:
+        entry = ranges.get(nickname)
+        if entry is None:
+            continue
+        header = f"{CLIENT_MARKER} {nickname}".encode("utf-8")
+        if not content.startswith(header, entry[0]) or entry[1] > len(content):
+            return False
+    return True
+
+def remove_users_from_server_config(config_file, nicknames):
+    """
+    Удаляет блоки клиентов из конфигурации сервера за одну запись.
+    Диапазоны байтов берутся из persistent index; если индекс устарел или не
+    совпадает с содержимым, файл разбирается заново.
+    :param config_file: Путь к wg0.conf.
+    :param nicknames: Имена клиентов для удаления.
+    :return: Список фактически удалённых имён.
+    """
+    config_file = str(config_file)
+    nicknames = set(nicknames)
+    with locked(config_file):
+        if not os.path.exists(config_file):
+            return []
+        return _remove_blocks(config_file, nicknames)
+
+def _remove_blocks(config_file, nicknames):
+    """Вырезает блоки клиентов; вызывается под блокировкой wg0.conf."""
+    with open(config_file, 'rb') as file:
+        st = os.fstat(file.fileno())
+        content = file.read()
+
+    ranges = load_peer_index(config_file, stat_key(st))
+    if ranges is None or not _ranges_match(content, ranges, nicknames):
+        ranges = peer_ranges(parse_server_config_text(content.decode("utf-8")))
+
+    removed = sorted((ranges[name][0], ranges[name][1], name) for name in nicknames if name in ranges)
+    if not removed:
+        return []
+
+    # Оставшиеся куски файла и сдвиг смещений для оставшихся блоков
+    chunks = []
+    position = 0
+    for start, end, _ in removed:
+        chunks.append(content[position:start])
+        position = end
+    chunks.append(content[position:])
+    if position == len(content) and chunks[-2].strip():
+        # Удалён последний блок: не оставляем в конце файла пустую строку-разделитель
+        chunks[-2] = chunks[-2].rstrip(b"\n") + b"\n"
+    new_size = sum(len(chunk) for chunk in chunks)
+
+    removed_names = {name for _, _, name in removed}
+    removed_ends = [end for _, end, _ in removed]
+    removed_bytes = [0] + list(accumulate(end - start for start, end, _ in removed))
+    remaining = {}
+    for name, (start, end, public_key) in ranges.items():
+        if name in removed_names:
+            continue
+        shift = removed_bytes[bisect_right(removed_ends, start)]
+        remaining[name] = [start - shift, min(end - shift, new_size), public_key]
+
+    new_stat = atomic_write(config_file, chunks, st.st_mode & 0o7777)
+    invalidate_cache(config_file)
+    save_peer_index(config_file, stat_key(new_stat), remaining)
+    return [name for _, _, name in removed]
 
 def remove_user_from_server_config(config_file, nickname):
-    if not os.path.exists(config_file):
-        return
-    
-    with open(config_file, 'r') as file:
-        lines = file.readlines()
-    
-    with open(config_file, 'w') as file:
-        skip = False
-        for line in lines:
-            if line.strip().startswith(f"### Client {nickname}"):
-                skip = True
-            if skip and line.strip() == "":
-                skip = False
-                continue
-            if not skip:
-                file.write(line)
+    return remove_users_from_server_config(config_file, [nickname])
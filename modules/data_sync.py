@@ -5,11 +5,16 @@
 import os
 import json
 import subprocess
+import time
 from datetime import datetime
 
+import settings
+from modules import user_store
+from modules.file_lock import atomic_write_json
+from modules.wg_dump import collect_peers, format_bytes, format_handshake
+
 # Пути к данным
 WG_USERS_JSON = os.path.join("logs", "wg_users.json")
-USER_RECORDS_JSON = os.path.join("user", "data", "user_records.json")
 
 
 def load_json(filepath):
@@ -22,36 +27,40 @@ def load_json(filepath):
 
 
 def get_wg_show_data():
-    """Получает данные команды 'wg show'."""
+    """
+    Получает состояние пиров из `wg show all dump`.
+    Наряду с отформатированными значениями сохраняются точные счётчики в байтах
+    (uploaded_bytes/downloaded_bytes) и время handshake в epoch.
+    """
     try:
-        output = subprocess.check_output(["wg", "show"], text=True)
-        peers = {}
-        current_peer = None
-
-        for line in output.splitlines():
-            if line.startswith("peer:"):
-                current_peer = line.split(":")[1].strip()
-                peers[current_peer] = {"peer": current_peer}  # Сохраняем peer
-            elif current_peer:
-                if "allowed ips:" in line:
-                    peers[current_peer]["allowed_ips"] = line.split(":")[1].strip()
-                elif "endpoint:" in line:
-                    peers[current_peer]["endpoint"] = line.split(":")[1].strip()
-                elif "latest handshake:" in line:
-                    peers[current_peer]["last_handshake"] = line.split(":")[1].strip()
-                elif "transfer:" in line:
-                    transfer_data = line.split(":")[1].strip().split(", ")
-                    peers[current_peer]["uploaded"] = transfer_data[0]
-                    peers[current_peer]["downloaded"] = transfer_data[1]
-
-        return peers
-    except subprocess.CalledProcessError:
+        table = collect_peers()
+    except (subprocess.CalledProcessError, OSError):
         return {}
 
+    now = time.time()
+    peers = {}
+    for row in table.rows():
+        peer = row["public_key"]
+        data = {
+            "peer": peer,
+            "allowed_ips": row["allowed_ips"] or "N/A",
+            "uploaded": format_bytes(row["rx_bytes"]),
+            "downloaded": format_bytes(row["tx_bytes"]),
+            "uploaded_bytes": row["rx_bytes"],
+            "downloaded_bytes": row["tx_bytes"],
+            "last_handshake_epoch": row["latest_handshake"],
+        }
+        if row["endpoint"]:
+            data["endpoint"] = row["endpoint"]
+        if row["latest_handshake"]:
+            data["last_handshake"] = format_handshake(row["latest_handshake"], now)
+        peers[peer] = data
+    return peers
+
 
 def sync_user_data():
     """Синхронизирует данные из всех источников."""
-    user_records = load_json(USER_RECORDS_JSON)
+    user_records = user_store.get_users()
     wg_show_data = get_wg_show_data()
 
     synced_data = {}
@@ -70,6 +79,9 @@ def sync_user_data():
             "last_handshake": wg_data.get("last_handshake", details.get("last_handshake", "N/A")),
             "uploaded": wg_data.get("uploaded", details.get("uploaded", "N/A")),
             "downloaded": wg_data.get("downloaded", details.get("downloaded", "N/A")),
+            "uploaded_bytes": wg_data.get("uploaded_bytes", details.get("uploaded_bytes", 0)),
+            "downloaded_bytes": wg_data.get("downloaded_bytes", details.get("downloaded_bytes", 0)),
+            "last_handshake_epoch": wg_data.get("last_handshake_epoch", details.get("last_handshake_epoch", 0)),
             "created": details.get("created", "N/A"),
             "expiry": details.get("expiry", "N/A"),
             "qr_code_path": details.get("qr_code_path", "N/A"),
@@ -77,8 +89,9 @@ def sync_user_data():
         }
 
     # Проверяем новых пользователей из wg show, которых нет в user_records
+    known_peers = {record.get("peer") for record in synced_data.values()}
     for peer, peer_data in wg_show_data.items():
-        if not any(record.get("peer") == peer for record in synced_data.values()):
+        if peer not in known_peers:
             new_user_id = f"unknown_{peer}"
             print(f"⚠️ Новый пользователь из wg show: {peer_data.get('allowed_ips')}")
             synced_data[new_user_id] = {
@@ -91,6 +104,9 @@ def sync_user_data():
                 "last_handshake": peer_data.get("last_handshake", "N/A"),
                 "uploaded": peer_data.get("uploaded", "N/A"),
                 "downloaded": peer_data.get("downloaded", "N/A"),
+                "uploaded_bytes": peer_data["uploaded_bytes"],
+                "downloaded_bytes": peer_data["downloaded_bytes"],
+                "last_handshake_epoch": peer_data["last_handshake_epoch"],
                 "created": datetime.utcnow().isoformat(),
                 "expiry": "N/A",
                 "qr_code_path": "N/A",
@@ -98,12 +114,10 @@ def sync_user_data():
             }
 
     # Сохранение данных
-    with open(USER_RECORDS_JSON, "w") as user_records_file:
-        json.dump(synced_data, user_records_file, indent=4)
-    with open(WG_USERS_JSON, "w") as wg_users_file:
-        json.dump(synced_data, wg_users_file, indent=4)
+    user_store.save_users(synced_data)
+    atomic_write_json(WG_USERS_JSON, synced_data, indent=4)
 
-    print(f"✅ Данные успешно синхронизированы. Файлы обновлены:\n - {WG_USERS_JSON}\n - {USER_RECORDS_JSON}")
+    print(f"✅ Данные успешно синхронизированы. Обновлены:\n - {WG_USERS_JSON}\n - {settings.USER_STORE_PATH}")
     return synced_data
 
 
@@ -86,7 +86,7 @@ def run_diagnostics():
         "user/data/qrcodes",
         "user/data/wg_configs",
         "logs",
-        "user/data/user_records.json",
+        "user/data/user_records.db",
         "logs/wg_users.json"
     ]
     functions_to_search = [
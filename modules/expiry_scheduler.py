@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# modules/expiry_scheduler.py
+## Планировщик истечения аккаунтов.
+##
+## Два этапа с отдельными сроками (колонки auto_suspend_at и auto_delete_at
+## в modules.user_store, Unix epoch; по умолчанию — expires_at):
+## - suspend — по auto_suspend_date: пир снимается с работающего интерфейса,
+##   пользователь получает status "suspended" и blocked_reason "expired";
+##   запись и блок [Peer] в wg0.conf сохраняются (продление возвращает пира);
+## - delete — по auto_delete_date: пользователь удаляется из wg0.conf и базы,
+##   конфигурация клиента переносится в архив, IP-адрес и QR-код освобождаются.
+##
+## Пользователи, у которых срок наступил, выбираются по индексу одним запросом
+## и обрабатываются пакетом: одна транзакция в базе, одна перезапись wg0.conf
+## и одно применение изменений к интерфейсу на этап.
+##
+## Поток-планировщик спит до ближайшего срока (MIN по индексу), но не дольше
+## settings.EXPIRY_MAX_SLEEP — чтобы заметить пользователей, добавленных
+## другими процессами. wake() будит его сразу (после изменения сроков в этом
+## процессе).
+##
+##   python3 -m modules.expiry_scheduler [--once]
+
+import os
+import shutil
+import subprocess
+import threading
+import time
+
+import settings
+from modules import user_store
+from modules.ip_management import release_ip
+from modules.qr_service import prune_cache
+from modules.quota import SUSPENDED_STATUS, suspended_keys
+from modules.user_repository import delete_users
+from modules.wg_apply import apply_peer_changes, get_desired_peers, interface_name, set_peer
+
+EXPIRED_REASON = "expired"
+STAGES = ("suspend", "delete")
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def _archive_user_files(nickname, record):
+    """Переносит конфигурацию клиента в архив, освобождает IP-адрес и удаляет QR-код."""
+    user_config_path = os.path.join(settings.WG_CONFIG_DIR, f"{nickname}.conf")
+    if os.path.exists(user_config_path):
+        os.makedirs(settings.STALE_CONFIG_DIR, exist_ok=True)
+        shutil.move(user_config_path, os.path.join(settings.STALE_CONFIG_DIR, f"{nickname}.conf"))
+        print(f"Конфигурация {nickname} перемещена в архив.")
+
+    # Записи create_user_record хранят адреса в allowed_ips ("10.66.66.2/32,fd42:42:42::2/128")
+    user_ip = record.get("allowed_ips") or record.get("address")
+    if user_ip:
+        for address in user_ip.split(","):
+            if address.strip():
+                release_ip(address.strip())
+    else:
+        print(f"IP-адрес для пользователя {nickname} не найден в записи")
+
+    qr_path = os.path.join(settings.QR_CODE_DIR, f"{nickname}.png")
+    if os.path.exists(qr_path):
+        os.remove(qr_path)
+
+
+def suspend_due(now=None, config_file=None):
+    """
+    Этап suspend: снимает с интерфейса пиров, у которых наступил auto_suspend_date.
+    :return: Список приостановленных пользователей.
+    """
+    now = int(time.time() if now is None else now)
+    due = user_store.get_users_due("suspend", now)
+    if not due:
+        return []
+    user_store.update_users({
+        nickname: {"status": SUSPENDED_STATUS, "blocked_reason": EXPIRED_REASON}
+        for nickname in due
+    })
+    apply_peer_changes(config_file or settings.SERVER_CONFIG_FILE, exclude_keys=suspended_keys())
+    for nickname in due:
+        print(f"⏸️ Срок действия {nickname} истёк, пир снят с интерфейса.")
+    return list(due)
+
+
+def delete_due(now=None, config_file=None):
+    """
+    Этап delete: удаляет пользователей, у которых наступил auto_delete_date.
+    :return: Список удалённых пользователей.
+    """
+    now = int(time.time() if now is None else now)
+    config_file = config_file or settings.SERVER_CONFIG_FILE
+    due = user_store.get_users_due("delete", now)
+    if not due:
+        return []
+
+    # Все пользователи этапа удаляются из wg0.conf одной перезаписью и из базы одной транзакцией
+    delete_users(due, config_file)
+    apply_peer_changes(config_file, exclude_keys=suspended_keys())
+    for nickname, record in due.items():
+        _archive_user_files(nickname, record)
+        print(f"Пользователь {nickname} успешно удален и его данные очищены.")
+    prune_cache()
+    return list(due)
+
+
+def process_due(now=None, config_file=None):
+    """
+    Выполняет оба этапа для наступивших сроков.
+    :return: Словарь {"suspend": [...], "delete": [...]}.
+    """
+    return {
+        "suspend": suspend_due(now, config_file),
+        "delete": delete_due(now, config_file),
+    }
+
+
+def next_due():
+    """Ближайший срок любого этапа (Unix epoch) или None."""
+    moments = [moment for moment in (user_store.next_due(stage) for stage in STAGES) if moment is not None]
+    return min(moments) if moments else None
+
+
+def reactivate(nickname, config_file=None):
+    """
+    Возвращает пользователя, приостановленного по сроку, если новый срок ещё не наступил:
+    статус active и `wg set` с параметрами пира из wg0.conf.
+    :return: True, если пользователь возвращён.
+    """
+    record = user_store.get_user(nickname)
+    if record is None or record.get("status") != SUSPENDED_STATUS or record.get("blocked_reason") != EXPIRED_REASON:
+        return False
+    suspend_at = user_store.to_epoch(record.get("auto_suspend_date") or record.get("expires_at"))
+    if suspend_at is not None and suspend_at <= time.time():
+        return False
+    user_store.update_user(nickname, {"status": "active", "blocked_reason": "N/A"})
+    peer = get_desired_peers(config_file).get(record.get("public_key"))
+    if peer is not None:
+        try:
+            set_peer(interface_name(config_file), record["public_key"], peer)
+        except (subprocess.CalledProcessError, OSError) as e:
+            print(f"❌ Не удалось вернуть пира {nickname} на интерфейс: {e}")
+    wake()
+    return True
+
+
+class ExpiryScheduler(threading.Thread):
+    """Фоновый поток, выполняющий этапы истечения к ближайшему сроку."""
+
+    def __init__(self, max_sleep=None, config_file=None):
+        super().__init__(name="expiry-scheduler", daemon=True)
+        self.max_sleep = settings.EXPIRY_MAX_SLEEP if max_sleep is None else max_sleep
+        self.config_file = config_file
+        self.runs = 0
+        self.processed = 0
+        self.next_due = None
+        self.last_error = None
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+
+    def wake(self):
+        self._wake.set()
+
+    def stop(self):
+        self._stopped.set()
+        self._wake.set()
+
+    def run(self):
+        while not self._stopped.is_set():
+            self._wake.clear()
+            try:
+                result = process_due(config_file=self.config_file)
+                self.runs += 1
+                self.processed += len(result["suspend"]) + len(result["delete"])
+                self.next_due = next_due()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"⚠️ Ошибка обработки истечения аккаунтов: {e}")
+            # Сон до ближайшего срока (не дольше max_sleep) или до wake();
+            # не меньше секунды — срок, обработка которого не удалась, не зациклит поток
+            delay = self.max_sleep
+            if self.next_due is not None:
+                delay = min(delay, max(1.0, self.next_due - time.time()))
+            self._wake.wait(delay)
+        user_store.close_connections()
+
+
+def start_expiry_scheduler(max_sleep=None, config_file=None):
+    """Запускает планировщик истечения (один поток на процесс)."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None or not _scheduler.is_alive():
+            _scheduler = ExpiryScheduler(max_sleep, config_file)
+            _scheduler.start()
+    return _scheduler
+
+
+def stop_expiry_scheduler():
+    """Останавливает планировщик истечения."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is not None:
+            _scheduler.stop()
+            _scheduler.join(timeout=5)
+            _scheduler = None
+
+
+def wake():
+    """Будит планировщик этого процесса (сроки изменились)."""
+    with _scheduler_lock:
+        if _scheduler is not None:
+            _scheduler.wake()
+
+
+def get_scheduler_stats():
+    """Состояние планировщика истечения."""
+    with _scheduler_lock:
+        scheduler = _scheduler
+    running = scheduler is not None and scheduler.is_alive()
+    return {
+        "running": running,
+        "runs": scheduler.runs if scheduler is not None else 0,
+        "processed": scheduler.processed if scheduler is not None else 0,
+        "next_due": scheduler.next_due if running else next_due(),
+        "last_error": scheduler.last_error if scheduler is not None else None,
+    }
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+    from datetime import datetime
+
+    parser = ArgumentParser(description="Планировщик истечения аккаунтов")
+    parser.add_argument("--once", action="store_true", help="Обработать наступившие сроки и выйти")
+    args = parser.parse_args()
+
+    if args.once:
+        result = process_due()
+        print(f"✅ Приостановлено: {len(result['suspend'])}, удалено: {len(result['delete'])}")
+    else:
+        scheduler = ExpiryScheduler()
+        moment = next_due()
+        print(f"⏰ Ближайший срок: {datetime.fromtimestamp(moment) if moment else 'нет'}. Ctrl+C для остановки.")
+        try:
+            scheduler.run()
+        except KeyboardInterrupt:
+            print("\n⏹️ Планировщик остановлен.")
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# modules/expiry_time.py
+## Оставшееся время до истечения аккаунтов.
+##
+## Сроки хранятся в базе как Unix epoch (колонка expires_epoch в
+## modules.user_store), поэтому списки и поиск считают оставшееся время
+## одним проходом целочисленной арифметики по массиву сроков
+## (array('q')), без разбора ISO-строки каждого пользователя при каждой
+## отрисовке. Отсутствующий или нераспознанный срок — NO_EXPIRY.
+##
+##   python3 -m modules.expiry_time [users]
+
+import time
+from array import array
+from datetime import datetime, timedelta
+
+from modules.user_store import to_epoch
+
+NO_EXPIRY = -(2 ** 63)  # срок не задан или не распознан
+DAY = 86400
+
+
+def epoch_of(value):
+    """
+    Срок в Unix epoch для одиночного значения.
+    :param value: Unix epoch, дата ISO 8601 или None.
+    :return: int или None, если срок не задан или не распознан.
+    """
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return int(value)
+    return to_epoch(value)
+
+
+def epochs_array(epochs):
+    """Сроки (int или None) в array('q'); None — NO_EXPIRY."""
+    return array("q", [NO_EXPIRY if epoch is None else epoch for epoch in epochs])
+
+
+def seconds_left(epochs, now=None):
+    """
+    Оставшееся время для массива сроков за один проход.
+    :param epochs: array('q') сроков (NO_EXPIRY — срока нет).
+    :param now: Текущий момент (Unix epoch); по умолчанию time.time().
+    :return: array('q') секунд до истечения (<= 0 — истёк; NO_EXPIRY сохраняется).
+    """
+    now = int(time.time() if now is None else now)
+    return array("q", [NO_EXPIRY if epoch == NO_EXPIRY else epoch - now for epoch in epochs])
+
+
+def days_left_text(seconds, template="{} days", expired="Expired", missing="N/A", min_days=1):
+    """
+    Оставшиеся полные дни в виде текста для каждого элемента seconds_left().
+    :param template: Шаблон для активного срока, например "{} дней".
+    :param min_days: Минимум дней, при котором срок ещё показывается (меньше — expired).
+    :return: Список строк в порядке seconds.
+    """
+    # Подпись зависит только от числа дней: у большинства пользователей оно повторяется
+    labels = {NO_EXPIRY // DAY: missing}
+    texts = []
+    for value in seconds:
+        days = value // DAY
+        label = labels.get(days)
+        if label is None:
+            label = labels[days] = template.format(days) if days >= min_days else expired
+        texts.append(label)
+    return texts
+
+
+def time_left_text(value, now=None, **kwargs):
+    """Текст оставшегося времени для одного срока (Unix epoch или ISO 8601); параметры — как у days_left_text()."""
+    return days_left_text(seconds_left(epochs_array([epoch_of(value)]), now), **kwargs)[0]
+
+
+def benchmark(users=10000, repeat=5):
+    """
+    Время расчёта оставшихся дней для списка пользователей: разбор ISO-строк
+    против прохода по массиву сроков.
+    :return: Словарь {"iso": секунды, "epoch": секунды}.
+    """
+    start = datetime.now()
+    iso = [(start + timedelta(hours=7 * n)).isoformat() for n in range(users)]
+    epochs = epochs_array(to_epoch(value) for value in iso)
+
+    def parse_each():
+        now = datetime.now()
+        days = [(datetime.fromisoformat(value) - now).days for value in iso]
+        return [f"{value} days" if value > 0 else "Expired" for value in days]
+
+    results = {}
+    for name, run in (("iso", parse_each), ("epoch", lambda: days_left_text(seconds_left(epochs)))):
+        best = None
+        for _ in range(repeat):
+            begin = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - begin
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = best
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    results = benchmark(count)
+    print(f"=== Оставшееся время ({count} пользователей) ===")
+    print(f"  разбор ISO     : {results['iso'] * 1000:8.2f} мс")
+    print(f"  массив сроков  : {results['epoch'] * 1000:8.2f} мс")
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# modules/file_lock.py
+## Межпроцессные блокировки файлов и атомарная запись.
+##
+## Блокировка — advisory fcntl.flock на соседнем файле "<path>.lock", поэтому
+## она переживает os.replace основного файла. Внутри одного потока блокировка
+## реентерабельна: функция, уже держащая блокировку wg0.conf, может вызывать
+## другие функции, которые берут ту же блокировку.
+##
+## Атомарная запись: временный файл в той же директории, fsync, os.replace —
+## при сбое на диске остаётся либо старая, либо новая версия файла целиком.
+
+import fcntl
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+_held = threading.local()
+
+
+def lock_path(path):
+    return f"{path}.lock"
+
+
+@contextmanager
+def locked(path, shared=False):
+    """
+    Блокировка файла между процессами (и потоками).
+    :param path: Путь к защищаемому файлу.
+    :param shared: Разделяемая блокировка (для чтения) вместо эксклюзивной.
+    """
+    path = os.path.abspath(str(path))
+    held = getattr(_held, "paths", None)
+    if held is None:
+        held = _held.paths = {}
+    if path in held:
+        held[path] += 1
+        try:
+            yield path
+        finally:
+            held[path] -= 1
+        return
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd = os.open(lock_path(path), os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        held[path] = 1
+        try:
+            yield path
+        finally:
+            del held[path]
+            fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+def atomic_write(path, chunks, mode=None):
+    """
+    Записывает файл через временный файл, fsync и os.replace.
+    :param path: Путь к файлу.
+    :param chunks: bytes, str или последовательность таких кусков.
+    :param mode: Права файла; по умолчанию сохраняются права существующего файла.
+    :return: os.stat_result записанного файла.
+    """
+    path = str(path)
+    if isinstance(chunks, (bytes, str)):
+        chunks = [chunks]
+    if mode is None:
+        try:
+            mode = os.stat(path).st_mode & 0o7777
+        except FileNotFoundError:
+            mode = 0o644
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+    try:
+        with os.fdopen(fd, "wb") as file:
+            os.fchmod(file.fileno(), mode)
+            for chunk in chunks:
+                file.write(chunk.encode("utf-8") if isinstance(chunk, str) else chunk)
+            file.flush()
+            os.fsync(file.fileno())
+            new_stat = os.fstat(file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return new_stat
+
+
+def atomic_write_json(path, data, mode=None, **dump_kwargs):
+    """Атомарно записывает data в JSON-файл (параметры json.dumps передаются через dump_kwargs)."""
+    return atomic_write(path, json.dumps(data, **dump_kwargs), mode)
@@ -0,0 +1,519 @@
+#!/usr/bin/env python3
+# modules/ip_allocator.py
+## Аллокатор IP-адресов WireGuard на основе битовых карт.
+##
+## Каждому адресу подсети соответствует один бит в файле из settings.IP_BITMAP_DIR,
+## который отображается в память (mmap). Курсор свободных адресов хранится в
+## заголовке файла, поэтому выделение и освобождение адреса стоят O(1)
+## (амортизированно) и не требуют перечитывания wg0.conf. Карта строится из
+## wg0.conf один раз — при первом запуске или при смене подсети.
+##
+## Пулы адресов (settings.ADDRESS_POOLS) перебираются по порядку: когда пул
+## заполнен, выдача переходит к следующему. Заполненный пул пропускается за O(1)
+## по счётчику занятых адресов. IPv6-адрес клиента выводится из порядкового
+## номера IPv4-адреса во всех пулах (settings.IPV6_POOL), как в wireguard-install:
+## 10.66.66.2 -> fd42:42:42::2.
+##
+## Формат файла:
+##   заголовок (64 байта): magic, версия, длина префикса, адрес сети,
+##                          курсор, количество занятых адресов;
+##   далее — битовая карта, бит i = адрес (сеть + i) занят.
+
+import fcntl
+import ipaddress
+import mmap
+import os
+import re
+import struct
+import threading
+from contextlib import contextmanager
+
+import settings
+from modules.wg_config_parser import load_server_config
+
+MAGIC = b"WGIPBMP1"
+VERSION = 1
+HEADER = struct.Struct("<8sBB6x16sQQ")
+HEADER_SIZE = 64
+_FREE_BYTE = re.compile(rb"[^\xff]")
+
+_bitmaps = {}
+_bitmaps_lock = threading.Lock()
+
+
+class IPBitmap:
+    """Битовая карта адресов одной подсети, отображённая в память."""
+
+    def __init__(self, path, subnet=None, reserved=()):
+        """
+        :param path: Путь к файлу битовой карты.
+        :param subnet: Подсеть в формате CIDR. Если None — берётся из существующего файла.
+        :param reserved: Адреса, которые никогда не выдаются (например, адрес сервера).
+        """
+        self.path = str(path)
+        self.created = False
+        # flock не разделяет потоки одного процесса, работающие с общим дескриптором
+        self._thread_lock = threading.Lock()
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            with self._lock():
+                header = os.pread(self._fd, HEADER.size, 0)
+                network = self._network_from_header(header)
+                if subnet is not None:
+                    wanted = ipaddress.ip_network(subnet, strict=False)
+                    if network != wanted:
+                        self._initialize(wanted, reserved)
+                        network = wanted
+                elif network is None:
+                    raise FileNotFoundError(f"Битовая карта IP-адресов не найдена: {self.path}")
+                self.network = network
+                self.size = network.num_addresses
+                self._map()
+                if not self.created:
+                    for address in reserved:
+                        self._set(self._index(address))
+        except Exception:
+            os.close(self._fd)
+            raise
+
+    @staticmethod
+    def _network_from_header(header):
+        if len(header) < HEADER.size:
+            return None
+        magic, version, prefixlen, packed, _cursor, _used = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            return None
+        address = ipaddress.IPv4Address(packed[:4]) if packed[4:] == b"\0" * 12 else ipaddress.IPv6Address(packed)
+        return ipaddress.ip_network(f"{address}/{prefixlen}")
+
+    def _initialize(self, network, reserved):
+        """Создаёт пустую карту: заняты только служебные адреса."""
+        size = network.num_addresses
+        nbytes = (size + 7) // 8
+        # Файл не усекается до нуля: другие процессы могут держать его отображённым
+        os.ftruncate(self._fd, HEADER_SIZE + nbytes)
+        os.pwrite(self._fd, b"\0" * nbytes, HEADER_SIZE)
+        packed = network.network_address.packed.ljust(16, b"\0")
+        os.pwrite(self._fd, HEADER.pack(MAGIC, VERSION, network.prefixlen, packed, 0, 0), 0)
+        self.network = network
+        self.size = size
+        self._map()
+        # Биты за пределами подсети (добивка последнего байта) всегда заняты
+        for index in range(size, nbytes * 8):
+            self._mm[HEADER_SIZE + index // 8] |= 1 << (index % 8)
+        if network.version == 4 and network.prefixlen < 31:
+            self._set(0)
+            self._set(size - 1)
+        for address in reserved:
+            self._set(self._index(address))
+        self.created = True
+
+    def _map(self):
+        if getattr(self, "_mm", None) is not None:
+            self._mm.close()
+        self._mm = mmap.mmap(self._fd, HEADER_SIZE + (self.size + 7) // 8)
+
+    @contextmanager
+    def _lock(self):
+        """Блокировка карты: между потоками процесса — threading.Lock, между процессами — flock."""
+        with self._thread_lock:
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def _header(self):
+        return HEADER.unpack_from(self._mm, 0)
+
+    def _store_counters(self, cursor, used):
+        magic, version, prefixlen, packed, _cursor, _used = self._header()
+        HEADER.pack_into(self._mm, 0, magic, version, prefixlen, packed, cursor, used)
+
+    def _index(self, address):
+        ip = ipaddress.ip_address(str(address).split("/")[0].strip())
+        if ip not in self.network:
+            raise ValueError(f"Адрес {ip} не принадлежит подсети {self.network}.")
+        return int(ip) - int(self.network.network_address)
+
+    def _is_set(self, index):
+        return bool(self._mm[HEADER_SIZE + index // 8] & (1 << (index % 8)))
+
+    def _set(self, index):
+        """Помечает бит занятым. Возвращает True, если бит был свободен."""
+        if self._is_set(index):
+            return False
+        self._mm[HEADER_SIZE + index // 8] |= 1 << (index % 8)
+        cursor, used = self._header()[4:]
+        self._store_counters(cursor, used + 1)
+        return True
+
+    def _clear(self, index):
+        """Освобождает бит. Возвращает True, если бит был занят."""
+        if not self._is_set(index):
+            return False
+        self._mm[HEADER_SIZE + index // 8] &= ~(1 << (index % 8)) & 0xFF
+        cursor, used = self._header()[4:]
+        self._store_counters(min(cursor, index), max(used - 1, 0))
+        return True
+
+    def _find_free(self, start):
+        """Ищет первый свободный бит, начиная с позиции start."""
+        if start >= self.size:
+            return None
+        byte_index = start // 8
+        value = self._mm[HEADER_SIZE + byte_index]
+        for bit in range(start % 8, 8):
+            if not value & (1 << bit):
+                return byte_index * 8 + bit
+        match = _FREE_BYTE.search(self._mm, HEADER_SIZE + byte_index + 1)
+        if match is None:
+            return None
+        byte_index = match.start() - HEADER_SIZE
+        value = self._mm[match.start()]
+        for bit in range(8):
+            if not value & (1 << bit):
+                return byte_index * 8 + bit
+        return None
+
+    def allocate(self):
+        """
+        Выделяет следующий свободный адрес.
+        :return: IP-адрес в виде строки.
+        """
+        with self._lock():
+            cursor = self._header()[4]
+            index = self._find_free(cursor)
+            if index is None and cursor:
+                index = self._find_free(0)
+            if index is None:
+                raise ValueError("Нет доступных IP-адресов в указанной подсети.")
+            self._set(index)
+            used = self._header()[5]
+            self._store_counters(index + 1, used)
+            self._mm.flush()
+        return str(self.network.network_address + index)
+
+    def allocate_many(self, count):
+        """
+        Выделяет до count свободных адресов за одну блокировку и один сброс карты на диск.
+        :return: Список адресов (может быть короче count, если подсеть заполнена).
+        """
+        base = self.network.network_address
+        addresses = []
+        with self._lock():
+            cursor = self._header()[4]
+            wrapped = cursor == 0
+            while len(addresses) < count:
+                index = self._find_free(cursor)
+                if index is None:
+                    if wrapped:
+                        break
+                    wrapped = True
+                    cursor = 0
+                    continue
+                self._set(index)
+                addresses.append(str(base + index))
+                cursor = index + 1
+            if addresses:
+                self._store_counters(cursor, self._header()[5])
+                self._mm.flush()
+        return addresses
+
+    def release(self, address):
+        """
+        Освобождает адрес.
+        :return: True, если адрес был занят.
+        """
+        with self._lock():
+            released = self._clear(self._index(address))
+            self._mm.flush()
+        return released
+
+    def mark(self, address):
+        """Помечает адрес занятым (например, добавленный вручную)."""
+        with self._lock():
+            marked = self._set(self._index(address))
+            self._mm.flush()
+        return marked
+
+    def is_allocated(self, address):
+        return self._is_set(self._index(address))
+
+    def allocated_addresses(self, include_reserved=False):
+        """
+        Перечисляет занятые адреса (полный проход по карте, для отчётов и совместимости).
+        :param include_reserved: Включать ли адрес сети и широковещательный адрес.
+        :return: Список адресов в виде строк.
+        """
+        base = int(self.network.network_address)
+        result = []
+        for byte_index, value in enumerate(self._mm[HEADER_SIZE:]):
+            if not value:
+                continue
+            for bit in range(8):
+                index = byte_index * 8 + bit
+                if value & (1 << bit) and index < self.size:
+                    result.append(str(ipaddress.ip_address(base + index)))
+        if not include_reserved and self.network.version == 4 and self.network.prefixlen < 31:
+            edges = {str(self.network.network_address), str(self.network.broadcast_address)}
+            result = [address for address in result if address not in edges]
+        return result
+
+    @property
+    def used(self):
+        return self._header()[5]
+
+    def rebuild(self, addresses, reserved=()):
+        """
+        Перестраивает карту по списку занятых адресов.
+        :param addresses: Итерируемый набор занятых адресов (адреса вне подсети игнорируются).
+        :param reserved: Служебные адреса.
+        """
+        with self._lock():
+            self._initialize(self.network, reserved)
+            for address in addresses:
+                try:
+                    self._set(self._index(address))
+                except ValueError:
+                    continue
+            self._mm.flush()
+
+    def close(self):
+        if getattr(self, "_mm", None) is not None:
+            self._mm.close()
+            self._mm = None
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+def read_config_addresses(config_file):
+    """
+    Однократно читает все адреса AllowedIPs из конфигурации сервера.
+    :param config_file: Путь к wg0.conf.
+    :return: Список адресов без маски.
+    """
+    try:
+        return load_server_config(config_file).addresses()
+    except FileNotFoundError:
+        return []
+
+
+def first_host(subnet):
+    """Первый адрес подсети (по соглашению — адрес сервера WireGuard)."""
+    network = ipaddress.ip_network(subnet, strict=False)
+    return str(network.network_address + 1)
+
+
+def pool_bitmap_path(network, bitmap_dir=None):
+    """Путь к файлу битовой карты пула."""
+    bitmap_dir = str(bitmap_dir or settings.IP_BITMAP_DIR)
+    return os.path.join(bitmap_dir, f"{network.network_address}_{network.prefixlen}.bin")
+
+
+def _open_bitmap(path, network, reserved, config_addresses):
+    """Открывает (или строит из wg0.conf) битовую карту пула, кэшируя её в процессе."""
+    with _bitmaps_lock:
+        bitmap = _bitmaps.get(path)
+        if bitmap is None or bitmap.network != network:
+            if bitmap is not None:
+                bitmap.close()
+            bitmap = IPBitmap(path, network, reserved)
+            if bitmap.created:
+                bitmap.rebuild(config_addresses(), reserved)
+            _bitmaps[path] = bitmap
+        return bitmap
+
+
+class AddressPoolAllocator:
+    """Упорядоченный набор IPv4-пулов с необязательным IPv6-префиксом."""
+
+    def __init__(self, pools, ipv6_prefix=None, server_ip=None, config_file=None, bitmap_dir=None):
+        """
+        :param pools: Список IPv4-подсетей в порядке заполнения.
+        :param ipv6_prefix: IPv6-префикс для dual-stack адресов (или None).
+        :param server_ip: Адрес сервера, исключаемый из выдачи.
+        :param config_file: Путь к wg0.conf (источник для первичного построения карт).
+        :param bitmap_dir: Каталог с файлами битовых карт.
+        """
+        if not pools:
+            raise ValueError("Не задан ни один пул IP-адресов.")
+        self.networks = [ipaddress.ip_network(pool, strict=False) for pool in pools]
+        for i, network in enumerate(self.networks):
+            for other in self.networks[i + 1:]:
+                if network.overlaps(other):
+                    raise ValueError(f"Пулы адресов пересекаются: {network} и {other}.")
+        self.ipv6_network = ipaddress.ip_network(ipv6_prefix, strict=False) if ipv6_prefix else None
+        if server_ip is None:
+            server_ip = first_host(self.networks[0])
+
+        config_file = str(config_file or settings.SERVER_CONFIG_FILE)
+        cached_addresses = []
+
+        def config_addresses():
+            # wg0.conf читается не более одного раза, даже если строятся несколько карт
+            if not cached_addresses:
+                cached_addresses.append(read_config_addresses(config_file))
+            return cached_addresses[0]
+
+        self.bitmaps = []
+        self.offsets = []
+        offset = 0
+        for network in self.networks:
+            reserved = tuple(
+                address for address in (server_ip,)
+                if ipaddress.ip_address(address) in network
+            )
+            path = pool_bitmap_path(network, bitmap_dir)
+            self.bitmaps.append(_open_bitmap(path, network, reserved, config_addresses))
+            self.offsets.append(offset)
+            offset += network.num_addresses
+
+        if self.ipv6_network is not None and offset > self.ipv6_network.num_addresses:
+            raise ValueError(f"IPv6-префикс {self.ipv6_network} меньше суммарного размера IPv4-пулов.")
+
+    def _ipv6_for_ordinal(self, ordinal):
+        if self.ipv6_network is None:
+            return None
+        return str(self.ipv6_network.network_address + ordinal)
+
+    def ipv6_for(self, ipv4):
+        """Возвращает IPv6-адрес, соответствующий IPv4-адресу клиента."""
+        ip = ipaddress.ip_address(str(ipv4).split("/")[0].strip())
+        for network, offset in zip(self.networks, self.offsets):
+            if ip in network:
+                return self._ipv6_for_ordinal(offset + int(ip) - int(network.network_address))
+        return None
+
+    def allocate(self):
+        """
+        Выделяет адрес в первом незаполненном пуле.
+        :return: Кортеж (ipv4, ipv6); ipv6 равен None, если IPv6 не настроен.
+        """
+        for bitmap, offset in zip(self.bitmaps, self.offsets):
+            if bitmap.used >= bitmap.size:
+                continue
+            try:
+                ipv4 = bitmap.allocate()
+            except ValueError:
+                continue
+            ordinal = offset + int(ipaddress.ip_address(ipv4)) - int(bitmap.network.network_address)
+            return ipv4, self._ipv6_for_ordinal(ordinal)
+        raise ValueError("Нет доступных IP-адресов ни в одном из пулов.")
+
+    def allocate_many(self, count):
+        """
+        Выделяет count адресов за один проход по пулам (для пакетного создания).
+        Если адресов не хватает, уже выделенные освобождаются.
+        :return: Список кортежей (ipv4, ipv6).
+        """
+        result = []
+        for bitmap, offset in zip(self.bitmaps, self.offsets):
+            missing = count - len(result)
+            if missing <= 0:
+                break
+            if bitmap.used >= bitmap.size:
+                continue
+            base = int(bitmap.network.network_address)
+            for ipv4 in bitmap.allocate_many(missing):
+                ordinal = offset + int(ipaddress.ip_address(ipv4)) - base
+                result.append((ipv4, self._ipv6_for_ordinal(ordinal)))
+        if len(result) < count:
+            for ipv4, _ in result:
+                self.release(ipv4)
+            raise ValueError("Нет доступных IP-адресов ни в одном из пулов.")
+        return result
+
+    def release(self, address):
+        """
+        Освобождает IPv4-адрес в пуле, которому он принадлежит.
+        :return: True, если адрес был занят.
+        """
+        ip = ipaddress.ip_address(str(address).split("/")[0].strip())
+        for bitmap in self.bitmaps:
+            if ip in bitmap.network:
+                return bitmap.release(ip)
+        return False
+
+    def usage(self):
+        """
+        Заполненность пулов.
+        :return: Список словарей {"pool", "used", "size"}.
+        """
+        return [
+            {"pool": str(bitmap.network), "used": bitmap.used, "size": bitmap.size}
+            for bitmap in self.bitmaps
+        ]
+
+    def allocated_addresses(self):
+        """Все занятые IPv4-адреса во всех пулах (полный проход, для отчётов)."""
+        result = []
+        for bitmap in self.bitmaps:
+            result.extend(bitmap.allocated_addresses())
+        return result
+
+
+def resolve_pools(server_wg_ipv4=None, server_wg_ipv6=None):
+    """
+    Определяет пулы адресов из настроек и параметров сервера.
+    :param server_wg_ipv4: SERVER_WG_IPV4 из /etc/wireguard/params.
+    :param server_wg_ipv6: SERVER_WG_IPV6 из /etc/wireguard/params.
+    :return: Кортеж (список IPv4-пулов, IPv6-префикс или None).
+    """
+    pools = list(settings.ADDRESS_POOLS)
+    if not pools:
+        if server_wg_ipv4:
+            pools = [str(ipaddress.ip_interface(f"{server_wg_ipv4}/24").network)]
+        else:
+            pools = [settings.USER_SET_SUBNET]
+    ipv6_prefix = settings.IPV6_POOL
+    if ipv6_prefix is None and server_wg_ipv6:
+        ipv6_prefix = str(ipaddress.ip_interface(f"{server_wg_ipv6}/64").network)
+    return pools, ipv6_prefix
+
+
+def get_address_allocator(config_file=None, pools=None, ipv6_prefix=None, server_ip=None, bitmap_dir=None):
+    """
+    Возвращает аллокатор для набора пулов, при необходимости строя карты из wg0.conf.
+    :param config_file: Путь к wg0.conf.
+    :param pools: Список IPv4-подсетей (по умолчанию — settings.ADDRESS_POOLS или USER_SET_SUBNET).
+    :param ipv6_prefix: IPv6-префикс для dual-stack адресов.
+    :param server_ip: Адрес сервера, исключаемый из выдачи.
+    :param bitmap_dir: Каталог с файлами битовых карт.
+    :return: Объект AddressPoolAllocator.
+    """
+    if pools is None:
+        pools, default_ipv6 = resolve_pools()
+        ipv6_prefix = ipv6_prefix or default_ipv6
+    return AddressPoolAllocator(pools, ipv6_prefix, server_ip, config_file, bitmap_dir)
+
+
+def release_address(address, bitmap_dir=None):
+    """
+    Освобождает IPv4-адрес в той битовой карте, которой он принадлежит.
+    :return: True, если адрес был занят.
+    """
+    bitmap_dir = str(bitmap_dir or settings.IP_BITMAP_DIR)
+    try:
+        ip = ipaddress.ip_address(str(address).split("/")[0].strip())
+    except ValueError:
+        return False
+    if not os.path.isdir(bitmap_dir):
+        return False
+    for name in sorted(os.listdir(bitmap_dir)):
+        if not name.endswith(".bin"):
+            continue
+        path = os.path.join(bitmap_dir, name)
+        with _bitmaps_lock:
+            bitmap = _bitmaps.get(path)
+            if bitmap is None:
+                try:
+                    bitmap = IPBitmap(path)
+                except FileNotFoundError:
+                    continue
+                _bitmaps[path] = bitmap
+        if ip in bitmap.network:
+            return bitmap.release(ip)
+    return False
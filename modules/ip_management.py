@@ -4,6 +4,8 @@
 
 import ipaddress
 from modules.utils import get_wireguard_subnet
+from modules.ip_allocator import get_address_allocator, release_address
+from modules.wg_config_parser import load_server_config
 
 
 def get_existing_ips(config_file):
@@ -16,17 +18,13 @@ def get_existing_ips(config_file):
         subnet = get_wireguard_subnet()
         network = ipaddress.ip_network(subnet, strict=False)
 
-        with open(config_file, "r") as file:
-            lines = file.readlines()
+        config = load_server_config(config_file)
 
         existing_ips = []
-        for line in lines:
-            if line.strip().startswith("AllowedIPs"):
-                ip = line.split("=")[-1].strip().split(",")[0]  # Берём только IPv4
-                ip_no_mask = ip.split("/")[0]  # Убираем маску подсети
-                # Фильтруем только IP из текущей подсети
-                if ipaddress.ip_address(ip_no_mask) in network:
-                    existing_ips.append(ip_no_mask)
+        for address in config.addresses():
+            # Фильтруем только IP из текущей подсети (IPv6 отбрасывается)
+            if ipaddress.ip_address(address) in network:
+                existing_ips.append(address)
 
         return existing_ips
     except FileNotFoundError:
@@ -36,24 +34,34 @@ def get_existing_ips(config_file):
 def generate_ip(config_file):
     """
     Генерация нового IP-адреса в подсети WireGuard.
+    Адрес выдаётся битовой картой (modules.ip_allocator) без перебора подсети.
     :param config_file: Путь к файлу конфигурации WireGuard.
-    :return: Новый IP-адрес и список существующих адресов.
+    :return: Новый IP-адрес и список занятых адресов (по данным битовой карты).
     """
-    existing_ips = get_existing_ips(config_file)
-    subnet = get_wireguard_subnet()
+    subnet = get_wireguard_subnet(config_file)
+    network = ipaddress.ip_network(subnet, strict=False)
+    server_ip = subnet.split("/")[0]
 
-    # Лог отладки
-    print(f"Существующие IP: {existing_ips}")
-    print(f"Подсеть WireGuard: {subnet}")
+    allocator = get_address_allocator(config_file, [str(network)], server_ip=server_ip)
+    try:
+        new_ip, _ = allocator.allocate()
+    except ValueError:
+        # Если все IP-адреса заняты, выбрасываем исключение
+        raise RuntimeError("Нет доступных IP-адресов в подсети WireGuard.")
 
-    # Преобразуем подсеть в объект ip_network
-    network = ipaddress.ip_network(subnet, strict=False)
+    print(f"Подсеть WireGuard: {subnet}, выдан адрес: {new_ip}")
+    return new_ip, allocator.allocated_addresses()
 
-    # Проходим по всем IP-адресам в подсети, начиная с первого доступного
-    for ip in network.hosts():  # Исключает адреса сети и широковещательный
-        ip_str = str(ip)
-        if ip_str not in existing_ips:
-            return ip_str, existing_ips
 
-    # Если все IP-адреса заняты, выбрасываем исключение
-    raise RuntimeError("Нет доступных IP-адресов в подсети WireGuard.")
+def release_ip(ip_address):
+    """
+    Освобождение IP-адреса (например, при удалении просроченного пользователя).
+    :param ip_address: IP-адрес (маска допускается).
+    :return: True, если адрес был занят и освобождён.
+    """
+    released = release_address(ip_address)
+    if released:
+        print(f"IP-адрес {ip_address} освобождён.")
+    else:
+        print(f"IP-адрес {ip_address} не был занят в битовой карте.")
+    return released
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# modules/key_pool.py
+## Пул заранее сгенерированных ключей WireGuard (private/public/PSK).
+##
+## Пул хранится в settings.KEY_POOL_PATH с правами 0600. Фоновый поток
+## поддерживает глубину пула на уровне settings.KEY_POOL_WATERMARK, поэтому
+## создание пользователя не ждёт генерации ключей. Если пул пуст, ключи
+## генерируются на месте — создание пользователя никогда не блокируется пулом.
+
+import json
+import threading
+import time
+
+import settings
+from modules.file_lock import atomic_write_json, locked
+from modules.keygen import generate_keypair
+
+POOL_FILE_MODE = 0o600
+
+_refiller = None
+_refiller_lock = threading.Lock()
+
+
+def _pool_path():
+    return str(settings.KEY_POOL_PATH)
+
+
+def _locked_pool():
+    """Эксклюзивная блокировка файла пула между процессами."""
+    return locked(_pool_path())
+
+
+def _read_pool(path):
+    try:
+        with open(path, "r") as file:
+            data = json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        data = {}
+    data.setdefault("keys", [])
+    data.setdefault("stats", {})
+    return data
+
+
+def _write_pool(path, data):
+    """Записывает пул через временный файл с правами 0600 и атомарной заменой."""
+    atomic_write_json(path, data, POOL_FILE_MODE)
+
+
+def take_keypair():
+    """
+    Извлекает набор ключей из пула.
+    :return: Кортеж (private_key, public_key, preshared_key) в виде bytes.
+    """
+    with _locked_pool() as path:
+        data = _read_pool(path)
+        entry = data["keys"].pop() if data["keys"] else None
+        if entry is not None:
+            _write_pool(path, data)
+        depth = len(data["keys"])
+
+    if depth < settings.KEY_POOL_WATERMARK and _refiller is not None:
+        _refiller.wake()
+
+    if entry is None:
+        return generate_keypair()
+    return tuple(key.encode("utf-8") for key in entry)
+
+
+def take_keypairs(count):
+    """
+    Извлекает из пула до count наборов ключей за одну блокировку и одну запись.
+    Недостающие наборы не генерируются — это делает вызывающий код.
+    :return: Список кортежей (private_key, public_key, preshared_key) в виде bytes.
+    """
+    with _locked_pool() as path:
+        data = _read_pool(path)
+        taken = data["keys"][-count:] if count > 0 else []
+        if taken:
+            del data["keys"][-len(taken):]
+            _write_pool(path, data)
+        depth = len(data["keys"])
+
+    if depth < settings.KEY_POOL_WATERMARK and _refiller is not None:
+        _refiller.wake()
+    return [tuple(key.encode("utf-8") for key in entry) for entry in taken]
+
+
+def refill_pool(watermark=None, batch_size=None):
+    """
+    Догенерирует ключи до заданного уровня.
+    Ключи генерируются вне блокировки, чтобы не задерживать take_keypair().
+    :param watermark: Целевая глубина пула.
+    :param batch_size: Максимум ключей за один вызов.
+    :return: Количество добавленных наборов ключей.
+    """
+    watermark = settings.KEY_POOL_WATERMARK if watermark is None else watermark
+    batch_size = settings.KEY_POOL_REFILL_BATCH if batch_size is None else batch_size
+
+    with _locked_pool() as path:
+        missing = watermark - len(_read_pool(path)["keys"])
+    missing = min(missing, batch_size)
+    if missing <= 0:
+        return 0
+
+    start = time.perf_counter()
+    fresh = [[key.decode("utf-8") for key in generate_keypair()] for _ in range(missing)]
+    elapsed = time.perf_counter() - start
+
+    with _locked_pool() as path:
+        data = _read_pool(path)
+        data["keys"].extend(fresh)
+        data["stats"] = {
+            "last_refill_at": time.time(),
+            "last_refill_count": len(fresh),
+            "refill_rate": len(fresh) / elapsed if elapsed > 0 else None,
+        }
+        _write_pool(path, data)
+    return len(fresh)
+
+
+def get_pool_stats():
+    """
+    Возвращает состояние пула для отображения в админке.
+    :return: Словарь с глубиной пула, целевым уровнем и скоростью пополнения.
+    """
+    with _locked_pool() as path:
+        data = _read_pool(path)
+    stats = data["stats"]
+    return {
+        "depth": len(data["keys"]),
+        "watermark": settings.KEY_POOL_WATERMARK,
+        "refill_rate": stats.get("refill_rate"),
+        "last_refill_at": stats.get("last_refill_at"),
+        "last_refill_count": stats.get("last_refill_count", 0),
+        "worker_running": _refiller is not None and _refiller.is_alive(),
+    }
+
+
+class KeyPoolRefiller(threading.Thread):
+    """Фоновый поток, поддерживающий пул ключей на уровне watermark."""
+
+    def __init__(self, interval=None):
+        super().__init__(name="key-pool-refiller", daemon=True)
+        self.interval = settings.KEY_POOL_REFILL_INTERVAL if interval is None else interval
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+
+    def wake(self):
+        self._wakeup.set()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+
+    def run(self):
+        while not self._stopped.is_set():
+            try:
+                added = refill_pool()
+            except Exception as e:
+                print(f"⚠️ Ошибка пополнения пула ключей: {e}")
+                added = 0
+            # Пока пул не заполнен, продолжаем без паузы
+            if added:
+                continue
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+
+
+def start_refill_worker(interval=None):
+    """Запускает фоновое пополнение пула (один поток на процесс)."""
+    global _refiller
+    with _refiller_lock:
+        if _refiller is None or not _refiller.is_alive():
+            _refiller = KeyPoolRefiller(interval)
+            _refiller.start()
+    return _refiller
+
+
+def stop_refill_worker():
+    """Останавливает фоновое пополнение пула."""
+    global _refiller
+    with _refiller_lock:
+        if _refiller is not None:
+            _refiller.stop()
+            _refiller.join(timeout=5)
+            _refiller = None
+
+
+if __name__ == "__main__":
+    added = refill_pool(batch_size=settings.KEY_POOL_WATERMARK)
+    stats = get_pool_stats()
+    print(f"✅ Добавлено ключей: {added}. Глубина пула: {stats['depth']}/{stats['watermark']}")
@@ -1,13 +1,171 @@
+#!/usr/bin/env python3
+# modules/keygen.py
+## Генерация ключей WireGuard (Curve25519).
+##
+## Поддерживаются два бэкенда:
+## - "native": генерация внутри процесса через пакет `cryptography` (X25519),
+##   без запуска внешних процессов;
+## - "wg": классический путь через `wg genkey` / `wg pubkey` / `wg genpsk`.
+## Оба бэкенда возвращают одинаковые base64-ключи (44 байта, bytes).
+##
+## Бэкенд выбирается через settings.KEYGEN_BACKEND ("auto", "native", "wg").
+## В режиме "auto" используется "native", если `cryptography` установлен,
+## иначе — подпроцессы `wg`.
+
+import base64
+import os
 import subprocess
+import time
+
+try:
+    from cryptography.hazmat.primitives.asymmetric.x25519 import X25519PrivateKey
+    from cryptography.hazmat.primitives import serialization
+    CRYPTOGRAPHY_AVAILABLE = True
+except ImportError:  # pragma: no cover - зависит от окружения
+    CRYPTOGRAPHY_AVAILABLE = False
+
+try:
+    import settings
+    DEFAULT_BACKEND = getattr(settings, "KEYGEN_BACKEND", "auto")
+except ImportError:  # pragma: no cover - модуль используется вне проекта
+    DEFAULT_BACKEND = "auto"
+
+KEY_LENGTH = 32  # Длина ключа Curve25519 в байтах
+
+
+def resolve_backend(backend=None):
+    """
+    Определяет бэкенд генерации ключей.
+    :param backend: "auto", "native", "wg" или None (значение из settings).
+    :return: "native" или "wg".
+    """
+    backend = backend or DEFAULT_BACKEND
+    if backend == "auto":
+        return "native" if CRYPTOGRAPHY_AVAILABLE else "wg"
+    if backend == "native" and not CRYPTOGRAPHY_AVAILABLE:
+        return "wg"
+    if backend not in ("native", "wg"):
+        raise ValueError(f"Неизвестный бэкенд генерации ключей: {backend}")
+    return backend
+
+
+def _clamp(raw_key):
+    """Приводит случайные 32 байта к формату приватного ключа Curve25519 (как `wg genkey`)."""
+    key = bytearray(raw_key)
+    key[0] &= 248
+    key[31] &= 127
+    key[31] |= 64
+    return bytes(key)
+
+
+def _decode_key(key):
+    """
+    Декодирует base64-ключ WireGuard.
+    При некорректном ключе поднимает то же исключение, что и `wg pubkey`.
+    """
+    try:
+        raw = base64.b64decode(key.strip(), validate=True)
+    except (ValueError, TypeError):
+        raw = b""
+    if len(raw) != KEY_LENGTH:
+        raise subprocess.CalledProcessError(
+            1, ["wg", "pubkey"], stderr=b"wg: Key is not the correct length or format"
+        )
+    return raw
+
+
+def _native_private_key():
+    return base64.b64encode(_clamp(os.urandom(KEY_LENGTH)))
+
+
+def _native_public_key(private_key):
+    raw_private = _decode_key(private_key)
+    public = X25519PrivateKey.from_private_bytes(raw_private).public_key()
+    raw_public = public.public_bytes(
+        encoding=serialization.Encoding.Raw,
+        format=serialization.PublicFormat.Raw,
+    )
+    return base64.b64encode(raw_public)
+
+
+def _native_preshared_key():
+    return base64.b64encode(os.urandom(KEY_LENGTH))
+
+
+def _wg_private_key():
+    return subprocess.check_output(['wg', 'genkey']).strip()
+
+
+def _wg_public_key(private_key):
+    return subprocess.check_output(['wg', 'pubkey'], input=private_key).strip()
+
+
+def _wg_preshared_key():
+    return subprocess.check_output(['wg', 'genpsk']).strip()
+
+
+def generate_private_key(backend=None):
+    if resolve_backend(backend) == "native":
+        return _native_private_key()
+    return _wg_private_key()
+
+
+def generate_public_key(private_key, backend=None):
+    if isinstance(private_key, str):
+        private_key = private_key.encode("utf-8")
+    if resolve_backend(backend) == "native":
+        return _native_public_key(private_key)
+    return _wg_public_key(private_key)
+
+
+def generate_preshared_key(backend=None):
+    if resolve_backend(backend) == "native":
+        return _native_preshared_key()
+    return _wg_preshared_key()
+
+
+def generate_keypair(backend=None):
+    """
+    Генерирует полный набор ключей для одного пользователя.
+    :param backend: Бэкенд генерации ключей.
+    :return: Кортеж (private_key, public_key, preshared_key) в виде bytes.
+    """
+    private_key = generate_private_key(backend)
+    public_key = generate_public_key(private_key, backend)
+    preshared_key = generate_preshared_key(backend)
+    return private_key, public_key, preshared_key
+
+
+def benchmark_backends(count=200, backends=("native", "wg")):
+    """
+    Сравнивает скорость генерации полного набора ключей (ключей/сек) для бэкендов.
+    :param count: Количество наборов ключей для каждого бэкенда.
+    :param backends: Список бэкендов для сравнения.
+    :return: Словарь {backend: keys_per_second или None, если бэкенд недоступен}.
+    """
+    results = {}
+    for backend in backends:
+        if backend == "native" and not CRYPTOGRAPHY_AVAILABLE:
+            results[backend] = None
+            continue
+        try:
+            start = time.perf_counter()
+            for _ in range(count):
+                generate_keypair(backend)
+            elapsed = time.perf_counter() - start
+            results[backend] = count / elapsed if elapsed > 0 else float("inf")
+        except (OSError, subprocess.CalledProcessError):
+            results[backend] = None
+    return results
 
-def generate_private_key():
-    private_key = subprocess.check_output(['wg', 'genkey']).strip()
-    return private_key
 
-def generate_public_key(private_key):
-    public_key = subprocess.check_output(['wg', 'pubkey'], input=private_key).strip()
-    return public_key
+if __name__ == "__main__":
+    import sys
 
-def generate_preshared_key():
-    preshared_key = subprocess.check_output(['wg', 'genpsk']).strip()
-    return preshared_key
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    print(f"=== Бенчмарк генерации ключей ({count} наборов) ===")
+    for backend, rate in benchmark_backends(count).items():
+        if rate is None:
+            print(f"  {backend:>6}: недоступен")
+        else:
+            print(f"  {backend:>6}: {rate:,.0f} наборов ключей/сек")
@@ -51,6 +51,7 @@ def create_user_record(
         "total_transfer": "0.0 KiB",
         "data_limit": "100.0 GB",
         "data_used": "0.0 KiB",
+        "data_used_base": 0,  # Итог трафика из учёта на начало периода (в байтах)
         "qr_code_path": qr_code_path,
         "email": email,
         "telegram_id": telegram_id,
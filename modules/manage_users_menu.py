@@ -2,29 +2,15 @@
 # modules/manage_users_menu.py
 # Модуль для управления пользователями WireGuard
 
-import os
-import json
-from modules.utils import get_wireguard_subnet, read_json, write_json
+from itertools import chain
 
-USER_RECORDS_FILE = "user/data/user_records.json"
-
-
-def ensure_directory_exists(filepath):
-    """Убедитесь, что директория для файла существует."""
-    directory = os.path.dirname(filepath)
-    if not os.path.exists(directory):
-        os.makedirs(directory)
+from modules.utils import get_wireguard_subnet
+from modules import user_store
 
 
 def load_user_records():
-    """Загрузка данных пользователей из JSON."""
-    return read_json(USER_RECORDS_FILE)
-
-
-def save_user_records(user_records):
-    """Сохранение данных пользователей в JSON."""
-    ensure_directory_exists(USER_RECORDS_FILE)
-    write_json(USER_RECORDS_FILE, user_records)
+    """Загрузка данных пользователей из базы."""
+    return user_store.get_users()
 
 
 def create_user():
@@ -42,31 +28,31 @@ def create_user():
 
     allowed_ips = input(f"Введите разрешённые IP (например, {default_subnet}): ").strip() or default_subnet
 
-    records = load_user_records()
-    if username in records:
+    if user_store.user_exists(username):
         print("❌ Пользователь с таким именем уже существует.")
         return
 
-    records[username] = {
+    user_store.save_user(username, {
         "username": username,
         "allowed_ips": allowed_ips,
         "status": "inactive",
-    }
-    save_user_records(records)
+    })
     print(f"✅ Пользователь {username} успешно создан с разрешёнными IP: {allowed_ips}")
 
 
 def list_users():
     """Вывод списка всех пользователей."""
-    records = load_user_records()
-    if not records:
+    # Из базы читаются только показываемые поля, страницами
+    users = user_store.iter_users(["allowed_ips", "status"])
+    first = next(users, None)
+    if first is None:
         print("⚠️ Список пользователей пуст.")
         return
 
     print("\n👤 Пользователи WireGuard:")
-    for username, data in records.items():
-        allowed_ips = data.get("allowed_ips", "N/A")
-        status = data.get("status", "N/A")
+    for username, data in chain([first], users):
+        allowed_ips = data["allowed_ips"] or "N/A"
+        status = data["status"] or "N/A"
         print(f"  - {username}: {allowed_ips} | Статус: {status}")
 
 
@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# modules/provisioning.py
+## Создание пользователя WireGuard в текущем процессе.
+##
+## Раньше админка запускала `python3 main.py <name>` на каждое нажатие:
+## каждый раз новый интерпретатор, импорт qrcode и settings, настройка логов,
+## разбор /etc/wireguard/params и wg0.conf. ProvisioningService живёт в процессе
+## (Gradio, CLI, main.py) и держит тёплые кэши:
+## - параметры сервера — перечитываются, только если файл params изменился;
+## - разобранный wg0.conf и битовая карта адресов — кэши modules.wg_config_parser
+##   и modules.ip_allocator (по stat файла);
+## - индекс имён пользователей — открытое соединение с базой (индекс
+##   username COLLATE NOCASE) и индекс имён wg0.conf.
+##
+## Каждый вызов create_user() возвращает время этапов; последние замеры
+## доступны через stats().
+##
+##   python3 -m modules.provisioning create <username> [--email E] [--telegram-id T]
+
+import os
+import tempfile
+import threading
+import time
+from collections import deque
+
+import settings
+from modules import user_store
+from modules.client_config import create_client_config, format_addresses
+from modules.client_render import lazy_mode, protect_record
+from modules.config import load_params
+from modules.directory_setup import setup_directories
+from modules.file_lock import atomic_write
+from modules.ip_allocator import get_address_allocator, release_address, resolve_pools
+from modules.key_pool import take_keypair
+from modules.main_registration_fields import create_user_record
+from modules.qr_service import render as render_qr_code
+from modules.quota import suspended_keys
+from modules.user_repository import UserExistsError, create_user
+from modules.wg_apply import apply_peer_changes
+from modules.wg_config_parser import load_server_config
+
+TIMINGS_KEPT = 100
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def allocate_address(config_file, params):
+    """
+    Выделяет адрес клиента из упорядоченных пулов (settings.ADDRESS_POOLS).
+    :param config_file: Путь к wg0.conf.
+    :param params: Параметры сервера.
+    :return: Кортеж (ipv4, ipv6 или None).
+    :raises ValueError: Если свободных адресов нет ни в одном пуле.
+    """
+    server_ipv4 = params.get('SERVER_WG_IPV4', '10.66.66.1')
+    pools, ipv6_prefix = resolve_pools(server_ipv4, params.get('SERVER_WG_IPV6'))
+    return get_address_allocator(config_file, pools, ipv6_prefix, server_ipv4).allocate()
+
+
+class ProvisioningService:
+    """
+    Создание пользователей с кэшами, общими для всех запросов процесса.
+    :param params_file: Путь к params (по умолчанию settings.PARAMS_FILE).
+    :param config_file: Путь к wg0.conf (по умолчанию settings.SERVER_CONFIG_FILE).
+    """
+
+    def __init__(self, params_file=None, config_file=None):
+        self._params_file = params_file
+        self._config_file = config_file
+        self._params = (None, None)  # (stat_key, params)
+        self._lock = threading.Lock()
+        self._timings = deque(maxlen=TIMINGS_KEPT)
+        self._directories_ready = False
+
+    @property
+    def params_file(self):
+        return str(self._params_file or settings.PARAMS_FILE)
+
+    @property
+    def config_file(self):
+        return str(self._config_file or settings.SERVER_CONFIG_FILE)
+
+    def params(self):
+        """Параметры сервера (перечитываются, только если файл изменился)."""
+        path = self.params_file
+        stat = os.stat(path)
+        stat_key = (path, stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            if self._params[0] != stat_key:
+                self._params = (stat_key, load_params(path))
+            return self._params[1]
+
+    def warm(self):
+        """
+        Заполняет кэши заранее, чтобы первый запрос не платил за их построение.
+        Отсутствующие params или wg0.conf не считаются ошибкой (их кэши заполнит первый запрос).
+        """
+        if not self._directories_ready:
+            setup_directories()
+            self._directories_ready = True
+        user_store.count_users()
+        try:
+            params = self.params()
+            load_server_config(self.config_file)
+            server_ipv4 = params.get('SERVER_WG_IPV4', '10.66.66.1')
+            pools, ipv6_prefix = resolve_pools(server_ipv4, params.get('SERVER_WG_IPV6'))
+            get_address_allocator(self.config_file, pools, ipv6_prefix, server_ipv4)
+        except FileNotFoundError:
+            pass
+
+    def check_available(self, username):
+        """
+        Проверяет, что имя не занято (без учёта регистра) ни в базе, ни в wg0.conf.
+        :raises UserExistsError: Если имя занято.
+        """
+        if user_store.user_exists(username, case_sensitive=False):
+            raise UserExistsError([username])
+        try:
+            if load_server_config(self.config_file).get_by_name(username, case_sensitive=False) is not None:
+                raise UserExistsError([username])
+        except FileNotFoundError:
+            pass
+
+    def create_user(self, username, email="N/A", telegram_id="N/A", params=None, apply=True):
+        """
+        Создаёт пользователя: ключи, адрес, конфигурация, QR-код, wg0.conf и база.
+        :param username: Имя пользователя.
+        :param params: Параметры сервера (по умолчанию — из кэша params()).
+        :param apply: Применить изменения к интерфейсу (wg set).
+        :return: Словарь {"username", "address", "config_path", "qr_path", "apply", "timings", "elapsed"};
+            в ленивом режиме config_path и qr_path — None.
+        :raises ValueError: Пустое имя, нет SERVER_PUB_IP или свободных адресов.
+        :raises UserExistsError: Если имя занято.
+        """
+        username = (username or "").strip()
+        if not username:
+            raise ValueError("Имя пользователя не может быть пустым.")
+        if not self._directories_ready:
+            setup_directories()
+            self._directories_ready = True
+
+        timings = {}
+        start = mark = time.perf_counter()
+
+        def lap(stage):
+            nonlocal mark
+            now = time.perf_counter()
+            timings[stage] = now - mark
+            mark = now
+
+        params = self.params() if params is None else params
+        if not params.get('SERVER_PUB_IP'):
+            raise ValueError("Параметр SERVER_PUB_IP отсутствует. Проверьте файл конфигурации.")
+        config_file = self.config_file
+        self.check_available(username)
+        lap("check")
+
+        private_key, public_key, preshared_key = take_keypair()
+        lap("keys")
+
+        ipv4, ipv6 = allocate_address(config_file, params)
+        lap("address")
+
+        committed = False
+        # Файлы пишутся во временные пути и занимают место только после записи в базу:
+        # проигравший гонку запрос не перезапишет файлы победителя и не оставит свои
+        pending = []
+        try:
+            client_config = create_client_config(
+                private_key=private_key,
+                address=ipv4,
+                address_v6=ipv6,
+                dns_servers=f"{params['CLIENT_DNS_1']},{params['CLIENT_DNS_2']}",
+                server_public_key=params['SERVER_PUB_KEY'],
+                preshared_key=preshared_key,
+                endpoint=f"{params['SERVER_PUB_IP']}:{params['SERVER_PORT']}",
+            )
+            lazy = lazy_mode()
+            if lazy:
+                config_path = qr_path = None
+            else:
+                config_path = os.path.join(settings.WG_CONFIG_DIR, f"{username}.conf")
+                qr_path = os.path.join(settings.QR_CODE_DIR, f"{username}.png")
+                for path in (config_path, qr_path):
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".new-",
+                                                    suffix=os.path.splitext(path)[1])
+                    os.close(fd)
+                    pending.append((tmp_path, path))
+                atomic_write(pending[0][0], client_config, mode=0o644)
+                render_qr_code(client_config, pending[1][0])
+            lap("files")
+
+            record = create_user_record(
+                username=username,
+                address=format_addresses(ipv4, ipv6),
+                public_key=public_key.decode('utf-8'),
+                preshared_key=preshared_key.decode('utf-8'),
+                qr_code_path=qr_path,
+                email=email or "N/A",
+                telegram_id=telegram_id or "N/A",
+            )
+            if lazy:
+                protect_record(record, private_key)
+            create_user(username, public_key.decode('utf-8'), preshared_key.decode('utf-8'), ipv4, ipv6,
+                        record, config_file)
+            committed = True
+            for tmp_path, path in pending:
+                os.replace(tmp_path, path)
+            lap("commit")
+        finally:
+            if not committed:
+                release_address(ipv4)
+            for tmp_path, _ in pending:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+
+        apply_result = None
+        if apply:
+            apply_result = apply_peer_changes(config_file, params.get('SERVER_WG_NIC'), exclude_keys=suspended_keys())
+            lap("apply")
+
+        elapsed = time.perf_counter() - start
+        self._timings.append((username, elapsed, timings))
+        return {
+            "username": username,
+            "address": format_addresses(ipv4, ipv6),
+            "config_path": config_path,
+            "qr_path": qr_path,
+            "apply": apply_result,
+            "timings": timings,
+            "elapsed": elapsed,
+        }
+
+    def stats(self):
+        """Сводка по последним запросам: количество, среднее и последнее время, среднее по этапам."""
+        with self._lock:
+            timings = list(self._timings)
+        if not timings:
+            return {"requests": 0, "avg": 0.0, "last": None, "stages": {}}
+        stages = {}
+        for _, _, stage_times in timings:
+            for stage, seconds in stage_times.items():
+                stages.setdefault(stage, []).append(seconds)
+        return {
+            "requests": len(timings),
+            "avg": sum(elapsed for _, elapsed, _ in timings) / len(timings),
+            "last": timings[-1][1],
+            "stages": {stage: sum(values) / len(values) for stage, values in stages.items()},
+        }
+
+
+def get_service():
+    """Общий сервис процесса (создаётся при первом обращении)."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = ProvisioningService()
+        return _service
+
+
+def format_timings(result):
+    """Строка времени этапов для вывода, например "check 0.4 мс, keys 0.1 мс, ... (всего 12.3 мс)"."""
+    stages = ", ".join(f"{stage} {seconds * 1000:.1f} мс" for stage, seconds in result["timings"].items())
+    return f"{stages} (всего {result['elapsed'] * 1000:.1f} мс)"
+
+
+if __name__ == "__main__":
+    import sys
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Создание пользователей WireGuard")
+    commands = parser.add_subparsers(dest="command", required=True)
+    create_parser = commands.add_parser("create", help="Создать пользователя")
+    create_parser.add_argument("username")
+    create_parser.add_argument("--email", default="N/A")
+    create_parser.add_argument("--telegram-id", default="N/A")
+    create_parser.add_argument("--no-apply", action="store_true", help="Не применять изменения к интерфейсу")
+    args = parser.parse_args()
+
+    try:
+        result = get_service().create_user(args.username, args.email, args.telegram_id, apply=not args.no_apply)
+    except (ValueError, KeyError, OSError) as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+    print(f"✅ Пользователь {result['username']} создан: {result['address']}")
+    if result["config_path"]:
+        print(f"   Конфигурация: {result['config_path']}\n   QR-код: {result['qr_path']}")
+    print(f"⏱️ {format_timings(result)}")
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# modules/qr_service.py
+## Генерация QR-кодов конфигураций клиентов с кэшем по содержимому.
+##
+## Ключ кэша — SHA-256 текста конфигурации вместе с параметрами отрисовки
+## (бэкенд, формат, размер модуля, рамка). Готовое изображение хранится в
+## settings.QR_CACHE_DIR под именем ключа, а файл в QR_CODE_DIR — жёсткая
+## ссылка на него: повторная отрисовка той же конфигурации (перегенерация,
+## массовый пересчёт) не кодирует QR заново, а если файл уже указывает на
+## запись кэша — не делает ничего. Записи кэша без ссылок (пользователь
+## удалён) убирает prune_cache() — кроме записей моложе
+## settings.QR_CACHE_PRUNE_GRACE, на которые render() ещё может сослаться.
+##
+## Бэкенды (settings.QR_BACKEND):
+## - "matrix" — матрица модулей из qrcode, PNG (1 бит на пиксель, zlib) или
+##   SVG (один path) пишутся напрямую, без PIL;
+## - "pil" — qrcode.make_image (PIL), как прежде в main.py;
+## - "pyqrcode" — modules.qr_generator (pyqrcode + pypng).
+## Большая часть времени кодирования — перебор 8 масок; фиксированная маска
+## (settings.QR_MASK_PATTERN = 0..7) ускоряет бэкенд "matrix" в несколько раз.
+##
+##   python3 -m modules.qr_service benchmark [count]
+##   python3 -m modules.qr_service prune
+
+import hashlib
+import os
+import shutil
+import struct
+import tempfile
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import settings
+
+BACKENDS = ("matrix", "pil", "pyqrcode")
+BOX_SIZE = 10
+BORDER = 4
+PYQRCODE_SCALE = 6
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def cache_key(data, fmt="png", backend=None, box_size=BOX_SIZE, border=BORDER):
+    """Ключ кэша: SHA-256 текста конфигурации и параметров отрисовки."""
+    backend = backend or settings.QR_BACKEND
+    digest = hashlib.sha256(f"{backend}:{fmt}:{box_size}:{border}:{settings.QR_MASK_PATTERN}\n".encode())
+    digest.update(data.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def cache_path(key, fmt="png"):
+    return os.path.join(str(settings.QR_CACHE_DIR), key[:2], f"{key}.{fmt}")
+
+
+def matrix(data, border=BORDER, mask_pattern=None):
+    """
+    Матрица модулей QR-кода (с рамкой).
+    :param mask_pattern: Маска 0..7; None — лучшая из 8 (по умолчанию settings.QR_MASK_PATTERN).
+    :return: Список строк, строка — список bool (True — тёмный модуль).
+    """
+    import qrcode
+
+    qr = qrcode.QRCode(
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        border=border,
+        mask_pattern=settings.QR_MASK_PATTERN if mask_pattern is None else mask_pattern,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr.get_matrix()
+
+
+def _png_chunk(kind, payload):
+    return struct.pack(">I", len(payload)) + kind + payload + struct.pack(">I", zlib.crc32(kind + payload))
+
+
+def png_bytes(modules, box_size=BOX_SIZE):
+    """PNG (оттенки серого, 1 бит на пиксель) из матрицы модулей без PIL."""
+    size = len(modules) * box_size
+    pad = "1" * (-size % 8)
+    dark, light = "0" * box_size, "1" * box_size
+    scanlines = []
+    for row in modules:
+        bits = "".join(dark if module else light for module in row) + pad
+        scanline = b"\x00" + int(bits, 2).to_bytes(len(bits) // 8, "big")
+        scanlines.append(scanline * box_size)
+    header = struct.pack(">IIBBBBB", size, size, 1, 0, 0, 0, 0)
+    return (
+        PNG_SIGNATURE
+        + _png_chunk(b"IHDR", header)
+        + _png_chunk(b"IDAT", zlib.compress(b"".join(scanlines)))
+        + _png_chunk(b"IEND", b"")
+    )
+
+
+def svg_bytes(modules, box_size=BOX_SIZE):
+    """SVG из матрицы модулей: один path, горизонтальные серии модулей — один прямоугольник."""
+    count = len(modules)
+    parts = []
+    for y, row in enumerate(modules):
+        x = 0
+        while x < count:
+            if not row[x]:
+                x += 1
+                continue
+            start = x
+            while x < count and row[x]:
+                x += 1
+            parts.append(f"M{start} {y}h{x - start}v1h-{x - start}z")
+    size = count * box_size
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size}" height="{size}" '
+        f'viewBox="0 0 {count} {count}" shape-rendering="crispEdges">'
+        f'<rect width="{count}" height="{count}" fill="#fff"/>'
+        f'<path fill="#000" d="{"".join(parts)}"/></svg>'
+    ).encode("ascii")
+
+
+def _render_file(data, path, fmt, backend, box_size, border):
+    """Кодирует QR-код выбранным бэкендом в файл path."""
+    if backend == "matrix" or fmt == "svg":
+        modules = matrix(data, border)
+        payload = svg_bytes(modules, box_size) if fmt == "svg" else png_bytes(modules, box_size)
+        with open(path, "wb") as file:
+            file.write(payload)
+    elif backend == "pil":
+        import qrcode
+
+        qr = qrcode.QRCode(
+            error_correction=qrcode.constants.ERROR_CORRECT_L,
+            box_size=box_size,
+            border=border,
+            mask_pattern=settings.QR_MASK_PATTERN,
+        )
+        qr.add_data(data)
+        qr.make(fit=True)
+        qr.make_image(fill_color="black", back_color="white").save(path, format="PNG")
+    elif backend == "pyqrcode":
+        from modules.qr_generator import generate_qr_code
+
+        generate_qr_code(data, path)
+    else:
+        raise ValueError(f"Неизвестный бэкенд QR-кодов: {backend}")
+
+
+def _link(source, target):
+    """Атомарно заменяет target жёсткой ссылкой на source (или копией, если ссылки не поддерживаются)."""
+    directory = os.path.dirname(os.path.abspath(target))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".qr-")
+    os.close(fd)
+    os.unlink(tmp_path)
+    try:
+        try:
+            os.link(source, tmp_path)
+        except OSError:
+            shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, target)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def render(data, output_path, backend=None, box_size=BOX_SIZE, border=BORDER):
+    """
+    Сохраняет QR-код конфигурации в output_path (формат — по расширению: .png или .svg).
+    :param data: Текст конфигурации клиента.
+    :param backend: "matrix", "pil" или "pyqrcode" (по умолчанию settings.QR_BACKEND).
+    :return: True, если QR-код закодирован; False, если взят из кэша.
+    """
+    backend = backend or settings.QR_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Неизвестный бэкенд QR-кодов: {backend}")
+    fmt = "svg" if str(output_path).lower().endswith(".svg") else "png"
+    if backend == "pyqrcode":
+        box_size = PYQRCODE_SCALE
+    key = cache_key(data, fmt, backend, box_size, border)
+    cached = cache_path(key, fmt)
+
+    try:
+        if os.path.samefile(cached, output_path):
+            return False
+    except FileNotFoundError:
+        pass
+
+    rendered = False
+    for attempt in range(2):
+        try:
+            # Свежее время изменения защищает запись от prune_cache() до появления ссылки
+            os.utime(cached)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(cached), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cached), prefix=".qr-", suffix=f".{fmt}")
+            os.close(fd)
+            try:
+                _render_file(data, tmp_path, fmt, backend, box_size, border)
+                os.replace(tmp_path, cached)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+            rendered = True
+        try:
+            _link(cached, output_path)
+            return rendered
+        except FileNotFoundError:
+            # Запись удалена между проверкой и ссылкой — отрисовывается заново один раз
+            if attempt or os.path.exists(cached):
+                raise
+
+
+def render_many(items, workers=None, backend=None):
+    """
+    Сохраняет QR-коды пулом потоков.
+    :param items: Итерируемое (data, output_path).
+    :return: Количество закодированных QR-кодов (без попаданий в кэш).
+    """
+    items = list(items)
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(items) <= 1:
+        return sum(render(data, path, backend) for data, path in items)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return sum(executor.map(lambda item: render(item[0], item[1], backend), items))
+
+
+def prune_cache(grace=None):
+    """
+    Удаляет записи кэша, на которые не ссылается ни один QR-код пользователя.
+    Записи моложе grace секунд не удаляются: render() мог создать запись и ещё не
+    успеть сослаться на неё.
+    :param grace: Возраст записи в секундах (по умолчанию settings.QR_CACHE_PRUNE_GRACE).
+    :return: Количество удалённых записей.
+    """
+    grace = settings.QR_CACHE_PRUNE_GRACE if grace is None else grace
+    threshold = time.time() - grace
+    removed = 0
+    for root, _, files in os.walk(str(settings.QR_CACHE_DIR)):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+                if stat.st_nlink <= 1 and stat.st_mtime < threshold:
+                    os.unlink(path)
+                    removed += 1
+            except FileNotFoundError:
+                continue
+    return removed
+
+
+def benchmark(count=50, backends=BACKENDS):
+    """
+    Скорость кодирования QR-кодов каждым бэкендом (без кэша) и повторной отрисовки из кэша.
+    :param count: Количество уникальных конфигураций.
+    :return: Словарь {название: QR-кодов в секунду}.
+    """
+    configs = [
+        "[Interface]\n"
+        f"PrivateKey = {hashlib.sha256(str(n).encode()).hexdigest()[:43]}=\n"
+        f"Address = 10.66.{n // 250}.{n % 250 + 2}/32,fd42:42:42::{n + 2:x}/128\n"
+        "DNS = 1.1.1.1,8.8.8.8\n\n[Peer]\n"
+        f"PublicKey = {hashlib.sha256(b'server').hexdigest()[:43]}=\n"
+        f"PresharedKey = {hashlib.sha256(str(-n).encode()).hexdigest()[:43]}=\n"
+        "Endpoint = 203.0.113.1:51820\nAllowedIPs = 0.0.0.0/0,::/0\n"
+        for n in range(count)
+    ]
+    cases = [(backend, backend, "png", None) for backend in backends]
+    if "matrix" in backends:
+        cases += [("matrix svg", "matrix", "svg", None), ("matrix mask=0", "matrix", "png", 0)]
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        saved = settings.QR_CACHE_DIR, settings.QR_MASK_PATTERN
+        try:
+            for name, backend, fmt, mask in cases:
+                settings.QR_CACHE_DIR = os.path.join(tmp_dir, "cache", name.replace(" ", "_"))
+                settings.QR_MASK_PATTERN = mask
+                paths = [os.path.join(tmp_dir, f"{name.replace(' ', '_')}_{n}.{fmt}") for n in range(count)]
+                start = time.perf_counter()
+                for config, path in zip(configs, paths):
+                    render(config, path, backend)
+                results[name] = count / (time.perf_counter() - start)
+                if name == "matrix":
+                    start = time.perf_counter()
+                    for config, path in zip(configs, paths):
+                        render(config, path, backend)
+                    results["cache hit"] = count / (time.perf_counter() - start)
+        finally:
+            settings.QR_CACHE_DIR, settings.QR_MASK_PATTERN = saved
+    return results
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="QR-коды конфигураций клиентов")
+    commands = parser.add_subparsers(dest="command", required=True)
+    benchmark_parser = commands.add_parser("benchmark", help="Скорость бэкендов QR-кодов")
+    benchmark_parser.add_argument("count", nargs="?", type=int, default=50)
+    commands.add_parser("prune", help="Удалить неиспользуемые записи кэша")
+    args = parser.parse_args()
+
+    if args.command == "benchmark":
+        print(f"=== QR-коды ({args.count} конфигураций) ===")
+        for name, rate in benchmark(args.count).items():
+            print(f"  {name:<14}: {rate:10.1f} QR/сек")
+    else:
+        print(f"🧹 Удалено записей кэша QR-кодов: {prune_cache()}")
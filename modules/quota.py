@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+# modules/quota.py
+## Контроль лимитов трафика пользователей (data_limit / data_used).
+##
+## Проверка (тик) выполняется после каждой выборки телеметрии и затрагивает
+## только пиров, у которых в этой выборке был трафик (TimeSeriesStore.changed),
+## — O(активных пиров), а не O(всех пользователей). Лимиты активных
+## пользователей кэшируются и перечитываются из базы раз в
+## settings.QUOTA_REFRESH_INTERVAL; при перечитывании проверяются все пиры
+## (на случай уменьшения лимита у простаивающего пользователя).
+##
+## Трафик за период — монотонный итог из учёта (modules.accounting) минус
+## data_used_base, сохранённый при последнем продлении.
+##
+## Превысивший лимит пир снимается с работающего интерфейса командой
+## `wg set <if> peer <key> remove` без перезапуска; в записи пользователя —
+## status "suspended" и blocked_reason "data_limit". Пир остаётся в wg0.conf,
+## поэтому apply_peer_changes вызывается с exclude_keys=suspended_keys().
+## renew() возвращает пользователя: новый период учёта, статус active и
+## `wg set` с параметрами пира из wg0.conf.
+##
+##   python3 -m modules.quota renew <username> [--limit "200 GB"]
+##   python3 -m modules.quota benchmark [peers] [active]
+
+import subprocess
+import time
+
+import settings
+from modules import timeseries, user_repository, user_store
+from modules.wg_apply import get_desired_peers, interface_name, remove_peer, set_peer
+from modules.wg_dump import format_bytes, parse_bytes
+
+SUSPENDED_STATUS = "suspended"
+QUOTA_REASON = "data_limit"
+
+
+def suspended_keys():
+    """Публичные ключи приостановленных пользователей (не должны быть на интерфейсе)."""
+    return user_store.get_public_keys_by_status(SUSPENDED_STATUS)
+
+
+def quota_of(record):
+    """
+    Лимит пользователя и начало периода учёта.
+    :return: Кортеж (limit_bytes, data_used_base) или None, если лимита нет.
+    """
+    limit = parse_bytes(record.get("data_limit", ""))
+    if not limit:
+        return None
+    return limit, int(record.get("data_used_base", 0))
+
+
+class QuotaEnforcer:
+    """
+    Проверка лимитов по итогам учёта.
+    :param interface: Интерфейс WireGuard (по умолчанию — по settings.SERVER_CONFIG_FILE).
+    :param refresh_interval: Интервал перечитывания лимитов из базы в секундах.
+    """
+
+    def __init__(self, interface=None, refresh_interval=None):
+        self.interface = interface or interface_name()
+        self.refresh_interval = (
+            settings.QUOTA_REFRESH_INTERVAL if refresh_interval is None else refresh_interval
+        )
+        self.ticks = 0
+        self.suspended = 0
+        self.last_tick = None
+        self._limits = {}  # public_key -> (username, limit_bytes, data_used_base)
+        self._loaded_at = None
+
+    def invalidate(self):
+        """Перечитать лимиты на следующем тике."""
+        self._loaded_at = None
+
+    def load_limits(self):
+        limits = {}
+        for username, record in user_store.get_users_by_status("active").items():
+            quota = quota_of(record)
+            if quota is not None and record.get("public_key"):
+                limits[record["public_key"]] = (username, *quota)
+        self._limits = limits
+        self._loaded_at = time.monotonic()
+
+    def over_quota(self, usage):
+        """
+        Пиры, превысившие лимит.
+        :param usage: Итерируемое (public_key, total_bytes).
+        :return: Список (public_key, username, total_bytes).
+        """
+        limits = self._limits
+        over = []
+        for public_key, total in usage:
+            quota = limits.get(public_key)
+            if quota is not None and total - quota[2] >= quota[1]:
+                over.append((public_key, quota[0], total))
+        return over
+
+    def tick(self, store):
+        """
+        Проверка после выборки: пиры с трафиком в последней выборке store
+        (или все пиры, если лимиты перечитаны).
+        :return: Статистика тика {"checked", "over", "suspended", "errors", "full", "duration"}.
+        """
+        start = time.perf_counter()
+        full = self._loaded_at is None or time.monotonic() - self._loaded_at >= self.refresh_interval
+        if full:
+            self.load_limits()
+            usage = [(key, rx + tx) for key, (rx, tx) in store.totals().items()]
+        else:
+            usage = store.changed_usage()
+        over = self.over_quota(usage)
+
+        suspended, errors = 0, []
+        for public_key, username, total in over:
+            try:
+                if self.suspend(username, public_key, total):
+                    suspended += 1
+            except (subprocess.CalledProcessError, OSError) as e:
+                errors.append(f"{username}: {e}")
+            # Повторная проверка — только после перечитывания лимитов
+            self._limits.pop(public_key, None)
+
+        self.ticks += 1
+        self.suspended += suspended
+        self.last_tick = {
+            "checked": len(usage),
+            "over": len(over),
+            "suspended": suspended,
+            "errors": errors,
+            "full": full,
+            "duration": time.perf_counter() - start,
+        }
+        return self.last_tick
+
+    def suspend(self, username, public_key, total):
+        """
+        Снимает пира с интерфейса и помечает пользователя приостановленным.
+        Лимит перепроверяется по свежей записи (она могла быть продлена в другом процессе).
+        :param total: Итог трафика пира из учёта в байтах.
+        :return: True, если пользователь приостановлен.
+        """
+        record = user_store.get_user(username)
+        quota = quota_of(record) if record and record.get("status") == "active" else None
+        if quota is None:
+            return False
+        used = total - quota[1]
+        if used < quota[0]:
+            return False
+
+        remove_peer(self.interface, public_key)
+        user_repository.update_user(username, lambda current: {
+            "status": SUSPENDED_STATUS,
+            "blocked_reason": QUOTA_REASON,
+            "data_used": format_bytes(used),
+        })
+        print(f"⛔ {username}: лимит трафика {format_bytes(quota[0])} исчерпан ({format_bytes(used)}), пир снят с {self.interface}.")
+        return True
+
+
+def renew(username, data_limit=None, config_file=None, interface=None):
+    """
+    Продлевает квоту пользователя: начинает новый период учёта трафика и
+    возвращает приостановленного пира на интерфейс.
+    :param data_limit: Новый лимит (например, "200 GB"); по умолчанию прежний.
+    :return: Обновлённая запись или None, если пользователь не найден.
+    :raises ValueError: Если лимит не распознан.
+    """
+    if data_limit is not None and parse_bytes(data_limit) is None:
+        raise ValueError(f"Неверный лимит трафика: {data_limit}")
+    current = user_store.get_user(username)
+    if current is None:
+        return None
+    public_key = current.get("public_key")
+    base = sum(timeseries.get_reader().totals([public_key]).get(public_key, (0, 0)))
+
+    def start_period(record):
+        changes = {"data_used_base": base, "data_used": format_bytes(0)}
+        if data_limit is not None:
+            changes["data_limit"] = data_limit
+        if record.get("status") == SUSPENDED_STATUS:
+            changes.update(status="active", blocked_reason="N/A")
+        return changes
+
+    record = user_repository.update_user(username, start_period)
+    if current.get("status") == SUSPENDED_STATUS and public_key:
+        peer = get_desired_peers(config_file).get(public_key)
+        if peer is not None:
+            set_peer(interface or interface_name(config_file), public_key, peer)
+    if _enforcer is not None:
+        _enforcer.invalidate()
+    return record
+
+
+_enforcer = None
+
+
+def get_enforcer():
+    """Общий экземпляр QuotaEnforcer процесса."""
+    global _enforcer
+    if _enforcer is None:
+        _enforcer = QuotaEnforcer()
+    return _enforcer
+
+
+def benchmark_tick(peers=20000, active=2000, repeat=5):
+    """
+    Время проверки лимитов на синтетических данных (без `wg` и базы).
+    :param peers: Количество пользователей с лимитом.
+    :param active: Количество пиров с трафиком в выборке.
+    :return: Словарь {"tick": секунды на тик, "full": секунды на полную проверку}.
+    """
+    enforcer = QuotaEnforcer(interface="wg0")
+    enforcer._limits = {f"peer_key_{n:06d}=": (f"user{n}", 10 ** 12, 0) for n in range(peers)}
+    step = max(1, peers // max(1, active))
+    usage = [(f"peer_key_{n:06d}=", n * 1531) for n in range(0, peers, step)][:active]
+    full_usage = [(f"peer_key_{n:06d}=", n * 1531) for n in range(peers)]
+    results = {}
+    for name, data in (("tick", usage), ("full", full_usage)):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            enforcer.over_quota(data)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = best
+    return results
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Лимиты трафика пользователей")
+    commands = parser.add_subparsers(dest="command", required=True)
+    renew_parser = commands.add_parser("renew", help="Продлить квоту и вернуть пира на интерфейс")
+    renew_parser.add_argument("username")
+    renew_parser.add_argument("--limit", default=None, help='Новый лимит, например "200 GB"')
+    benchmark_parser = commands.add_parser("benchmark", help="Время проверки лимитов")
+    benchmark_parser.add_argument("peers", nargs="?", type=int, default=20000)
+    benchmark_parser.add_argument("active", nargs="?", type=int, default=2000)
+    args = parser.parse_args()
+
+    if args.command == "renew":
+        record = renew(args.username, args.limit)
+        if record is None:
+            print(f"❌ Пользователь {args.username} не найден.")
+        else:
+            print(f"✅ {args.username}: лимит {record.get('data_limit')}, статус {record.get('status')}.")
+    else:
+        results = benchmark_tick(args.peers, args.active)
+        print(f"=== Проверка лимитов ({args.peers} пользователей) ===")
+        print(f"  тик ({args.active} активных): {results['tick'] * 1000:8.2f} мс")
+        print(f"  полная проверка      : {results['full'] * 1000:8.2f} мс")
@@ -11,6 +11,7 @@
 
 import os
 import json
+import sqlite3
 import subprocess
 import platform
 import psutil
@@ -21,6 +22,8 @@ from pathlib import Path
 from modules.firewall_utils import get_external_ip
 from settings import SUMMARY_REPORT_PATH, TEST_REPORT_PATH
 from modules.test_report_generator import generate_report
+from modules import user_store
+from modules.telemetry import get_snapshot
 
 # Путь к скрипту создания summary_report
 SUMMARY_SCRIPT = Path(__file__).resolve().parent.parent / "ai_diagnostics" / "ai_diagnostics_summary.py"
@@ -77,29 +80,25 @@ def get_wireguard_status():
 
 
 def get_wireguard_peers():
-    """Получает список активных пиров WireGuard."""
+    """Получает количество пиров WireGuard из последнего снимка телеметрии."""
     try:
-        output = subprocess.check_output(["wg", "show"], text=True).splitlines()
-        peers = [line.split(":")[1].strip() for line in output if line.startswith("peer:")]
-        if peers:
-            return f"{len(peers)} активных пиров ✅"
-        return colored("Нет активных пиров ❌", "red")
-    except FileNotFoundError:
-        return colored("Команда 'wg' не найдена ❌", "red")
-    except subprocess.CalledProcessError:
+        snapshot = get_snapshot()
+    except (OSError, ValueError):
         return colored("Ошибка получения данных ❌", "red")
+    if snapshot is None:
+        return colored("Нет данных телеметрии (запустите python3 -m modules.telemetry) ❌", "red")
+    peers = len(snapshot.table)
+    if peers:
+        return f"{peers} пиров, активных: {snapshot.active_count()} ✅"
+    return colored("Нет активных пиров ❌", "red")
 
 
 def get_users_data():
-    """Получает информацию о пользователях из user_records.json."""
-    user_records_path = os.path.join("user", "data", "user_records.json")
+    """Получает информацию о пользователях из базы данных."""
     try:
-        with open(user_records_path, "r") as file:
-            return json.load(file)
-    except FileNotFoundError:
-        return colored("Файл user_records.json отсутствует ❌", "red")
-    except json.JSONDecodeError:
-        return colored("Файл user_records.json поврежден ❌", "red")
+        return user_store.get_users()
+    except sqlite3.Error as e:
+        return colored(f"База пользователей недоступна: {e} ❌", "red")
 
 
 def get_gradio_status(port=7860):
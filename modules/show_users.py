@@ -2,12 +2,13 @@
 # modules/show_users.py
 # Модуль для отображения списка пользователей
 
-import os
 import json
-from datetime import datetime
+from itertools import islice
 
-# Пути к данным
-USER_RECORDS_JSON = os.path.join("user", "data", "user_records.json")
+from modules import user_store
+from modules.expiry_time import days_left_text, epochs_array, seconds_left, time_left_text
+from modules.telemetry import get_snapshot
+from modules.wg_dump import format_bytes
 
 
 def load_json(filepath):
@@ -22,43 +23,57 @@ def load_json(filepath):
 def calculate_time_left(expiry_date):
     """
     Вычисляет оставшееся время до истечения срока действия аккаунта.
-    :param expiry_date: Дата истечения в формате ISO 8601.
+    :param expiry_date: Дата истечения в формате ISO 8601 или Unix epoch.
     :return: Оставшееся время в днях или "N/A".
     """
-    if not expiry_date or expiry_date == "N/A":
-        return "N/A"
-    try:
-        expiry = datetime.fromisoformat(expiry_date)
-        now = datetime.now()
-        remaining = expiry - now
-        return f"{remaining.days} days" if remaining.days > 0 else "Expired"
-    except (ValueError, TypeError):
-        return "N/A"
+    return time_left_text(expiry_date)
+
+
+# Поля записи, которые показывает список
+SHOW_FIELDS = ("username", "email", "telegram_id", "created_at", "expires_at", "allowed_ips",
+               "uploaded", "downloaded", "endpoint", "status", "public_key", "expires_epoch")
 
 
-def show_all_users():
+def show_all_users(page_size=None):
     """
-    Отображает всех пользователей из JSON.
+    Отображает всех пользователей из базы данных.
+    Записи читаются страницами и только с показываемыми полями (user_store.iter_users).
+    :param page_size: Размер страницы чтения (по умолчанию user_store.QUERY_PAGE_SIZE).
     """
-    user_data = load_json(USER_RECORDS_JSON)
-
-    if not user_data:
+    users = user_store.iter_users(SHOW_FIELDS, page_size=page_size)
+    page = list(islice(users, page_size or user_store.QUERY_PAGE_SIZE))
+    if not page:
         print("🔍 Пользователи не найдены.")
         return
 
+    # Трафик и endpoint берутся из последнего снимка телеметрии, если он есть
+    snapshot = get_snapshot()
+
     print("========== Список пользователей ==========")
-    for username, details in user_data.items():
-        print(f"👤 User account : {details.get('username', 'N/A')}")
-        print(f"📧 User e-mail : {details.get('email', 'N/A')}")
-        print(f"📱 Telegram ID  : {details.get('telegram_id', 'N/A')}")
-        print(f"🌱 Created : {details.get('created_at', 'N/A')}")
-        print(f"🔥 Expires : {details.get('expires_at', 'N/A')}")
-        print(f"🌐 intIP 🟢  : {details.get('allowed_ips', 'N/A')}")
-        print(f"⬆️ up : {details.get('uploaded', 'N/A')}")
-        print(f"🌎 extIP 🟢  : {details.get('endpoint', 'N/A')}")
-        print(f"⬇️ dw : {details.get('downloaded', 'N/A')}")
-        print(f"📅 TimeLeft : {calculate_time_left(details.get('expires_at'))}")
-        print(f"State : {'✅' if details.get('status', 'inactive') == 'active' else '❌'}\n")
+    while page:
+        # Оставшееся время пользователей страницы — одним проходом по срокам из базы
+        time_left = days_left_text(seconds_left(epochs_array(details["expires_epoch"] for _, details in page)))
+        for (username, details), left in zip(page, time_left):
+            details = {field: value for field, value in details.items() if value is not None}
+            peer = snapshot.table.get(details.get("public_key")) if snapshot is not None else None
+            if peer is not None:
+                details.update(
+                    uploaded=format_bytes(peer["rx_bytes"]),
+                    downloaded=format_bytes(peer["tx_bytes"]),
+                    endpoint=peer["endpoint"] or "N/A",
+                )
+            print(f"👤 User account : {details.get('username', 'N/A')}")
+            print(f"📧 User e-mail : {details.get('email', 'N/A')}")
+            print(f"📱 Telegram ID  : {details.get('telegram_id', 'N/A')}")
+            print(f"🌱 Created : {details.get('created_at', 'N/A')}")
+            print(f"🔥 Expires : {details.get('expires_at', 'N/A')}")
+            print(f"🌐 intIP 🟢  : {details.get('allowed_ips', 'N/A')}")
+            print(f"⬆️ up : {details.get('uploaded', 'N/A')}")
+            print(f"🌎 extIP 🟢  : {details.get('endpoint', 'N/A')}")
+            print(f"⬇️ dw : {details.get('downloaded', 'N/A')}")
+            print(f"📅 TimeLeft : {left}")
+            print(f"State : {'✅' if details.get('status', 'inactive') == 'active' else '❌'}\n")
+        page = list(islice(users, page_size or user_store.QUERY_PAGE_SIZE))
 
     print("==========================================")
 
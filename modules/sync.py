@@ -5,8 +5,13 @@
 import subprocess
 import json
 import os
+import tempfile
+import time
+
+from modules import user_store
+from modules.file_lock import atomic_write_json
+from modules.wg_dump import collect_peers, format_handshake
 
-USER_RECORDS_JSON = "user/data/user_records.json"
 WG_USERS_JSON = "logs/wg_users.json"
 
 def load_json(filepath):
@@ -23,55 +28,70 @@ def load_json(filepath):
 def save_json(filepath, data):
     """Сохраняет данные в JSON-файл."""
     os.makedirs(os.path.dirname(filepath), exist_ok=True)
-    with open(filepath, "w") as file:
-        json.dump(data, file, indent=4)
-
-def parse_wireguard_output(wg_output):
-    """Парсит вывод команды `wg show`."""
-    lines = wg_output.splitlines()
-    peers = {}
-    current_peer = None
+    atomic_write_json(filepath, data, indent=4)
 
-    for line in lines:
-        if line.startswith("peer:"):
-            current_peer = line.split(":")[1].strip()
-            peers[current_peer] = {"last_handshake": "N/A", "allowed_ips": "N/A"}
-        elif current_peer and line.strip().startswith("allowed ips:"):
-            peers[current_peer]["allowed_ips"] = line.split(":")[1].strip()
-        elif current_peer and line.strip().startswith("latest handshake:"):
-            peers[current_peer]["last_handshake"] = line.split(":")[1].strip()
-
-    return peers
+def peers_from_table(table, now=None):
+    """
+    Состояние пиров из PeerTable (`wg show all dump`) для wg_users.json.
+    :return: Словарь {public_key: {...}} с точными счётчиками и epoch handshake.
+    """
+    now = time.time() if now is None else now
+    return {
+        public_key: {
+            "allowed_ips": allowed_ips or "N/A",
+            "last_handshake": format_handshake(handshake, now),
+            "last_handshake_epoch": handshake,
+            "rx_bytes": rx,
+            "tx_bytes": tx,
+        }
+        for public_key, allowed_ips, handshake, rx, tx in zip(
+            table.public_keys, table.allowed_ips, table.latest_handshakes, table.rx_bytes, table.tx_bytes
+        )
+    }
 
 def sync_users_with_wireguard():
     """Синхронизирует пользователей WireGuard с JSON-файлами."""
     try:
         print("🔄 Получение информации из WireGuard...")
-        wg_output = subprocess.check_output(["wg", "show"], text=True)
-        wg_users = parse_wireguard_output(wg_output)
+        wg_users = peers_from_table(collect_peers())
 
-        user_records = load_json(USER_RECORDS_JSON)
         users_json = load_json(WG_USERS_JSON)
 
-        key_to_username = {
-            record.get("public_key", ""): username
-            for username, record in user_records.items()
-        }
-
         for public_key, data in wg_users.items():
-            username = key_to_username.get(public_key, "unknown_user")
+            # Поиск по индексу public_key в базе вместо построения словаря всех пользователей
+            match = user_store.find_user_by_public_key(public_key)
+            username = match[0] if match else "unknown_user"
             users_json[username] = {
                 "public_key": public_key,
                 **data,
-                "status": "active" if data["last_handshake"] != "N/A" else "inactive"
+                "status": "active" if data["last_handshake_epoch"] else "inactive"
             }
 
         save_json(WG_USERS_JSON, users_json)
         print("✅ Пользователи успешно синхронизированы.")
-    except subprocess.CalledProcessError as e:
+    except (subprocess.CalledProcessError, OSError) as e:
         print(f"❌ Ошибка выполнения команды WireGuard: {e}")
     except Exception as e:
         print(f"❌ Ошибка синхронизации пользователей: {e}")
 
+def sync_wireguard_config(server_wg_nic):
+    """
+    Применяет конфигурацию интерфейса через `wg syncconf` без перезапуска.
+    Существующие сессии пиров, которые не изменились, не прерываются.
+    :param server_wg_nic: Имя интерфейса WireGuard (например, wg0).
+    :return: True при успешной синхронизации.
+    """
+    try:
+        stripped_config = subprocess.check_output(["wg-quick", "strip", server_wg_nic])
+        with tempfile.NamedTemporaryFile() as temp_file:
+            temp_file.write(stripped_config)
+            temp_file.flush()
+            subprocess.run(['wg', 'syncconf', server_wg_nic, temp_file.name], check=True)
+        print(f"✅ Конфигурация для {server_wg_nic} успешно синхронизирована.")
+        return True
+    except (subprocess.CalledProcessError, OSError) as e:
+        print(f"❌ Ошибка при синхронизации конфигурации {server_wg_nic}: {e}")
+        return False
+
 if __name__ == "__main__":
     sync_users_with_wireguard()
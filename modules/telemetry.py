@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+# modules/telemetry.py
+## Фоновый сбор телеметрии пиров WireGuard.
+##
+## Поток-сборщик раз в settings.TELEMETRY_INTERVAL снимает `wg show <if> dump`
+## (modules.wg_dump) и держит последний снимок в памяти. Читатели (Gradio,
+## отчёты) получают его через get_snapshot() без запуска подпроцессов.
+##
+## На диск пишется:
+## - settings.TELEMETRY_DIR/snapshot.dump — последний снимок в формате dump без
+##   секретов (атомарная замена), чтобы его видели процессы без собственного сборщика;
+## - счётчики трафика пиров — в историю (modules.timeseries, только изменившиеся пиры).
+##   Если история уже открыта на запись другим процессом, выборка в неё не пишется.
+##
+## После записи в историю проверяются лимиты трафика (modules.quota), если
+## включён settings.QUOTA_ENFORCEMENT.
+##
+## Запуск отдельным процессом:
+##   python3 -m modules.telemetry [--interval N] [--once]
+
+import os
+import threading
+import time
+
+import settings
+from modules import quota, timeseries
+from modules.file_lock import atomic_write
+from modules.wg_dump import collect_peers, format_dump, parse_dump
+
+SNAPSHOT_FILE = "snapshot.dump"
+TELEMETRY_FILE_MODE = 0o600
+
+_snapshot = None
+_snapshot_lock = threading.Lock()
+_file_snapshot = (None, None)  # (mtime_ns, Snapshot) — кэш снимка, прочитанного с диска
+_sampler = None
+_sampler_lock = threading.Lock()
+_history = None
+_history_lock = threading.Lock()
+
+
+class Snapshot:
+    """Состояние пиров на момент выборки."""
+
+    __slots__ = ("taken_at", "table", "duration")
+
+    def __init__(self, taken_at, table, duration=0.0):
+        self.taken_at = taken_at
+        self.table = table
+        self.duration = duration
+
+    def active_count(self, window=None):
+        """Количество пиров с handshake не старше window секунд."""
+        window = settings.TELEMETRY_ACTIVE_WINDOW if window is None else window
+        threshold = self.taken_at - window
+        return sum(1 for handshake in self.table.latest_handshakes if handshake >= threshold)
+
+    def summary(self):
+        return {
+            "taken_at": self.taken_at,
+            "duration": self.duration,
+            "peers": len(self.table),
+            "active": self.active_count(),
+            "rx_bytes": sum(self.table.rx_bytes),
+            "tx_bytes": sum(self.table.tx_bytes),
+        }
+
+
+def _telemetry_dir():
+    return str(settings.TELEMETRY_DIR)
+
+
+def snapshot_path():
+    return os.path.join(_telemetry_dir(), SNAPSHOT_FILE)
+
+
+# --- Сбор и сохранение ---
+
+def record_history(snapshot):
+    """
+    Дописывает счётчики трафика снимка в историю.
+    :return: Количество записанных пиров или None, если история открыта другим процессом.
+    """
+    global _history
+    with _history_lock:
+        if _history is None:
+            try:
+                _history = timeseries.open_writer()
+            except BlockingIOError:
+                return None
+        table = snapshot.table
+        written = _history.append_sample(
+            snapshot.taken_at,
+            zip(table.public_keys, table.rx_bytes, table.tx_bytes, table.latest_handshakes),
+        )
+        if settings.QUOTA_ENFORCEMENT:
+            # Ошибка проверки лимитов (база, конфликт версий) не должна останавливать сбор
+            try:
+                quota.get_enforcer().tick(_history)
+            except Exception as e:
+                print(f"⚠️ Ошибка проверки лимитов трафика: {e}")
+        return written
+
+
+def close_history():
+    """Закрывает историю, открытую сборщиком на запись."""
+    global _history
+    with _history_lock:
+        if _history is not None:
+            _history.close()
+            _history = None
+
+
+def persist(snapshot):
+    """
+    Сохраняет снимок на диск и дописывает изменившиеся счётчики в историю.
+    :return: Количество записанных в историю пиров (None — история занята другим процессом).
+    """
+    os.makedirs(_telemetry_dir(), exist_ok=True)
+    atomic_write(
+        snapshot_path(),
+        [f"# taken_at={snapshot.taken_at:.3f}\n", format_dump(snapshot.table)],
+        TELEMETRY_FILE_MODE,
+    )
+    return record_history(snapshot)
+
+
+def sample(interface=None, save=True):
+    """
+    Снимает состояние пиров и публикует его как текущий снимок.
+    :param interface: Интерфейс (по умолчанию settings.TELEMETRY_INTERFACE).
+    :param save: Сохранить снимок и счётчики на диск.
+    :return: Snapshot.
+    """
+    global _snapshot
+    start = time.perf_counter()
+    table = collect_peers(interface or settings.TELEMETRY_INTERFACE)
+    snapshot = Snapshot(time.time(), table, time.perf_counter() - start)
+    with _snapshot_lock:
+        _snapshot = snapshot
+    if save:
+        persist(snapshot)
+    return snapshot
+
+
+# --- Чтение ---
+
+def load_snapshot():
+    """Последний снимок, сохранённый сборщиком на диск (или None)."""
+    global _file_snapshot
+    path = snapshot_path()
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    cached_mtime, cached = _file_snapshot
+    if cached_mtime == mtime:
+        return cached
+    with open(path, "r") as file:
+        header = file.readline()
+        content = file.read()
+    taken_at = float(header.split("=", 1)[1]) if header.startswith("# taken_at=") else mtime / 1e9
+    snapshot = Snapshot(taken_at, parse_dump(content))
+    _file_snapshot = (mtime, snapshot)
+    return snapshot
+
+
+def get_snapshot():
+    """
+    Текущий снимок без запуска `wg`: из памяти, если сборщик работает в этом
+    процессе, иначе — последний сохранённый на диск. None, если данных нет.
+    """
+    with _snapshot_lock:
+        snapshot = _snapshot
+    return snapshot if snapshot is not None else load_snapshot()
+
+
+# --- Фоновый сборщик ---
+
+class TelemetrySampler(threading.Thread):
+    """Фоновый поток, снимающий состояние пиров раз в interval секунд."""
+
+    def __init__(self, interval=None, interface=None):
+        super().__init__(name="telemetry-sampler", daemon=True)
+        self.interval = settings.TELEMETRY_INTERVAL if interval is None else interval
+        self.interface = interface
+        self.samples = 0
+        self.errors = 0
+        self.last_error = None
+        self._stopped = threading.Event()
+
+    def stop(self):
+        self._stopped.set()
+
+    def run(self):
+        while not self._stopped.is_set():
+            started = time.monotonic()
+            try:
+                sample(self.interface)
+                self.samples += 1
+                self.last_error = None
+            except Exception as e:
+                # Любая ошибка выборки засчитывается, поток продолжает работу
+                self.errors += 1
+                self.last_error = str(e)
+                print(f"⚠️ Ошибка сбора телеметрии WireGuard: {e}")
+            # Интервал отсчитывается от начала выборки, а не от её конца
+            self._stopped.wait(max(0.0, self.interval - (time.monotonic() - started)))
+
+
+def start_telemetry_worker(interval=None, interface=None):
+    """Запускает фоновый сбор телеметрии (один поток на процесс)."""
+    global _sampler
+    with _sampler_lock:
+        if _sampler is None or not _sampler.is_alive():
+            _sampler = TelemetrySampler(interval, interface)
+            _sampler.start()
+    return _sampler
+
+
+def stop_telemetry_worker():
+    """Останавливает фоновый сбор телеметрии."""
+    global _sampler
+    with _sampler_lock:
+        if _sampler is not None:
+            _sampler.stop()
+            _sampler.join(timeout=5)
+            _sampler = None
+    close_history()
+
+
+def get_telemetry_stats():
+    """Сводка по текущему снимку и состоянию сборщика."""
+    snapshot = get_snapshot()
+    stats = snapshot.summary() if snapshot is not None else None
+    with _sampler_lock:
+        sampler = _sampler
+    enforcer = quota._enforcer
+    return {
+        "snapshot": stats,
+        "quota": enforcer.last_tick if enforcer is not None else None,
+        "worker_running": sampler is not None and sampler.is_alive(),
+        "interval": sampler.interval if sampler is not None else settings.TELEMETRY_INTERVAL,
+        "last_error": sampler.last_error if sampler is not None else None,
+    }
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Сбор телеметрии пиров WireGuard")
+    parser.add_argument("--interval", type=float, default=None, help="Интервал выборки в секундах")
+    parser.add_argument("--interface", default=None, help="Интерфейс (по умолчанию все)")
+    parser.add_argument("--once", action="store_true", help="Снять одну выборку и выйти")
+    args = parser.parse_args()
+
+    if args.once:
+        summary = sample(args.interface).summary()
+        print(f"✅ Пиров: {summary['peers']}, активных: {summary['active']} ({summary['duration'] * 1000:.1f} мс)")
+    else:
+        sampler = TelemetrySampler(args.interval, args.interface)
+        print(f"📡 Сбор телеметрии каждые {sampler.interval} с. Ctrl+C для остановки.")
+        try:
+            sampler.run()
+        except KeyboardInterrupt:
+            print("\n⏹️ Сбор телеметрии остановлен.")
+        finally:
+            close_history()
@@ -18,7 +18,8 @@ PROJECT_ROOT = Path(__file__).resolve().parent.parent
 sys.path.append(str(PROJECT_ROOT))
 
 # Импорт настроек
-from settings import TEST_REPORT_PATH, USER_DB_PATH, WG_CONFIG_DIR, GRADIO_PORT
+from settings import TEST_REPORT_PATH, USER_STORE_PATH, WG_CONFIG_DIR, GRADIO_PORT
+from modules import user_store
 
 
 def load_json(filepath):
@@ -57,14 +58,14 @@ def get_gradio_status():
 def generate_report():
     """Генерация полного отчёта о состоянии проекта."""
     timestamp = datetime.utcnow().isoformat()
-    user_records = load_json(USER_DB_PATH)
+    user_records = user_store.get_users()
 
     report_lines = [f"\n === 📝  Отчет о состоянии проекта wg_qr_generator  ===", f" 📅  Дата и время: {timestamp}\n"]
 
     # Проверка структуры
     report_lines.append(" === 📂  Проверка структуры проекта  ===")
     required_files = {
-        "user_records.json": USER_DB_PATH,
+        "user_records.db": USER_STORE_PATH,
         "wg_configs": WG_CONFIG_DIR,
     }
     for name, path in required_files.items():
@@ -74,8 +75,8 @@ def generate_report():
     for folder in required_dirs:
         report_lines.append(f"- {folder}: {' 🟢  Существует' if os.path.exists(folder) else ' ❌  Отсутствует'}")
 
-    # Данные из JSON
-    report_lines.append("\n === 📄  Данные из user_records.json  ===")
+    # Данные из базы пользователей
+    report_lines.append("\n === 📄  Данные из user_records.db  ===")
     if isinstance(user_records, dict):
         table = PrettyTable(["Пользователь", "peer", "telegram_id"])
         for username, data in user_records.items():
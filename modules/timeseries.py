@@ -0,0 +1,558 @@
+#!/usr/bin/env python3
+# modules/timeseries.py
+## Хранилище истории трафика пиров (append-only временные ряды).
+##
+## Запись фиксированной ширины — (timestamp, индекс пира, rx, tx), 24 байта;
+## индекс пира — позиция публичного ключа в peers.json.
+## Ряды хранятся сегментами в settings.TIMESERIES_DIR/<ряд>/<первый ts>.seg:
+## файл заранее размечен под TIMESERIES_SEGMENT_RECORDS записей и отображается
+## в память (mmap); при заполнении начинается новый сегмент, сегменты старше
+## срока хранения ряда удаляются целиком.
+##
+## Ряды:
+## - raw — счётчики пиров из `wg show dump` (только изменившиеся пиры);
+## - 1m, 1h, 1d — свёртки: трафик пира за интервал (сумма приращений).
+##   1m считается из raw при смене минуты, 1h — из 1m, 1d — из 1h.
+##
+## Записи в сегменте упорядочены по времени, поэтому выборка диапазона —
+## бинарный поиск по сегментам и внутри сегмента без чтения остальных данных.
+##
+## Приращения и монотонные итоги пиров считает modules.accounting (accounting.bin
+## в том же каталоге): сырые счётчики, handshake и итоги с учётом сбросов.
+## Каждый raw-сегмент начинается с базовой линии — последних счётчиков всех
+## известных пиров, поэтому незакрытая минута после перезапуска писателя
+## восстанавливается из последнего сегмента.
+##
+## Писатель один (эксклюзивная блокировка каталога); читатели открывают
+## сегменты только на чтение и видят записи сразу после их добавления.
+## Незакрытая минута хранится в памяти писателя — читатели видят свёртки с
+## задержкой до одной минуты (итоги из accounting.bin — сразу).
+##
+##   python3 -m modules.timeseries [--hours N] [--resolution 1h]
+
+import fcntl
+import json
+import mmap
+import os
+import struct
+import time
+from array import array
+
+import settings
+from modules.accounting import LEDGER_FILE, Ledger
+from modules.file_lock import atomic_write_json, lock_path
+
+RECORD = struct.Struct("<IIQQ")       # timestamp, peer, rx, tx
+HEADER = struct.Struct("<4sHHQQQ")    # magic, version, record size, count, capacity, baseline
+HEADER_SIZE = 64
+MAGIC = b"WGTS"
+VERSION = 1
+
+RESOLUTIONS = {"1m": 60, "1h": 3600, "1d": 86400}
+SERIES = ("raw",) + tuple(RESOLUTIONS)
+ROLLUP_SOURCE = {"1h": "1m", "1d": "1h"}
+
+PEERS_FILE = "peers.json"
+META_FILE = "meta.json"
+
+
+class Segment:
+    """Один файл ряда, отображённый в память."""
+
+    def __init__(self, path, capacity=None, writable=False):
+        self.path = path
+        self.first_ts = segment_first_ts(path)
+        if writable and not os.path.exists(path):
+            fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o644)
+            try:
+                os.ftruncate(fd, HEADER_SIZE + capacity * RECORD.size)
+                os.pwrite(fd, HEADER.pack(MAGIC, VERSION, RECORD.size, 0, capacity, 0), 0)
+            finally:
+                os.close(fd)
+        with open(path, "r+b" if writable else "rb") as file:
+            self._mm = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        magic, version, record_size, _, self.capacity, _ = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            self._mm.close()
+            raise ValueError(f"Неверный формат сегмента {path}")
+
+    @property
+    def count(self):
+        return HEADER.unpack_from(self._mm, 0)[3]
+
+    @property
+    def baseline(self):
+        """Количество записей базовой линии в начале сегмента."""
+        return HEADER.unpack_from(self._mm, 0)[5]
+
+    @property
+    def full(self):
+        return self.count >= self.capacity
+
+    def append(self, records, baseline=False):
+        """Дописывает записи, сколько поместится. Возвращает их количество."""
+        count = self.count
+        written = min(len(records), self.capacity - count)
+        offset = HEADER_SIZE + count * RECORD.size
+        for record in records[:written]:
+            RECORD.pack_into(self._mm, offset, *record)
+            offset += RECORD.size
+        if baseline:
+            struct.pack_into("<Q", self._mm, 24, count + written)
+        # Счётчик обновляется после записи данных: читатель не увидит незаполненных записей
+        struct.pack_into("<Q", self._mm, 8, count + written)
+        return written
+
+    def timestamp(self, position):
+        return struct.unpack_from("<I", self._mm, HEADER_SIZE + position * RECORD.size)[0]
+
+    def bisect(self, ts, count=None):
+        """Первая позиция с timestamp >= ts."""
+        low, high = 0, self.count if count is None else count
+        while low < high:
+            middle = (low + high) // 2
+            if self.timestamp(middle) < ts:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def records(self, start=None, end=None):
+        """Записи с timestamp в [start, end)."""
+        count = self.count
+        first = 0 if start is None else self.bisect(start, count)
+        last = count if end is None else self.bisect(end, count)
+        if first >= last:
+            return iter(())
+        return RECORD.iter_unpack(self._mm[HEADER_SIZE + first * RECORD.size:HEADER_SIZE + last * RECORD.size])
+
+    def flush(self):
+        self._mm.flush()
+
+    def close(self):
+        self._mm.close()
+
+
+class Series:
+    """Ряд из последовательности сегментов."""
+
+    def __init__(self, directory, writable=False, segment_records=None, retention=None):
+        self.directory = directory
+        self.writable = writable
+        self.segment_records = segment_records or settings.TIMESERIES_SEGMENT_RECORDS
+        self.retention = retention
+        self._open = {}
+        if writable:
+            os.makedirs(directory, exist_ok=True)
+
+    def segment_paths(self):
+        try:
+            names = sorted(name for name in os.listdir(self.directory) if name.endswith(".seg"))
+        except FileNotFoundError:
+            return []
+        return [os.path.join(self.directory, name) for name in names]
+
+    def _segment(self, path):
+        segment = self._open.get(path)
+        if segment is None:
+            segment = self._open[path] = Segment(path, self.segment_records, self.writable)
+        return segment
+
+    def last_timestamp(self):
+        paths = self.segment_paths()
+        if not paths:
+            return None
+        segment = self._segment(paths[-1])
+        return segment.timestamp(segment.count - 1) if segment.count else None
+
+    def append(self, records, baseline=None):
+        """
+        Дописывает записи (упорядоченные по времени), начиная новый сегмент при заполнении.
+        :param baseline: Функция baseline(ts) -> записи, которыми начинается новый сегмент.
+        """
+        paths = self.segment_paths()
+        while records:
+            if not paths or self._segment(paths[-1]).full:
+                ts = records[0][0]
+                path = os.path.join(self.directory, f"{ts:010d}.seg")
+                if paths and segment_first_ts(paths[-1]) == ts:
+                    # Сегмент с таким же первым timestamp уже заполнен
+                    path = os.path.join(self.directory, f"{ts:010d}-{len(paths)}.seg")
+                paths.append(path)
+                segment = self._segment(path)
+                if baseline is not None:
+                    # Базовая линия занимает не больше половины сегмента
+                    segment.append(baseline(ts)[:self.segment_records // 2], baseline=True)
+                self._expire(paths, ts)
+            written = self._segment(paths[-1]).append(records)
+            records = records[written:]
+
+    def _expire(self, paths, now):
+        """Удаляет сегменты, все записи которых старше срока хранения."""
+        if not self.retention:
+            return
+        # Сегмент i содержит записи до начала сегмента i + 1
+        while len(paths) > 1 and segment_first_ts(paths[1]) < now - self.retention:
+            path = paths.pop(0)
+            segment = self._open.pop(path, None)
+            if segment is not None:
+                segment.close()
+            os.remove(path)
+
+    def records(self, start=None, end=None):
+        """Записи ряда с timestamp в [start, end) в порядке времени."""
+        paths = self.segment_paths()
+        for stale in set(self._open) - set(paths):
+            self._open.pop(stale).close()
+        for position, path in enumerate(paths):
+            if end is not None and segment_first_ts(path) >= end:
+                break
+            if start is not None and position + 1 < len(paths) and segment_first_ts(paths[position + 1]) <= start:
+                continue
+            try:
+                segment = self._segment(path)
+            except FileNotFoundError:
+                continue  # сегмент удалён писателем по сроку хранения
+            yield from segment.records(start, end)
+
+    def flush(self):
+        for segment in self._open.values():
+            segment.flush()
+
+    def close(self):
+        for segment in self._open.values():
+            segment.close()
+        self._open = {}
+
+
+def segment_first_ts(path):
+    """Timestamp первой записи сегмента (из имени файла "<ts>[-n].seg")."""
+    return int(os.path.basename(path).split(".")[0].split("-")[0])
+
+
+class Columns:
+    """Результат выборки по колонкам: timestamps, public_keys, rx, tx."""
+
+    __slots__ = ("timestamps", "public_keys", "rx", "tx")
+
+    def __init__(self):
+        self.timestamps = array("q")
+        self.public_keys = []
+        self.rx = array("q")
+        self.tx = array("q")
+
+    def __len__(self):
+        return len(self.timestamps)
+
+
+class TimeSeriesStore:
+    """
+    Хранилище истории трафика.
+    :param directory: Каталог хранилища (по умолчанию settings.TIMESERIES_DIR).
+    :param writable: Открыть как писатель (не более одного процесса одновременно).
+    """
+
+    def __init__(self, directory=None, writable=False):
+        self.directory = str(directory or settings.TIMESERIES_DIR)
+        self.writable = writable
+        self._lock_fd = None
+        if writable:
+            os.makedirs(self.directory, exist_ok=True)
+            self._lock_fd = os.open(lock_path(self.directory), os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(self._lock_fd)
+                raise BlockingIOError(f"Хранилище {self.directory} уже открыто на запись другим процессом")
+        self.series = {
+            name: Series(os.path.join(self.directory, name), writable,
+                         retention=settings.TIMESERIES_RETENTION.get(name))
+            for name in SERIES
+        }
+        self._peer_keys = self._read_json(PEERS_FILE, [])
+        self._peer_index = {key: index for index, key in enumerate(self._peer_keys)}
+        self._peers_mtime = self._mtime(PEERS_FILE)
+        self.ledger = Ledger(self._path(LEDGER_FILE), writable)
+        self.changed = []     # индексы пиров с приращением трафика в последней выборке
+        self._minute = None   # начало незакрытой минуты
+        self._pending = {}    # индекс пира -> [rx, tx] приращения незакрытой минуты
+        if writable:
+            self._restore()
+
+    # --- Служебные файлы ---
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _mtime(self, name):
+        try:
+            return os.stat(self._path(name)).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _read_json(self, name, default):
+        try:
+            with open(self._path(name), "r") as file:
+                return json.load(file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return default
+
+    def meta(self):
+        """Границы закрытых свёрток: {"closed": {"1h": ts, "1d": ts}}."""
+        return self._read_json(META_FILE, {"closed": {}})
+
+    def _refresh_peers(self):
+        mtime = self._mtime(PEERS_FILE)
+        if mtime != self._peers_mtime:
+            self._peer_keys = self._read_json(PEERS_FILE, [])
+            self._peer_index = {key: index for index, key in enumerate(self._peer_keys)}
+            self._peers_mtime = mtime
+
+    def peer_index(self, public_key, create=False):
+        index = self._peer_index.get(public_key)
+        if index is None and create:
+            index = self._peer_index[public_key] = len(self._peer_keys)
+            self._peer_keys.append(public_key)
+        return index
+
+    def _save_peers(self):
+        atomic_write_json(self._path(PEERS_FILE), self._peer_keys)
+        self._peers_mtime = self._mtime(PEERS_FILE)
+
+    # --- Запись ---
+
+    def _restore(self):
+        """Восстанавливает приращения незакрытой минуты из хвоста raw."""
+        raw = self.series["raw"]
+        paths = raw.segment_paths()
+        last_ts = raw.last_timestamp()
+        if last_ts is None:
+            return
+        minute = last_ts - last_ts % 60
+        flushed = self.series["1m"].last_timestamp()
+        segment = raw._segment(paths[-1])
+        baseline = segment.baseline
+        last = {}
+        for position, (ts, peer, rx, tx) in enumerate(segment.records()):
+            if position >= baseline and ts >= minute and flushed != minute:
+                delta_rx, delta_tx = _delta(last.get(peer), rx, tx)
+                pending = self._pending.setdefault(peer, [0, 0])
+                pending[0] += delta_rx
+                pending[1] += delta_tx
+            last[peer] = (rx, tx)
+        self._minute = minute
+
+    def append_sample(self, ts, counters):
+        """
+        Добавляет выборку счётчиков.
+        :param ts: Время выборки (epoch, секунды).
+        :param counters: Итерируемое (public_key, rx_bytes, tx_bytes, latest_handshake).
+        :return: Количество записанных raw-записей (только изменившиеся пиры).
+        """
+        if not self.writable:
+            raise PermissionError("Хранилище открыто только для чтения")
+        ts = int(ts)
+        minute = ts - ts % 60
+        if self._minute is not None and minute > self._minute:
+            self._close_minute(minute)
+        if self._minute is None or minute > self._minute:
+            self._minute = minute
+
+        new_peers = False
+        records = []
+        observed = []
+        ledger = self.ledger
+        for public_key, rx, tx, handshake in counters:
+            peer = self._peer_index.get(public_key)
+            if peer is None:
+                peer = self.peer_index(public_key, create=True)
+                new_peers = True
+            entry = ledger.entry(peer)
+            if entry is not None and entry[2] == rx and entry[3] == tx:
+                if entry[4] != handshake:
+                    observed.append((peer, rx, tx, handshake))
+                continue
+            observed.append((peer, rx, tx, handshake))
+            records.append((ts, peer, rx, tx))
+
+        if new_peers:
+            self._save_peers()
+        if records:
+            # Базовая линия нового сегмента — счётчики до этой выборки
+            self.series["raw"].append(records, self._baseline)
+        changed = []
+        for peer, rx, tx, handshake in observed:
+            delta_rx, delta_tx, _ = ledger.observe(peer, rx, tx, handshake, ts)
+            if delta_rx or delta_tx:
+                pending = self._pending.setdefault(peer, [0, 0])
+                pending[0] += delta_rx
+                pending[1] += delta_tx
+                changed.append(peer)
+        self.changed = changed
+        return len(records)
+
+    def changed_usage(self):
+        """
+        Итоги пиров, у которых был трафик в последней выборке (без обхода остальных).
+        :return: Список (public_key, total_rx + total_tx).
+        """
+        keys, entry = self._peer_keys, self.ledger.entry
+        result = []
+        for peer in self.changed:
+            total_rx, total_tx = entry(peer)[:2]
+            result.append((keys[peer], total_rx + total_tx))
+        return result
+
+    def _baseline(self, ts):
+        return [(ts, peer, rx, tx) for peer, rx, tx in self.ledger.observed()]
+
+    def _close_minute(self, next_minute):
+        """Записывает свёртку закрытой минуты и закрывает часы и сутки, если они сменились."""
+        minute = self._minute
+        records = [(minute, peer, rx, tx) for peer, (rx, tx) in sorted(self._pending.items()) if rx or tx]
+        if records:
+            self.series["1m"].append(records)
+        self._pending = {}
+
+        closed = {}
+        for resolution in ("1h", "1d"):
+            step = RESOLUTIONS[resolution]
+            if minute // step != next_minute // step:
+                bucket = minute - minute % step
+                sums = self._sum(ROLLUP_SOURCE[resolution], bucket, bucket + step)
+                rollup = [(bucket, peer, rx, tx) for peer, (rx, tx) in sorted(sums.items()) if rx or tx]
+                if rollup:
+                    self.series[resolution].append(rollup)
+                closed[resolution] = bucket + step
+        if closed:
+            meta = self.meta()
+            meta["closed"].update(closed)
+            atomic_write_json(self._path(META_FILE), meta)
+
+    def flush(self):
+        for series in self.series.values():
+            series.flush()
+        self.ledger.flush()
+
+    def close(self):
+        for series in self.series.values():
+            series.close()
+        self.ledger.close()
+        if self._lock_fd is not None:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    # --- Чтение ---
+
+    def _sum(self, series, start=None, end=None, peers=None):
+        sums = {}
+        for _, peer, rx, tx in self.series[series].records(start, end):
+            if peers is not None and peer not in peers:
+                continue
+            total = sums.get(peer)
+            if total is None:
+                sums[peer] = [rx, tx]
+            else:
+                total[0] += rx
+                total[1] += tx
+        return sums
+
+    def _peer_filter(self, public_keys):
+        if public_keys is None:
+            return None
+        return {index for index in (self._peer_index.get(key) for key in public_keys) if index is not None}
+
+    def query(self, start=None, end=None, resolution="raw", public_keys=None):
+        """
+        Записи ряда за [start, end).
+        :param resolution: "raw" (счётчики) или "1m"/"1h"/"1d" (трафик за интервал).
+        :param public_keys: Ограничить выборку пирами.
+        :return: Columns.
+        """
+        self._refresh_peers()
+        peers = self._peer_filter(public_keys)
+        result = Columns()
+        keys = self._peer_keys
+        for ts, peer, rx, tx in self.series[resolution].records(start, end):
+            if peers is not None and peer not in peers:
+                continue
+            result.timestamps.append(ts)
+            result.public_keys.append(keys[peer])
+            result.rx.append(rx)
+            result.tx.append(tx)
+        return result
+
+    def usage(self, start=None, end=None, resolution="1h", public_keys=None):
+        """
+        Трафик пиров за период по свёртке.
+        :return: Словарь {public_key: [rx_bytes, tx_bytes]}.
+        """
+        self._refresh_peers()
+        sums = self._sum(resolution, start, end, self._peer_filter(public_keys))
+        return {self._peer_keys[peer]: total for peer, total in sums.items()}
+
+    def totals(self, public_keys=None):
+        """
+        Монотонные итоги трафика пиров за всю историю (modules.accounting).
+        :return: Словарь {public_key: [rx_bytes, tx_bytes]}.
+        """
+        self._refresh_peers()
+        if public_keys is None:
+            items = self.ledger.totals().items()
+        else:
+            items = ((peer, self.ledger.total(peer)) for peer in self._peer_filter(public_keys))
+        keys = self._peer_keys
+        return {keys[peer]: total for peer, total in items if peer < len(keys)}
+
+
+def _delta(previous, rx, tx):
+    """Приращение по одним счётчикам (для восстановления минуты из raw, где нет handshake)."""
+    if previous is None:
+        return rx, tx
+    previous_rx, previous_tx = previous
+    return (rx - previous_rx if rx >= previous_rx else rx), (tx - previous_tx if tx >= previous_tx else tx)
+
+
+_reader = None
+
+
+def get_reader():
+    """Общий экземпляр хранилища только для чтения (для Gradio и отчётов)."""
+    global _reader
+    if _reader is None or _reader.directory != str(settings.TIMESERIES_DIR):
+        _reader = TimeSeriesStore()
+    return _reader
+
+
+def open_writer(directory=None):
+    """
+    Открывает хранилище на запись.
+    :raises BlockingIOError: Если писатель уже работает в другом процессе.
+    """
+    return TimeSeriesStore(directory, writable=True)
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    from modules.wg_dump import format_bytes
+
+    parser = ArgumentParser(description="Трафик пиров по истории")
+    parser.add_argument("--hours", type=float, default=24, help="Период в часах (по умолчанию 24)")
+    parser.add_argument("--resolution", choices=tuple(RESOLUTIONS), default="1m", help="Свёртка для расчёта")
+    args = parser.parse_args()
+
+    store = get_reader()
+    start = time.perf_counter()
+    usage = store.usage(time.time() - args.hours * 3600, None, args.resolution)
+    elapsed = time.perf_counter() - start
+    print(f"=== Трафик за {args.hours:g} ч ({args.resolution}, {elapsed * 1000:.1f} мс) ===")
+    for public_key, (rx, tx) in sorted(usage.items(), key=lambda item: -sum(item[1])):
+        print(f"  {public_key}: ⬆️ {format_bytes(rx)} ⬇️ {format_bytes(tx)}")
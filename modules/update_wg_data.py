@@ -5,87 +5,75 @@ modules/update_wg_data.py
 Обновляет данные WireGuard:
 - Убирает дублирующиеся записи.
 - Чистит имена пользователей.
+- Дописывает счётчики трафика в историю (modules.timeseries); итоги трафика
+  берутся из учёта (modules.accounting) в целых байтах.
 """
 
 import os
 import subprocess
 import json
+import time
 from datetime import datetime
 
+from modules import timeseries
+from modules.wg_config_parser import load_server_config
+from modules.wg_dump import collect_peers, format_bytes
+
 
 # Пути к файлам
 WG_CONFIG_PATH = "/etc/wireguard/wg0.conf"
 JSON_LOG_PATH = "/root/pyWGgen/wg_qr_generator/logs/wg_users.json"
-TEXT_LOG_PATH = "/root/pyWGgen/wg_qr_generator/logs/wg_activity.log"
 
 
 def parse_wg_show():
-    """Считывает и парсит вывод команды `wg show`."""
+    """
+    Считывает состояние пиров из `wg show all dump`.
+    :return: Словарь {public_key: {"transfer": {"received", "sent"} в байтах,
+             "latest_handshake": epoch или None, "endpoint": ...}} или None при ошибке.
+    """
     try:
-        output = subprocess.check_output(["wg"], text=True)
-    except subprocess.CalledProcessError as e:
+        table = collect_peers()
+    except (subprocess.CalledProcessError, OSError) as e:
         print(f"Ошибка при выполнении `wg`: {e}")
         return None
-    
-    peers = {}
-    current_peer = None
-
-    for line in output.splitlines():
-        if line.startswith("peer:"):
-            current_peer = line.split(":")[1].strip()
-            peers[current_peer] = {"transfer": {"received": 0, "sent": 0}, "latest_handshake": None}
-        elif line.strip().startswith("transfer:"):
-            parts = line.strip().split(",")
-            received = parts[0].split()[1]
-            sent = parts[1].split()[1]
-            peers[current_peer]["transfer"] = {"received": received, "sent": sent}
-        elif line.strip().startswith("latest handshake:"):
-            handshake = line.split(":")[1].strip()
-            peers[current_peer]["latest_handshake"] = handshake
-
-    return peers
+
+    return {
+        public_key: {
+            "transfer": {"received": rx, "sent": tx},
+            "latest_handshake": handshake or None,
+            "endpoint": endpoint,
+        }
+        for public_key, endpoint, handshake, rx, tx in zip(
+            table.public_keys, table.endpoints, table.latest_handshakes, table.rx_bytes, table.tx_bytes
+        )
+    }
 
 
 def parse_wg_conf():
     """Считывает конфигурацию WireGuard для получения соответствия пользователей."""
     try:
-        with open(WG_CONFIG_PATH, "r") as f:
-            config = f.read()
+        config = load_server_config(WG_CONFIG_PATH)
     except FileNotFoundError:
         print(f"Файл {WG_CONFIG_PATH} не найден.")
         return None
 
-    users = {}
-    current_peer = None
-
-    for line in config.splitlines():
-        if line.strip().startswith("[Peer]"):
-            current_peer = None
-        elif line.strip().startswith("PublicKey ="):
-            current_peer = line.split("=")[1].strip()
-            users[current_peer] = {"username": None, "allowed_ips": None}
-        elif line.strip().startswith("#"):
-            if current_peer:
-                username = line.strip("#").strip()
-                # Убираем лишнее слово "Client"
-                if username.startswith("Client "):
-                    username = username.replace("Client ", "", 1)
-                users[current_peer]["username"] = username
-        elif line.strip().startswith("AllowedIPs ="):
-            if current_peer:
-                users[current_peer]["allowed_ips"] = line.split("=")[1].strip()
-
-    return users
+    return {
+        peer.public_key: {"username": peer.name, "allowed_ips": peer.allowed_ips}
+        for peer in config.peers
+        if peer.public_key
+    }
 
 
 def update_data():
-    """Обновляет JSON и текстовый лог на основе текущих данных `wg`."""
+    """Обновляет JSON и историю трафика на основе текущих данных `wg`."""
     wg_show = parse_wg_show()
     wg_conf = parse_wg_conf()
 
     if not wg_show or not wg_conf:
         return
 
+    totals = record_history(wg_show)
+
     # Загружаем или создаем JSON с историей
     if os.path.exists(JSON_LOG_PATH):
         with open(JSON_LOG_PATH, "r") as f:
@@ -96,7 +84,7 @@ def update_data():
     for peer, data in wg_conf.items():
         username = data["username"]
         allowed_ips = data["allowed_ips"]
-        transfer = wg_show.get(peer, {}).get("transfer", {"received": "0 B", "sent": "0 B"})
+        transfer = wg_show.get(peer, {}).get("transfer", {"received": 0, "sent": 0})
         latest_handshake = wg_show.get(peer, {}).get("latest_handshake", None)
 
         # Обновляем данные пользователя
@@ -111,26 +99,17 @@ def update_data():
 
         # Обновляем статус и handshake
         if latest_handshake:
-            user_data["last_handshake"] = latest_handshake
+            user_data["last_handshake"] = datetime.fromtimestamp(latest_handshake).isoformat()
+            user_data["last_handshake_epoch"] = latest_handshake
             user_data["status"] = "active"
         else:
             user_data["status"] = "inactive"
 
-        # Обновляем трафик
-        new_received = parse_size(transfer["received"])
-        new_sent = parse_size(transfer["sent"])
-        old_received = parse_size(user_data["total_transfer"]["received"])
-        old_sent = parse_size(user_data["total_transfer"]["sent"])
-
-        # Обнуляем, если данные сбросились
-        if new_received < old_received or new_sent < old_sent:
-            new_received += old_received
-            new_sent += old_sent
-
-        user_data["total_transfer"] = {
-            "received": format_size(new_received),
-            "sent": format_size(new_sent)
-        }
+        # Итоги трафика — монотонные суммы из учёта (сбросы счётчиков уже учтены);
+        # строки total_transfer только для отображения и обратно не разбираются
+        received, sent = totals.get(peer) or (transfer["received"], transfer["sent"])
+        user_data["total_bytes"] = {"received": received, "sent": sent}
+        user_data["total_transfer"] = {"received": format_bytes(received), "sent": format_bytes(sent)}
 
         # Обновляем endpoint
         endpoint = wg_show.get(peer, {}).get("endpoint", None)
@@ -149,35 +128,27 @@ def update_data():
     with open(JSON_LOG_PATH, "w") as f:
         json.dump(history, f, indent=4)
 
-    # Логируем в текстовый файл
-    with open(TEXT_LOG_PATH, "a") as f:
-        for username, user_data in history["users"].items():
-            status = user_data["status"]
-            transfer = user_data["total_transfer"]
-            f.write(f"{datetime.now()}: {username} — {status}. Трафик: {transfer['received']} / {transfer['sent']}\n")
-
-
-def parse_size(size_str):
-    """Парсит строку размера (например, '4.88 KiB') в байты."""
-    size, unit = size_str.split()
-    size = float(size)
-    unit = unit.lower()
-    multiplier = {
-        "b": 1,
-        "kib": 1024,
-        "mib": 1024**2,
-        "gib": 1024**3
-    }
-    return int(size * multiplier.get(unit, 1))
-
 
-def format_size(size_bytes):
-    """Форматирует размер в байтах в удобочитаемый вид."""
-    for unit in ["B", "KiB", "MiB", "GiB"]:
-        if size_bytes < 1024:
-            return f"{size_bytes:.2f} {unit}"
-        size_bytes /= 1024
-    return f"{size_bytes:.2f} GiB"
+def record_history(wg_show, now=None):
+    """
+    Дописывает счётчики пиров в историю трафика.
+    Если историю уже пишет сборщик телеметрии в другом процессе, выборка не
+    записывается — итоги берутся из его учёта.
+    :return: Итоги трафика {public_key: [received, sent]} в байтах.
+    """
+    try:
+        store = timeseries.open_writer()
+    except BlockingIOError:
+        return timeseries.get_reader().totals()
+    with store:
+        store.append_sample(
+            time.time() if now is None else now,
+            (
+                (peer, data["transfer"]["received"], data["transfer"]["sent"], data["latest_handshake"] or 0)
+                for peer, data in wg_show.items()
+            ),
+        )
+        return store.totals()
 
 
 if __name__ == "__main__":
@@ -6,9 +6,12 @@ import os
 import shutil
 import subprocess
 
+from modules import user_store
+from modules.file_lock import atomic_write, locked
+from modules.wg_config_parser import invalidate_cache
+
 USER_DATA_DIR = "user/data"
 USER_LOGS_DIR = "logs"
-USER_RECORDS_JSON = "user/data/user_records.json"
 WG_USERS_JSON = "logs/wg_users.json"
 WG_CONFIG_FILE = "/etc/wireguard/wg0.conf"
 WG_BACKUP_FILE = "/etc/wireguard/wg0.conf.bak"
@@ -26,10 +29,10 @@ def confirm_action(message):
 def clean_user_data():
     """Выборочная очистка данных пользователей с подтверждением."""
     try:
-        # Очистка user_records.json
-        if os.path.exists(USER_RECORDS_JSON) and confirm_action("🧹 Очистить файл user_records.json?"):
-            os.remove(USER_RECORDS_JSON)
-            print(f"✅ {USER_RECORDS_JSON} очищен.")
+        # Очистка базы пользователей
+        if user_store.count_users() and confirm_action("🧹 Очистить базу пользователей (user_records.db)?"):
+            user_store.clear_users()
+            print("✅ База пользователей очищена.")
 
         # Очистка wg_users.json
         if os.path.exists(WG_USERS_JSON) and confirm_action("🧹 Очистить файл wg_users.json?"):
@@ -43,11 +46,12 @@ def clean_user_data():
             print(f"✅ Резервная копия создана: {WG_BACKUP_FILE}")
 
             # Очистка конфигурации
-            with open(WG_CONFIG_FILE, "r") as wg_file:
-                lines = wg_file.readlines()
-            cleaned_lines = [line for line in lines if not line.startswith("[Peer]")]
-            with open(WG_CONFIG_FILE, "w") as wg_file:
-                wg_file.writelines(cleaned_lines)
+            with locked(WG_CONFIG_FILE):
+                with open(WG_CONFIG_FILE, "r") as wg_file:
+                    lines = wg_file.readlines()
+                cleaned_lines = [line for line in lines if not line.startswith("[Peer]")]
+                atomic_write(WG_CONFIG_FILE, cleaned_lines)
+                invalidate_cache(WG_CONFIG_FILE)
             print(f"✅ Конфигурация WireGuard очищена.")
 
         # Перезапуск WireGuard
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+# modules/user_index.py
+## Поисковый индекс пользователей в памяти: имя, email, Telegram ID, адрес, ключ.
+##
+## - Подстрока (от 3 символов) — по триграммам: для каждой триграммы хранится
+##   массив номеров пользователей (array('I'), по возрастанию). Кандидаты берутся
+##   из самого короткого массива среди триграмм запроса и проверяются по тексту.
+## - Короткий запрос (1–2 символа) — префикс по отсортированному списку значений
+##   полей (bisect, аналог обхода префиксного дерева).
+## - IP-адрес или подсеть (CIDR) — по отсортированным целочисленным адресам:
+##   адреса подсети занимают непрерывный диапазон, который находится бисекцией
+##   (как поддерево в префиксном дереве адресов).
+## - Публичный ключ — точное совпадение по словарю.
+##
+## Индекс строится один раз по полям из базы (user_store.get_search_fields) и
+## обновляется по месту при создании и удалении пользователей через
+## modules.user_repository (note_created/note_deleted). Если база изменилась
+## иначе (другой процесс, правка записи), счётчик user_store.generation() не
+## совпадёт с индексом и он будет перестроен при следующем обращении.
+##
+##   python3 -m modules.user_index benchmark [--users 100000]
+
+import ipaddress
+import socket
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right, insort
+
+import settings
+from modules import user_store
+
+GRAM = 3
+SEPARATOR = "\x00"
+UNSET_VALUES = ("", "N/A", None)
+FAMILIES = ((4, socket.AF_INET), (6, socket.AF_INET6))
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def _grams(value):
+    return {value[i:i + GRAM] for i in range(len(value) - GRAM + 1)}
+
+
+def _addresses(*values):
+    """
+    Адреса из строк вида "10.66.66.2/32,fd42:42:42::2/128".
+    :return: Список кортежей (версия, адрес как int, адрес без маски).
+    """
+    found = []
+    for value in values:
+        if not isinstance(value, str):
+            continue
+        for part in value.split(","):
+            text = part.split("/")[0].strip().lower()
+            for version, family in FAMILIES:
+                try:
+                    found.append((version, int.from_bytes(socket.inet_pton(family, text), "big"), text))
+                    break
+                except OSError:
+                    continue
+    return found
+
+
+class UserIndex:
+    """
+    Индекс пользователей для поиска.
+    :param rows: Кортежи (username, public_key, allowed_ips, address, email, telegram_id).
+    """
+
+    def __init__(self, rows=()):
+        self.generation = None
+        self._lock = threading.RLock()
+        self._names = []        # номер -> имя (None для удалённых)
+        self._texts = []        # номер -> поля в нижнем регистре через SEPARATOR
+        self._fields = []       # номер -> (public_key, [адреса])
+        self._ids = {}          # имя -> номер
+        self._grams = {}        # триграмма -> array('I') номеров
+        self._prefixes = []     # отсортированные (значение поля, номер)
+        self._keys = {}         # публичный ключ -> номер
+        self._ips = {4: ([], []), 6: ([], [])}  # версия -> (отсортированные адреса, номера)
+        self._deleted = 0
+        for row in rows:
+            self._add(*row, bulk=True)
+        self._prefixes.sort()
+        for version, (ips, numbers) in self._ips.items():
+            pairs = sorted(zip(ips, numbers))
+            self._ips[version] = ([ip for ip, _ in pairs], [number for _, number in pairs])
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _add(self, username, public_key=None, allowed_ips=None, address=None, email=None, telegram_id=None,
+             bulk=False):
+        """:param bulk: Начальное построение — списки сортируются один раз в конце."""
+        if username in self._ids:
+            self._remove(username)
+        number = len(self._names)
+        values = [value.lower() for value in (username, email, telegram_id)
+                  if value not in UNSET_VALUES and isinstance(value, str)]
+        addresses = _addresses(allowed_ips, address)
+        values.extend(text for _, _, text in addresses)
+
+        text = SEPARATOR.join(values)
+        self._names.append(username)
+        self._texts.append(text)
+        self._fields.append((public_key, addresses))
+        self._ids[username] = number
+        if bulk:
+            self._prefixes.extend((value, number) for value in values)
+        else:
+            for value in values:
+                insort(self._prefixes, (value, number))
+        # Триграммы на стыке полей (с SEPARATOR) не совпадут ни с одним запросом
+        postings = self._grams
+        for gram in _grams(text):
+            posting = postings.get(gram)
+            if posting is None:
+                posting = postings[gram] = array("I")
+            posting.append(number)
+        if public_key:
+            self._keys[public_key] = number
+        for version, ip, _ in addresses:
+            ips, numbers = self._ips[version]
+            position = len(ips) if bulk else bisect_right(ips, ip)
+            ips.insert(position, ip)
+            numbers.insert(position, number)
+
+    def _remove(self, username):
+        number = self._ids.pop(username, None)
+        if number is None:
+            return False
+        # Массивы триграмм не сжимаются: удалённые номера отбрасываются при проверке
+        for value in self._texts[number].split(SEPARATOR):
+            position = bisect_left(self._prefixes, (value, number))
+            if position < len(self._prefixes) and self._prefixes[position] == (value, number):
+                del self._prefixes[position]
+        public_key, addresses = self._fields[number]
+        if public_key and self._keys.get(public_key) == number:
+            del self._keys[public_key]
+        for version, ip, _ in addresses:
+            ips, numbers = self._ips[version]
+            start, end = bisect_left(ips, ip), bisect_right(ips, ip)
+            for position in range(start, end):
+                if numbers[position] == number:
+                    del ips[position], numbers[position]
+                    break
+        self._names[number] = None
+        self._texts[number] = ""
+        self._fields[number] = (None, [])
+        self._deleted += 1
+        return True
+
+    def add(self, username, record):
+        """Добавляет или заменяет пользователя по его записи."""
+        with self._lock:
+            self._add(username, record.get("public_key"), record.get("allowed_ips"), record.get("address"),
+                      record.get("email"), record.get("telegram_id"))
+
+    def remove(self, username):
+        """Удаляет пользователя из индекса. :return: True, если он был в индексе."""
+        with self._lock:
+            return self._remove(username)
+
+    # --- Поиск ---
+
+    def by_public_key(self, public_key):
+        """Имя пользователя с этим публичным ключом или None."""
+        with self._lock:
+            number = self._keys.get(public_key)
+            return None if number is None else self._names[number]
+
+    def in_network(self, network):
+        """
+        Пользователи с адресом в подсети (или равным адресу).
+        :param network: Строка "10.66.66.0/28", "10.66.66.5" или объект ipaddress.
+        """
+        network = ipaddress.ip_network(network, strict=False) if isinstance(network, str) else network
+        with self._lock:
+            ips, numbers = self._ips[network.version]
+            start = bisect_left(ips, int(network.network_address))
+            end = bisect_right(ips, int(network.broadcast_address))
+            return self._ordered(numbers[start:end])
+
+    def _ordered(self, numbers, limit=None):
+        names = self._names
+        found = []
+        for number in sorted(set(numbers)):
+            if names[number] is not None:
+                found.append(names[number])
+                if limit is not None and len(found) >= limit:
+                    break
+        return found
+
+    def _substring(self, term, limit):
+        postings = [self._grams.get(gram) for gram in _grams(term)]
+        if not all(postings):
+            return []
+        texts, names = self._texts, self._names
+        found = []
+        for number in min(postings, key=len):
+            if term in texts[number] and names[number] is not None:
+                found.append(names[number])
+                if limit is not None and len(found) >= limit:
+                    break
+        return found
+
+    def _prefix(self, term, limit):
+        start = bisect_left(self._prefixes, (term,))
+        end = bisect_left(self._prefixes, (term + "￿",))
+        return self._ordered((number for _, number in self._prefixes[start:end]), limit)
+
+    def search(self, term, limit=None):
+        """
+        Поиск пользователей.
+        :param term: Публичный ключ, IP-адрес, подсеть (CIDR) или часть имени, email,
+            Telegram ID, адреса (без учёта регистра; 1–2 символа — по префиксу).
+        :param limit: Максимум результатов.
+        :return: Имена пользователей в порядке добавления в индекс.
+        """
+        term = (term or "").strip()
+        if not term:
+            return []
+        with self._lock:
+            if term in self._keys:
+                return [self._names[self._keys[term]]]
+            if any(char in term for char in ".:/"):
+                try:
+                    return self.in_network(term)[:limit]
+                except ValueError:
+                    pass
+            term = term.lower()
+            if len(term) < GRAM:
+                return self._prefix(term, limit)
+            return self._substring(term, limit)
+
+
+def load_index():
+    """Строит индекс по текущей базе пользователей."""
+    generation = user_store.generation()
+    index = UserIndex(user_store.get_search_fields())
+    index.generation = (str(settings.USER_STORE_PATH), generation)
+    return index
+
+
+def get_index():
+    """Общий индекс процесса (перестраивается, если база изменилась не через note_*)."""
+    global _index
+    generation = (str(settings.USER_STORE_PATH), user_store.generation())
+    with _index_lock:
+        if _index is None or _index.generation != generation:
+            _index = load_index()
+        return _index
+
+
+def warm_index():
+    """Строит индекс в фоновом потоке, чтобы первый поиск в админке не ждал построения."""
+    def build():
+        try:
+            get_index()
+        finally:
+            user_store.close_connections()
+    thread = threading.Thread(target=build, name="user-index", daemon=True)
+    thread.start()
+    return thread
+
+
+def _note(apply):
+    """Применяет изменение к индексу, если кроме него база не менялась с построения индекса."""
+    with _index_lock:
+        if _index is None:
+            return
+        path, generation = str(settings.USER_STORE_PATH), user_store.generation()
+        if _index.generation == (path, generation - 1):
+            apply(_index)
+            _index.generation = (path, generation)
+
+
+def note_created(records):
+    """Добавляет в индекс созданных пользователей ({username: record})."""
+    _note(lambda index: [index.add(username, record) for username, record in records.items()])
+
+
+def note_deleted(usernames):
+    """Удаляет из индекса удалённых пользователей."""
+    _note(lambda index: [index.remove(username) for username in usernames])
+
+
+def benchmark(users=100000, queries=1000):
+    """
+    Замер построения индекса и поиска на синтетических пользователях.
+    :return: Словарь {"build", "<вид запроса>": среднее время запроса в секундах}.
+    """
+    import random
+    import string
+
+    rng = random.Random(0)
+    rows = []
+    for n in range(users):
+        name = "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(5, 10))) + str(n)
+        ip = ipaddress.ip_address(int(ipaddress.ip_address("10.0.0.2")) + n)
+        key = "".join(rng.choice(string.ascii_letters + string.digits) for _ in range(43)) + "="
+        rows.append((name, key, f"{ip}/32", None, f"{name}@example.com", str(rng.randint(10 ** 8, 10 ** 9))))
+
+    start = time.perf_counter()
+    index = UserIndex(rows)
+    report = {"build": time.perf_counter() - start}
+    samples = [rows[rng.randrange(users)] for _ in range(queries)]
+    cases = {
+        "name": lambda row: index.search(row[0][2:8]),
+        "prefix": lambda row: index.search(row[0][:2], limit=50),
+        "email": lambda row: index.search(row[4]),
+        "telegram": lambda row: index.search(row[5]),
+        "ip": lambda row: index.search(row[2].split("/")[0]),
+        "cidr": lambda row: index.search(str(ipaddress.ip_network(row[2].replace("/32", "/28"), strict=False))),
+        "public_key": lambda row: index.search(row[1]),
+    }
+    for name, query in cases.items():
+        start = time.perf_counter()
+        for row in samples:
+            query(row)
+        report[name] = (time.perf_counter() - start) / queries
+    return report
+
+
+if __name__ == "__main__":
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description="Поисковый индекс пользователей")
+    commands = parser.add_subparsers(dest="command", required=True)
+    bench_parser = commands.add_parser("benchmark", help="Замер поиска на синтетических пользователях")
+    bench_parser.add_argument("--users", type=int, default=100000)
+    args = parser.parse_args()
+
+    result = benchmark(args.users)
+    print(f"Построение индекса для {args.users} пользователей: {result.pop('build'):.2f} с")
+    for name, seconds in result.items():
+        print(f"  {name:<11} {seconds * 1e6:8.1f} мкс/запрос")
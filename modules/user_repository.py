@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# modules/user_repository.py
+## Согласованные изменения пользователей: wg0.conf и база пользователей.
+##
+## Создание и удаление выполняются под блокировкой wg0.conf (modules.file_lock),
+## поэтому проверка имени и запись пира не разрываются другим процессом
+## (Gradio, CLI-меню, cleanup.py). Блокировка держится только на время записи
+## в wg0.conf и БД — генерация ключей, конфигураций и QR-кодов идёт параллельно.
+## Записи пользователей изменяются построчно в SQLite; для правок полей
+## используется оптимистичная версия (user_store.update_user с expected_version).
+## Созданные и удалённые пользователи сразу применяются к поисковому индексу
+## процесса (modules.user_index), если он уже построен.
+
+import sqlite3
+
+import settings
+from modules import user_index, user_store
+from modules.config_writer import add_users_to_server_config, remove_users_from_server_config
+from modules.file_lock import locked
+from modules.user_store import VersionConflict
+from modules.wg_config_parser import load_server_config
+
+
+class UserExistsError(ValueError):
+    """Пользователь с таким именем уже есть в wg0.conf или в базе."""
+
+    def __init__(self, usernames):
+        self.usernames = list(usernames)
+        super().__init__(f"Пользователи уже существуют: {', '.join(self.usernames)}")
+
+
+def _config_names(config_file):
+    try:
+        return load_server_config(config_file).by_name_lower
+    except FileNotFoundError:
+        return {}
+
+
+def create_users(peers, records, config_file=None):
+    """
+    Добавляет пиров в wg0.conf и записи в базу как одну операцию.
+    :param peers: Кортежи (nickname, public_key, preshared_key, allowed_ips, allowed_ips_v6).
+    :param records: Словарь {nickname: record} для базы пользователей.
+    :param config_file: Путь к wg0.conf.
+    :raises UserExistsError: Если хотя бы одно имя занято; ничего не записывается.
+    """
+    config_file = str(config_file or settings.SERVER_CONFIG_FILE)
+    with locked(config_file):
+        in_config = _config_names(config_file)
+        taken = [
+            name for name in records
+            if name.lower() in in_config or user_store.user_exists(name, case_sensitive=False)
+        ]
+        if taken:
+            raise UserExistsError(taken)
+
+        add_users_to_server_config(config_file, peers)
+        try:
+            user_store.insert_users(records)
+            user_index.note_created(records)
+        except sqlite3.IntegrityError:
+            remove_users_from_server_config(config_file, [peer[0] for peer in peers])
+            raise UserExistsError(name for name in records if user_store.user_exists(name))
+        except Exception:
+            remove_users_from_server_config(config_file, [peer[0] for peer in peers])
+            raise
+
+
+def create_user(nickname, public_key, preshared_key, allowed_ips, allowed_ips_v6, record, config_file=None):
+    create_users([(nickname, public_key, preshared_key, allowed_ips, allowed_ips_v6)], {nickname: record}, config_file)
+
+
+def delete_users(nicknames, config_file=None):
+    """
+    Удаляет пиров из wg0.conf и записи из базы как одну операцию.
+    :return: Список имён, удалённых из wg0.conf.
+    """
+    config_file = str(config_file or settings.SERVER_CONFIG_FILE)
+    nicknames = list(nicknames)
+    with locked(config_file):
+        removed = remove_users_from_server_config(config_file, nicknames)
+        user_store.delete_users(nicknames)
+        user_index.note_deleted(nicknames)
+    return removed
+
+
+def update_user(username, update, retries=10):
+    """
+    Изменяет запись с оптимистичной блокировкой: читает запись и версию,
+    вычисляет изменения и сохраняет их, если запись не изменилась за это время.
+    :param update: Функция record -> dict изменяемых полей.
+    :return: Обновлённая запись или None, если пользователь не найден.
+    :raises VersionConflict: Если запись менялась конкурентно retries раз подряд.
+    """
+    for _ in range(retries):
+        current = user_store.get_user_versioned(username)
+        if current is None:
+            return None
+        record, version = current
+        try:
+            return user_store.update_user(username, update(record), expected_version=version)
+        except VersionConflict:
+            continue
+    raise VersionConflict(f"Не удалось обновить {username}: запись изменяется конкурентно.")
@@ -0,0 +1,645 @@
+#!/usr/bin/env python3
+# modules/user_store.py
+## Хранилище записей пользователей на SQLite (режим WAL).
+##
+## Каждая запись хранится целиком в колонке data (JSON), а часто используемые
+## поля вынесены в отдельные индексируемые колонки: public_key, allowed_ips
+## (основной адрес без маски), status и expires_at. Сроки этапов истечения
+## (auto_suspend_date, auto_delete_date; по умолчанию — expires_at) хранятся
+## в колонках auto_suspend_at и auto_delete_at как Unix epoch — по ним
+## планировщик (modules.expiry_scheduler) находит ближайший срок через индекс.
+## Сам expires_at дублируется в колонке expires_epoch (Unix epoch): списки и
+## поиск получают сроки массивом без разбора ISO-строк (modules.expiry_time).
+## Изменение одного пользователя — это одна строка в БД, а не перезапись
+## всего user_records.json.
+##
+## При первом открытии БД записи импортируются из settings.USER_DB_PATH
+## (user_records.json). Каждая запись имеет номер версии (version), который
+## увеличивается при любом изменении: update_user/delete_user с expected_version
+## реализуют оптимистичную блокировку — если запись изменил другой процесс,
+## выбрасывается VersionConflict, и вызывающий перечитывает запись.
+##
+## Каждая транзакция, изменившая таблицу users (в любом процессе), увеличивает
+## счётчик generation в таблице meta в той же транзакции: кэши поверх базы
+## (таблица статистики в админке) сравнивают generation() вместо перечитывания записей.
+##
+## Для совместимости с внешними инструментами доступен
+## экспорт обратно в JSON:
+##   python3 -m modules.user_store export [path]
+##   python3 -m modules.user_store import [path]
+
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+import settings
+from modules.file_lock import atomic_write_json, locked
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username    TEXT PRIMARY KEY,
+    public_key  TEXT,
+    allowed_ips TEXT,
+    status      TEXT,
+    expires_at  TEXT,
+    data        TEXT NOT NULL,
+    version     INTEGER NOT NULL DEFAULT 1,
+    auto_suspend_at INTEGER,
+    auto_delete_at  INTEGER,
+    expires_epoch   INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_users_username_nocase ON users (username COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_users_public_key ON users (public_key);
+CREATE INDEX IF NOT EXISTS idx_users_allowed_ips ON users (allowed_ips);
+CREATE INDEX IF NOT EXISTS idx_users_status ON users (status);
+CREATE INDEX IF NOT EXISTS idx_users_expires_at ON users (expires_at);
+CREATE TABLE IF NOT EXISTS meta (
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# Индексы по колонкам, добавленным миграцией (создаются после неё)
+STAGE_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_users_status_suspend ON users (status, auto_suspend_at);
+CREATE INDEX IF NOT EXISTS idx_users_delete ON users (auto_delete_at);
+"""
+
+UPSERT = """
+INSERT INTO users (username, public_key, allowed_ips, status, expires_at, data, auto_suspend_at, auto_delete_at, expires_epoch)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT(username) DO UPDATE SET
+    public_key = excluded.public_key,
+    allowed_ips = excluded.allowed_ips,
+    status = excluded.status,
+    expires_at = excluded.expires_at,
+    data = excluded.data,
+    auto_suspend_at = excluded.auto_suspend_at,
+    auto_delete_at = excluded.auto_delete_at,
+    expires_epoch = excluded.expires_epoch,
+    version = users.version + 1
+"""
+
+# Счётчик изменений таблицы users: увеличивается один раз на транзакцию с изменениями
+BUMP_GENERATION = """
+INSERT INTO meta (key, value) VALUES ('generation', 1)
+ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1
+"""
+
+INSERT = """
+INSERT INTO users (username, public_key, allowed_ips, status, expires_at, data, auto_suspend_at, auto_delete_at, expires_epoch)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# Колонки Unix epoch, вычисляемые из дат записи (последние значения _row)
+EPOCH_COLUMNS = ("auto_suspend_at", "auto_delete_at", "expires_epoch")
+
+# Этапы истечения: колонка срока и условие отбора пользователей
+STAGES = {
+    "suspend": ("auto_suspend_at", "status = 'active'"),
+    "delete": ("auto_delete_at", "1"),
+}
+
+# Максимум параметров в одном запросе WHERE ... IN (...)
+QUERY_CHUNK = 500
+
+# Поля записи, вынесенные в колонки (query_users читает их без разбора JSON)
+FIELD_COLUMNS = {
+    "username": "username",
+    "public_key": "public_key",
+    "status": "status",
+    "expires_at": "expires_at",
+    "expires_epoch": "expires_epoch",
+    "version": "version",
+}
+FIELD_NAME = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+QUERY_OPERATORS = ("=", "!=", "<", "<=", ">", ">=", "like", "in", "not in")
+QUERY_PAGE_SIZE = 500
+
+_local = threading.local()
+
+
+class VersionConflict(Exception):
+    """Запись изменена другим процессом после чтения."""
+
+
+def _store_path():
+    return str(settings.USER_STORE_PATH)
+
+
+def primary_address(record):
+    """Основной адрес пользователя без маски (первый из allowed_ips/address)."""
+    value = record.get("allowed_ips") or record.get("address")
+    if not value or not isinstance(value, str) or value == "N/A":
+        return None
+    return value.split(",")[0].split("/")[0].strip() or None
+
+
+def to_epoch(value):
+    """Дата ISO 8601 в Unix epoch (int) или None, если дата не задана или не распознана."""
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        return int(datetime.fromisoformat(value).timestamp())
+    except ValueError:
+        return None
+
+
+def _row(username, record):
+    expires_at = record.get("expires_at")
+    return (
+        username,
+        record.get("public_key"),
+        primary_address(record),
+        record.get("status"),
+        expires_at,
+        json.dumps(record, ensure_ascii=False),
+        to_epoch(record.get("auto_suspend_date") or expires_at),
+        to_epoch(record.get("auto_delete_date") or expires_at),
+        to_epoch(expires_at),
+    )
+
+
+def _migrate_schema(conn):
+    """Добавляет колонки version и сроков (Unix epoch) в БД, созданные до их появления."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(users)")}
+    if "version" not in columns:
+        conn.execute("ALTER TABLE users ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+    missing = [column for column in EPOCH_COLUMNS if column not in columns]
+    if missing:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for column in missing:
+                conn.execute(f"ALTER TABLE users ADD COLUMN {column} INTEGER")
+            rows = [_row(username, json.loads(data)) for username, data in conn.execute("SELECT username, data FROM users")]
+            assignments = ", ".join(f"{column} = ?" for column in EPOCH_COLUMNS)
+            conn.executemany(
+                f"UPDATE users SET {assignments} WHERE username = ?",
+                [(*row[-len(EPOCH_COLUMNS):], row[0]) for row in rows],
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    conn.executescript(STAGE_INDEXES)
+
+
+def _migrate_json(conn):
+    """Однократный импорт user_records.json в пустую БД."""
+    if conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+        return
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if not conn.execute("SELECT 1 FROM meta WHERE key = 'json_migrated'").fetchone():
+            records = _read_json(settings.USER_DB_PATH)
+            conn.executemany(UPSERT, [_row(name, record) for name, record in records.items()])
+            conn.execute("INSERT INTO meta (key, value) VALUES ('json_migrated', ?)", (str(len(records)),))
+            if records:
+                conn.execute(BUMP_GENERATION)
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def get_connection():
+    """Соединение с БД для текущего потока (создаётся и мигрируется при первом обращении)."""
+    path = _store_path()
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    conn = connections.get(path)
+    if conn is None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        _migrate_schema(conn)
+        _migrate_json(conn)
+        connections[path] = conn
+    return conn
+
+
+def close_connections():
+    """Закрывает соединения текущего потока."""
+    for conn in getattr(_local, "connections", {}).values():
+        conn.close()
+    _local.connections = {}
+
+
+@contextmanager
+def transaction():
+    """Транзакция с блокировкой записи (BEGIN IMMEDIATE)."""
+    conn = get_connection()
+    conn.execute("BEGIN IMMEDIATE")
+    changes = conn.total_changes
+    try:
+        yield conn
+        if conn.total_changes != changes:
+            conn.execute(BUMP_GENERATION)
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def _records(rows):
+    return {username: json.loads(data) for username, data in rows}
+
+
+# --- Чтение ---
+
+def get_user(username):
+    """Запись пользователя или None."""
+    row = get_connection().execute("SELECT data FROM users WHERE username = ?", (username,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def get_user_versioned(username):
+    """Кортеж (record, version) или None."""
+    row = get_connection().execute(
+        "SELECT data, version FROM users WHERE username = ?", (username,)
+    ).fetchone()
+    return (json.loads(row[0]), row[1]) if row else None
+
+
+def get_users():
+    """Все записи в порядке добавления: {username: record}."""
+    return _records(get_connection().execute("SELECT username, data FROM users ORDER BY rowid"))
+
+
+def get_users_with_expiry(usernames=None):
+    """
+    Записи и их сроки истечения одним запросом, в порядке добавления.
+    :param usernames: Только эти пользователи (по умолчанию — все).
+    :return: Кортеж ({username: record}, [expires_epoch или None]) — сроки в порядке записей.
+    """
+    query = "SELECT rowid, username, data, expires_epoch FROM users"
+    conn = get_connection()
+    if usernames is None:
+        rows = conn.execute(query + " ORDER BY rowid").fetchall()
+    else:
+        usernames, rows = list(usernames), []
+        for i in range(0, len(usernames), QUERY_CHUNK):
+            chunk = usernames[i:i + QUERY_CHUNK]
+            rows.extend(conn.execute(f"{query} WHERE username IN ({', '.join('?' * len(chunk))})", chunk))
+        rows.sort()
+    records, epochs = {}, []
+    for _, username, data, epoch in rows:
+        records[username] = json.loads(data)
+        epochs.append(epoch)
+    return records, epochs
+
+
+def _field_sql(field):
+    """Выражение SQL для поля записи: отдельная колонка или json_extract из data."""
+    if field in FIELD_COLUMNS:
+        return FIELD_COLUMNS[field]
+    if not FIELD_NAME.fullmatch(field):
+        raise ValueError(f"Недопустимое имя поля: {field!r}")
+    return f"json_extract(data, '$.{field}')"
+
+
+def _where_sql(where):
+    """
+    Условия отбора в SQL.
+    :param where: Словарь {поле: значение} (None — поле не задано, список — одно из значений)
+        или список кортежей (поле, оператор, значение) с операторами из QUERY_OPERATORS.
+    :return: Кортеж (" WHERE ..." или "", параметры).
+    """
+    if not where:
+        return "", []
+    if isinstance(where, dict):
+        where = [
+            (field, "in" if isinstance(value, (list, tuple, set, frozenset)) else "=", value)
+            for field, value in where.items()
+        ]
+    clauses, params = [], []
+    for field, operator, value in where:
+        operator = operator.lower()
+        if operator not in QUERY_OPERATORS:
+            raise ValueError(f"Недопустимый оператор: {operator!r}")
+        column = _field_sql(field)
+        if operator in ("in", "not in"):
+            # Список любой длины — одним параметром через json_each
+            clauses.append(f"{column} {operator.upper()} (SELECT value FROM json_each(?))")
+            params.append(json.dumps(list(value), ensure_ascii=False))
+        elif value is None and operator in ("=", "!="):
+            clauses.append(f"{column} IS {'NOT ' if operator == '!=' else ''}NULL")
+        else:
+            clauses.append(f"{column} {operator.upper()} ?")
+            params.append(value)
+    return " WHERE " + " AND ".join(clauses), params
+
+
+def query_users(fields=None, where=None, order_by=None, offset=0, limit=None):
+    """
+    Выборка пользователей на стороне БД: отбор, сортировка, страница и набор полей.
+    :param fields: Возвращаемые поля записи (по умолчанию — запись целиком). Вложенные
+        списки и словари возвращаются строкой JSON.
+    :param where: Условия отбора (см. _where_sql).
+    :param order_by: Поле или список полей; "-поле" — по убыванию. При равенстве — порядок добавления.
+    :param offset: Сколько записей пропустить.
+    :param limit: Максимум записей (None — все).
+    :return: Словарь {username: {поле: значение}} в порядке сортировки.
+    :raises ValueError: Недопустимое имя поля или оператор.
+    """
+    if fields is None:
+        columns = "data"
+    else:
+        fields = list(fields)
+        columns = ", ".join(_field_sql(field) for field in fields) or "NULL"
+    clause, params = _where_sql(where)
+    order = []
+    for field in ([order_by] if isinstance(order_by, str) else order_by or []):
+        descending = field.startswith("-")
+        order.append(f"{_field_sql(field.lstrip('-'))}{' DESC' if descending else ''}")
+    order.append("rowid")
+    sql = f"SELECT username, {columns} FROM users{clause} ORDER BY {', '.join(order)}"
+    if limit is not None or offset:
+        sql += " LIMIT ? OFFSET ?"
+        params = [*params, -1 if limit is None else int(limit), int(offset)]
+
+    result = {}
+    for row in get_connection().execute(sql, params):
+        if fields is None:
+            result[row[0]] = json.loads(row[1])
+        else:
+            result[row[0]] = dict(zip(fields, row[1:]))
+    return result
+
+
+def iter_users(fields=None, where=None, page_size=None):
+    """
+    Обход пользователей страницами в порядке добавления (по rowid, без OFFSET):
+    в памяти одновременно только одна страница.
+    :param fields: Поля записи, как в query_users.
+    :param page_size: Размер страницы (по умолчанию QUERY_PAGE_SIZE).
+    :return: Генератор кортежей (username, {поле: значение} или запись).
+    """
+    page_size = page_size or QUERY_PAGE_SIZE
+    columns = "data" if fields is None else ", ".join(_field_sql(field) for field in fields) or "NULL"
+    clause, params = _where_sql(where)
+    clause = f"{clause} AND rowid > ?" if clause else " WHERE rowid > ?"
+    sql = f"SELECT rowid, username, {columns} FROM users{clause} ORDER BY rowid LIMIT ?"
+    last = 0
+    while True:
+        rows = get_connection().execute(sql, [*params, last, page_size]).fetchall()
+        for row in rows:
+            yield row[1], json.loads(row[2]) if fields is None else dict(zip(fields, row[2:]))
+        if len(rows) < page_size:
+            return
+        last = rows[-1][0]
+
+
+def get_search_fields():
+    """
+    Поля для поискового индекса (modules.user_index) без разбора JSON записей в Python.
+    :return: Список кортежей (username, public_key, allowed_ips, address, email, telegram_id) в порядке добавления.
+    """
+    return get_connection().execute(
+        "SELECT username, public_key, json_extract(data, '$.allowed_ips'), json_extract(data, '$.address'), "
+        "json_extract(data, '$.email'), json_extract(data, '$.telegram_id') FROM users ORDER BY rowid"
+    ).fetchall()
+
+
+def get_usernames():
+    """Имена всех пользователей в порядке добавления."""
+    return [row[0] for row in get_connection().execute("SELECT username FROM users ORDER BY rowid")]
+
+
+def count_users(where=None):
+    """Количество пользователей (where — условия отбора, как в query_users)."""
+    clause, params = _where_sql(where)
+    return get_connection().execute(f"SELECT COUNT(*) FROM users{clause}", params).fetchone()[0]
+
+
+def user_exists(username, case_sensitive=True):
+    query = "SELECT 1 FROM users WHERE username = ?"
+    if not case_sensitive:
+        query += " COLLATE NOCASE"
+    return get_connection().execute(query, (username,)).fetchone() is not None
+
+
+def find_user_by_public_key(public_key):
+    """Кортеж (username, record) или None."""
+    row = get_connection().execute(
+        "SELECT username, data FROM users WHERE public_key = ?", (public_key,)
+    ).fetchone()
+    return (row[0], json.loads(row[1])) if row else None
+
+
+def find_user_by_address(address):
+    """Кортеж (username, record) по IP-адресу (маска игнорируется) или None."""
+    address = str(address).split("/")[0].strip()
+    row = get_connection().execute(
+        "SELECT username, data FROM users WHERE allowed_ips = ?", (address,)
+    ).fetchone()
+    return (row[0], json.loads(row[1])) if row else None
+
+
+def get_users_by_status(status):
+    return _records(get_connection().execute(
+        "SELECT username, data FROM users WHERE status = ? ORDER BY rowid", (status,)
+    ))
+
+
+def get_public_keys_by_status(status):
+    """Публичные ключи пользователей с указанным статусом (по индексу status)."""
+    return {
+        row[0] for row in get_connection().execute(
+            "SELECT public_key FROM users WHERE status = ? AND public_key IS NOT NULL", (status,)
+        )
+    }
+
+
+def get_users_due(stage, moment):
+    """
+    Пользователи, у которых срок этапа истечения наступил.
+    :param stage: "suspend" (только активные) или "delete".
+    :param moment: Unix epoch.
+    """
+    column, condition = STAGES[stage]
+    return _records(get_connection().execute(
+        f"SELECT username, data FROM users WHERE {condition} AND {column} <= ? ORDER BY {column}", (moment,)
+    ))
+
+
+def next_due(stage):
+    """Ближайший срок этапа истечения (Unix epoch) или None."""
+    column, condition = STAGES[stage]
+    return get_connection().execute(f"SELECT MIN({column}) FROM users WHERE {condition}").fetchone()[0]
+
+
+def get_users_expiring_before(moment):
+    """Пользователи, у которых expires_at (ISO 8601) раньше moment."""
+    return _records(get_connection().execute(
+        "SELECT username, data FROM users WHERE expires_at < ? ORDER BY expires_at", (moment,)
+    ))
+
+
+# --- Запись ---
+
+def save_user(username, record):
+    """Добавляет или заменяет запись пользователя."""
+    with transaction() as conn:
+        conn.execute(UPSERT, _row(username, record))
+
+
+def insert_users(records):
+    """
+    Добавляет новые записи одной транзакцией.
+    :raises sqlite3.IntegrityError: Если хотя бы один пользователь уже существует
+        (в этом случае не добавляется ни одна запись).
+    """
+    with transaction() as conn:
+        conn.executemany(INSERT, [_row(username, record) for username, record in records.items()])
+
+
+def save_users(records):
+    """Добавляет или заменяет несколько записей одной транзакцией."""
+    with transaction() as conn:
+        conn.executemany(UPSERT, [_row(username, record) for username, record in records.items()])
+
+
+def update_users(changes):
+    """
+    Обновляет отдельные поля нескольких записей одной транзакцией.
+    :param changes: Словарь {username: {поле: значение}}.
+    :return: Обновлённые записи {username: record} (отсутствующие пропускаются).
+    """
+    updated = {}
+    with transaction() as conn:
+        for username, fields in changes.items():
+            row = conn.execute("SELECT data FROM users WHERE username = ?", (username,)).fetchone()
+            if row is None:
+                continue
+            record = json.loads(row[0])
+            record.update(fields)
+            conn.execute(UPSERT, _row(username, record))
+            updated[username] = record
+    return updated
+
+
+def _check_version(username, row, expected_version):
+    if expected_version is not None and row[1] != expected_version:
+        raise VersionConflict(
+            f"Запись {username} изменена: версия {row[1]}, ожидалась {expected_version}."
+        )
+
+
+def update_user(username, changes, expected_version=None):
+    """
+    Обновляет отдельные поля записи.
+    :param expected_version: Версия, прочитанная вызывающим (get_user_versioned).
+    :return: Обновлённая запись или None, если пользователь не найден.
+    :raises VersionConflict: Если версия записи не совпадает с expected_version.
+    """
+    with transaction() as conn:
+        row = conn.execute("SELECT data, version FROM users WHERE username = ?", (username,)).fetchone()
+        if row is None:
+            return None
+        _check_version(username, row, expected_version)
+        record = json.loads(row[0])
+        record.update(changes)
+        conn.execute(UPSERT, _row(username, record))
+    return record
+
+
+def delete_user(username, expected_version=None):
+    """
+    Удаляет запись пользователя.
+    :return: Удалённая запись или None.
+    :raises VersionConflict: Если версия записи не совпадает с expected_version.
+    """
+    with transaction() as conn:
+        row = conn.execute("SELECT data, version FROM users WHERE username = ?", (username,)).fetchone()
+        if row is None:
+            return None
+        _check_version(username, row, expected_version)
+        conn.execute("DELETE FROM users WHERE username = ?", (username,))
+    return json.loads(row[0])
+
+
+def delete_users(usernames):
+    """Удаляет несколько записей одной транзакцией. Возвращает число удалённых."""
+    with transaction() as conn:
+        cursor = conn.executemany("DELETE FROM users WHERE username = ?", [(name,) for name in usernames])
+    return cursor.rowcount
+
+
+def clear_users():
+    """Удаляет все записи."""
+    with transaction() as conn:
+        conn.execute("DELETE FROM users")
+
+
+# --- Служебные значения ---
+
+def get_meta(key, default=None):
+    """Служебное значение из таблицы meta."""
+    row = get_connection().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else default
+
+
+def set_meta(key, value):
+    """Сохраняет служебное значение в таблице meta."""
+    get_connection().execute(
+        "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT(key) DO UPDATE SET value = excluded.value",
+        (key, value),
+    )
+
+
+def generation():
+    """Счётчик изменений таблицы users (растёт с каждой транзакцией, изменившей записи)."""
+    return int(get_meta("generation", 0))
+
+
+# --- Совместимость с user_records.json ---
+
+def _read_json(path):
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def export_json(path=None):
+    """
+    Выгружает все записи в JSON (формат user_records.json) с атомарной заменой файла.
+    :return: Количество выгруженных записей.
+    """
+    path = str(path or settings.USER_DB_PATH)
+    records = get_users()
+    with locked(path):
+        atomic_write_json(path, records, indent=4, ensure_ascii=False)
+    return len(records)
+
+
+def import_json(path=None):
+    """
+    Загружает записи из JSON (формат user_records.json), заменяя совпадающие.
+    :return: Количество загруженных записей.
+    """
+    records = _read_json(path or settings.USER_DB_PATH)
+    save_users(records)
+    return len(records)
+
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "export"
+    target = sys.argv[2] if len(sys.argv) > 2 else None
+    if command == "export":
+        print(f"✅ Выгружено записей: {export_json(target)} -> {target or settings.USER_DB_PATH}")
+    elif command == "import":
+        print(f"✅ Загружено записей: {import_json(target)}")
+    else:
+        print("Использование: python3 -m modules.user_store [export|import] [path]")
+        sys.exit(1)
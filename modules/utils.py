@@ -6,6 +6,8 @@ import json
 import os
 import datetime
 
+from modules.file_lock import atomic_write_json, locked
+
 
 def read_json(file_path):
     """
@@ -25,8 +27,8 @@ def write_json(file_path, data):
     :param file_path: Путь к JSON-файлу.
     :param data: Данные для записи.
     """
-    with open(file_path, 'w', encoding='utf-8') as file:
-        json.dump(data, file, indent=4, ensure_ascii=False)
+    with locked(file_path):
+        atomic_write_json(file_path, data, indent=4, ensure_ascii=False)
 
 
 def get_wireguard_config_path():
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# modules/wg_apply.py
+## Применение изменений пиров к работающему интерфейсу WireGuard без перезапуска.
+##
+## Желаемый набор пиров берётся из wg0.conf, текущий — из `wg show <if> dump`.
+## Разница применяется точечными командами `wg set <if> peer ...`, поэтому
+## сессии остальных пользователей не прерываются. Если изменений больше, чем
+## settings.WG_APPLY_MAX_OPS, выполняется `wg syncconf` с выводом `wg-quick strip`.
+
+import os
+import subprocess
+
+import settings
+from modules.sync import sync_wireguard_config
+from modules.wg_config_parser import load_server_config
+from modules.wg_dump import NONE_VALUE, collect_peers
+
+
+def interface_name(config_file=None):
+    """Имя интерфейса по пути к конфигурации (/etc/wireguard/wg0.conf -> wg0)."""
+    config_file = str(config_file or settings.SERVER_CONFIG_FILE)
+    return os.path.splitext(os.path.basename(config_file))[0]
+
+
+def _normalize_allowed_ips(value):
+    if not value or value == NONE_VALUE:
+        return ""
+    return ",".join(sorted(entry.strip() for entry in value.split(",") if entry.strip()))
+
+
+def get_running_peers(interface):
+    """
+    Текущие пиры интерфейса по `wg show <if> dump`.
+    :return: Словарь {public_key: {"preshared_key": ..., "allowed_ips": ...}}.
+    """
+    table = collect_peers(interface)
+    return {
+        public_key: {
+            "preshared_key": preshared_key,
+            "allowed_ips": _normalize_allowed_ips(allowed_ips),
+        }
+        for public_key, preshared_key, allowed_ips in zip(table.public_keys, table.preshared_keys, table.allowed_ips)
+    }
+
+
+def get_desired_peers(config_file=None, exclude_keys=()):
+    """
+    Пиры, которые должны быть на интерфейсе согласно wg0.conf.
+    :param config_file: Путь к конфигурации сервера.
+    :param exclude_keys: Публичные ключи, которые не нужно применять.
+    :return: Словарь в формате get_running_peers().
+    """
+    config = load_server_config(config_file)
+    exclude_keys = set(exclude_keys)
+    return {
+        peer.public_key: {
+            "preshared_key": peer.preshared_key,
+            "allowed_ips": _normalize_allowed_ips(peer.allowed_ips),
+        }
+        for peer in config.peers
+        if peer.public_key and peer.public_key not in exclude_keys
+    }
+
+
+def diff_peers(desired, running):
+    """
+    Сравнивает желаемые и текущие пиры.
+    :return: Кортеж (upserts, removals): список (public_key, peer) и список ключей.
+    """
+    upserts = [
+        (public_key, peer)
+        for public_key, peer in desired.items()
+        if running.get(public_key) != peer
+    ]
+    removals = [public_key for public_key in running if public_key not in desired]
+    return upserts, removals
+
+
+def set_peer(interface, public_key, peer):
+    """Добавляет или обновляет одного пира. PSK передаётся через stdin, а не в аргументах."""
+    command = ["wg", "set", interface, "peer", public_key]
+    psk_input = None
+    if peer.get("preshared_key"):
+        command += ["preshared-key", "/dev/stdin"]
+        psk_input = peer["preshared_key"] + "\n"
+    command += ["allowed-ips", peer.get("allowed_ips", "")]
+    subprocess.run(command, input=psk_input, text=True, check=True)
+
+
+def remove_peer(interface, public_key):
+    """Удаляет одного пира с интерфейса."""
+    subprocess.run(["wg", "set", interface, "peer", public_key, "remove"], check=True)
+
+
+def apply_peer_changes(config_file=None, interface=None, max_ops=None, exclude_keys=()):
+    """
+    Приводит работающий интерфейс в соответствие с wg0.conf минимальным набором операций.
+    :param config_file: Путь к конфигурации сервера.
+    :param interface: Имя интерфейса (по умолчанию — по имени файла конфигурации).
+    :param max_ops: Порог числа операций, после которого используется `wg syncconf`.
+    :param exclude_keys: Публичные ключи пиров, которые не должны быть на интерфейсе.
+    :return: Словарь {"mode", "added", "updated", "removed"}; mode = "set", "syncconf" или "error".
+    """
+    interface = interface or interface_name(config_file)
+    max_ops = settings.WG_APPLY_MAX_OPS if max_ops is None else max_ops
+    result = {"mode": "set", "added": 0, "updated": 0, "removed": 0}
+
+    try:
+        running = get_running_peers(interface)
+    except (subprocess.CalledProcessError, OSError) as e:
+        print(f"❌ Не удалось получить состояние интерфейса {interface}: {e}")
+        result["mode"] = "error"
+        return result
+
+    desired = get_desired_peers(config_file, exclude_keys)
+    upserts, removals = diff_peers(desired, running)
+    result["added"] = sum(1 for public_key, _ in upserts if public_key not in running)
+    result["updated"] = len(upserts) - result["added"]
+    result["removed"] = len(removals)
+
+    # `wg-quick strip` вернёт всех пиров из файла, поэтому при исключениях — только точечно
+    if len(upserts) + len(removals) > max_ops and not exclude_keys:
+        result["mode"] = "syncconf" if sync_wireguard_config(interface) else "error"
+        return result
+
+    try:
+        for public_key in removals:
+            remove_peer(interface, public_key)
+        for public_key, peer in upserts:
+            set_peer(interface, public_key, peer)
+    except (subprocess.CalledProcessError, OSError) as e:
+        print(f"❌ Ошибка применения изменений к {interface}: {e}")
+        result["mode"] = "error"
+    return result
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+# modules/wg_config_parser.py
+## Единый потоковый парсер конфигурации сервера WireGuard (wg0.conf).
+##
+## Файл читается за один проход и превращается в компактную модель:
+## секция [Interface] и список пиров (имя, PublicKey, PresharedKey, AllowedIPs,
+## байтовые смещения блока в файле). Для пиров строятся индексы по имени,
+## публичному ключу и IP-адресу.
+##
+## load_server_config() кэширует модель в процессе и проверяет актуальность
+## по inode, mtime и размеру файла, поэтому все вызывающие модули используют
+## один разбор, пока файл не изменился.
+##
+## Блок пира включает комментарий "### Client <имя>", секцию [Peer] и
+## завершающие пустые строки — до начала следующего блока.
+##
+## Смещения блоков дополнительно сохраняются в settings.SERVER_CONFIG_INDEX_PATH
+## (persistent index), чтобы удаление пиров не требовало повторного разбора
+## файла в новом процессе.
+
+import json
+import os
+
+import settings
+from modules.file_lock import atomic_write_json, locked
+
+CLIENT_MARKER = "### Client"
+
+_cache = {}
+
+
+class Peer:
+    """Пир из wg0.conf."""
+
+    __slots__ = ("name", "public_key", "preshared_key", "allowed_ips", "start", "end", "extra")
+
+    def __init__(self, name=None, start=0):
+        self.name = name
+        self.public_key = None
+        self.preshared_key = None
+        self.allowed_ips = None
+        self.start = start
+        self.end = start
+        self.extra = None
+
+    @property
+    def addresses(self):
+        """Адреса из AllowedIPs без масок."""
+        if not self.allowed_ips:
+            return []
+        return [entry.strip().split("/")[0] for entry in self.allowed_ips.split(",") if entry.strip()]
+
+    def as_dict(self):
+        """Поля пира в том виде, в котором они записаны в wg0.conf."""
+        fields = {}
+        if self.public_key is not None:
+            fields["PublicKey"] = self.public_key
+        if self.preshared_key is not None:
+            fields["PresharedKey"] = self.preshared_key
+        if self.allowed_ips is not None:
+            fields["AllowedIPs"] = self.allowed_ips
+        if self.extra:
+            fields.update(self.extra)
+        return fields
+
+    def __repr__(self):
+        return f"Peer(name={self.name!r}, public_key={self.public_key!r}, allowed_ips={self.allowed_ips!r})"
+
+
+class ServerConfig:
+    """Разобранный wg0.conf с индексами по имени, ключу и IP."""
+
+    __slots__ = ("path", "stat_key", "size", "interface", "peers", "by_name", "by_name_lower", "by_key", "by_ip")
+
+    def __init__(self, interface, peers, size):
+        self.path = None
+        self.stat_key = None
+        self.size = size
+        self.interface = interface
+        self.peers = peers
+        self.by_name = {}
+        self.by_name_lower = {}
+        self.by_key = {}
+        self.by_ip = {}
+        for peer in peers:
+            if peer.name:
+                self.by_name.setdefault(peer.name, peer)
+                self.by_name_lower.setdefault(peer.name.lower(), peer)
+            if peer.public_key:
+                self.by_key[peer.public_key] = peer
+            for address in peer.addresses:
+                self.by_ip[address] = peer
+
+    def get_by_name(self, name, case_sensitive=True):
+        if case_sensitive:
+            return self.by_name.get(name)
+        return self.by_name_lower.get(name.lower())
+
+    def get_by_key(self, public_key):
+        return self.by_key.get(public_key)
+
+    def get_by_ip(self, address):
+        return self.by_ip.get(str(address).split("/")[0].strip())
+
+    def addresses(self):
+        """Все адреса пиров (без масок)."""
+        return list(self.by_ip)
+
+    def __len__(self):
+        return len(self.peers)
+
+
+def parse_server_config(lines):
+    """
+    Разбирает конфигурацию сервера за один проход.
+    :param lines: Итерируемый набор строк (открытый файл или список строк с переводами строк).
+    :return: Объект ServerConfig.
+    """
+    interface = {}
+    peers = []
+    section = None
+    current = None
+    pending_name = None
+    pending_start = None
+    offset = 0
+
+    for line in lines:
+        length = len(line.encode("utf-8"))
+        stripped = line.strip()
+
+        if stripped.startswith(CLIENT_MARKER):
+            if current is not None:
+                current.end = offset
+                current = None
+            pending_name = stripped[len(CLIENT_MARKER):].strip()
+            pending_start = offset
+            section = None
+        elif stripped == "[Peer]":
+            if current is not None:
+                current.end = offset
+            if pending_start is not None:
+                current = Peer(pending_name, pending_start)
+            else:
+                current = Peer(None, offset)
+            peers.append(current)
+            pending_name = pending_start = None
+            section = "peer"
+        elif stripped == "[Interface]":
+            if current is not None:
+                current.end = offset
+                current = None
+            pending_name = pending_start = None
+            section = "interface"
+        elif "=" in stripped and not stripped.startswith("#"):
+            key, value = stripped.split("=", 1)
+            key = key.strip()
+            value = value.strip()
+            if section == "peer" and current is not None:
+                if key == "PublicKey":
+                    current.public_key = value
+                elif key == "PresharedKey":
+                    current.preshared_key = value
+                elif key == "AllowedIPs":
+                    current.allowed_ips = value
+                else:
+                    if current.extra is None:
+                        current.extra = {}
+                    current.extra[key] = value
+            elif section == "interface":
+                # Ключи вроде PostUp могут повторяться — сохраняем все значения
+                if key in interface:
+                    interface[key] = f"{interface[key]}\n{value}"
+                else:
+                    interface[key] = value
+        offset += length
+
+    if current is not None:
+        current.end = offset
+    return ServerConfig(interface, peers, offset)
+
+
+def parse_server_config_text(content):
+    """Разбирает конфигурацию сервера из строки."""
+    return parse_server_config(content.splitlines(keepends=True))
+
+
+def stat_key(st):
+    """Ключ актуальности файла по результату os.stat()."""
+    return (st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def _stat_key(path):
+    try:
+        return stat_key(os.stat(path))
+    except (OSError, TypeError, ValueError):
+        return None
+
+
+def load_server_config(path=None):
+    """
+    Возвращает разобранный wg0.conf, используя кэш, пока файл не изменился.
+    :param path: Путь к конфигурации (по умолчанию settings.SERVER_CONFIG_FILE).
+    :return: Объект ServerConfig.
+    :raises FileNotFoundError: Если файл отсутствует.
+    """
+    path = str(path or settings.SERVER_CONFIG_FILE)
+    current = _stat_key(path)
+    if current is not None:
+        cached = _cache.get(path)
+        if cached is not None and cached.stat_key == current:
+            return cached
+
+    with open(path, "r") as file:
+        config = parse_server_config(file)
+    config.path = path
+    config.stat_key = current
+    if current is not None:
+        _cache[path] = config
+    return config
+
+
+def invalidate_cache(path=None):
+    """Сбрасывает кэш (для пути или полностью)."""
+    if path is None:
+        _cache.clear()
+    else:
+        _cache.pop(str(path), None)
+
+
+# --- Persistent index смещений блоков ---
+
+def peer_ranges(config):
+    """
+    Байтовые диапазоны именованных пиров.
+    :param config: Объект ServerConfig.
+    :return: Словарь {имя: [start, end, public_key]}.
+    """
+    ranges = {}
+    for peer in config.peers:
+        if peer.name:
+            ranges.setdefault(peer.name, [peer.start, peer.end, peer.public_key])
+    return ranges
+
+
+def _read_index_file():
+    try:
+        with open(settings.SERVER_CONFIG_INDEX_PATH, "r") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def load_peer_index(path, current_stat):
+    """
+    Возвращает сохранённые диапазоны пиров, если индекс соответствует файлу.
+    :param path: Путь к wg0.conf.
+    :param current_stat: Текущий ключ stat_key() файла.
+    :return: Словарь {имя: [start, end, public_key]} или None, если индекс устарел.
+    """
+    entry = _read_index_file().get(str(path))
+    if not entry or tuple(entry.get("stat", ())) != tuple(current_stat):
+        return None
+    return entry["peers"]
+
+
+def save_peer_index(path, current_stat, ranges):
+    """Сохраняет диапазоны пиров для файла (под блокировкой индекса, атомарной заменой)."""
+    index_path = str(settings.SERVER_CONFIG_INDEX_PATH)
+    with locked(index_path):
+        data = _read_index_file()
+        data[str(path)] = {"stat": list(current_stat), "peers": ranges}
+        atomic_write_json(index_path, data)
+
+
+def record_appended_peers(path, previous_stat, blocks):
+    """
+    Дописывает в индекс блоки, добавленные в конец файла.
+    Каждый блок начинается с пустой строки-разделителя, которая по правилам
+    разбора относится к предыдущему пиру. Если индекс не соответствовал файлу
+    до записи, он не обновляется и будет перестроен при следующем обращении.
+    :param blocks: Список кортежей (имя, public_key, размер блока в байтах).
+    """
+    ranges = load_peer_index(path, previous_stat)
+    current = _stat_key(path)
+    if ranges is None or current is None:
+        return
+    size = previous_stat[3]
+    for name, public_key, block_size in blocks:
+        for entry in ranges.values():
+            if entry[1] == size:
+                entry[1] = size + 1
+        ranges.setdefault(name, [size + 1, size + block_size, public_key])
+        size += block_size
+    save_peer_index(path, current, ranges)
+
+
+def record_appended_peer(path, previous_stat, name, public_key, block_size):
+    """Дописывает в индекс один блок, добавленный в конец файла."""
+    record_appended_peers(path, previous_stat, [(name, public_key, block_size)])
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+# modules/wg_dump.py
+## Сбор состояния пиров через `wg show <if> dump`.
+##
+## Вывод dump — строки с полями через табуляцию, без округления и локализации:
+## счётчики трафика приходят точными целыми байтами, время последнего
+## handshake — секундами Unix epoch (0 — handshake не было). Поэтому не нужно
+## разбирать "4.88 KiB" обратно в байты и делить строки по ":" (что ломает
+## IPv6-адреса endpoint).
+##
+## Результат хранится по колонкам (PeerTable): строки — в списках, числа — в
+## array('q'). Человекочитаемые значения для отчётов и интерфейса получаются
+## через format_bytes() и format_handshake().
+##
+## Бенчмарк разбора синтетического dump на 10 000 пиров:
+##   python3 -m modules.wg_dump [peers]
+
+import subprocess
+import time
+from array import array
+
+NONE_VALUE = "(none)"
+OFF_VALUE = "off"
+
+SIZE_UNITS = ("B", "KiB", "MiB", "GiB", "TiB")
+SIZE_MULTIPLIERS = {
+    "b": 1,
+    "kib": 1024, "mib": 1024 ** 2, "gib": 1024 ** 3, "tib": 1024 ** 4,
+    "kb": 1000, "mb": 1000 ** 2, "gb": 1000 ** 3, "tb": 1000 ** 4,
+}
+
+
+def _optional(value):
+    return None if value == NONE_VALUE else value
+
+
+class PeerTable:
+    """
+    Состояние пиров в колоночном виде.
+    Колонки: interfaces, public_keys, preshared_keys, endpoints, allowed_ips
+    (списки строк, None — значение отсутствует), latest_handshakes (epoch),
+    rx_bytes, tx_bytes, keepalives (array('q'), 0 — выключено).
+    """
+
+    __slots__ = (
+        "interfaces", "public_keys", "preshared_keys", "endpoints", "allowed_ips",
+        "latest_handshakes", "rx_bytes", "tx_bytes", "keepalives",
+        "interface_info", "_index",
+    )
+
+    def __init__(self):
+        self.interfaces = []
+        self.public_keys = []
+        self.preshared_keys = []
+        self.endpoints = []
+        self.allowed_ips = []
+        self.latest_handshakes = array("q")
+        self.rx_bytes = array("q")
+        self.tx_bytes = array("q")
+        self.keepalives = array("q")
+        self.interface_info = {}
+        self._index = None
+
+    def __len__(self):
+        return len(self.public_keys)
+
+    def __contains__(self, public_key):
+        return public_key in self.index
+
+    @property
+    def index(self):
+        """Словарь {public_key: номер строки} (строится при первом обращении)."""
+        if self._index is None:
+            self._index = {key: row for row, key in enumerate(self.public_keys)}
+        return self._index
+
+    def row(self, row):
+        """Строка таблицы в виде словаря."""
+        return {
+            "interface": self.interfaces[row],
+            "public_key": self.public_keys[row],
+            "preshared_key": self.preshared_keys[row],
+            "endpoint": self.endpoints[row],
+            "allowed_ips": self.allowed_ips[row],
+            "latest_handshake": self.latest_handshakes[row],
+            "rx_bytes": self.rx_bytes[row],
+            "tx_bytes": self.tx_bytes[row],
+            "persistent_keepalive": self.keepalives[row],
+        }
+
+    def get(self, public_key):
+        """Строка пира по публичному ключу или None."""
+        row = self.index.get(public_key)
+        return None if row is None else self.row(row)
+
+    def rows(self):
+        for row in range(len(self)):
+            yield self.row(row)
+
+
+def parse_dump(output, interface=None):
+    """
+    Разбирает вывод `wg show <if> dump` или `wg show all dump`.
+    :param output: Текст вывода.
+    :param interface: Имя интерфейса для `wg show <if> dump` (в выводе его нет);
+        для `all dump` имя берётся из первой колонки.
+    :return: PeerTable.
+    """
+    table = PeerTable()
+    peer_fields, interface_fields = (9, 5) if interface is None else (8, 4)
+    rows = []
+    for line in output.splitlines():
+        fields = line.split("\t")
+        if len(fields) == peer_fields:
+            rows.append(fields)
+        elif len(fields) == interface_fields:
+            name = fields[0] if interface is None else interface
+            table.interface_info[name] = _interface_fields(fields[-3:])
+    if not rows:
+        return table
+
+    # Транспонирование строк в колонки за один проход
+    columns = list(zip(*rows))
+    if interface is None:
+        table.interfaces = list(columns[0])
+        columns = columns[1:]
+    else:
+        table.interfaces = [interface] * len(rows)
+    table.public_keys = list(columns[0])
+    table.preshared_keys = [_optional(value) for value in columns[1]]
+    table.endpoints = [_optional(value) for value in columns[2]]
+    table.allowed_ips = [_optional(value) for value in columns[3]]
+    table.latest_handshakes = array("q", map(int, columns[4]))
+    table.rx_bytes = array("q", map(int, columns[5]))
+    table.tx_bytes = array("q", map(int, columns[6]))
+    table.keepalives = array("q", (0 if value == OFF_VALUE else int(value) for value in columns[7]))
+    return table
+
+
+def _interface_fields(fields):
+    public_key, listen_port, fwmark = fields
+    return {
+        "public_key": _optional(public_key),
+        "listen_port": int(listen_port) if listen_port.isdigit() else None,
+        "fwmark": None if fwmark == OFF_VALUE else fwmark,
+    }
+
+
+def collect_peers(interface="all"):
+    """
+    Снимает состояние пиров командой `wg show <interface> dump`.
+    :param interface: Имя интерфейса или "all".
+    :return: PeerTable.
+    :raises subprocess.CalledProcessError, OSError: Если `wg` недоступен или интерфейса нет.
+    """
+    output = subprocess.check_output(["wg", "show", interface, "dump"], text=True)
+    return parse_dump(output, None if interface == "all" else interface)
+
+
+def format_dump(table):
+    """
+    Таблица обратно в формат `wg show all dump` (для сохранения снимка на диск).
+    Секреты не записываются: приватные ключи интерфейсов и PSK заменяются на "(none)".
+    """
+    lines = [
+        "\t".join([
+            name, NONE_VALUE, info["public_key"] or NONE_VALUE,
+            str(info["listen_port"] or 0), info["fwmark"] or OFF_VALUE,
+        ])
+        for name, info in table.interface_info.items()
+    ]
+    for row in range(len(table)):
+        keepalive = table.keepalives[row]
+        lines.append("\t".join([
+            table.interfaces[row],
+            table.public_keys[row],
+            NONE_VALUE,
+            table.endpoints[row] or NONE_VALUE,
+            table.allowed_ips[row] or NONE_VALUE,
+            str(table.latest_handshakes[row]),
+            str(table.rx_bytes[row]),
+            str(table.tx_bytes[row]),
+            str(keepalive) if keepalive else OFF_VALUE,
+        ]))
+    return "\n".join(lines) + "\n"
+
+
+# --- Форматирование для отчётов ---
+
+def format_bytes(size):
+    """Байты в формате `wg show` (например, 4.88 KiB)."""
+    if size < 1024:
+        return f"{size} B"
+    value = float(size)
+    for unit in SIZE_UNITS[1:]:
+        value /= 1024
+        if value < 1024 or unit == SIZE_UNITS[-1]:
+            return f"{value:.2f} {unit}"
+
+
+def parse_bytes(text):
+    """
+    Размер вида "4.88 KiB" или "100.0 GB" в байты.
+    :return: int или None, если строка не распознана.
+    """
+    parts = str(text).split()
+    if len(parts) != 2 or parts[1].lower() not in SIZE_MULTIPLIERS:
+        return None
+    try:
+        return int(float(parts[0]) * SIZE_MULTIPLIERS[parts[1].lower()])
+    except ValueError:
+        return None
+
+
+def format_handshake(epoch, now=None):
+    """
+    Время с последнего handshake в формате `wg show` ("1 minute, 5 seconds ago").
+    :return: "N/A", если handshake не было.
+    """
+    if not epoch:
+        return "N/A"
+    seconds = max(0, int((time.time() if now is None else now) - epoch))
+    if seconds == 0:
+        return "Now"
+    parts = []
+    for name, length in (("day", 86400), ("hour", 3600), ("minute", 60), ("second", 1)):
+        amount, seconds = divmod(seconds, length)
+        if amount:
+            parts.append(f"{amount} {name}{'s' if amount != 1 else ''}")
+    return ", ".join(parts) + " ago"
+
+
+# --- Бенчмарк ---
+
+def synthetic_dump(count, interface="wg0", now=None):
+    """Синтетический вывод `wg show all dump` с count пирами (IPv6 endpoint у каждого второго)."""
+    now = int(time.time() if now is None else now)
+    lines = [f"{interface}\tprivate_key\tserver_public_key\t51820\toff"]
+    for n in range(count):
+        endpoint = f"[2001:db8::{n:x}]:{40000 + n % 20000}" if n % 2 else f"198.51.100.{n % 250}:{40000 + n % 20000}"
+        handshake = 0 if n % 10 == 0 else now - n % 3600
+        lines.append("\t".join([
+            interface, f"peer_key_{n:06d}=", f"psk_{n:06d}=", endpoint,
+            f"10.{n // 65536 % 256}.{n // 256 % 256}.{n % 256}/32",
+            str(handshake), str(n * 1531), str(n * 7919), "off" if n % 3 else "25",
+        ]))
+    return "\n".join(lines) + "\n"
+
+
+def synthetic_show(dump):
+    """Тот же набор пиров в человекочитаемом формате `wg show` (для сравнения)."""
+    table = parse_dump(dump)
+    lines = []
+    for row in table.rows():
+        lines.append(f"peer: {row['public_key']}")
+        lines.append(f"  preshared key: (hidden)")
+        if row["endpoint"]:
+            lines.append(f"  endpoint: {row['endpoint']}")
+        lines.append(f"  allowed ips: {row['allowed_ips']}")
+        if row["latest_handshake"]:
+            lines.append(f"  latest handshake: {format_handshake(row['latest_handshake'])}")
+        lines.append(f"  transfer: {format_bytes(row['rx_bytes'])} received, {format_bytes(row['tx_bytes'])} sent")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def _parse_show_text(output):
+    """
+    Разбор человекочитаемого `wg show` так, как это делали прежние парсеры
+    (split по ":" и пересчёт "4.88 KiB" в байты). Используется только в бенчмарке.
+    """
+    multiplier = {"b": 1, "kib": 1024, "mib": 1024 ** 2, "gib": 1024 ** 3, "tib": 1024 ** 4}
+    peers = {}
+    current = None
+    for line in output.splitlines():
+        if line.startswith("peer:"):
+            current = peers[line.split(":")[1].strip()] = {}
+        elif current is not None:
+            line = line.strip()
+            if line.startswith("endpoint:"):
+                current["endpoint"] = line.split(":")[1].strip()
+            elif line.startswith("allowed ips:"):
+                current["allowed_ips"] = line.split(":")[1].strip()
+            elif line.startswith("latest handshake:"):
+                current["latest_handshake"] = line.split(":")[1].strip()
+            elif line.startswith("transfer:"):
+                received, sent = line.split(":")[1].strip().split(", ")
+                for key, value in (("rx_bytes", received), ("tx_bytes", sent)):
+                    size, unit = value.split()[:2]
+                    current[key] = int(float(size) * multiplier[unit.lower()])
+    return peers
+
+
+def benchmark_parsers(count=10000, repeat=5):
+    """
+    Сравнивает разбор dump и текстового `wg show` на синтетических данных.
+    :param count: Количество пиров.
+    :param repeat: Количество повторов (берётся лучшее время).
+    :return: Словарь {"dump": секунды, "text": секунды, "speedup": во сколько раз быстрее}.
+    """
+    dump = synthetic_dump(count)
+    text = synthetic_show(dump)
+    results = {}
+    for name, parse, data in (("dump", parse_dump, dump), ("text", _parse_show_text, text)):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            parse(data)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = best
+    results["speedup"] = results["text"] / results["dump"] if results["dump"] > 0 else float("inf")
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    results = benchmark_parsers(count)
+    print(f"=== Бенчмарк разбора состояния WireGuard ({count} пиров) ===")
+    print(f"  wg show dump: {results['dump'] * 1000:8.1f} мс")
+    print(f"  wg show     : {results['text'] * 1000:8.1f} мс")
+    print(f"  ускорение   : {results['speedup']:.1f}x")
@@ -37,18 +37,64 @@ PROJECT_DIR = BASE_DIR  # Для совместимости, PROJECT_DIR рав
 # Пути к файлам и директориям
 WG_CONFIG_DIR = BASE_DIR / "user/data/wg_configs"  # Путь к конфигурациям WireGuard пользователей
 QR_CODE_DIR = BASE_DIR / "user/data/qrcodes"      # Путь к сохраненным QR-кодам
+CLIENT_SECRET_KEY_PATH = BASE_DIR / "user/data/client_secret.key"  # Ключ Fernet для приватных ключей клиентов (ленивый режим, права 0600)
+QR_CACHE_DIR = BASE_DIR / "user/data/qr_cache"    # Кэш QR-кодов по хэшу конфигурации (файлы в QR_CODE_DIR — ссылки на него)
 STALE_CONFIG_DIR = BASE_DIR / "user/data/usr_stale_config"  # Путь к устаревшим конфигурациям пользователей
-USER_DB_PATH = BASE_DIR / "user/data/user_records.json"  # База данных пользователей
+USER_DB_PATH = BASE_DIR / "user/data/user_records.json"  # JSON-выгрузка пользователей (источник миграции в USER_STORE_PATH)
+USER_STORE_PATH = BASE_DIR / "user/data/user_records.db"  # База данных пользователей (SQLite, WAL)
 IP_DB_PATH = BASE_DIR / "user/data/ip_records.json"      # База данных IP-адресов
+IP_BITMAP_DIR = BASE_DIR / "user/data/ip_pools"         # Битовые карты занятых IP-адресов (по файлу на пул)
 SERVER_CONFIG_FILE = Path("/etc/wireguard/wg0.conf")     # Путь к конфигурационному файлу сервера WireGuard
 PARAMS_FILE = Path("/etc/wireguard/params")             # Путь к файлу параметров WireGuard
+KEY_POOL_PATH = BASE_DIR / "user/data/key_pool.json"    # Пул заранее сгенерированных ключей (права 0600)
+SERVER_CONFIG_INDEX_PATH = BASE_DIR / "user/data/wg_peer_index.json"  # Байтовые смещения блоков [Peer] в wg0.conf
+TELEMETRY_DIR = BASE_DIR / "user/data/telemetry"        # Последний снимок состояния пиров
+TIMESERIES_DIR = BASE_DIR / "user/data/timeseries"      # История трафика пиров (сегменты временных рядов)
 
 # Параметры WireGuard
 DEFAULT_TRIAL_DAYS = 30  # Базовый срок действия аккаунта в днях
 WIREGUARD_PORT = 51820   # Порт для сервера WireGuard (по умолчанию) range [1-65535]
 DEFAULT_SUBNET = "10.66.66.0/24"
 USER_SET_SUBNET = DEFAULT_SUBNET
+# Упорядоченные IPv4-пулы для клиентов. Когда пул заполнен, выдача переходит к следующему.
+# Пустой список — использовать /24 сервера (SERVER_WG_IPV4), как раньше.
+# Пример: ADDRESS_POOLS = ["10.66.66.0/24", "10.67.0.0/16", "10.68.0.0/16"]
+ADDRESS_POOLS = []
+# IPv6-префикс для dual-stack адресов клиентов. None — взять SERVER_WG_IPV6/64 из params (если есть).
+IPV6_POOL = None
 DNS_WIREGUAED = "1.1.1.1, 1.0.0.1, 8.8.8.8" 
+KEYGEN_BACKEND = "auto"  # Бэкенд генерации ключей: "auto", "native" (cryptography) или "wg" (подпроцессы)
+KEY_POOL_WATERMARK = 64          # Целевая глубина пула ключей
+KEY_POOL_REFILL_BATCH = 16       # Максимум ключей, генерируемых за одну итерацию пополнения
+KEY_POOL_REFILL_INTERVAL = 5     # Пауза фонового пополнения пула (в секундах)
+CLIENT_ALLOWED_IPS = "0.0.0.0/0,::/0"  # AllowedIPs клиента по умолчанию (весь трафик в туннель)
+CLIENT_MTU = None                # MTU клиента по умолчанию (None — строка MTU не пишется)
+CLIENT_PERSISTENT_KEEPALIVE = None  # PersistentKeepalive клиента в секундах (None — не писать)
+CLIENT_CONFIG_TEMPLATE = None    # Путь к своему шаблону конфигурации клиента (None — встроенный)
+CLIENT_RERENDER_INTERVAL = 60    # Интервал проверки изменения параметров сервера для пересборки конфигураций (в секундах)
+CLIENT_FILES_MODE = "files"      # "files" — .conf и .png клиента на диске; "lazy" — зашифрованный ключ в базе, отрисовка по запросу
+CLIENT_RENDER_CACHE_SIZE = 256   # Размер LRU-кэша конфигураций и QR-кодов, отрисованных по запросу
+QR_BACKEND = "matrix"            # Бэкенд QR-кодов: "matrix" (без PIL), "pil" (qrcode + PIL) или "pyqrcode"
+QR_MASK_PATTERN = None           # Маска QR-кода 0..7; None — лучшая из 8 (медленнее в несколько раз)
+QR_CACHE_PRUNE_GRACE = 300      # Записи кэша QR-кодов моложе этого возраста не удаляются (в секундах)
+WG_APPLY_MAX_OPS = 64            # Больше изменений пиров — применять через `wg syncconf`, а не `wg set`
+TELEMETRY_INTERFACE = "all"      # Интерфейс для сбора телеметрии (`wg show <if> dump`)
+TELEMETRY_INTERVAL = 30          # Интервал выборки состояния пиров (в секундах)
+TELEMETRY_ACTIVE_WINDOW = 180    # Пир считается активным, если handshake был не раньше (в секундах)
+EXPIRY_MAX_SLEEP = 300           # Максимальный сон планировщика истечения между проверками (в секундах)
+# Снимать с интерфейса пиров, превысивших data_limit (после каждой выборки телеметрии).
+# Выключено по умолчанию: старые записи содержат шаблонный data_limit "100.0 GB" и не имеют
+# data_used_base, поэтому при включении давно работающие пиры будут приостановлены на первом же тике.
+# Перед включением задайте пользователям реальные лимиты (python3 -m modules.quota renew <username>).
+QUOTA_ENFORCEMENT = False
+QUOTA_REFRESH_INTERVAL = 60      # Интервал перечитывания лимитов пользователей из базы (в секундах)
+STATS_TABLE_PAGE_SIZE = 100      # Строк на странице таблицы статистики в админке
+DASHBOARD_INTERVAL = 5          # Интервал проверки нового снимка телеметрии вкладкой Dashboard (в секундах)
+DASHBOARD_MAX_ROWS = 50          # Пиров в таблице Dashboard (самые активные)
+DASHBOARD_SPARKLINE_MINUTES = 30 # Минут истории трафика в графике пира на вкладке Dashboard
+TIMESERIES_SEGMENT_RECORDS = 262144  # Записей в сегменте истории трафика (24 байта на запись)
+# Срок хранения рядов истории трафика в секундах (None — без ограничения)
+TIMESERIES_RETENTION = {"raw": 7 * 86400, "1m": 14 * 86400, "1h": 400 * 86400, "1d": None}
 
 # Настройки для логирования
 LOG_DIR = BASE_DIR / "user/data/logs"  # Директория для хранения логов
@@ -106,10 +152,17 @@ def check_paths():
         "PROJECT_DIR": PROJECT_DIR,
         "WG_CONFIG_DIR": WG_CONFIG_DIR,
         "QR_CODE_DIR": QR_CODE_DIR,
+        "QR_CACHE_DIR": QR_CACHE_DIR,
         "USER_DB_PATH": USER_DB_PATH,
+        "USER_STORE_PATH": USER_STORE_PATH,
         "IP_DB_PATH": IP_DB_PATH,
+        "IP_BITMAP_DIR": IP_BITMAP_DIR,
         "SERVER_CONFIG_FILE": SERVER_CONFIG_FILE,
         "PARAMS_FILE": PARAMS_FILE,
+        "KEY_POOL_PATH": KEY_POOL_PATH,
+        "SERVER_CONFIG_INDEX_PATH": SERVER_CONFIG_INDEX_PATH,
+        "TELEMETRY_DIR": TELEMETRY_DIR,
+        "TIMESERIES_DIR": TIMESERIES_DIR,
         "LOG_DIR": LOG_DIR,
         "DIAGNOSTICS_LOG": DIAGNOSTICS_LOG,
         "SUMMARY_REPORT_PATH": SUMMARY_REPORT_PATH,
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# helpers.py
+## Общая подготовка модульных тестов: временный каталог и подмена настроек.
+
+import os
+import sys
+import tempfile
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import settings
+from modules import user_store
+
+# Имена файлов и каталогов во временном каталоге для настроек-путей
+PATHS = {
+    "USER_STORE_PATH": "user_records.db",
+    "USER_DB_PATH": "user_records.json",
+    "SERVER_CONFIG_INDEX_PATH": "wg_peer_index.json",
+    "WG_CONFIG_DIR": "wg_configs",
+    "QR_CODE_DIR": "qrcodes",
+    "QR_CACHE_DIR": "qr_cache",
+    "STALE_CONFIG_DIR": "stale",
+    "IP_BITMAP_DIR": "ip_pools",
+    "KEY_POOL_PATH": "key_pool.json",
+    "TIMESERIES_DIR": "timeseries",
+    "TELEMETRY_DIR": "telemetry",
+    "CLIENT_SECRET_KEY_PATH": "client_secret.key",
+    "PARAMS_FILE": "params",
+}
+# База пользователей (SQLite и исходный JSON для миграции)
+USER_STORE = ("USER_STORE_PATH", "USER_DB_PATH")
+
+
+def isolated_settings(testcase, *paths, **overrides):
+    """
+    Создаёт временный каталог теста и подменяет настройки до конца теста.
+    Если подменена база пользователей, её соединения закрываются после теста.
+    :param testcase: unittest.TestCase (временный каталог — testcase.tmp_dir).
+    :param paths: Имена настроек из PATHS, которые указывают во временный каталог.
+    :param overrides: Прочие значения настроек.
+    :return: Путь к временному каталогу.
+    """
+    tmp_dir = tempfile.TemporaryDirectory()
+    testcase.addCleanup(tmp_dir.cleanup)
+    testcase.tmp_dir = tmp_dir
+    values = {name: os.path.join(tmp_dir.name, PATHS[name]) for name in paths}
+    values.update(overrides)
+    for name, value in values.items():
+        patcher = patch.object(settings, name, value)
+        patcher.start()
+        testcase.addCleanup(patcher.stop)
+    if "USER_STORE_PATH" in values:
+        testcase.addCleanup(user_store.close_connections)
+    return tmp_dir.name
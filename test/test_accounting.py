@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# test_accounting.py
+## Модульные тесты учёта трафика пиров (сбросы счётчиков и монотонные итоги).
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import settings
+from modules.accounting import INITIAL_ENTRIES, Ledger
+
+
+class TestLedger(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.path = os.path.join(self.tmp_dir.name, "accounting.bin")
+        self.ledger = Ledger(self.path, writable=True)
+        self.addCleanup(self.ledger.close)
+
+    def test_counter_regression(self):
+        """Тест: уменьшение счётчика считается сбросом, приращение — новое значение целиком."""
+        ledger = self.ledger
+        self.assertEqual(ledger.observe(0, 1000, 100, 50, 60), (1000, 100, False))
+        self.assertEqual(ledger.observe(0, 1500, 150, 80, 90), (500, 50, False))
+        self.assertEqual(ledger.observe(0, 200, 20, 120, 120), (200, 20, True))
+        self.assertEqual(ledger.total(0), [1700, 170])
+        self.assertEqual(ledger.resets, 1)
+
+    def test_handshake_regression(self):
+        """Тест: пир пересоздан (handshake уменьшился), а счётчики уже обогнали прежние."""
+        ledger = self.ledger
+        ledger.observe(0, 1000, 100, 500, 500)
+        self.assertEqual(ledger.observe(0, 3000, 300, 0, 600), (3000, 300, True))
+        self.assertEqual(ledger.observe(0, 3500, 350, 650, 660), (500, 50, False))
+        self.assertEqual(ledger.total(0), [4500, 450])
+
+    def test_growth_and_reader(self):
+        """Тест: файл учёта растёт под новые индексы, читатель видит итоги без перезапуска."""
+        reader = Ledger(self.path)
+        self.addCleanup(reader.close)
+        index = INITIAL_ENTRIES * 3
+        self.ledger.observe(5, 10, 20, 0, 1)
+        self.ledger.observe(index, 2 ** 40, 1, 0, 1)
+
+        self.assertEqual(reader.totals(), {5: [10, 20], index: [2 ** 40, 1]})
+        self.assertIsNone(reader.entry(6))
+        self.assertEqual(reader.total(6), [0, 0])
+
+    @patch("modules.update_wg_data.parse_wg_conf", return_value={"key_a": {"username": "alice", "allowed_ips": "10.66.66.2/32"}})
+    def test_update_wg_data_totals(self, mocked_conf):
+        """Тест: update_wg_data записывает точные итоги в байтах, переживая сброс счётчиков."""
+        from modules import update_wg_data
+
+        json_path = os.path.join(self.tmp_dir.name, "wg_users.json")
+        samples = [(5000, 1048576, 100), (7000, 1048577, 200), (10, 20, 300)]
+        with patch.object(settings, "TIMESERIES_DIR", os.path.join(self.tmp_dir.name, "timeseries")), \
+                patch.object(update_wg_data, "JSON_LOG_PATH", json_path):
+            for rx, tx, handshake in samples:
+                show = {"key_a": {"transfer": {"received": rx, "sent": tx}, "latest_handshake": handshake, "endpoint": None}}
+                with patch("modules.update_wg_data.parse_wg_show", return_value=show):
+                    update_wg_data.update_data()
+
+            with open(json_path) as file:
+                user = json.load(file)["users"]["alice"]
+        self.assertEqual(user["total_bytes"], {"received": 7010, "sent": 1048597})
+        self.assertEqual(user["total_transfer"]["received"], "6.85 KiB")
+
+
+if __name__ == "__main__":
+    unittest.main()
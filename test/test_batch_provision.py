@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# test_batch_provision.py
+## Модульные тесты пакетного создания пользователей.
+
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import settings
+from modules import user_store
+from modules.batch_provision import provision_users, read_users_file
+from modules.ip_allocator import _bitmaps
+from modules.wg_config_parser import invalidate_cache, load_server_config
+from test.helpers import USER_STORE, isolated_settings
+
+PARAMS = {
+    "SERVER_PUB_IP": "203.0.113.1",
+    "SERVER_PORT": "51820",
+    "SERVER_PUB_KEY": "server_public_key",
+    "CLIENT_DNS_1": "1.1.1.1",
+    "CLIENT_DNS_2": "8.8.8.8",
+    "SERVER_WG_IPV4": "10.66.66.1",
+    "SERVER_WG_IPV6": "fd42:42:42::1",
+}
+
+
+class TestBatchProvision(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(invalidate_cache)
+        base = isolated_settings(
+            self, *USER_STORE, "WG_CONFIG_DIR", "QR_CODE_DIR", "QR_CACHE_DIR", "IP_BITMAP_DIR", "KEY_POOL_PATH",
+            "SERVER_CONFIG_INDEX_PATH", ADDRESS_POOLS=[], IPV6_POOL=None,
+        )
+        self.addCleanup(self._close_bitmaps)
+
+        self.config_file = os.path.join(base, "wg0.conf")
+        with open(self.config_file, "w") as file:
+            file.write("[Interface]\nAddress = 10.66.66.1/24\n"
+                       "\n### Client existing\n[Peer]\nPublicKey = key_existing\nAllowedIPs = 10.66.66.2/32\n")
+
+    def _close_bitmaps(self):
+        for path in [path for path in _bitmaps if path.startswith(self.tmp_dir.name)]:
+            _bitmaps.pop(path).close()
+
+    def test_read_users_file(self):
+        """Тест: чтение CSV (с заголовком и без) и JSONL."""
+        csv_path = os.path.join(self.tmp_dir.name, "users.csv")
+        with open(csv_path, "w") as file:
+            file.write("username,email\nalice,alice@example.com\n\nbob,\n")
+        plain_path = os.path.join(self.tmp_dir.name, "plain.csv")
+        with open(plain_path, "w") as file:
+            file.write("carol,carol@example.com,12345\n")
+        jsonl_path = os.path.join(self.tmp_dir.name, "users.jsonl")
+        with open(jsonl_path, "w") as file:
+            file.write('{"username": "dave", "telegram_id": "777"}\n')
+
+        self.assertEqual(read_users_file(csv_path), [
+            {"username": "alice", "email": "alice@example.com", "telegram_id": "N/A"},
+            {"username": "bob", "email": "N/A", "telegram_id": "N/A"},
+        ])
+        self.assertEqual(read_users_file(plain_path)[0]["telegram_id"], "12345")
+        self.assertEqual(read_users_file(jsonl_path)[0]["telegram_id"], "777")
+
+    def test_provision_batch(self):
+        """Тест: пакет пользователей записывается в wg0.conf и базу за один проход."""
+        users = [{"username": f"user{n}", "email": "N/A", "telegram_id": "N/A"} for n in range(20)]
+        users.append({"username": "EXISTING", "email": "N/A", "telegram_id": "N/A"})
+        users.append({"username": "user0", "email": "N/A", "telegram_id": "N/A"})
+
+        report = provision_users(users, PARAMS, self.config_file, workers=2, apply=False)
+
+        self.assertEqual(len(report["created"]), 20)
+        self.assertEqual(sorted(report["skipped"]), ["EXISTING", "user0"])
+        self.assertGreater(report["users_per_sec"], 0)
+
+        config = load_server_config(self.config_file)
+        self.assertEqual(len(config), 21)
+        addresses = [address for address in config.addresses() if "." in address]
+        self.assertEqual(len(set(addresses)), 21)
+        self.assertNotIn("10.66.66.1", addresses)
+        self.assertIn("fd42:42:42::", config.get_by_name("user0").allowed_ips)
+
+        records = user_store.get_users()
+        self.assertEqual(len(records), 20)
+        self.assertEqual(records["user5"]["public_key"], config.get_by_name("user5").public_key)
+        for name in ("user0", "user19"):
+            self.assertTrue(os.path.exists(os.path.join(settings.WG_CONFIG_DIR, f"{name}.conf")))
+            self.assertTrue(os.path.exists(os.path.join(settings.QR_CODE_DIR, f"{name}.png")))
+
+    def test_addresses_released_on_failure(self):
+        """Тест: при ошибке записи адреса возвращаются в пул, а wg0.conf не меняется."""
+        users = [{"username": "alice", "email": "N/A", "telegram_id": "N/A"}]
+        with open(self.config_file) as file:
+            before = file.read()
+        with patch("modules.batch_provision._write_user_files", side_effect=OSError("disk full")):
+            with self.assertRaises(OSError):
+                provision_users(users, PARAMS, self.config_file, workers=1, apply=False)
+        with open(self.config_file) as file:
+            self.assertEqual(file.read(), before)
+
+        report = provision_users(users, PARAMS, self.config_file, workers=1, apply=False)
+        self.assertEqual(load_server_config(self.config_file).get_by_name("alice").addresses[0], "10.66.66.3")
+        self.assertEqual(report["created"], ["alice"])
+
+    def test_lazy_mode(self):
+        """Тест: в ленивом режиме файлы клиентов не пишутся, ключ шифруется в записи."""
+        from modules import client_render
+
+        key_path = os.path.join(self.tmp_dir.name, "client_secret.key")
+        with patch.object(settings, "CLIENT_FILES_MODE", "lazy"), \
+                patch.object(settings, "CLIENT_SECRET_KEY_PATH", key_path), \
+                patch.object(client_render, "_fernet", None):
+            users = [{"username": "alice", "email": "N/A", "telegram_id": "N/A"}]
+            provision_users(users, PARAMS, self.config_file, workers=1, apply=False)
+            token = user_store.get_user("alice")[client_render.SECRET_FIELD]
+            private_key = client_render.decrypt_key(token)
+
+        self.assertEqual(len(private_key), 44)
+        self.assertFalse(os.path.exists(os.path.join(settings.WG_CONFIG_DIR, "alice.conf")))
+        self.assertFalse(os.path.exists(os.path.join(settings.QR_CODE_DIR, "alice.png")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# test_client_render.py
+## Модульные тесты отрисовки конфигураций и QR-кодов клиентов по запросу.
+
+import os
+import stat
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import settings
+from modules import client_render, user_store
+from test.helpers import USER_STORE, isolated_settings
+
+PRIVATE_KEY = b"cHJpdmF0ZV9rZXlfcHJpdmF0ZV9rZXlfcHJpdmF0ZV8="
+PARAMS = """[server]
+SERVER_PUB_IP=203.0.113.1
+SERVER_PORT=51820
+SERVER_PUB_KEY=server_public_key
+CLIENT_DNS_1=1.1.1.1
+CLIENT_DNS_2=8.8.8.8
+"""
+
+
+class TestClientRender(unittest.TestCase):
+
+    def setUp(self):
+        isolated_settings(
+            self, *USER_STORE, "WG_CONFIG_DIR", "QR_CODE_DIR", "QR_CACHE_DIR", "CLIENT_SECRET_KEY_PATH",
+            "PARAMS_FILE", CLIENT_FILES_MODE="lazy",
+        )
+        self.params_file = settings.PARAMS_FILE
+        self.write_params(PARAMS)
+        self.addCleanup(self._reset)
+        self._reset()
+
+    def _reset(self):
+        client_render._fernet = None
+        client_render._profile = (None, None)
+        client_render._cache = client_render.RenderCache(maxsize=8)
+
+    def write_params(self, text):
+        with open(self.params_file, "w") as file:
+            file.write(text)
+        # Разные mtime для последовательных записей в одном тесте
+        os.utime(self.params_file, ns=(0, os.stat(self.params_file).st_mtime_ns + 1_000_000))
+
+    def save_lazy_user(self, name="alice"):
+        record = {"allowed_ips": "10.66.66.2/32,fd42:42:42::2/128", "preshared_key": "psk_value"}
+        user_store.save_user(name, client_render.protect_record(record, PRIVATE_KEY))
+        return record
+
+    def test_encrypted_record(self):
+        """Тест: в записи хранится только зашифрованный ключ, файл ключа с правами 0600."""
+        record = self.save_lazy_user()
+        self.assertNotIn(PRIVATE_KEY.decode(), str(user_store.get_user("alice")))
+        self.assertEqual(client_render.decrypt_key(record[client_render.SECRET_FIELD]), PRIVATE_KEY)
+        mode = stat.S_IMODE(os.stat(settings.CLIENT_SECRET_KEY_PATH).st_mode)
+        self.assertEqual(mode, 0o600)
+
+        client_render._fernet = None
+        with open(settings.CLIENT_SECRET_KEY_PATH, "wb") as file:
+            file.write(client_render.Fernet.generate_key())
+        with self.assertRaises(ValueError):
+            client_render.decrypt_key(record[client_render.SECRET_FIELD])
+
+    def test_render_from_memory(self):
+        """Тест: конфигурация и QR-код собираются из записи без файлов и кэшируются."""
+        self.save_lazy_user()
+        config = client_render.render_config("alice")
+        self.assertIn(f"PrivateKey = {PRIVATE_KEY.decode()}", config)
+        self.assertIn("Address = 10.66.66.2/32,fd42:42:42::2/128", config)
+        self.assertIn("Endpoint = 203.0.113.1:51820", config)
+        self.assertTrue(client_render.render_qr("alice").startswith(b"\x89PNG"))
+        self.assertFalse(os.path.exists(settings.WG_CONFIG_DIR))
+        self.assertFalse(os.path.exists(settings.QR_CODE_DIR))
+
+        misses = client_render.get_cache().stats()["misses"]
+        client_render.render_config("alice")
+        client_render.render_qr("alice")
+        self.assertEqual(client_render.get_cache().stats()["misses"], misses)
+
+        with self.assertRaises(KeyError):
+            client_render.render_config("nobody")
+
+    def test_endpoint_rotation_and_record_changes(self):
+        """Тест: смена endpoint в params и изменение записи сразу меняют результат."""
+        self.save_lazy_user()
+        client_render.render_config("alice")
+        self.write_params(PARAMS.replace("203.0.113.1", "198.51.100.7"))
+        self.assertIn("Endpoint = 198.51.100.7:51820", client_render.render_config("alice"))
+
+        user_store.update_user("alice", {"preshared_key": "rotated_psk"})
+        self.assertIn("PresharedKey = rotated_psk", client_render.render_config("alice"))
+
+    def test_lru_bound(self):
+        """Тест: кэш ограничен и вытесняет давно не использованные элементы."""
+        cache = client_render.RenderCache(maxsize=2)
+        for key in ("a", "b", "a", "c"):
+            cache.get(key, lambda: key.upper())
+        self.assertEqual(cache.stats()["size"], 2)
+        self.assertEqual(cache.get("a", lambda: "rebuilt"), "A")
+        self.assertEqual(cache.get("b", lambda: "rebuilt"), "rebuilt")
+
+    def test_migrate_to_lazy(self):
+        """Тест: перевод в ленивый режим шифрует ключ из файла и удаляет файлы клиента."""
+        os.makedirs(settings.WG_CONFIG_DIR)
+        os.makedirs(settings.QR_CODE_DIR)
+        config_path = os.path.join(settings.WG_CONFIG_DIR, "bob.conf")
+        with open(config_path, "w") as file:
+            file.write(f"[Interface]\nPrivateKey = {PRIVATE_KEY.decode()}\nAddress = 10.66.66.3/32\n")
+        open(os.path.join(settings.QR_CODE_DIR, "bob.png"), "wb").close()
+        user_store.save_user("bob", {"allowed_ips": "10.66.66.3/32", "preshared_key": "psk_value"})
+
+        self.assertEqual(client_render.render_config("bob").count("PrivateKey"), 1)  # из файла
+        self.assertEqual(client_render.migrate_to_lazy(), 1)
+        self.assertEqual(os.listdir(settings.WG_CONFIG_DIR) + os.listdir(settings.QR_CODE_DIR), [])
+        self.assertIn(f"PrivateKey = {PRIVATE_KEY.decode()}", client_render.render_config("bob"))
+        self.assertEqual(client_render.migrate_to_lazy(), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
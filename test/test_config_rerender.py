@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# test_config_rerender.py
+## Модульные тесты шаблонов конфигураций клиентов и их пересборки.
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import settings
+from modules import client_config, client_render, config_rerender, user_store
+from test.helpers import USER_STORE, isolated_settings
+
+PRIVATE_KEY = b"cHJpdmF0ZV9rZXlfcHJpdmF0ZV9rZXlfcHJpdmF0ZV8="
+PARAMS = """[server]
+SERVER_PUB_IP=203.0.113.1
+SERVER_PORT=51820
+SERVER_PUB_KEY=server_public_key
+CLIENT_DNS_1=1.1.1.1
+CLIENT_DNS_2=8.8.8.8
+"""
+
+
+class TestClientConfigTemplate(unittest.TestCase):
+
+    def render(self, **kwargs):
+        return client_config.create_client_config(
+            PRIVATE_KEY, "10.66.66.2", "1.1.1.1,8.8.8.8", "server_public_key", b"psk", "203.0.113.1:51820",
+            **kwargs,
+        )
+
+    def test_default_output(self):
+        """Тест: без дополнительных параметров конфигурация совпадает с прежним форматом."""
+        self.assertEqual(self.render(address_v6="fd42:42:42::2"), (
+            "[Interface]\n"
+            f"PrivateKey = {PRIVATE_KEY.decode()}\n"
+            "Address = 10.66.66.2/32,fd42:42:42::2/128\n"
+            "DNS = 1.1.1.1,8.8.8.8\n"
+            "\n"
+            "[Peer]\n"
+            "PublicKey = server_public_key\n"
+            "PresharedKey = psk\n"
+            "Endpoint = 203.0.113.1:51820\n"
+            "AllowedIPs = 0.0.0.0/0,::/0"
+        ))
+
+    def test_options(self):
+        """Тест: раздельный туннель, MTU и keepalive попадают в конфигурацию."""
+        config = self.render(allowed_ips="10.66.66.0/24", mtu=1420, persistent_keepalive=25)
+        self.assertIn("AllowedIPs = 10.66.66.0/24\n", config)
+        self.assertIn("MTU = 1420\n", config)
+        self.assertTrue(config.endswith("PersistentKeepalive = 25"))
+
+        template = client_config.compile_template("[Interface]\nPrivateKey = {private_key}\n# {mtu}")
+        self.assertIs(template, client_config.compile_template(template.text))
+        self.assertEqual(self.render(template=template), f"[Interface]\nPrivateKey = {PRIVATE_KEY.decode()}")
+        with self.assertRaises(ValueError):
+            client_config.ConfigTemplate("MTU = {mtu:d}")
+
+    def test_user_options(self):
+        """Тест: заполнители по умолчанию в записи не переопределяют параметры сервера."""
+        record = {"allowed_ips": "10.66.66.2/32", "allowed_ips_custom": "10.66.66.2/32",
+                  "dns_custom": "1.1.1.1,8.8.8.8", "mtu": None}
+        self.assertEqual(client_config.user_options(record), {})
+        record.update(allowed_ips_custom="10.0.0.0/8", dns_custom="9.9.9.9", mtu=1380)
+        self.assertEqual(client_config.user_options(record),
+                         {"allowed_ips": "10.0.0.0/8", "dns_servers": "9.9.9.9", "mtu": 1380})
+
+
+class TestConfigRerender(unittest.TestCase):
+
+    def setUp(self):
+        isolated_settings(
+            self, *USER_STORE, "WG_CONFIG_DIR", "QR_CODE_DIR", "QR_CACHE_DIR", "CLIENT_SECRET_KEY_PATH", "PARAMS_FILE",
+        )
+        self.params_file = settings.PARAMS_FILE
+        self.write_params(PARAMS)
+        client_render._profile = (None, None)
+        self.addCleanup(setattr, client_render, "_profile", (None, None))
+
+        os.makedirs(settings.WG_CONFIG_DIR)
+        for name, address in (("alice", "10.66.66.2/32"), ("bob", "10.66.66.3/32")):
+            record = {"allowed_ips": address, "preshared_key": "psk_value"}
+            user_store.save_user(name, record)
+            with open(self.conf(name), "w") as file:
+                file.write(client_render.build_config(record, client_render.server_profile()[1], PRIVATE_KEY))
+
+    def write_params(self, text):
+        with open(self.params_file, "w") as file:
+            file.write(text)
+        os.utime(self.params_file, ns=(0, os.stat(self.params_file).st_mtime_ns + 1_000_000))
+
+    def conf(self, name):
+        return os.path.join(settings.WG_CONFIG_DIR, f"{name}.conf")
+
+    def test_rerender_on_params_change(self):
+        """Тест: пересборка только при смене параметров и только изменившихся файлов."""
+        self.assertIsNone(config_rerender.rerender_if_changed(workers=2))
+        report = config_rerender.rerender_if_changed(workers=2, force=True)
+        self.assertEqual((report["changed"], report["unchanged"]), ([], 2))
+        self.assertTrue(os.path.exists(os.path.join(settings.QR_CODE_DIR, "alice.png")))
+        self.assertIsNone(config_rerender.rerender_if_changed())
+
+        self.write_params(PARAMS.replace("203.0.113.1", "198.51.100.7"))
+        mtime = os.stat(self.conf("bob")).st_mtime_ns
+        report = config_rerender.rerender_if_changed(workers=2)
+        self.assertEqual(sorted(report["changed"]), ["alice", "bob"])
+        with open(self.conf("alice")) as file:
+            text = file.read()
+        self.assertIn("Endpoint = 198.51.100.7:51820", text)
+        self.assertIn(f"PrivateKey = {PRIVATE_KEY.decode()}", text)
+        self.assertNotEqual(os.stat(self.conf("bob")).st_mtime_ns, mtime)
+
+    def test_first_run_keeps_files(self):
+        """Тест: первый запуск только сохраняет подпись, файлы старого формата не переписываются."""
+        legacy = f"[Interface]\nPrivateKey = {PRIVATE_KEY.decode()}\nAddress = 10.66.66.2\nDNS = 1.1.1.1,8.8.8.8\n"
+        with open(self.conf("alice"), "w") as file:
+            file.write(legacy)
+        self.assertIsNone(config_rerender.rerender_if_changed())
+        with open(self.conf("alice")) as file:
+            self.assertEqual(file.read(), legacy)
+        self.assertFalse(os.path.exists(os.path.join(settings.QR_CODE_DIR, "alice.png")))
+        self.assertIsNone(config_rerender.rerender_if_changed())
+
+    def test_per_user_options(self):
+        """Тест: параметры записи пользователя применяются только к его конфигурации."""
+        user_store.update_user("alice", {"allowed_ips_custom": "10.66.66.0/24", "mtu": 1420})
+        os.remove(self.conf("bob"))
+        report = config_rerender.rerender_all(workers=1)
+        self.assertEqual((report["changed"], report["missing"]), (["alice"], ["bob"]))
+        with open(self.conf("alice")) as file:
+            text = file.read()
+        self.assertIn("AllowedIPs = 10.66.66.0/24", text)
+        self.assertIn("MTU = 1420", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,15 @@
 import unittest
 import sys
 import os
+import stat
+import tempfile
 from unittest.mock import mock_open, patch
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
-from modules.config_writer import add_user_to_server_config, remove_user_from_server_config
+from modules.config_writer import (
+    add_user_to_server_config,
+    remove_user_from_server_config,
+    remove_users_from_server_config,
+)
 
 
 class TestConfigWriter(unittest.TestCase):
@@ -11,7 +17,9 @@ class TestConfigWriter(unittest.TestCase):
     @patch("builtins.open", new_callable=mock_open)
     def test_add_user_to_server_config(self, mock_open_func):
         """Тест: добавление пользователя в конфигурационный файл."""
-        config_file = "mock_config.conf"
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        config_file = os.path.join(tmp_dir.name, "mock_config.conf")
         nickname = "testuser"
         public_key = "mock_public_key"
         preshared_key = "mock_preshared_key"
@@ -30,38 +38,44 @@ class TestConfigWriter(unittest.TestCase):
         mock_open_func().write.assert_any_call(f"PresharedKey = {preshared_key}\n")
         mock_open_func().write.assert_any_call(f"AllowedIPs = {allowed_ips}\n")
 
-    @patch("os.path.exists", return_value=True)
-    @patch("builtins.open", new_callable=mock_open)
-    def test_remove_user_from_server_config(self, mock_open_func, mock_exists):
+    def _write_config(self, content):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        index_patcher = patch("modules.wg_config_parser.settings.SERVER_CONFIG_INDEX_PATH",
+                              os.path.join(tmp_dir.name, "wg_peer_index.json"))
+        index_patcher.start()
+        self.addCleanup(index_patcher.stop)
+        config_file = os.path.join(tmp_dir.name, "wg0.conf")
+        with open(config_file, "w") as file:
+            file.write(content)
+        os.chmod(config_file, 0o600)
+        return config_file
+
+    def _read_config(self, config_file):
+        with open(config_file, "r") as file:
+            return file.read()
+
+    def test_remove_user_from_server_config(self):
         """Тест: удаление пользователя из конфигурационного файла."""
-        config_file = "mock_config.conf"
-        nickname = "testuser"
-
-        # Исходное содержимое файла
-        mock_open_func().readlines.return_value = [
-            "### Client testuser\n",
-            "[Peer]\n",
-            "PublicKey = mock_public_key\n",
-            "PresharedKey = mock_preshared_key\n",
-            "AllowedIPs = 10.0.0.2/32\n",
-            "\n",
-            "### Client otheruser\n",
-            "[Peer]\n",
-            "PublicKey = other_public_key\n",
-            "PresharedKey = other_preshared_key\n",
-            "AllowedIPs = 10.0.0.3/32\n",
-            "\n",
-        ]
+        config_file = self._write_config(
+            "### Client testuser\n"
+            "[Peer]\n"
+            "PublicKey = mock_public_key\n"
+            "PresharedKey = mock_preshared_key\n"
+            "AllowedIPs = 10.0.0.2/32\n"
+            "\n"
+            "### Client otheruser\n"
+            "[Peer]\n"
+            "PublicKey = other_public_key\n"
+            "PresharedKey = other_preshared_key\n"
+            "AllowedIPs = 10.0.0.3/32\n"
+            "\n"
+        )
 
         # Вызов функции
-        remove_user_from_server_config(config_file, nickname)
-
-        # Проверяем, что файл был открыт для чтения и записи
-        mock_open_func.assert_any_call(config_file, 'r')
-        mock_open_func.assert_any_call(config_file, 'w')
+        self.assertEqual(remove_user_from_server_config(config_file, "testuser"), ["testuser"])
 
         # Проверяем, что записи testuser удалены
-        written_data = "".join(call[0][0] for call in mock_open_func().write.call_args_list)
         expected_data = (
             "### Client otheruser\n"
             "[Peer]\n"
@@ -70,13 +84,53 @@ class TestConfigWriter(unittest.TestCase):
             "AllowedIPs = 10.0.0.3/32\n"
             "\n"
         )
-        self.assertEqual(written_data, expected_data)
+        self.assertEqual(self._read_config(config_file), expected_data)
+        self.assertEqual(stat.S_IMODE(os.stat(config_file).st_mode), 0o600)
+
+    def test_remove_users_batch_with_index(self):
+        """Тест: пакетное удаление по индексу смещений, в том числе после добавления пиров."""
+        config_file = self._write_config("[Interface]\nListenPort = 51820\n")
+        for number in range(1, 6):
+            add_user_to_server_config(config_file, f"user{number}", f"key{number}", f"psk{number}", f"10.0.0.{number + 1}")
+
+        # Индекс заполняется при первом удалении и дальше поддерживается при добавлении
+        self.assertEqual(remove_users_from_server_config(config_file, ["user2"]), ["user2"])
+        add_user_to_server_config(config_file, "user6", "key6", "psk6", "10.0.0.7")
+        removed = remove_users_from_server_config(config_file, ["user1", "user4", "user6", "missing"])
+        self.assertEqual(sorted(removed), ["user1", "user4", "user6"])
+
+        content = self._read_config(config_file)
+        self.assertEqual(content, (
+            "[Interface]\nListenPort = 51820\n"
+            "\n### Client user3\n[Peer]\nPublicKey = key3\nPresharedKey = psk3\nAllowedIPs = 10.0.0.4/32\n"
+            "\n### Client user5\n[Peer]\nPublicKey = key5\nPresharedKey = psk5\nAllowedIPs = 10.0.0.6/32\n"
+        ))
+        self.assertEqual(remove_users_from_server_config(config_file, ["user5"]), ["user5"])
+        self.assertNotIn("user5", self._read_config(config_file))
+
+    def test_remove_user_stale_index(self):
+        """Тест: при ручном изменении файла индекс не используется и файл разбирается заново."""
+        config_file = self._write_config("")
+        add_user_to_server_config(config_file, "alpha", "key_a", "psk_a", "10.0.0.2")
+        add_user_to_server_config(config_file, "beta", "key_b", "psk_b", "10.0.0.3")
+        remove_users_from_server_config(config_file, ["missing"])
+
+        content = self._read_config(config_file)
+        with open(config_file, "w") as file:
+            file.write("# manual edit\n" + content)
+        remove_user_from_server_config(config_file, "beta")
+        self.assertEqual(
+            self._read_config(config_file),
+            "# manual edit\n\n### Client alpha\n[Peer]\nPublicKey = key_a\nPresharedKey = psk_a\nAllowedIPs = 10.0.0.2/32\n",
+        )
 
     @patch("os.path.exists", return_value=False)
     @patch("builtins.open", new_callable=mock_open)
     def test_remove_user_from_nonexistent_file(self, mock_open_func, mock_exists):
         """Тест: попытка удаления пользователя из несуществующего файла."""
-        config_file = "mock_config.conf"
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        config_file = os.path.join(tmp_dir.name, "mock_config.conf")
         nickname = "testuser"
 
         # Вызов функции
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# test_dashboard_model.py
+## Модульные тесты модели вкладки Dashboard.
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from gradio_admin.functions import dashboard_model
+from modules import timeseries, user_store
+from modules.telemetry import Snapshot
+from modules.wg_dump import parse_dump
+from test.helpers import USER_STORE, isolated_settings
+
+T0 = 1700000000 - 1700000000 % 86400  # начало суток
+
+
+def snapshot(taken_at, peers):
+    """Снимок из списка (public_key, handshake, rx, tx)."""
+    lines = [f"wg0\tkey_{key}\tpsk\t198.51.100.{n + 1}:51820\t10.66.66.{n + 2}/32\t{handshake}\t{rx}\t{tx}\toff"
+             for n, (key, handshake, rx, tx) in enumerate(peers)]
+    return Snapshot(taken_at, parse_dump("\n".join(lines)))
+
+
+class TestDashboard(unittest.TestCase):
+
+    def setUp(self):
+        isolated_settings(self, *USER_STORE, "TIMESERIES_DIR")
+        user_store.save_user("alice", {"public_key": "key_a"})
+
+    def test_sparkline(self):
+        """Тест: график масштабируется по максимуму ряда, пустой ряд — нижние блоки."""
+        self.assertEqual(dashboard_model.sparkline([0, 7, 14]), "▁▅█")
+        self.assertEqual(dashboard_model.sparkline([0, 0]), "▁▁")
+
+    def test_deltas(self):
+        """Тест: скорости по соседним снимкам, дельта строк и холостое обновление."""
+        dashboard = dashboard_model.Dashboard(max_rows=2, minutes=3)
+        first = dashboard.update(snapshot(T0, [("a", T0 - 10, 1000, 0), ("b", T0 - 10, 0, 0), ("c", 0, 0, 0)]))
+        self.assertEqual(first["order"], ["key_a", "key_b"])
+        self.assertIsNone(dashboard.update(snapshot(T0, [])))
+
+        delta = dashboard.update(snapshot(T0 + 10, [("a", T0 - 10, 1000, 0), ("b", T0 - 10, 0, 0),
+                                                    ("c", T0 + 5, 20480, 10240)]))
+        self.assertEqual(delta["order"], ["key_c", "key_a"])
+        self.assertEqual(delta["removed"], ["key_b"])
+        self.assertEqual(sorted(delta["changed"]), ["key_a", "key_c"])  # у key_a сменился возраст handshake
+        self.assertEqual(delta["version"], 2)
+        rows = dashboard.rows()
+        self.assertEqual(rows[0][0], "key_c…")
+        self.assertEqual(rows[0][3:5], ["2.00 KiB/s", "1.00 KiB/s"])
+        self.assertEqual(rows[1][0], "alice")
+        summary = dashboard.summary()
+        self.assertEqual((summary["peers"], summary["active"]), (3, 3))
+
+        # Те же скорости и возраст handshake — строки не меняются
+        delta = dashboard.update(snapshot(T0 + 20, [("a", T0, 1000, 0), ("b", T0, 0, 0),
+                                                    ("c", T0 + 15, 40960, 20480)]))
+        self.assertEqual((delta["changed"], delta["removed"], delta["order"], delta["version"]), ({}, [], None, 2))
+
+    def test_sparklines_from_history(self):
+        """Тест: график пира строится по закрытым минутам свёртки 1m."""
+        store = timeseries.open_writer()
+        self.addCleanup(store.close)
+        for minute, rx in enumerate((0, 100, 300, 600, 600)):
+            store.append_sample(T0 + minute * 60, [("key_a", rx, 0, 0)])
+        store.flush()
+
+        dashboard = dashboard_model.Dashboard(minutes=3)
+        dashboard.update(snapshot(T0 + 4 * 60, [("a", T0, 600, 0)]))
+        self.assertEqual(dashboard.rows()[0][5], "▃▆█")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# test_expiry_scheduler.py
+## Модульные тесты планировщика истечения аккаунтов (этапы suspend и delete).
+
+import os
+import sqlite3
+import sys
+import time
+import unittest
+from datetime import datetime
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import settings
+from modules import expiry_scheduler, user_store
+from modules.ip_allocator import _bitmaps, get_address_allocator
+from test.helpers import USER_STORE, isolated_settings
+
+NOW = 1700000000
+
+
+def iso(epoch):
+    return datetime.fromtimestamp(epoch).isoformat()
+
+
+class TestExpiryScheduler(unittest.TestCase):
+
+    def setUp(self):
+        base = isolated_settings(
+            self, *USER_STORE, "SERVER_CONFIG_INDEX_PATH", "WG_CONFIG_DIR", "QR_CODE_DIR", "QR_CACHE_DIR",
+            "STALE_CONFIG_DIR", "IP_BITMAP_DIR",
+        )
+        self.config_file = os.path.join(base, "wg0.conf")
+        patcher = patch("modules.expiry_scheduler.apply_peer_changes")
+        self.apply_peer_changes = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self._close_bitmaps)
+
+        with open(self.config_file, "w") as file:
+            file.write("[Interface]\nPrivateKey = server\nAddress = 10.66.66.1/24\n")
+            for n, name in enumerate(("alice", "bob", "carol"), start=2):
+                file.write(f"\n### Client {name}\n[Peer]\nPublicKey = key_{name}\nAllowedIPs = 10.66.66.{n}/32\n")
+        user_store.save_users({
+            # Приостановка наступила, удаление — позже
+            "alice": {"public_key": "key_alice", "status": "active", "expires_at": iso(NOW + 100),
+                      "auto_suspend_date": iso(NOW - 10), "auto_delete_date": iso(NOW + 3600),
+                      "allowed_ips": "10.66.66.2/32"},
+            # Оба этапа наступили (по умолчанию — по expires_at)
+            "bob": {"public_key": "key_bob", "status": "active", "expires_at": iso(NOW - 1),
+                    "allowed_ips": "10.66.66.3/32,fd42:42:42::3/128"},
+            "carol": {"public_key": "key_carol", "status": "active", "expires_at": iso(NOW + 600),
+                      "allowed_ips": "10.66.66.4/32"},
+        })
+
+    def _close_bitmaps(self):
+        for path in [path for path in _bitmaps if path.startswith(self.tmp_dir.name)]:
+            _bitmaps.pop(path).close()
+
+    def test_stages(self):
+        """Тест: этапы suspend и delete обрабатываются пакетом по своим срокам."""
+        self.assertEqual(expiry_scheduler.next_due(), NOW - 10)
+
+        result = expiry_scheduler.process_due(NOW, self.config_file)
+        self.assertEqual(sorted(result["suspend"]), ["alice", "bob"])
+        self.assertEqual(result["delete"], ["bob"])
+
+        alice = user_store.get_user("alice")
+        self.assertEqual((alice["status"], alice["blocked_reason"]), ("suspended", "expired"))
+        self.assertIsNone(user_store.get_user("bob"))
+        with open(self.config_file) as file:
+            config = file.read()
+        self.assertNotIn("key_bob", config)
+        self.assertIn("key_alice", config)  # приостановленный пир остаётся в wg0.conf
+        self.assertEqual(self.apply_peer_changes.call_args.kwargs["exclude_keys"], {"key_alice"})
+
+        # Следующий срок — приостановка carol, затем удаление alice
+        self.assertEqual(expiry_scheduler.next_due(), NOW + 600)
+        self.assertEqual(sorted(expiry_scheduler.process_due(NOW + 3600, self.config_file)["delete"]), ["alice", "carol"])
+
+    def test_delete_releases_address(self):
+        """Тест: адрес удалённого по сроку пользователя освобождается в битовой карте."""
+        allocator = get_address_allocator(self.config_file, ["10.66.66.0/24"], server_ip="10.66.66.1")
+        self.assertIn("10.66.66.3", allocator.allocated_addresses())
+
+        self.assertEqual(expiry_scheduler.delete_due(NOW, self.config_file), ["bob"])
+        self.assertNotIn("10.66.66.3", allocator.allocated_addresses())
+        self.assertEqual(allocator.allocate()[0], "10.66.66.3")
+
+    @patch("modules.expiry_scheduler.set_peer")
+    def test_reactivate(self, mocked_set):
+        """Тест: после продления приостановленный по сроку пользователь возвращается на интерфейс."""
+        expiry_scheduler.suspend_due(NOW, self.config_file)
+        self.assertFalse(expiry_scheduler.reactivate("alice", self.config_file))  # срок ещё в прошлом
+
+        user_store.update_user("alice", {"auto_suspend_date": iso(time.time() + 3600)})
+        self.assertTrue(expiry_scheduler.reactivate("alice", self.config_file))
+        self.assertEqual(user_store.get_user("alice")["status"], "active")
+        self.assertEqual(mocked_set.call_args.args[:2], ("wg0", "key_alice"))
+
+    def test_scheduler_thread(self):
+        """Тест: поток обрабатывает наступившие сроки и спит до ближайшего."""
+        future = int(time.time()) + 3600
+        user_store.save_user("erin", {"public_key": "key_erin", "status": "active", "expires_at": iso(future)})
+        scheduler = expiry_scheduler.ExpiryScheduler(max_sleep=60, config_file=self.config_file)
+        scheduler.start()
+        self.addCleanup(scheduler.join, 5)
+        self.addCleanup(scheduler.stop)
+        deadline = time.monotonic() + 5
+        while scheduler.runs < 1 and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual(scheduler.processed, 6)  # сроки alice, bob и carol в прошлом: оба этапа
+        self.assertEqual(scheduler.next_due, future)
+        self.assertEqual(user_store.get_usernames(), ["erin"])
+        self.assertIsNone(scheduler.last_error)
+
+    def test_schema_migration(self):
+        """Тест: колонки сроков этапов заполняются в БД, созданной до их появления."""
+        path = os.path.join(self.tmp_dir.name, "old.db")
+        conn = sqlite3.connect(path)
+        conn.executescript(
+            "CREATE TABLE users (username TEXT PRIMARY KEY, public_key TEXT, allowed_ips TEXT, status TEXT,"
+            " expires_at TEXT, data TEXT NOT NULL);"
+            "CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);"
+            "INSERT INTO meta VALUES ('json_migrated', '0');"
+        )
+        conn.execute("INSERT INTO users VALUES ('dave', 'key_dave', NULL, 'active', ?, ?)",
+                     (iso(NOW), f'{{"expires_at": "{iso(NOW)}", "status": "active"}}'))
+        conn.commit()
+        conn.close()
+
+        with patch.object(settings, "USER_STORE_PATH", path):
+            self.assertEqual(user_store.next_due("delete"), NOW)
+            self.assertEqual(list(user_store.get_users_due("suspend", NOW)), ["dave"])
+
+
+if __name__ == "__main__":
+    unittest.main()
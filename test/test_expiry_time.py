@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# test_expiry_time.py
+## Модульные тесты расчёта оставшегося времени по срокам в Unix epoch.
+
+import os
+import sqlite3
+import sys
+import unittest
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import settings
+
+from gradio_admin.functions.format_helpers import calculate_time_remaining
+from gradio_admin.list_users import list_users
+from gradio_admin.search_user import search_user
+from modules import expiry_time, user_store
+from modules.show_users import calculate_time_left
+from test.helpers import USER_STORE, isolated_settings
+
+NOW = 1_700_000_000
+DAY = expiry_time.DAY
+
+
+class TestExpiryTime(unittest.TestCase):
+
+    def setUp(self):
+        isolated_settings(self, *USER_STORE)
+        self.db_path = settings.USER_STORE_PATH
+
+    def test_vectorized_days(self):
+        """Тест: оставшиеся дни считаются одним проходом, отсутствующий срок сохраняется."""
+        epochs = expiry_time.epochs_array([NOW + 3 * DAY + 5, NOW + DAY // 2, NOW - 1, None])
+        seconds = expiry_time.seconds_left(epochs, NOW)
+        self.assertEqual(list(seconds), [3 * DAY + 5, DAY // 2, -1, expiry_time.NO_EXPIRY])
+        self.assertEqual(expiry_time.days_left_text(seconds), ["3 days", "Expired", "Expired", "N/A"])
+        self.assertEqual(
+            expiry_time.days_left_text(seconds, min_days=0), ["3 days", "0 days", "Expired", "N/A"]
+        )
+
+    def test_single_value_helpers(self):
+        """Тест: одиночные помощники принимают ISO 8601 и Unix epoch, как раньше."""
+        future = (datetime.now() + timedelta(days=10, hours=1)).isoformat()
+        self.assertEqual(calculate_time_left(future), "10 days")
+        self.assertEqual(calculate_time_left(int(datetime.now().timestamp()) - DAY), "Expired")
+        self.assertEqual(calculate_time_left("N/A"), "N/A")
+        self.assertEqual(calculate_time_remaining((datetime.now() + timedelta(hours=1)).isoformat()), "0 days")
+        self.assertEqual(calculate_time_remaining(None), "N/A")
+
+    def test_store_epoch_column(self):
+        """Тест: срок хранится в колонке expires_epoch и заполняется миграцией для старых БД."""
+        expires = datetime.now() + timedelta(days=5, hours=1)
+        user_store.save_user("alice", {"expires_at": expires.isoformat(), "address": "10.66.66.2/32"})
+        user_store.save_user("bob", {"expires_at": "N/A", "address": "10.66.66.3/32"})
+        records, epochs = user_store.get_users_with_expiry()
+        self.assertEqual(list(records), ["alice", "bob"])
+        self.assertEqual(epochs, [int(expires.timestamp()), None])
+        self.assertNotIn("expires_epoch", records["alice"])
+
+        user_store.close_connections()
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("ALTER TABLE users DROP COLUMN expires_epoch")
+        conn.commit()
+        conn.close()
+        self.assertEqual(user_store.get_users_with_expiry()[1], [int(expires.timestamp()), None])
+
+    def test_listing_and_search(self):
+        """Тест: список и поиск показывают оставшееся время по срокам из базы."""
+        user_store.save_users({
+            "alice": {"expires_at": (datetime.now() + timedelta(days=5, hours=1)).isoformat(), "address": "10.66.66.2/32"},
+            "bob": {"expires_at": (datetime.now() - timedelta(days=1)).isoformat(), "address": "10.66.66.3/32"},
+            "carol": {"expires_at": "N/A", "address": "10.66.66.4/32"},
+        })
+        listing = list_users()
+        self.assertIn("⏳ Осталось: 5 дней", listing)
+        self.assertIn("⏳ Осталось: Истек", listing)
+        self.assertIn("⏳ Осталось: Ошибка в данных срока действия", listing)
+
+        found = search_user("66.3")
+        self.assertIn("👤 Пользователь: bob", found)
+        self.assertIn("⏳ Осталось: Истек", found)
+        self.assertNotIn("alice", found)
+        self.assertEqual(search_user("nobody"), "ℹ️ Пользователь не найден.")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+# test_ip_allocator.py
+## Модульные тесты для аллокатора IP-адресов на основе битовых карт.
+
+import os
+import sys
+import tempfile
+import threading
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.ip_allocator import IPBitmap, get_address_allocator, release_address, _bitmaps
+
+
+class TestIPBitmap(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.bitmap_dir = os.path.join(self.tmp_dir.name, "ip_pools")
+        self.bitmap_path = os.path.join(self.tmp_dir.name, "ip_bitmap.bin")
+        self.config_file = os.path.join(self.tmp_dir.name, "wg0.conf")
+        with open(self.config_file, "w") as f:
+            f.write(
+                "[Interface]\n"
+                "Address = 10.66.66.1/24,fd42:42:42::1/64\n"
+                "\n### Client alice\n[Peer]\nPublicKey = a\nPresharedKey = b\n"
+                "AllowedIPs = 10.66.66.2/32,fd42:42:42::2/128\n"
+                "\n### Client bob\n[Peer]\nPublicKey = c\nPresharedKey = d\n"
+                "AllowedIPs = 10.66.66.4/32\n"
+            )
+
+    def tearDown(self):
+        for path in [p for p in _bitmaps if p.startswith(self.tmp_dir.name)]:
+            _bitmaps.pop(path).close()
+        self.tmp_dir.cleanup()
+
+    def allocator(self, pools, ipv6_prefix=None):
+        return get_address_allocator(self.config_file, pools, ipv6_prefix, bitmap_dir=self.bitmap_dir)
+
+    def test_rebuild_from_config(self):
+        """Тест: карта строится из wg0.conf, занятые и служебные адреса пропускаются."""
+        allocator = self.allocator(["10.66.66.0/24"])
+        self.assertEqual(allocator.allocate(), ("10.66.66.3", None))
+        self.assertEqual(allocator.allocate(), ("10.66.66.5", None))
+
+    def test_release_and_reuse(self):
+        """Тест: освобождённый адрес выдаётся повторно."""
+        allocator = self.allocator(["10.66.66.0/24"])
+        self.assertTrue(release_address("10.66.66.2/32", bitmap_dir=self.bitmap_dir))
+        self.assertFalse(release_address("10.66.66.2", bitmap_dir=self.bitmap_dir))
+        self.assertEqual(allocator.allocate()[0], "10.66.66.2")
+
+    def test_concurrent_allocate(self):
+        """Тест: потоки с общей кэшированной картой не получают одинаковых адресов."""
+        allocator = self.allocator(["10.66.0.0/20"])
+        kept, barrier = [], threading.Barrier(8)
+        # Частое переключение потоков, чтобы гонка проявлялась без блокировки
+        interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)
+        self.addCleanup(sys.setswitchinterval, interval)
+
+        def worker():
+            barrier.wait()
+            addresses = [allocator.allocate()[0] for _ in range(200)]
+            # Освобождение чередуется с выделением в других потоках
+            for address in addresses[::2]:
+                release_address(address, bitmap_dir=self.bitmap_dir)
+            kept.extend(addresses[1::2])
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(set(kept)), 800)
+        bitmap = _bitmaps[os.path.join(self.bitmap_dir, "10.66.0.0_20.bin")]
+        self.assertTrue(all(bitmap.is_allocated(address) for address in kept))
+
+    def test_persistence(self):
+        """Тест: состояние карты сохраняется между открытиями файла."""
+        allocator = IPBitmap(self.bitmap_path, "10.66.66.0/24", reserved=("10.66.66.1",))
+        first = allocator.allocate()
+        allocator.close()
+        reopened = IPBitmap(self.bitmap_path)
+        self.assertTrue(reopened.is_allocated(first))
+        self.assertNotEqual(reopened.allocate(), first)
+        reopened.close()
+
+    def test_exhaustion(self):
+        """Тест: при заполнении подсети выбрасывается ValueError."""
+        allocator = IPBitmap(self.bitmap_path, "10.0.0.0/29", reserved=("10.0.0.1",))
+        allocated = [allocator.allocate() for _ in range(5)]
+        self.assertEqual(allocated, [f"10.0.0.{i}" for i in range(2, 7)])
+        with self.assertRaises(ValueError):
+            allocator.allocate()
+        allocator.close()
+
+    def test_large_subnet(self):
+        """Тест: выделение в /16 не зависит от перебора всей подсети."""
+        allocator = IPBitmap(self.bitmap_path, "10.70.0.0/16", reserved=("10.70.0.1",))
+        for _ in range(1000):
+            allocator.allocate()
+        self.assertEqual(allocator.allocate(), "10.70.3.234")
+        allocator.close()
+
+    def test_pool_spillover(self):
+        """Тест: когда пул заполнен, выдача переходит к следующему."""
+        allocator = self.allocator(["10.0.0.0/29", "10.0.1.0/29"])
+        first_pool = [allocator.allocate()[0] for _ in range(5)]
+        self.assertEqual(first_pool[-1], "10.0.0.6")
+        self.assertEqual(allocator.allocate()[0], "10.0.1.1")
+        self.assertTrue(release_address("10.0.0.3", bitmap_dir=self.bitmap_dir))
+        self.assertEqual(allocator.allocate()[0], "10.0.0.3")
+
+    def test_dual_stack(self):
+        """Тест: IPv6-адрес выводится из порядкового номера во всех пулах."""
+        allocator = self.allocator(["10.66.66.0/24", "10.67.0.0/16"], "fd42:42:42::/64")
+        self.assertEqual(allocator.allocate(), ("10.66.66.3", "fd42:42:42::3"))
+        self.assertEqual(allocator.ipv6_for("10.67.0.5"), "fd42:42:42::105")
+
+    def test_overlapping_pools(self):
+        """Тест: пересекающиеся пулы отклоняются."""
+        with self.assertRaises(ValueError):
+            self.allocator(["10.0.0.0/16", "10.0.1.0/24"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -27,7 +27,11 @@ class TestIPManagement(unittest.TestCase):
         )
 
     @patch("modules.utils.parse_wireguard_config")
-    @patch("builtins.open", new_callable=mock_open, read_data="AllowedIPs = 10.96.96.2/32\nAllowedIPs = 10.96.96.3/32\n")
+    @patch("builtins.open", new_callable=mock_open, read_data=(
+        "[Interface]\nAddress = 10.96.96.1/24,fd42:42:42::1/64\n\n"
+        "### Client user1\n[Peer]\nPublicKey = key1\nAllowedIPs = 10.96.96.2/32,fd42:42:42::2/128\n\n"
+        "### Client user2\n[Peer]\nPublicKey = key2\nAllowedIPs = 10.96.96.3/32\n"
+    ))
     @patch("os.path.exists", return_value=True)
     @patch("modules.utils.get_wireguard_subnet", return_value="10.96.96.1/24")
     def test_get_existing_ips(self, mocked_get_subnet, mocked_exists, mocked_open, mocked_parse_wireguard_config):
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# test_key_pool.py
+## Модульные тесты для пула заранее сгенерированных ключей.
+
+import os
+import stat
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.key_pool import take_keypair, refill_pool, get_pool_stats
+
+
+class TestKeyPool(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.pool_path = os.path.join(self.tmp_dir.name, "key_pool.json")
+        patcher = patch("modules.key_pool.settings.KEY_POOL_PATH", self.pool_path)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp_dir.cleanup)
+
+    def test_refill_up_to_watermark(self):
+        """Тест: пул пополняется до заданного уровня и не выше."""
+        self.assertEqual(refill_pool(watermark=5, batch_size=10), 5)
+        self.assertEqual(refill_pool(watermark=5, batch_size=10), 0)
+        self.assertEqual(get_pool_stats()["depth"], 5)
+
+    def test_pool_file_permissions(self):
+        """Тест: файл пула доступен только владельцу (0600)."""
+        refill_pool(watermark=1, batch_size=1)
+        mode = stat.S_IMODE(os.stat(self.pool_path).st_mode)
+        self.assertEqual(mode, 0o600)
+
+    def test_take_keypair_from_pool(self):
+        """Тест: ключи выдаются из пула и больше не повторяются."""
+        refill_pool(watermark=3, batch_size=3)
+        taken = {take_keypair() for _ in range(3)}
+        self.assertEqual(len(taken), 3)
+        self.assertEqual(get_pool_stats()["depth"], 0)
+        for private_key, public_key, preshared_key in taken:
+            self.assertEqual(len(private_key), 44)
+            self.assertEqual(len(public_key), 44)
+            self.assertEqual(len(preshared_key), 44)
+
+    def test_take_keypair_empty_pool(self):
+        """Тест: при пустом пуле ключи генерируются на месте."""
+        private_key, public_key, preshared_key = take_keypair()
+        self.assertIsInstance(private_key, bytes)
+        self.assertEqual(len(public_key), 44)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,8 +1,15 @@
 'USING: # PYTHONPATH=/var/www/html/grav/user/scripts/wg_qr_generator python3 -m unittest test_keygen.py'
 
 import unittest
+import base64
+import shutil
 import subprocess
-from modules.keygen import generate_private_key, generate_public_key
+from modules.keygen import (
+    generate_private_key,
+    generate_public_key,
+    generate_preshared_key,
+    generate_keypair,
+)
 
 class TestKeygen(unittest.TestCase):
 
@@ -45,5 +52,48 @@ class TestKeygen(unittest.TestCase):
         with self.assertRaises(subprocess.CalledProcessError):
             generate_public_key(invalid_key_bytes)  # Передаем bytes напрямую
 
+
+class TestNativeKeygen(unittest.TestCase):
+
+    def test_public_key_rfc7748_vector(self):
+        """Тест: вычисление публичного ключа совпадает с тестовым вектором RFC 7748."""
+        private_key = base64.b64encode(bytes.fromhex(
+            "77076d0a7318a57d3c16c17251b26645df4c2f87ebc0992ab177fba51db92c2a"
+        ))
+        expected = base64.b64encode(bytes.fromhex(
+            "8520f0098930a754748b7ddcb43ef75a0dbf3a0d26381af4eba4a98eaa9b4e6a"
+        ))
+        self.assertEqual(generate_public_key(private_key, backend="native"), expected)
+
+    def test_private_key_is_clamped(self):
+        """Тест: приватный ключ приведён к формату Curve25519, как у `wg genkey`."""
+        raw = base64.b64decode(generate_private_key(backend="native"))
+        self.assertEqual(len(raw), 32)
+        self.assertEqual(raw[0] & 7, 0)
+        self.assertEqual(raw[31] & 128, 0)
+        self.assertEqual(raw[31] & 64, 64)
+
+    def test_keypair_format(self):
+        """Тест: все ключи набора — base64 длиной 44 байта."""
+        for key in generate_keypair(backend="native"):
+            self.assertIsInstance(key, bytes)
+            self.assertEqual(len(key), 44)
+        self.assertEqual(len(generate_preshared_key(backend="native")), 44)
+
+    def test_invalid_key_native(self):
+        """Тест: некорректный ключ даёт ту же ошибку, что и `wg pubkey`."""
+        with self.assertRaises(subprocess.CalledProcessError):
+            generate_public_key(b"invalid_key", backend="native")
+
+    @unittest.skipUnless(shutil.which("wg"), "wg не установлен")
+    def test_backends_match(self):
+        """Тест: оба бэкенда выдают идентичный публичный ключ."""
+        private_key = generate_private_key(backend="native")
+        self.assertEqual(
+            generate_public_key(private_key, backend="native"),
+            generate_public_key(private_key, backend="wg"),
+        )
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# test_provisioning.py
+## Модульные тесты создания пользователей в процессе (ProvisioningService).
+
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import settings
+from modules import user_store
+from modules.ip_allocator import _bitmaps
+from modules.provisioning import ProvisioningService, format_timings
+from modules.user_repository import UserExistsError
+from modules.wg_config_parser import invalidate_cache, load_server_config
+from test.helpers import USER_STORE, isolated_settings
+
+PARAMS = """[server]
+SERVER_PUB_IP=203.0.113.1
+SERVER_PORT=51820
+SERVER_PUB_KEY=server_public_key
+SERVER_WG_IPV4=10.66.66.1
+CLIENT_DNS_1=1.1.1.1
+CLIENT_DNS_2=8.8.8.8
+"""
+
+
+class TestProvisioningService(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(invalidate_cache)
+        base = isolated_settings(
+            self, *USER_STORE, "WG_CONFIG_DIR", "QR_CODE_DIR", "QR_CACHE_DIR", "STALE_CONFIG_DIR", "IP_BITMAP_DIR",
+            "KEY_POOL_PATH", "SERVER_CONFIG_INDEX_PATH", ADDRESS_POOLS=[], IPV6_POOL=None,
+        )
+        self.addCleanup(self._close_bitmaps)
+
+        self.params_file = os.path.join(base, "params")
+        with open(self.params_file, "w") as file:
+            file.write(PARAMS)
+        self.config_file = os.path.join(base, "wg0.conf")
+        with open(self.config_file, "w") as file:
+            file.write("[Interface]\nAddress = 10.66.66.1/24\n"
+                       "\n### Client existing\n[Peer]\nPublicKey = key_existing\nAllowedIPs = 10.66.66.2/32\n")
+        self.service = ProvisioningService(self.params_file, self.config_file)
+
+    def _close_bitmaps(self):
+        for path in [path for path in _bitmaps if path.startswith(self.tmp_dir.name)]:
+            _bitmaps.pop(path).close()
+
+    def test_create_user(self):
+        """Тест: пользователь создаётся без подпроцесса, с файлами и временем этапов."""
+        self.service.warm()
+        result = self.service.create_user("alice", "alice@example.com", apply=False)
+
+        self.assertEqual(result["address"], "10.66.66.3/32")
+        self.assertTrue(os.path.exists(result["config_path"]))
+        self.assertTrue(os.path.exists(result["qr_path"]))
+        self.assertEqual(list(result["timings"]), ["check", "keys", "address", "files", "commit"])
+        self.assertIn("всего", format_timings(result))
+        self.assertEqual(user_store.get_user("alice")["email"], "alice@example.com")
+        self.assertIsNotNone(load_server_config(self.config_file).get_by_name("alice"))
+
+        stats = self.service.stats()
+        self.assertEqual(stats["requests"], 1)
+        self.assertEqual(stats["last"], result["elapsed"])
+
+    def test_existing_and_invalid(self):
+        """Тест: занятые имена (без учёта регистра) и пустое имя отклоняются, адрес не тратится."""
+        with self.assertRaises(UserExistsError):
+            self.service.create_user("Existing", apply=False)
+        self.service.create_user("bob", apply=False)
+        with self.assertRaises(UserExistsError):
+            self.service.create_user("BOB", apply=False)
+        with self.assertRaises(ValueError):
+            self.service.create_user("  ", apply=False)
+        self.assertEqual(self.service.create_user("carol", apply=False)["address"], "10.66.66.4/32")
+
+    def test_failed_commit_keeps_files(self):
+        """Тест: проигравший гонку запрос не трогает файлы победителя и не оставляет своих."""
+        config_path = os.path.join(settings.WG_CONFIG_DIR, "alice.conf")
+        os.makedirs(settings.WG_CONFIG_DIR)
+        with open(config_path, "w") as file:
+            file.write("winner")
+
+        with patch("modules.provisioning.create_user", side_effect=UserExistsError(["alice"])):
+            with self.assertRaises(UserExistsError):
+                self.service.create_user("alice", apply=False)
+
+        with open(config_path) as file:
+            self.assertEqual(file.read(), "winner")
+        self.assertEqual(os.listdir(settings.WG_CONFIG_DIR), ["alice.conf"])
+        self.assertEqual(os.listdir(settings.QR_CODE_DIR), [])
+
+    def test_params_cache(self):
+        """Тест: params перечитывается только после изменения файла."""
+        first = self.service.params()
+        self.assertIs(self.service.params(), first)
+        with open(self.params_file, "w") as file:
+            file.write(PARAMS.replace("203.0.113.1", "198.51.100.7"))
+        os.utime(self.params_file, ns=(0, os.stat(self.params_file).st_mtime_ns + 1_000_000))
+        self.assertEqual(self.service.params()["SERVER_PUB_IP"], "198.51.100.7")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# test_qr_service.py
+## Модульные тесты генерации QR-кодов с кэшем по содержимому.
+
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from PIL import Image
+
+from modules import qr_service
+from test.helpers import isolated_settings
+
+CONFIG = "[Interface]\nPrivateKey = private\nAddress = 10.66.66.2/32\n\n[Peer]\nEndpoint = 203.0.113.1:51820\n"
+
+
+class TestQRService(unittest.TestCase):
+
+    def setUp(self):
+        isolated_settings(self, "QR_CACHE_DIR", QR_BACKEND="matrix", QR_MASK_PATTERN=None)
+
+    def path(self, name):
+        return os.path.join(self.tmp_dir.name, "qrcodes", name)
+
+    def test_matrix_png_matches_pil(self):
+        """Тест: PNG без PIL совпадает по пикселям с изображением qrcode + PIL."""
+        self.assertTrue(qr_service.render(CONFIG, self.path("matrix.png"), "matrix"))
+        self.assertTrue(qr_service.render(CONFIG, self.path("pil.png"), "pil"))
+        with Image.open(self.path("matrix.png")) as fast, Image.open(self.path("pil.png")) as pil:
+            self.assertEqual(fast.size, pil.size)
+            self.assertEqual(fast.convert("L").tobytes(), pil.convert("L").tobytes())
+
+    def test_cache_hit(self):
+        """Тест: повторная отрисовка той же конфигурации не кодирует QR-код."""
+        first = self.path("alice.png")
+        self.assertTrue(qr_service.render(CONFIG, first))
+        with patch("modules.qr_service.matrix", side_effect=AssertionError("encoded again")):
+            self.assertFalse(qr_service.render(CONFIG, first))
+            self.assertFalse(qr_service.render(CONFIG, self.path("copy.png")))
+        self.assertTrue(os.path.samefile(first, self.path("copy.png")))
+
+        # Другая конфигурация — другой ключ
+        self.assertTrue(qr_service.render(CONFIG + "# changed\n", first))
+        self.assertFalse(os.path.samefile(first, self.path("copy.png")))
+
+    def test_svg_and_prune(self):
+        """Тест: SVG по расширению файла; записи кэша без ссылок удаляются."""
+        svg_path = self.path("alice.svg")
+        qr_service.render(CONFIG, svg_path)
+        with open(svg_path) as file:
+            self.assertTrue(file.read().startswith("<svg"))
+        qr_service.render(CONFIG, self.path("bob.png"))
+
+        os.remove(svg_path)
+        self.assertEqual(qr_service.prune_cache(), 0)  # запись моложе QR_CACHE_PRUNE_GRACE
+        self.assertEqual(qr_service.prune_cache(grace=0), 1)
+        self.assertEqual(qr_service.prune_cache(grace=0), 0)
+        self.assertFalse(qr_service.render(CONFIG, self.path("bob.png")))
+
+    def test_pruned_before_link(self):
+        """Тест: запись кэша, удалённая до создания ссылки, отрисовывается заново."""
+        link = qr_service._link
+        calls = []
+
+        def racing_link(cached, output_path):
+            if not calls:
+                calls.append(cached)
+                qr_service.prune_cache(grace=0)
+            link(cached, output_path)
+
+        with patch("modules.qr_service._link", side_effect=racing_link):
+            self.assertTrue(qr_service.render(CONFIG, self.path("carol.png")))
+        self.assertEqual(len(calls), 1)
+        self.assertTrue(os.path.samefile(calls[0], self.path("carol.png")))
+
+    def test_render_many(self):
+        """Тест: пакетная отрисовка пулом потоков считает только закодированные QR-коды."""
+        items = [(f"{CONFIG}# {n}\n", self.path(f"user{n}.png")) for n in range(4)]
+        self.assertEqual(qr_service.render_many(items, workers=4), 4)
+        self.assertEqual(qr_service.render_many(items, workers=4), 0)
+        self.assertTrue(all(os.path.exists(path) for _, path in items))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# test_quota.py
+## Модульные тесты контроля лимитов трафика (data_limit / data_used).
+
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules import quota, timeseries, user_store
+from test.helpers import USER_STORE, isolated_settings
+
+T0 = 1700000000
+
+
+class TestQuota(unittest.TestCase):
+
+    def setUp(self):
+        isolated_settings(self, *USER_STORE, "TIMESERIES_DIR")
+
+        user_store.save_users({
+            "alice": {"username": "alice", "public_key": "key_a", "status": "active", "data_limit": "1 KB"},
+            "bob": {"username": "bob", "public_key": "key_b", "status": "active", "data_limit": "1 MB"},
+            "carol": {"username": "carol", "public_key": "key_c", "status": "active", "data_limit": "N/A"},
+        })
+        self.store = timeseries.open_writer()
+        self.addCleanup(self.store.close)
+        self.enforcer = quota.QuotaEnforcer(interface="wg0", refresh_interval=3600)
+
+    def sample(self, ts, counters):
+        self.store.append_sample(ts, [(key, rx, tx, ts) for key, rx, tx in counters])
+        return self.enforcer.tick(self.store)
+
+    @patch("modules.quota.remove_peer")
+    def test_suspend_over_quota(self, mocked_remove):
+        """Тест: пир сверх лимита снимается с интерфейса, проверяются только пиры с трафиком."""
+        first = self.sample(T0, [("key_a", 100, 100), ("key_b", 100, 100), ("key_c", 10 ** 9, 0)])
+        self.assertTrue(first["full"])
+        self.assertEqual(first["suspended"], 0)
+
+        tick = self.sample(T0 + 30, [("key_a", 600, 400), ("key_b", 100, 100), ("key_c", 10 ** 9, 0)])
+        self.assertFalse(tick["full"])
+        self.assertEqual((tick["checked"], tick["over"], tick["suspended"]), (1, 1, 1))
+        mocked_remove.assert_called_once_with("wg0", "key_a")
+
+        record = user_store.get_user("alice")
+        self.assertEqual((record["status"], record["blocked_reason"]), ("suspended", "data_limit"))
+        self.assertEqual(quota.suspended_keys(), {"key_a"})
+
+        # Повторно не снимается, даже если трафик продолжает расти
+        self.sample(T0 + 60, [("key_a", 700, 400)])
+        self.assertEqual(mocked_remove.call_count, 1)
+
+    @patch("modules.quota.set_peer")
+    @patch("modules.quota.get_desired_peers", return_value={"key_a": {"preshared_key": None, "allowed_ips": "10.66.66.2/32"}})
+    @patch("modules.quota.remove_peer")
+    def test_renew(self, mocked_remove, mocked_desired, mocked_set):
+        """Тест: продление возвращает пира на интерфейс и начинает новый период учёта."""
+        self.sample(T0, [("key_a", 2000, 0)])
+        self.assertEqual(user_store.get_user("alice")["status"], "suspended")
+
+        record = quota.renew("alice", "2 KB")
+        self.assertEqual((record["status"], record["data_limit"], record["data_used_base"]), ("active", "2 KB", 2000))
+        mocked_set.assert_called_once_with("wg0", "key_a", {"preshared_key": None, "allowed_ips": "10.66.66.2/32"})
+        with self.assertRaises(ValueError):
+            quota.renew("alice", "lots")
+
+        # Лимит нового периода считается от data_used_base
+        self.enforcer.invalidate()
+        self.assertEqual(self.sample(T0 + 30, [("key_a", 3500, 0)])["suspended"], 0)
+        self.assertEqual(self.sample(T0 + 60, [("key_a", 4100, 0)])["suspended"], 1)
+        self.assertEqual(mocked_remove.call_count, 2)
+
+    def test_benchmark(self):
+        """Тест: бенчмарк проверки лимитов возвращает время тика и полной проверки."""
+        results = quota.benchmark_tick(2000, 200, repeat=1)
+        self.assertGreater(results["full"], 0)
+        self.assertGreater(results["tick"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# test_table_model.py
+## Модульные тесты кэшируемой модели таблицы статистики.
+
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from gradio_admin.functions.table_model import UserTable
+from modules import user_store
+from test.helpers import USER_STORE, isolated_settings
+
+
+def record(name, status="active"):
+    return {"username": name, "status": status, "data_limit": "100.0 GB", "user_id": f"uid-{name}",
+            "public_key": f"key-{name}", "data_used": "0.0 KiB"}
+
+
+class TestUserTable(unittest.TestCase):
+
+    def setUp(self):
+        isolated_settings(self, *USER_STORE, "TIMESERIES_DIR")
+        user_store.insert_users({f"user{n}": record(f"user{n}", "active" if n % 2 else "inactive") for n in range(25)})
+        self.table = UserTable()
+
+    def names(self, indices):
+        return [self.table.rows[index][0] for index in indices]
+
+    def test_search(self):
+        """Тест: поиск без учёта регистра, уточнение запроса и фильтр неактивных."""
+        self.table.refresh()
+        self.assertEqual(self.names(self.table.search("USER1")), ["user1"] + [f"user{n}" for n in range(10, 20)])
+        self.assertEqual(self.names(self.table.search("user12")), ["user12"])
+        self.assertEqual(self.names(self.table.search("uid-user2", show_inactive=False)), ["user21", "user23"])
+        self.assertEqual(self.table.search("inactive active"), [])
+        self.assertEqual(len(self.table.search("")), 25)
+
+    def test_invalidation(self):
+        """Тест: модель перестраивается только после изменения базы."""
+        self.table.refresh()
+        with patch.object(user_store, "iter_users", side_effect=AssertionError("rebuilt")):
+            self.table.refresh()
+        user_store.update_user("user0", {"status": "active"})
+        user_store.delete_user("user24")
+        self.table.refresh()
+        self.assertEqual(len(self.table.rows), 24)
+        self.assertIn(0, self.table.search("user0", show_inactive=False))
+
+    def test_pages(self):
+        """Тест: страницы таблицы и ограничение номера страницы."""
+        self.table.refresh()
+        rows, total, page, pages = self.table.page("", True, page=3, page_size=10)
+        self.assertEqual((len(rows), total, page, pages), (5, 25, 3, 3))
+        self.assertEqual(self.table.page("user", True, page=99, page_size=10)[2], 3)
+        self.assertEqual(self.table.page("nobody", True, page=2, page_size=10)[1:], (0, 1, 1))
+
+    def test_sort(self):
+        """Тест: сортировка совпадений до выбора страницы."""
+        self.table.refresh()
+        rows = self.table.page("", False, page_size=3, sort="user", descending=True)[0]
+        self.assertEqual([row[0] for row in rows], ["user9", "user7", "user5"])
+        rows = self.table.page("", True, page_size=2, descending=True)[0]
+        self.assertEqual([row[0] for row in rows], ["user24", "user23"])
+
+
+if __name__ == "__main__":
+    unittest.main()
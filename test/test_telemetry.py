@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# test_telemetry.py
+## Модульные тесты фонового сбора телеметрии пиров.
+
+import os
+import sqlite3
+import sys
+import time
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import settings
+from modules import telemetry, timeseries
+from modules.wg_dump import parse_dump
+from test.helpers import isolated_settings
+
+HEADER = "wg0\tprivate_secret\tserver_pub\t51820\toff\n"
+
+
+def dump(rx_b):
+    return parse_dump(
+        HEADER
+        + "wg0\tkey_a\tpsk_secret\t[2001:db8::1]:51000\t10.66.66.2/32\t1700000000\t100\t200\toff\n"
+        + f"wg0\tkey_b\t(none)\t(none)\t10.66.66.3/32\t0\t{rx_b}\t0\toff\n"
+    )
+
+
+class TestTelemetry(unittest.TestCase):
+
+    def setUp(self):
+        isolated_settings(self, "TELEMETRY_DIR", "TIMESERIES_DIR", QUOTA_ENFORCEMENT=False)
+        self.addCleanup(self._reset)
+        self._reset()
+
+    def _reset(self):
+        telemetry.stop_telemetry_worker()
+        telemetry._snapshot = None
+        telemetry._file_snapshot = (None, None)
+
+    def test_incremental_samples(self):
+        """Тест: в историю пишутся только изменившиеся пиры, снимок сохраняется без секретов."""
+        with patch("modules.telemetry.collect_peers", side_effect=[dump(0), dump(0), dump(50)]):
+            telemetry.sample()
+            telemetry.sample()
+            telemetry.sample()
+
+        rows = timeseries.TimeSeriesStore().query()
+        self.assertEqual(rows.public_keys, ["key_a", "key_b", "key_b"])
+        self.assertEqual(list(rows.rx), [100, 0, 50])
+
+        with open(telemetry.snapshot_path()) as file:
+            content = file.read()
+        self.assertNotIn("secret", content)
+        self.assertIn("[2001:db8::1]:51000", content)
+
+    def test_snapshot_read_path(self):
+        """Тест: снимок читается из памяти, а в другом процессе — с диска, без вызова `wg`."""
+        with patch("modules.telemetry.collect_peers", return_value=dump(10)):
+            taken = telemetry.sample()
+
+        with patch("modules.telemetry.collect_peers", side_effect=AssertionError("wg called")):
+            self.assertIs(telemetry.get_snapshot(), taken)
+
+            telemetry._snapshot = None  # как в процессе без сборщика
+            loaded = telemetry.get_snapshot()
+            self.assertAlmostEqual(loaded.taken_at, taken.taken_at, places=2)
+            self.assertEqual(loaded.table.get("key_b")["rx_bytes"], 10)
+            self.assertIs(telemetry.get_snapshot(), loaded)  # повторное чтение — из кэша
+
+        summary = loaded.summary()
+        self.assertEqual((summary["peers"], summary["rx_bytes"], summary["tx_bytes"]), (2, 110, 200))
+
+    def test_worker(self):
+        """Тест: фоновый поток снимает выборки по интервалу и переживает ошибки `wg`."""
+        results = [OSError("wg not found")] + [dump(n) for n in range(100)]
+        with patch("modules.telemetry.collect_peers", side_effect=results):
+            sampler = telemetry.start_telemetry_worker(interval=0.01)
+            deadline = time.monotonic() + 5
+            while sampler.samples < 3 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertTrue(telemetry.get_telemetry_stats()["worker_running"])
+            telemetry.stop_telemetry_worker()
+
+        self.assertGreaterEqual(sampler.samples, 3)
+        self.assertEqual(sampler.errors, 1)
+        self.assertFalse(telemetry.get_telemetry_stats()["worker_running"])
+
+    def test_worker_survives_quota_errors(self):
+        """Тест: ошибка проверки лимитов и непредвиденная ошибка выборки не останавливают поток."""
+        results = [ValueError("bad dump")] + [dump(n) for n in range(100)]
+        with patch.object(settings, "QUOTA_ENFORCEMENT", True), \
+                patch("modules.telemetry.quota.get_enforcer") as get_enforcer, \
+                patch("modules.telemetry.collect_peers", side_effect=results):
+            get_enforcer.return_value.tick.side_effect = sqlite3.OperationalError("database is locked")
+            sampler = telemetry.start_telemetry_worker(interval=0.01)
+            deadline = time.monotonic() + 5
+            while sampler.samples < 3 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertTrue(sampler.is_alive())
+            telemetry.stop_telemetry_worker()
+
+        self.assertGreaterEqual(sampler.samples, 3)
+        self.assertEqual(sampler.errors, 1)
+        self.assertGreaterEqual(get_enforcer.return_value.tick.call_count, 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# test_timeseries.py
+## Модульные тесты хранилища истории трафика пиров.
+
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import settings
+from modules import timeseries
+from modules.wg_dump import parse_bytes
+
+T0 = 1700000000 - 1700000000 % 86400  # начало суток
+
+
+class TestTimeSeries(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.directory = self.tmp_dir.name
+
+    def open_writer(self):
+        store = timeseries.open_writer(self.directory)
+        self.addCleanup(store.close)
+        return store
+
+    def test_append_and_query(self):
+        """Тест: в raw пишутся только изменившиеся пиры, выборка диапазона по времени и пирам."""
+        store = self.open_writer()
+        self.assertEqual(store.append_sample(T0, [("key_a", 100, 10, 0), ("key_b", 0, 0, 0)]), 2)
+        self.assertEqual(store.append_sample(T0 + 30, [("key_a", 100, 10, 0), ("key_b", 50, 5, 0)]), 1)
+        store.append_sample(T0 + 60, [("key_a", 300, 30, 0), ("key_b", 50, 5, 0)])
+
+        reader = timeseries.TimeSeriesStore(self.directory)
+        rows = reader.query(T0 + 1, T0 + 61)
+        self.assertEqual(list(rows.timestamps), [T0 + 30, T0 + 60])
+        self.assertEqual(rows.public_keys, ["key_b", "key_a"])
+        self.assertEqual(list(rows.rx), [50, 300])
+        self.assertEqual(len(reader.query(resolution="raw", public_keys=["key_a"])), 2)
+        self.assertEqual(len(reader.query(public_keys=["missing"])), 0)
+
+    def test_rollups_and_totals(self):
+        """Тест: свёртки 1m/1h/1d, сброс счётчика и итоги трафика за всю историю."""
+        store = self.open_writer()
+        store.append_sample(T0, [("key_a", 100, 10, 0)])
+        store.append_sample(T0 + 30, [("key_a", 160, 16, 0)])
+        store.append_sample(T0 + 90, [("key_a", 40, 4, 0)])        # сброс счётчика: +40
+        store.append_sample(T0 + 3600, [("key_a", 50, 5, 0)])      # закрывает первый час
+        store.append_sample(T0 + 86400, [("key_a", 60, 6, 0)])     # закрывает сутки
+
+        minutes = store.query(resolution="1m")
+        self.assertEqual(list(minutes.timestamps), [T0, T0 + 60, T0 + 3600])
+        self.assertEqual(list(minutes.rx), [160, 40, 10])
+        self.assertEqual(store.usage(resolution="1h"), {"key_a": [210, 21]})
+        self.assertEqual(store.usage(resolution="1d"), {"key_a": [210, 21]})
+        self.assertEqual(store.totals(), {"key_a": [220, 22]})
+
+        # Итоги читатель видит сразу, свёртки — после закрытия минуты
+        reader = timeseries.TimeSeriesStore(self.directory)
+        self.assertEqual(reader.totals(), {"key_a": [220, 22]})
+        self.assertEqual(reader.usage(resolution="1m"), {"key_a": [210, 21]})
+
+    def test_segments_and_restore(self):
+        """Тест: ротация сегментов, срок хранения и восстановление состояния писателя после перезапуска."""
+        with patch.object(settings, "TIMESERIES_SEGMENT_RECORDS", 4), \
+                patch.dict(settings.TIMESERIES_RETENTION, {"raw": 600}):
+            store = timeseries.open_writer(self.directory)
+            for step in range(20):
+                store.append_sample(T0 + step * 60, [("key_a", step * 10, 0, 0), ("key_b", step, 0, 0)])
+            with self.assertRaises(BlockingIOError):
+                timeseries.open_writer(self.directory)
+            store.close()
+
+            raw = store.series["raw"].segment_paths()
+            self.assertLess(len(raw), 20)
+            self.assertGreaterEqual(timeseries.segment_first_ts(raw[1]), T0 + 19 * 60 - 600)
+
+            # После перезапуска приращение считается от последних счётчиков, а не от нуля
+            store = self.open_writer()
+            store.append_sample(T0 + 20 * 60, [("key_a", 200, 0, 0), ("key_b", 20, 0, 0)])
+            self.assertEqual(store.totals()["key_a"][0], 200)
+            self.assertEqual(store.totals()["key_b"][0], 20)
+
+    def test_parse_bytes(self):
+        """Тест: разбор размеров data_limit/data_used."""
+        self.assertEqual(parse_bytes("100.0 GB"), 100 * 1000 ** 3)
+        self.assertEqual(parse_bytes("4.88 KiB"), 4997)
+        self.assertIsNone(parse_bytes("N/A"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# test_user_index.py
+## Модульные тесты поискового индекса пользователей.
+
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules import user_index, user_store
+from modules.user_index import UserIndex
+from test.helpers import USER_STORE, isolated_settings
+
+ROWS = [
+    ("alice", "key_alice=", "10.66.66.2/32,fd42:42:42::2/128", None, "alice@example.com", "111222333"),
+    ("Bob", "key_bob=", "10.66.66.3/32", None, "N/A", "N/A"),
+    ("carol", "key_carol=", "10.66.66.20/32", None, "carol@mail.org", "N/A"),
+]
+
+
+class TestUserIndex(unittest.TestCase):
+
+    def test_search(self):
+        """Тест: поиск по подстроке, префиксу, IP, подсети и ключу."""
+        index = UserIndex(ROWS)
+        self.assertEqual(index.search("LIC"), ["alice"])
+        self.assertEqual(index.search("example.com"), ["alice"])
+        self.assertEqual(index.search("222"), ["alice"])
+        self.assertEqual(index.search("b"), ["Bob"])
+        self.assertEqual(index.search("66.2"), ["alice", "carol"])
+        self.assertEqual(index.search("10.66.66.3"), ["Bob"])
+        self.assertEqual(index.search("10.66.66.0/28"), ["alice", "Bob"])
+        self.assertEqual(index.search("fd42:42:42::/64"), ["alice"])
+        self.assertEqual(index.search("key_carol="), ["carol"])
+        self.assertEqual(index.by_public_key("key_bob="), "Bob")
+        self.assertEqual(index.search("nobody"), [])
+        self.assertEqual(index.search("o"), [])  # короткий запрос — по префиксу
+        self.assertEqual(index.search("66.", limit=2), ["alice", "Bob"])
+
+    def test_add_remove(self):
+        """Тест: добавление и удаление обновляют все индексы."""
+        index = UserIndex(ROWS)
+        index.add("dave", {"public_key": "key_dave=", "allowed_ips": "10.66.66.4/32", "email": "dave@example.com"})
+        self.assertEqual(index.search("example"), ["alice", "dave"])
+        self.assertEqual(index.search("10.66.66.0/28"), ["alice", "Bob", "dave"])
+        self.assertTrue(index.remove("alice"))
+        self.assertFalse(index.remove("alice"))
+        self.assertEqual(index.search("example"), ["dave"])
+        self.assertEqual(index.search("al"), [])
+        self.assertEqual(index.search("10.66.66.0/28"), ["Bob", "dave"])
+        self.assertIsNone(index.by_public_key("key_alice="))
+        self.assertEqual(len(index), 3)
+
+
+class TestSharedIndex(unittest.TestCase):
+
+    def setUp(self):
+        isolated_settings(self, *USER_STORE)
+        self.addCleanup(setattr, user_index, "_index", None)
+        user_store.insert_users({"alice": {"public_key": "key_alice=", "allowed_ips": "10.66.66.2/32"}})
+
+    def test_incremental_updates(self):
+        """Тест: изменения через note_* применяются без перестроения, остальные — с ним."""
+        self.assertEqual(user_index.get_index().search("alice"), ["alice"])
+
+        records = {"bob": {"public_key": "key_bob=", "allowed_ips": "10.66.66.3/32"}}
+        user_store.insert_users(records)
+        user_index.note_created(records)
+        user_store.delete_users(["alice"])
+        user_index.note_deleted(["alice"])
+        with patch.object(user_store, "get_search_fields", side_effect=AssertionError("rebuilt")):
+            self.assertEqual(user_index.get_index().search("10.66.66.0/24"), ["bob"])
+
+        # Изменение в обход note_* (например, другим процессом) — индекс перестраивается
+        user_store.save_user("carol", {"allowed_ips": "10.66.66.4/32"})
+        records = {"dave": {"allowed_ips": "10.66.66.5/32"}}
+        user_store.insert_users(records)
+        user_index.note_created(records)
+        self.assertEqual(user_index.get_index().search("10.66.66.0/24"), ["bob", "carol", "dave"])
+
+
+if __name__ == "__main__":
+    unittest.main()
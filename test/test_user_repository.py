@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# test_user_repository.py
+## Модульные тесты согласованных изменений wg0.conf и базы пользователей,
+## включая параллельные создания/удаления из нескольких процессов.
+
+import multiprocessing
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import settings
+from modules import user_repository, user_store
+from modules.user_repository import UserExistsError
+from modules.wg_config_parser import invalidate_cache, load_server_config, parse_server_config_text
+from test.helpers import USER_STORE, isolated_settings
+
+WORKERS = 6
+USERS_PER_WORKER = 15
+
+
+def _configure(base):
+    settings.USER_STORE_PATH = os.path.join(base, "user_records.db")
+    settings.USER_DB_PATH = os.path.join(base, "user_records.json")
+    settings.SERVER_CONFIG_INDEX_PATH = os.path.join(base, "wg_peer_index.json")
+
+
+def _peer(name, n):
+    return (name, f"key_{name}", f"psk_{name}", f"10.{n // 250}.{n % 250}.2", None)
+
+
+def _worker(base, config_file, worker):
+    """Создаёт пользователей, пытается занять общее имя и удаляет каждого третьего."""
+    _configure(base)
+    created, conflicts = [], 0
+    for n in range(USERS_PER_WORKER):
+        name = f"w{worker}_u{n}"
+        user_repository.create_user(*_peer(name, worker * 100 + n), {"status": "active"}, config_file)
+        created.append(name)
+        try:
+            user_repository.create_user(*_peer("shared", 9999), {"status": "active"}, config_file)
+        except UserExistsError:
+            conflicts += 1
+        if n % 3 == 2:
+            user_repository.delete_users([created.pop(0)], config_file)
+        user_repository.update_user("counter", lambda record: {"hits": record.get("hits", 0) + 1})
+    return created, conflicts
+
+
+class TestUserRepository(unittest.TestCase):
+
+    def setUp(self):
+        self.addCleanup(invalidate_cache)
+        base = isolated_settings(self, *USER_STORE, "SERVER_CONFIG_INDEX_PATH")
+
+        self.config_file = os.path.join(base, "wg0.conf")
+        with open(self.config_file, "w") as file:
+            file.write("[Interface]\nAddress = 10.66.66.1/24\n")
+
+    def test_create_conflict_and_delete(self):
+        """Тест: занятое имя не записывается ни в wg0.conf, ни в базу; удаление чистит оба."""
+        user_repository.create_user(*_peer("alice", 1), {"status": "active"}, self.config_file)
+        with open(self.config_file) as file:
+            before = file.read()
+
+        with self.assertRaises(UserExistsError):
+            user_repository.create_user(*_peer("ALICE", 2), {"status": "active"}, self.config_file)
+        with open(self.config_file) as file:
+            self.assertEqual(file.read(), before)
+
+        self.assertEqual(user_repository.delete_users(["alice"], self.config_file), ["alice"])
+        self.assertEqual(len(load_server_config(self.config_file)), 0)
+        self.assertEqual(user_store.count_users(), 0)
+
+    def test_store_failure_rolls_back_config(self):
+        """Тест: при ошибке записи в базу пир удаляется из wg0.conf."""
+        with open(self.config_file) as file:
+            before = file.read()
+        with patch("modules.user_repository.user_store.insert_users", side_effect=RuntimeError("db down")):
+            with self.assertRaises(RuntimeError):
+                user_repository.create_user(*_peer("bob", 1), {}, self.config_file)
+        with open(self.config_file) as file:
+            self.assertEqual(file.read(), before)
+
+    def test_admin_delete_failed_apply(self):
+        """Тест: удаление из админки при ошибке применения к интерфейсу оставляет wg0.conf и базу согласованными."""
+        from gradio_admin.functions.delete_user import delete_user
+
+        user_repository.create_user(*_peer("alice", 1), {"status": "active"}, self.config_file)
+        user_repository.create_user(*_peer("bob", 2), {"status": "active"}, self.config_file)
+        with patch("gradio_admin.functions.delete_user.release_ip"), \
+                patch("gradio_admin.functions.delete_user.apply_peer_changes",
+                      return_value={"mode": "error", "added": 0, "updated": 0, "removed": 0}) as apply:
+            message = delete_user("alice", self.config_file)
+            self.assertEqual(delete_user("nobody", self.config_file), "❌ Пользователь 'nobody' не существует.")
+
+        self.assertTrue(message.startswith("⚠️"))
+        apply.assert_called_once_with(self.config_file, exclude_keys=set())
+        self.assertEqual([peer.name for peer in load_server_config(self.config_file).peers], ["bob"])
+        self.assertEqual(user_store.get_usernames(), ["bob"])
+
+    def test_optimistic_update(self):
+        """Тест: обновление с устаревшей версией отклоняется, повтор через update_user проходит."""
+        user_store.save_user("carol", {"hits": 0})
+        record, version = user_store.get_user_versioned("carol")
+        user_store.update_user("carol", {"hits": 1})
+
+        with self.assertRaises(user_store.VersionConflict):
+            user_store.update_user("carol", {"hits": 5}, expected_version=version)
+        self.assertEqual(user_repository.update_user("carol", lambda r: {"hits": r["hits"] + 1}), {"hits": 2})
+
+    def test_concurrent_processes(self):
+        """Тест: параллельные создания/удаления из нескольких процессов сохраняют инварианты."""
+        user_store.save_user("counter", {"hits": 0})
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(WORKERS) as pool:
+            results = pool.starmap(_worker, [(self.tmp_dir.name, self.config_file, w) for w in range(WORKERS)])
+
+        expected = {name for created, _ in results for name in created} | {"shared"}
+        self.assertEqual(sum(conflicts for _, conflicts in results), WORKERS * USERS_PER_WORKER - 1)
+
+        # wg0.conf целый: каждое имя и ключ встречаются ровно один раз
+        with open(self.config_file) as file:
+            config = parse_server_config_text(file.read())
+        names = [peer.name for peer in config.peers]
+        self.assertEqual(len(names), len(set(names)))
+        self.assertEqual(set(names), expected)
+        self.assertEqual(len({peer.public_key for peer in config.peers}), len(names))
+        self.assertFalse(os.path.exists(self.config_file + ".tmp"))
+
+        # База совпадает с wg0.conf, а счётчик не потерял ни одного обновления
+        user_store.close_connections()
+        self.assertEqual(set(user_store.get_usernames()) - {"counter"}, expected)
+        self.assertEqual(user_store.get_user("counter")["hits"], WORKERS * USERS_PER_WORKER)
+
+        # Индекс смещений согласован с файлом: удаление по нему даёт корректный результат
+        invalidate_cache()
+        user_repository.delete_users(sorted(expected)[:5], self.config_file)
+        with open(self.config_file) as file:
+            remaining = [peer.name for peer in parse_server_config_text(file.read()).peers]
+        self.assertEqual(set(remaining), set(sorted(expected)[5:]))
+
+
+if __name__ == "__main__":
+    unittest.main()
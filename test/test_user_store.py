@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# test_user_store.py
+## Модульные тесты хранилища пользователей на SQLite.
+
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import settings
+from modules import user_store
+from test.helpers import USER_STORE, isolated_settings
+
+
+class TestUserStore(unittest.TestCase):
+
+    def setUp(self):
+        isolated_settings(self, *USER_STORE)
+        self.json_path = settings.USER_DB_PATH
+        self.db_path = settings.USER_STORE_PATH
+
+    def test_json_migration(self):
+        """Тест: при первом открытии записи импортируются из user_records.json один раз."""
+        with open(self.json_path, "w") as file:
+            json.dump({
+                "alice": {"public_key": "key_a", "allowed_ips": "10.66.66.2/32, fd42::2/128", "status": "active"},
+                "bob": {"public_key": "key_b", "address": "10.66.66.3/32", "status": "inactive"},
+            }, file)
+
+        self.assertEqual(user_store.get_usernames(), ["alice", "bob"])
+        self.assertEqual(user_store.get_connection().execute("PRAGMA journal_mode").fetchone()[0], "wal")
+
+        # Повторное открытие не импортирует удалённые записи заново
+        user_store.delete_user("alice")
+        user_store.close_connections()
+        self.assertEqual(user_store.get_usernames(), ["bob"])
+
+    def test_lookups(self):
+        """Тест: поиск по ключу, адресу, статусу и сроку действия."""
+        user_store.save_users({
+            "alice": {"public_key": "key_a", "allowed_ips": "10.66.66.2/32", "status": "active",
+                      "expires_at": "2024-01-01T00:00:00"},
+            "bob": {"public_key": "key_b", "address": "10.66.66.3/32", "status": "inactive",
+                    "expires_at": "2025-01-01T00:00:00"},
+        })
+
+        self.assertEqual(user_store.find_user_by_public_key("key_b")[0], "bob")
+        self.assertEqual(user_store.find_user_by_address("10.66.66.2")[0], "alice")
+        self.assertIsNone(user_store.find_user_by_address("10.66.66.9/32"))
+        self.assertEqual(list(user_store.get_users_by_status("active")), ["alice"])
+        self.assertEqual(list(user_store.get_users_expiring_before("2024-06-01T00:00:00")), ["alice"])
+        self.assertTrue(user_store.user_exists("ALICE", case_sensitive=False))
+        self.assertFalse(user_store.user_exists("ALICE"))
+        self.assertEqual(user_store.count_users(), 2)
+
+    def test_update_and_delete(self):
+        """Тест: обновление полей и удаление записей."""
+        user_store.save_user("alice", {"status": "active", "address": "10.66.66.2/32"})
+
+        updated = user_store.update_user("alice", {"status": "blocked"})
+        self.assertEqual(updated, {"status": "blocked", "address": "10.66.66.2/32"})
+        self.assertEqual(list(user_store.get_users_by_status("blocked")), ["alice"])
+        self.assertIsNone(user_store.update_user("nobody", {"status": "blocked"}))
+
+        self.assertEqual(user_store.delete_user("alice")["status"], "blocked")
+        self.assertIsNone(user_store.delete_user("alice"))
+
+        user_store.save_users({"a": {}, "b": {}, "c": {}})
+        self.assertEqual(user_store.delete_users(["a", "c", "missing"]), 2)
+        self.assertEqual(user_store.get_usernames(), ["b"])
+
+    def test_export_import(self):
+        """Тест: выгрузка в JSON и обратная загрузка."""
+        user_store.save_user("alice", {"status": "active"})
+        export_path = os.path.join(self.tmp_dir.name, "export.json")
+
+        self.assertEqual(user_store.export_json(export_path), 1)
+        with open(export_path) as file:
+            self.assertEqual(json.load(file), {"alice": {"status": "active"}})
+
+        user_store.clear_users()
+        self.assertEqual(user_store.import_json(export_path), 1)
+        self.assertEqual(user_store.get_user("alice"), {"status": "active"})
+
+    def test_query_users(self):
+        """Тест: отбор, сортировка, страница и набор полей выполняются в базе."""
+        user_store.save_users({
+            "alice": {"public_key": "key_a", "status": "active", "email": "a@example.com", "data_limit": "5.0 GB"},
+            "bob": {"public_key": "key_b", "status": "inactive", "email": "b@example.com"},
+            "carol": {"public_key": "key_c", "status": "active", "email": "c@example.com", "data_limit": "1.0 GB"},
+        })
+
+        self.assertEqual(user_store.query_users(["email", "status"], where={"status": "active"}), {
+            "alice": {"email": "a@example.com", "status": "active"},
+            "carol": {"email": "c@example.com", "status": "active"},
+        })
+        self.assertEqual(list(user_store.query_users([], order_by="-username", offset=1, limit=1)), ["bob"])
+        self.assertEqual(list(user_store.query_users(["email"], where={"data_limit": None})), ["bob"])
+        self.assertEqual(list(user_store.query_users(where=[("username", "in", ["carol", "bob"])])), ["bob", "carol"])
+        self.assertEqual(user_store.query_users(where={"username": "bob"})["bob"]["public_key"], "key_b")
+        self.assertEqual(user_store.count_users({"status": "active"}), 2)
+        self.assertEqual(user_store.count_users([("email", "like", "c@%")]), 1)
+        with self.assertRaises(ValueError):
+            user_store.query_users(["email') FROM users --"])
+        with self.assertRaises(ValueError):
+            user_store.count_users([("status", "or", "active")])
+
+        pages = list(user_store.iter_users(["status"], page_size=2))
+        self.assertEqual([username for username, _ in pages], ["alice", "bob", "carol"])
+        self.assertEqual(pages[1][1], {"status": "inactive"})
+        self.assertEqual(list(user_store.iter_users([], where={"status": "active"}, page_size=1)),
+                         [("alice", {}), ("carol", {})])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# test_wg_apply.py
+## Модульные тесты применения изменений пиров к интерфейсу (с поддельным `wg` в PATH).
+
+import json
+import os
+import stat
+import sys
+import tempfile
+import textwrap
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.wg_apply import apply_peer_changes, get_running_peers
+from modules.wg_config_parser import invalidate_cache
+
+# Поддельные `wg` и `wg-quick`: состояние интерфейса хранится в JSON, все вызовы пишутся в журнал
+FAKE_WG = textwrap.dedent('''\
+    #!{python}
+    import json, os, sys
+    state_path = os.environ["FAKE_WG_STATE"]
+    with open(state_path) as f:
+        state = json.load(f)
+    with open(os.environ["FAKE_WG_LOG"], "a") as f:
+        f.write(" ".join(sys.argv[1:]) + "\\n")
+    args = sys.argv[1:]
+    if args[0] == "show" and args[2] == "dump":
+        print("privkey\\tpubkey\\t51820\\toff")
+        for key, peer in state.items():
+            print("\\t".join([key, peer["psk"] or "(none)", "(none)", peer["ips"] or "(none)", "0", "0", "0", "off"]))
+    elif args[0] == "set":
+        key = args[3]
+        if args[4:] == ["remove"]:
+            state.pop(key)
+        else:
+            peer = state.setdefault(key, {{"psk": None, "ips": ""}})
+            options = dict(zip(args[4::2], args[5::2]))
+            if "preshared-key" in options:
+                peer["psk"] = sys.stdin.read().strip()
+            peer["ips"] = options.get("allowed-ips", peer["ips"])
+    elif args[0] == "syncconf":
+        state = {{}}
+        peer = None
+        for line in open(args[2]):
+            line = line.strip()
+            if line == "[Peer]":
+                peer = {{"psk": None, "ips": ""}}
+            elif peer is not None and "=" in line:
+                name, value = [part.strip() for part in line.split("=", 1)]
+                if name == "PublicKey":
+                    state[value] = peer
+                elif name == "PresharedKey":
+                    peer["psk"] = value
+                elif name == "AllowedIPs":
+                    peer["ips"] = value
+    elif args[0] == "strip":
+        sys.stdout.write(open(os.environ["FAKE_WG_CONFIG"]).read())
+    with open(state_path, "w") as f:
+        json.dump(state, f)
+''')
+
+
+def peer_block(name, key, ips):
+    return f"\n### Client {name}\n[Peer]\nPublicKey = {key}\nPresharedKey = psk_{name}\nAllowedIPs = {ips}\n"
+
+
+class TestWGApply(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.addCleanup(invalidate_cache)
+        bin_dir = os.path.join(self.tmp_dir.name, "bin")
+        os.makedirs(bin_dir)
+        script = FAKE_WG.format(python=sys.executable)
+        for name in ("wg", "wg-quick"):
+            path = os.path.join(bin_dir, name)
+            with open(path, "w") as file:
+                file.write(script)
+            os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+
+        self.config_file = os.path.join(self.tmp_dir.name, "wg0.conf")
+        self.state_path = os.path.join(self.tmp_dir.name, "state.json")
+        self.log_path = os.path.join(self.tmp_dir.name, "calls.log")
+        env = {
+            "PATH": bin_dir + os.pathsep + os.environ.get("PATH", ""),
+            "FAKE_WG_STATE": self.state_path,
+            "FAKE_WG_LOG": self.log_path,
+            "FAKE_WG_CONFIG": self.config_file,
+        }
+        env_patcher = patch.dict(os.environ, env)
+        env_patcher.start()
+        self.addCleanup(env_patcher.stop)
+
+        self.write_config(peer_block("alice", "key_a", "10.66.66.2/32") + peer_block("bob", "key_b", "10.66.66.3/32"))
+        self.write_state({
+            "key_a": {"psk": "psk_alice", "ips": "10.66.66.2/32"},
+            "key_b": {"psk": "psk_bob", "ips": "10.66.66.3/32"},
+        })
+
+    def write_config(self, content):
+        with open(self.config_file, "w") as file:
+            file.write("[Interface]\nListenPort = 51820\n" + content)
+        invalidate_cache()
+
+    def write_state(self, state):
+        with open(self.state_path, "w") as file:
+            json.dump(state, file)
+
+    def calls(self):
+        if not os.path.exists(self.log_path):
+            return []
+        with open(self.log_path) as file:
+            return [line.strip() for line in file]
+
+    def test_add_and_remove_single_peer(self):
+        """Тест: добавление одного пира — одна команда `wg set`, остальные пиры не затрагиваются."""
+        self.write_config(peer_block("alice", "key_a", "10.66.66.2/32") + peer_block("carol", "key_c", "10.66.66.4/32"))
+
+        result = apply_peer_changes(self.config_file)
+
+        self.assertEqual(result, {"mode": "set", "added": 1, "updated": 0, "removed": 1})
+        self.assertEqual(self.calls(), [
+            "show wg0 dump",
+            "set wg0 peer key_b remove",
+            "set wg0 peer key_c preshared-key /dev/stdin allowed-ips 10.66.66.4/32",
+        ])
+        running = get_running_peers("wg0")
+        self.assertEqual(sorted(running), ["key_a", "key_c"])
+        self.assertEqual(running["key_c"]["preshared_key"], "psk_carol")
+
+    def test_no_changes(self):
+        """Тест: если интерфейс уже соответствует конфигурации, изменения не применяются."""
+        result = apply_peer_changes(self.config_file)
+        self.assertEqual(result["added"] + result["updated"] + result["removed"], 0)
+        self.assertEqual(self.calls(), ["show wg0 dump"])
+
+    def test_large_diff_uses_syncconf(self):
+        """Тест: при большом числе изменений используется `wg syncconf`."""
+        self.write_config("".join(peer_block(f"user{n}", f"key{n}", f"10.66.66.{n + 10}/32") for n in range(5)))
+
+        result = apply_peer_changes(self.config_file, max_ops=3)
+
+        self.assertEqual(result["mode"], "syncconf")
+        self.assertEqual(self.calls()[1], "strip wg0")
+        self.assertTrue(self.calls()[2].startswith("syncconf wg0 "))
+        self.assertEqual(sorted(get_running_peers("wg0")), [f"key{n}" for n in range(5)])
+
+    def test_interface_down(self):
+        """Тест: если интерфейс недоступен, возвращается ошибка без исключения."""
+        os.remove(self.state_path)
+        self.assertEqual(apply_peer_changes(self.config_file)["mode"], "error")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# test_wg_config_parser.py
+## Модульные тесты для парсера конфигурации сервера WireGuard.
+
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.wg_config_parser import (
+    invalidate_cache,
+    load_server_config,
+    parse_server_config_text,
+)
+
+SERVER_CONFIG = (
+    "[Interface]\n"
+    "Address = 10.66.66.1/24,fd42:42:42::1/64\n"
+    "ListenPort = 51820\n"
+    "PostUp = iptables -A FORWARD -i wg0 -j ACCEPT\n"
+    "PostUp = ip6tables -A FORWARD -i wg0 -j ACCEPT\n"
+    "\n"
+    "### Client Алиса\n"
+    "[Peer]\n"
+    "PublicKey = key_alice\n"
+    "PresharedKey = psk_alice\n"
+    "AllowedIPs = 10.66.66.2/32,fd42:42:42::2/128\n"
+    "\n"
+    "### Client bob\n"
+    "[Peer]\n"
+    "PublicKey = key_bob\n"
+    "PresharedKey = psk_bob\n"
+    "AllowedIPs = 10.66.66.3/32\n"
+    "PersistentKeepalive = 25\n"
+)
+
+
+class TestWGConfigParser(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.config_path = os.path.join(self.tmp_dir.name, "wg0.conf")
+        with open(self.config_path, "w") as file:
+            file.write(SERVER_CONFIG)
+        self.addCleanup(self.tmp_dir.cleanup)
+        self.addCleanup(invalidate_cache)
+
+    def test_parse_peers_and_interface(self):
+        """Тест: пиры, секция [Interface] и дополнительные поля разбираются за один проход."""
+        config = parse_server_config_text(SERVER_CONFIG)
+        self.assertEqual(len(config), 2)
+        self.assertEqual(config.interface["ListenPort"], "51820")
+        self.assertEqual(len(config.interface["PostUp"].splitlines()), 2)
+        bob = config.get_by_name("bob")
+        self.assertEqual(bob.public_key, "key_bob")
+        self.assertEqual(bob.as_dict()["PersistentKeepalive"], "25")
+
+    def test_indexes(self):
+        """Тест: поиск пира по имени, ключу и IP."""
+        config = parse_server_config_text(SERVER_CONFIG)
+        self.assertEqual(config.get_by_key("key_alice").name, "Алиса")
+        self.assertEqual(config.get_by_ip("fd42:42:42::2/128").name, "Алиса")
+        self.assertEqual(config.get_by_name("BOB", case_sensitive=False).name, "bob")
+        self.assertIsNone(config.get_by_name("BOB"))
+        self.assertEqual(config.addresses(), ["10.66.66.2", "fd42:42:42::2", "10.66.66.3"])
+
+    def test_byte_offsets(self):
+        """Тест: смещения блока пира указывают на его байты в файле."""
+        config = parse_server_config_text(SERVER_CONFIG)
+        raw = SERVER_CONFIG.encode("utf-8")
+        alice = config.get_by_name("Алиса")
+        block = raw[alice.start:alice.end].decode("utf-8")
+        self.assertTrue(block.startswith("### Client Алиса\n[Peer]\n"))
+        self.assertTrue(block.endswith("fd42:42:42::2/128\n\n"))
+        self.assertEqual(config.get_by_name("bob").end, len(raw))
+
+    def test_cache_until_file_changes(self):
+        """Тест: модель кэшируется, пока файл не изменился."""
+        first = load_server_config(self.config_path)
+        self.assertIs(load_server_config(self.config_path), first)
+
+        with open(self.config_path, "a") as file:
+            file.write("\n### Client carol\n[Peer]\nPublicKey = key_carol\nAllowedIPs = 10.66.66.4/32\n")
+        second = load_server_config(self.config_path)
+        self.assertIsNot(second, first)
+        self.assertEqual(second.get_by_ip("10.66.66.4").name, "carol")
+
+    def test_missing_file(self):
+        """Тест: отсутствующий файл поднимает FileNotFoundError."""
+        with self.assertRaises(FileNotFoundError):
+            load_server_config(os.path.join(self.tmp_dir.name, "missing.conf"))
+
+
+if __name__ == "__main__":
+    unittest.main()
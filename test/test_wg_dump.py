@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# test_wg_dump.py
+## Модульные тесты разбора `wg show <if> dump` и его потребителей.
+
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from modules.wg_dump import (
+    benchmark_parsers,
+    format_bytes,
+    format_handshake,
+    parse_dump,
+    synthetic_dump,
+)
+
+ALL_DUMP = (
+    "wg0\tprivate\tserver_pub\t51820\toff\n"
+    "wg0\tkey_a\tpsk_a\t[2001:db8::1]:51000\t10.66.66.2/32,fd42::2/128\t1700000000\t5000\t1048576\toff\n"
+    "wg0\tkey_b\t(none)\t(none)\t10.66.66.3/32\t0\t0\t0\t25\n"
+    "wg1\tprivate1\tserver_pub1\t51821\t0x1\n"
+    "wg1\tkey_c\t(none)\t203.0.113.5:4000\t10.77.0.2/32\t1700000100\t1\t2\toff\n"
+)
+
+
+class TestWGDump(unittest.TestCase):
+
+    def test_parse_all_dump(self):
+        """Тест: разбор `wg show all dump` с несколькими интерфейсами и IPv6 endpoint."""
+        table = parse_dump(ALL_DUMP)
+
+        self.assertEqual(len(table), 3)
+        self.assertEqual(table.public_keys, ["key_a", "key_b", "key_c"])
+        self.assertEqual(table.interfaces, ["wg0", "wg0", "wg1"])
+        self.assertEqual(list(table.rx_bytes), [5000, 0, 1])
+        self.assertEqual(list(table.keepalives), [0, 25, 0])
+        self.assertEqual(table.interface_info["wg1"], {"public_key": "server_pub1", "listen_port": 51821, "fwmark": "0x1"})
+
+        peer = table.get("key_a")
+        self.assertEqual(peer["endpoint"], "[2001:db8::1]:51000")
+        self.assertEqual(peer["allowed_ips"], "10.66.66.2/32,fd42::2/128")
+        self.assertEqual(peer["latest_handshake"], 1700000000)
+        self.assertEqual(peer["tx_bytes"], 1048576)
+        self.assertIsNone(table.get("key_b")["preshared_key"])
+        self.assertIsNone(table.get("key_b")["endpoint"])
+        self.assertNotIn("missing", table)
+
+    def test_parse_interface_dump(self):
+        """Тест: разбор `wg show wg0 dump` (без колонки интерфейса)."""
+        output = "private\tserver_pub\t51820\toff\nkey_a\t(none)\t(none)\t10.66.66.2/32\t0\t10\t20\toff\n"
+        table = parse_dump(output, "wg0")
+        self.assertEqual(table.row(0)["interface"], "wg0")
+        self.assertEqual(table.row(0)["rx_bytes"], 10)
+        self.assertEqual(table.interface_info["wg0"]["listen_port"], 51820)
+        self.assertEqual(len(parse_dump("", "wg0")), 0)
+
+    def test_formatting(self):
+        """Тест: форматирование байтов и времени handshake как в `wg show`."""
+        self.assertEqual(format_bytes(512), "512 B")
+        self.assertEqual(format_bytes(5000), "4.88 KiB")
+        self.assertEqual(format_bytes(3 * 1024 ** 3), "3.00 GiB")
+        self.assertEqual(format_handshake(0), "N/A")
+        self.assertEqual(format_handshake(1000, now=1000), "Now")
+        self.assertEqual(format_handshake(1000, now=1000 + 3600 + 65), "1 hour, 1 minute, 5 seconds ago")
+
+    def test_synthetic_benchmark(self):
+        """Тест: синтетический dump разбирается полностью, бенчмарк возвращает время обоих разборов."""
+        table = parse_dump(synthetic_dump(1000, now=1700000000))
+        self.assertEqual(len(table), 1000)
+        self.assertEqual(table.get("peer_key_000003=")["endpoint"], "[2001:db8::3]:40003")
+        results = benchmark_parsers(200, repeat=1)
+        self.assertGreater(results["dump"], 0)
+        self.assertGreater(results["text"], 0)
+
+    @patch("modules.sync.collect_peers", return_value=parse_dump(ALL_DUMP))
+    def test_sync_peers(self, mocked_collect):
+        """Тест: wg_users.json получает точные счётчики и epoch handshake."""
+        from modules.sync import peers_from_table
+
+        peers = peers_from_table(mocked_collect(), now=1700000060)
+        self.assertEqual(peers["key_a"]["last_handshake"], "1 minute ago")
+        self.assertEqual(peers["key_a"]["rx_bytes"], 5000)
+        self.assertEqual(peers["key_b"]["last_handshake_epoch"], 0)
+
+    @patch("modules.data_sync.collect_peers", return_value=parse_dump(ALL_DUMP))
+    def test_data_sync_peers(self, mocked_collect):
+        """Тест: data_sync получает endpoint целиком (включая IPv6) и трафик в байтах."""
+        from modules.data_sync import get_wg_show_data
+
+        peers = get_wg_show_data()
+        self.assertEqual(peers["key_a"]["endpoint"], "[2001:db8::1]:51000")
+        self.assertEqual(peers["key_a"]["uploaded"], "4.88 KiB")
+        self.assertEqual(peers["key_a"]["downloaded_bytes"], 1048576)
+        self.assertNotIn("endpoint", peers["key_b"])
+
+
+if __name__ == "__main__":
+    unittest.main()
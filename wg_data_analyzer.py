@@ -6,7 +6,7 @@
 # ==================================================
 # Описание:
 # Этот скрипт собирает данные из трёх источников:
-# - Команда `sudo wg show` (текущее состояние WireGuard);
+# - Команда `wg show all dump` (текущее состояние WireGuard);
 # - Файл конфигурации `/etc/wireguard/wg0.conf`;
 # - Файл параметров `/etc/wireguard/params`.
 # 
@@ -37,6 +37,8 @@ sys.path.append(str(PROJECT_ROOT))
 # Попытка импортировать настройки проекта
 try:
     from settings import BASE_DIR, SERVER_CONFIG_FILE, PARAMS_FILE, LLM_API_URL
+    from modules.wg_config_parser import load_server_config, parse_server_config_text
+    from modules.wg_dump import PeerTable, collect_peers, format_handshake
 except ModuleNotFoundError as e:
     logger = logging.getLogger(__name__)
     logger.error("Не удалось найти модуль settings. Убедитесь, что файл settings.py находится в корне проекта.")
@@ -71,11 +73,10 @@ def get_last_restart():
         return "No data"
 
 def get_wg_status():
-    """Получает состояние WireGuard через команду `wg show`."""
+    """Получает состояние WireGuard через `wg show all dump`."""
     try:
-        output = subprocess.check_output(["sudo", "wg", "show"], text=True)
-        return output
-    except subprocess.CalledProcessError as e:
+        return collect_peers()
+    except (subprocess.CalledProcessError, OSError) as e:
         logger.error(f"Ошибка выполнения команды wg show: {e}")
         return f"Error executing wg show: {e}"
 
@@ -91,88 +92,36 @@ def read_config_file(filepath):
         logger.error(f"Ошибка чтения файла {filepath}: {e}")
         return f"Error reading file {filepath}: {e}"
 
-def parse_wg_show(output):
-    """Парсит вывод команды `wg show` и извлекает данные о пирах."""
-    def convert_to_simple_format(size_str):
-        """Конвертирует размер из строки в простой формат (MB или GB)."""
-        try:
-            size, unit = size_str.split()
-            size = float(size)
-            if unit.lower().startswith("kib"):
-                size_mb = size / 1024
-                return f"{size_mb:.2f} MB"
-            elif unit.lower().startswith("mib"):
-                return f"{size:.2f} MB"
-            elif unit.lower().startswith("gib"):
-                return f"{size:.2f} GB"
-            else:
-                return size_str
-        except Exception:
-            return "No data"
-
-    peers = []
-    current_peer = None
-
-    for line in output.splitlines():
-        line = line.strip()
-        if line.startswith("peer:"):
-            if current_peer:
-                peers.append(current_peer)
-            current_peer = {
-                "PublicKey": line.split("peer:")[1].strip(),
-                "Transfer": {"Received": "No data", "Sent": "No data"},
-                "LatestHandshake": "No data"
-            }
-        elif "latest handshake:" in line and current_peer:
-            handshake_data = line.split("latest handshake:")[1].strip()
-            current_peer["LatestHandshake"] = handshake_data if handshake_data else "No data"
-        elif "transfer:" in line and current_peer:
-            transfer_data = line.split("transfer:")[1].split(",")
-            if len(transfer_data) == 2:
-                current_peer["Transfer"] = {
-                    "Received": convert_to_simple_format(transfer_data[0].strip()) or "No data",
-                    "Sent": convert_to_simple_format(transfer_data[1].strip()) or "No data"
-                }
-
-    if current_peer:
-        peers.append(current_peer)
-
+def parse_wg_show(table):
+    """Извлекает данные о пирах из PeerTable (`wg show all dump`)."""
+    def convert_to_simple_format(size):
+        """Конвертирует размер в байтах в простой формат (MB или GB)."""
+        if size >= 1024 ** 3:
+            return f"{size / 1024 ** 3:.2f} GB"
+        return f"{size / 1024 ** 2:.2f} MB"
+
+    peers = [
+        {
+            "PublicKey": public_key,
+            "Transfer": {
+                "Received": convert_to_simple_format(rx),
+                "Sent": convert_to_simple_format(tx),
+            },
+            "LatestHandshake": format_handshake(handshake) if handshake else "No data",
+        }
+        for public_key, handshake, rx, tx in zip(
+            table.public_keys, table.latest_handshakes, table.rx_bytes, table.tx_bytes
+        )
+    ]
     return {"peers": peers}
 
-    # Проверка на отсутствие данных и установка значений по умолчанию
-    for peer in peers:
-        peer["Transfer"]["Received"] = peer["Transfer"]["Received"] or "No data"
-        peer["Transfer"]["Sent"] = peer["Transfer"]["Sent"] or "No data"
-        peer["LatestHandshake"] = peer["LatestHandshake"] or "No data"
-
-    return {"peers": peers}
+def peers_with_logins(config):
+    """Преобразует разобранный wg0.conf в список пиров с логинами."""
+    return [{"login": peer.name, "peer": peer.as_dict()} for peer in config.peers]
 
 def parse_config_with_logins(content):
     """Парсит конфигурационный файл WireGuard и сопоставляет пиров с логинами."""
-    peer_data = []
-    current_login = None
-    current_peer = {}
-
-    for line in content.splitlines():
-        line = line.strip()
-        if line.startswith("### Client"):
-            if current_peer:
-                peer_data.append(current_peer)
-            current_login = line.split("Client")[-1].strip()
-            current_peer = {"login": current_login, "peer": {}}
-        elif line.startswith("[Peer]"):
-            if current_peer:
-                peer_data.append(current_peer)
-            current_peer = {"login": current_login, "peer": {}}
-        elif "=" in line:
-            key, value = map(str.strip, line.split("=", 1))
-            if current_peer:
-                current_peer["peer"][key] = value
-
-    if current_peer:
-        peer_data.append(current_peer)
-
-    return peer_data
+    return peers_with_logins(parse_server_config_text(content))
 
 def parse_config_file(content):
     """Парсит содержимое конфигурационного файла и возвращает словарь."""
@@ -189,12 +138,19 @@ def collect_and_analyze_wg_data():
 
     # Сбор данных
     wg_status = get_wg_status()
-    wg0_config = read_config_file(SERVER_CONFIG_FILE)
     params_config = read_config_file(PARAMS_FILE)
+    try:
+        wg0_config = peers_with_logins(load_server_config(SERVER_CONFIG_FILE))
+    except FileNotFoundError:
+        logger.warning(f"Файл не найден: {SERVER_CONFIG_FILE}")
+        wg0_config = f"File not found: {SERVER_CONFIG_FILE}"
+    except OSError as e:
+        logger.error(f"Ошибка чтения файла {SERVER_CONFIG_FILE}: {e}")
+        wg0_config = f"Error reading file {SERVER_CONFIG_FILE}: {e}"
 
     # Анализ данных
-    data["wg_status"] = parse_wg_show(wg_status) if "Error" not in wg_status else wg_status
-    data["wg0_config"] = parse_config_with_logins(wg0_config) if "Error" not in wg0_config else wg0_config
+    data["wg_status"] = parse_wg_show(wg_status) if isinstance(wg_status, PeerTable) else wg_status
+    data["wg0_config"] = wg0_config
     data["params_config"] = parse_config_file(params_config) if "Error" not in params_config else params_config
     data["last_restart"] = get_last_restart()
 